@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+"""
+Agent mode and fleet controller for Better10
+
+An agent serves the operation engine over JSON-RPC 2.0 on a local HTTP
+endpoint, so many machines can be provisioned from one controller instead
+of clicking through the GUI on each of them. Every request is a POST to
+/rpc carrying "Authorization: Bearer <token>".
+
+Agent methods:
+    ping()                          -> {"hostname", "backend", "busy"}
+    submit(operations, name=None)   -> {"run_id"}
+    events(run_id, since=0, wait=25)-> {"events": [...], "next", "state"}
+    status(run_id=None)             -> run summary (latest run if no id)
+    cancel(run_id)                  -> {"cancelled"}
+    inventory()                     -> installed programs, Appx packages, local catalog
+
+events() is a long poll: it returns as soon as there is an event after
+"since", or when "wait" seconds pass. Events are "started", "log",
+"progress", "op_started", "op_finished" (with outcome, duration and exit
+code) and "finished". Operations are profile-format dicts (hives by name),
+the same as a --run profile.
+
+An agent runs whatever it is sent with the backend's privileges, so it
+refuses to listen on anything but a loopback address without a token. The
+endpoint is plain HTTP: the token and the plans cross the network in
+cleartext, so serve remote agents only on a trusted network or through a
+tunnel (SSH, VPN).
+
+Start an agent:
+    python better10.py --agent --agent-bind 127.0.0.1:8765 --agent-token SECRET
+
+Fan a profile out to several agents:
+    python agent.py lab_profile.json 10.0.0.11:8765 10.0.0.12:8765 --token SECRET
+
+Try it on one machine with simulated agents:
+    python better10.py --simulate --sim-latency 0.2 --agent --agent-bind 127.0.0.1:8801 --agent-token t
+    python better10.py --simulate --sim-latency 0.2 --agent --agent-bind 127.0.0.1:8802 --agent-token t
+    python agent.py lab_profile.json 127.0.0.1:8801 127.0.0.1:8802 --token t
+"""
+
+import sys
+import os
+import hmac
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import platform
+import ipaddress
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Tuple, Optional, Callable
+
+from backends import SystemBackend, SCRIPT_DIR
+from profiles import load_profile, normalize_operation, serialize_operation
+from events import EventKind
+
+DEFAULT_PORT = 8765
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+UNAUTHORIZED = -32001
+BUSY = -32002
+
+
+class RunState:
+    """Lifecycle of a submitted plan"""
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class RpcError(Exception):
+    """Error returned to the caller as a JSON-RPC error object"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def parse_address(address: str, default_port: int = DEFAULT_PORT) -> Tuple[str, int]:
+    """Split "host:port" (or a bare host) into a (host, port) tuple"""
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        return address, default_port
+    return host or "127.0.0.1", int(port)
+
+
+def is_loopback(host: str) -> bool:
+    """Return True if a bind host only accepts connections from this machine"""
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        pass
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except OSError:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_loopback
+                                   for address in addresses)
+
+
+class AgentRun:
+    """
+    One plan executing on the agent
+
+    Events are kept in order with a sequence number equal to their index,
+    so a client resumes from the "next" value of its previous poll.
+    """
+
+    def __init__(self, run_id: str, name: str, operations: List[Dict]):
+        self.run_id = run_id
+        self.name = name
+        self.operations = operations
+        self.state = RunState.RUNNING
+        self.progress = 0
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.worker = None
+        self.events: List[Dict] = []
+        self.condition = threading.Condition()
+
+    def add_event(self, event: str, **fields):
+        """Append an event and wake any long-polling clients"""
+        with self.condition:
+            fields.update(seq=len(self.events), time=round(time.time(), 3), event=event)
+            self.events.append(fields)
+            self.condition.notify_all()
+
+    def events_since(self, since: int, wait: float) -> List[Dict]:
+        """Return events from sequence number "since", waiting up to "wait" seconds for new ones"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: len(self.events) > since or self.state != RunState.RUNNING,
+                timeout=wait
+            )
+            return self.events[since:]
+
+    def summary(self) -> Dict:
+        """Return the run's state without its events"""
+        worker = self.worker
+        return {
+            "run_id": self.run_id,
+            "name": self.name,
+            "state": self.state,
+            "progress": self.progress,
+            "operations": len(self.operations),
+            "successful": worker.success_count if worker else 0,
+            "failed": worker.failure_count if worker else 0,
+            "reboot_required": list(worker.reboot_required) if worker else [],
+            "verification": [result.to_dict() for result in worker.verification_results] if worker else [],
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class AgentService:
+    """
+    JSON-RPC methods of an agent
+
+    Only one plan runs at a time, because two plans changing the same
+    machine concurrently would race on the registry and on msiexec.
+    """
+
+    def __init__(self, backend: SystemBackend, max_runs: int = 20):
+        """
+        Args:
+            backend: Backend every submitted plan runs against
+            max_runs: Finished runs kept for status() and events() queries
+        """
+        self.backend = backend
+        self.max_runs = max_runs
+        self.runs: "OrderedDict[str, AgentRun]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_run(self, run_id: Optional[str]) -> AgentRun:
+        with self._lock:
+            if run_id is None and self.runs:
+                return next(reversed(self.runs.values()))
+            run = self.runs.get(run_id)
+        if run is None:
+            raise RpcError(INVALID_PARAMS, f"Unknown run: {run_id}")
+        return run
+
+    def _active_run(self) -> Optional[AgentRun]:
+        with self._lock:
+            for run in self.runs.values():
+                if run.state == RunState.RUNNING:
+                    return run
+        return None
+
+    def ping(self) -> Dict:
+        return {"hostname": socket.gethostname(), "backend": self.backend.name,
+                "busy": self._active_run() is not None}
+
+    def submit(self, operations: List[Dict], name: str = None) -> Dict:
+        # Imported here because better10 imports this module lazily from main()
+        from better10 import WorkerThread
+
+        if not isinstance(operations, list) or not all(isinstance(op, dict) and op.get('type') for op in operations):
+            raise RpcError(INVALID_PARAMS, "operations must be a list of operation objects with a type")
+
+        with self._lock:
+            for run in self.runs.values():
+                if run.state == RunState.RUNNING:
+                    raise RpcError(BUSY, f"Run {run.run_id} is still in progress")
+            run = AgentRun(uuid.uuid4().hex[:12], name or "Remote plan",
+                           [normalize_operation(op) for op in operations])
+            self.runs[run.run_id] = run
+            while len(self.runs) > self.max_runs:
+                self.runs.popitem(last=False)
+
+        worker = WorkerThread(run.operations, backend=self.backend)
+        run.worker = worker
+        worker.events.subscribe(lambda event: self._on_event(run, event), name="agent",
+                                kinds=(EventKind.LOG, EventKind.PROGRESS, EventKind.OP_STARTED,
+                                       EventKind.OP_FINISHED, EventKind.RUN_FINISHED))
+
+        run.add_event("started", name=run.name, operations=len(run.operations))
+        threading.Thread(target=worker.run, name=f"agent-run-{run.run_id}", daemon=True).start()
+        return {"run_id": run.run_id}
+
+    def _on_event(self, run: AgentRun, event):
+        if event.kind == EventKind.LOG:
+            run.add_event("log", level=event.level, message=event.message)
+        elif event.kind == EventKind.PROGRESS:
+            self._on_progress(run, event.percent)
+        elif event.kind == EventKind.RUN_FINISHED:
+            self._on_finished(run, event.success)
+        else:
+            run.add_event(event.kind, **event.fields())
+
+    @staticmethod
+    def _on_progress(run: AgentRun, percent: int):
+        run.progress = percent
+        run.add_event("progress", percent=percent)
+
+    @staticmethod
+    def _on_finished(run: AgentRun, success: bool):
+        if run.worker.cancelled:
+            state = RunState.CANCELLED
+        else:
+            state = RunState.SUCCEEDED if success else RunState.FAILED
+        run.finished = time.time()
+        # Set the state inside the event's lock so pollers see both together
+        with run.condition:
+            run.state = state
+            run.add_event("finished", **{k: v for k, v in run.summary().items()
+                                         if k in ("state", "successful", "failed", "reboot_required")})
+
+    def events(self, run_id: str, since: int = 0, wait: float = 25.0) -> Dict:
+        run = self._get_run(run_id)
+        try:
+            since, wait = max(0, int(since)), min(max(0.0, float(wait)), 60.0)
+        except (TypeError, ValueError):
+            raise RpcError(INVALID_PARAMS, "since and wait must be numbers")
+        events = run.events_since(since, wait)
+        return {"events": events, "next": since + len(events), "state": run.state}
+
+    def status(self, run_id: str = None) -> Dict:
+        if run_id is None and not self.runs:
+            return {"state": None}
+        return self._get_run(run_id).summary()
+
+    def cancel(self, run_id: str) -> Dict:
+        run = self._get_run(run_id)
+        if run.state != RunState.RUNNING:
+            return {"cancelled": False}
+        run.worker.cancel()
+        return {"cancelled": True}
+
+    def inventory(self) -> Dict:
+        from better10 import scan_apps_folder, scan_tools_folder
+
+        apps = scan_apps_folder(os.path.join(SCRIPT_DIR, "Apps"), os.path.join(SCRIPT_DIR, "Tools"))
+        tools = scan_tools_folder(os.path.join(SCRIPT_DIR, "Tools"))
+        inventory = {
+            "hostname": socket.gethostname(),
+            "platform": platform.platform(),
+            "backend": self.backend.name,
+            "admin": self.backend.is_admin(),
+            "catalog": {
+                "apps": [serialize_operation(op) for op in apps.values()],
+                "tools": [serialize_operation(op) for op in tools.values()],
+            },
+        }
+        inventory.update(self.backend.inventory())
+        return inventory
+
+    METHODS = ("ping", "submit", "events", "status", "cancel", "inventory")
+
+    def dispatch(self, request) -> Optional[Dict]:
+        """
+        Handle one JSON-RPC request object
+
+        Returns:
+            Response object, or None for notifications (requests without an id)
+        """
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or "method" not in request:
+                raise RpcError(INVALID_REQUEST, "Invalid JSON-RPC request")
+            method = request["method"]
+            if method not in self.METHODS:
+                raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+            params = request.get("params", {})
+            try:
+                if isinstance(params, list):
+                    result = getattr(self, method)(*params)
+                else:
+                    result = getattr(self, method)(**params)
+            except TypeError as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": SERVER_ERROR, "message": str(e)}}
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        if isinstance(request, dict) and "id" not in request:
+            return None
+        return response
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """HTTP transport for AgentService (POST /rpc only)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+
+        if self.path != "/rpc":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        token = self.server.token
+        supplied = self.headers.get("Authorization", "")
+        if token and not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            self._send_json(401, {"jsonrpc": "2.0", "id": None,
+                                  "error": {"code": UNAUTHORIZED, "message": "Invalid or missing token"}})
+            return
+
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self._send_json(200, {"jsonrpc": "2.0", "id": None,
+                                  "error": {"code": PARSE_ERROR, "message": "Parse error"}})
+            return
+
+        service = self.server.service
+        if isinstance(request, list):
+            responses = [r for r in (service.dispatch(item) for item in request) if r is not None]
+            self._send_json(200, responses)
+        else:
+            response = service.dispatch(request)
+            if response is None:
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self._send_json(200, response)
+
+    def log_message(self, format, *args):
+        # Requests are polled constantly; logging each one would drown the run output
+        pass
+
+
+class AgentServer(ThreadingHTTPServer):
+    """HTTP server bound to one AgentService"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: AgentService, token: str):
+        super().__init__(address, AgentRequestHandler)
+        self.service = service
+        self.token = token
+
+
+def serve_agent(backend: SystemBackend, bind: str, token: str):
+    """
+    Serve an agent until interrupted
+
+    Raises:
+        ValueError: If the address is not loopback and there is no token
+    """
+    address = parse_address(bind)
+    remote = not is_loopback(address[0])
+    if remote and not token:
+        raise ValueError(f"Refusing to serve on {bind} without --agent-token: "
+                         "anyone who can reach it could run plans on this machine")
+    server = AgentServer(address, AgentService(backend), token)
+    host, port = server.server_address[:2]
+    print(f"Better10 agent listening on http://{host}:{port}/rpc (backend: {backend.name})")
+    if not token:
+        print("WARNING: no --agent-token set; any local process can submit plans")
+    elif remote:
+        print("WARNING: the agent speaks plain HTTP; the token and plans are sent unencrypted, "
+              "so use it only on a trusted network or through a tunnel")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Agent stopped")
+    finally:
+        server.server_close()
+
+
+class AgentError(Exception):
+    """A JSON-RPC error or transport failure reported by an agent"""
+
+
+class AgentClient:
+    """asyncio JSON-RPC client for one agent"""
+
+    def __init__(self, address: str, token: str = None, timeout: float = 90.0):
+        """
+        Args:
+            address: "host:port" of the agent
+            token: Bearer token the agent was started with
+            timeout: Seconds to wait for one response (must exceed the events() long-poll)
+        """
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.token = token
+        self.timeout = timeout
+        self._next_id = 0
+
+    async def call(self, method: str, **params):
+        """Call a method on the agent and return its result"""
+        self._next_id += 1
+        body = json.dumps({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}).encode("utf-8")
+        headers = [
+            "POST /rpc HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        if self.token:
+            headers.append(f"Authorization: Bearer {self.token}")
+
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise AgentError(f"{self.address}: cannot connect ({e or 'timed out'})")
+        try:
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("ascii") + body)
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise AgentError(f"{self.address}: request failed ({e or 'timed out'})")
+        finally:
+            writer.close()
+
+        head, _, payload = raw.partition(b"\r\n\r\n")
+        status_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+        try:
+            response = json.loads(payload)
+        except ValueError:
+            raise AgentError(f"{self.address}: unexpected response ({status_line})")
+        if "error" in response:
+            raise AgentError(f"{self.address}: {response['error'].get('message')}")
+        return response.get("result")
+
+
+class FleetController:
+    """
+    Fans one plan out to many agents concurrently
+
+    Each agent is driven by its own coroutine: submit, then long-poll its
+    events until the run finishes. on_event(address, event) is called for
+    every event, and overall_progress() aggregates progress across agents.
+    """
+
+    def __init__(self, agents: List[str], token: str = None,
+                 on_event: Callable[[str, Dict], None] = None):
+        self.clients = [AgentClient(address, token) for address in agents]
+        self.on_event = on_event
+        self.progress: Dict[str, int] = {client.address: 0 for client in self.clients}
+
+    def overall_progress(self) -> int:
+        """Average progress across all agents, in percent"""
+        return int(sum(self.progress.values()) / len(self.progress)) if self.progress else 100
+
+    async def _drive(self, client: AgentClient, operations: List[Dict], name: str) -> Dict:
+        try:
+            run_id = (await client.call("submit", operations=operations, name=name))["run_id"]
+            since = 0
+            finished = False
+            while not finished:
+                batch = await client.call("events", run_id=run_id, since=since, wait=25)
+                for event in batch["events"]:
+                    if event["event"] == "progress":
+                        self.progress[client.address] = event["percent"]
+                    finished = finished or event["event"] == "finished"
+                    if self.on_event:
+                        self.on_event(client.address, event)
+                since = batch["next"]
+            self.progress[client.address] = 100
+            return await client.call("status", run_id=run_id)
+        except AgentError as e:
+            self.progress[client.address] = 100
+            return {"state": "error", "error": str(e)}
+
+    async def run(self, operations: List[Dict], name: str = None) -> Dict[str, Dict]:
+        """
+        Run a plan on every agent
+
+        Args:
+            operations: Operation dicts (converted to profile format before sending)
+            name: Display name for the run
+
+        Returns:
+            Dict of agent address -> final status (or {"state": "error", ...})
+        """
+        payload = [serialize_operation(op) for op in operations]
+        results = await asyncio.gather(*(self._drive(client, payload, name) for client in self.clients))
+        return {client.address: result for client, result in zip(self.clients, results)}
+
+    async def cancel(self, run_ids: Dict[str, str]):
+        """Cancel runs, given agent address -> run id"""
+        clients = {client.address: client for client in self.clients}
+        await asyncio.gather(*(clients[address].call("cancel", run_id=run_id)
+                               for address, run_id in run_ids.items()), return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Better10 profile on many agents at once")
+    parser.add_argument("profile", help="Profile file to run")
+    parser.add_argument("agents", nargs="+", metavar="HOST:PORT", help="Agents to run the profile on")
+    parser.add_argument("--token", default=os.environ.get("BETTER10_AGENT_TOKEN"),
+                        help="Token the agents were started with (default: $BETTER10_AGENT_TOKEN)")
+    parser.add_argument("--quiet", action="store_true", help="Only print progress and the final summary")
+    args = parser.parse_args()
+
+    operations = load_profile(args.profile)
+    name = os.path.splitext(os.path.basename(args.profile))[0]
+
+    def on_event(address: str, event: Dict):
+        if event["event"] == "log" and not args.quiet and event["message"]:
+            print(f"[{address}] [{event['level']}] {event['message']}")
+        elif event["event"] == "progress":
+            print(f"Fleet progress: {controller.overall_progress()}%")
+
+    controller = FleetController(args.agents, args.token, on_event)
+    results = asyncio.run(controller.run(operations, name))
+
+    print("\n=== Fleet Summary ===")
+    for address, result in results.items():
+        if result.get("state") == "error":
+            print(f"{address}: ERROR - {result['error']}")
+        else:
+            line = f"{address}: {result['state']} ({result['successful']} succeeded, {result['failed']} failed)"
+            if result.get("reboot_required"):
+                line += f", restart required for {len(result['reboot_required'])}"
+            print(line)
+    sys.exit(0 if all(r.get("state") == RunState.SUCCEEDED for r in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1644 @@
+"""
+System backends for Better10
+
+SystemOperations delegates every system-level call to a backend:
+
+- WindowsBackend talks to winreg, ctypes.windll and powershell.exe
+- SimulatedBackend keeps an in-memory registry, Appx store and winget
+  catalog, and replaces child processes with a configurable runner so the
+  whole engine can be exercised (and capacity-planned) on any platform
+"""
+
+import os
+import re
+import base64
+import ntpath
+import random
+import threading
+import ctypes
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import List, Dict, Tuple, Optional
+
+from process_monitor import LaunchOptions, ExitStatus, HangAction, run_monitored, disk_slot
+
+try:
+    import winreg
+except ImportError:  # Not running on Windows
+    winreg = None
+
+
+# Registry constants. The values match the winreg module so operation
+# dicts built on one platform stay valid on the other.
+HKEY_CLASSES_ROOT = 0x80000000
+HKEY_CURRENT_USER = 0x80000001
+HKEY_LOCAL_MACHINE = 0x80000002
+HKEY_USERS = 0x80000003
+
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+HIVE_NAMES = {
+    HKEY_CLASSES_ROOT: "HKCR",
+    HKEY_CURRENT_USER: "HKCU",
+    HKEY_LOCAL_MACHINE: "HKLM",
+    HKEY_USERS: "HKU",
+}
+
+_HIVE_ALIASES = {
+    "HKCR": HKEY_CLASSES_ROOT,
+    "HKEY_CLASSES_ROOT": HKEY_CLASSES_ROOT,
+    "HKCU": HKEY_CURRENT_USER,
+    "HKEY_CURRENT_USER": HKEY_CURRENT_USER,
+    "HKLM": HKEY_LOCAL_MACHINE,
+    "HKEY_LOCAL_MACHINE": HKEY_LOCAL_MACHINE,
+    "HKU": HKEY_USERS,
+    "HKEY_USERS": HKEY_USERS,
+}
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Appx packages present on a stock Windows 10 install that the bloatware
+# catalog knows how to remove
+DEFAULT_APPX_PACKAGES = [
+    "Microsoft.XboxGamingOverlay",
+    "Microsoft.XboxApp",
+    "Microsoft.XboxIdentityProvider",
+    "Microsoft.549981C3F5F10",
+    "Microsoft.MixedReality.Portal",
+    "Microsoft.WindowsFeedbackHub",
+    "Microsoft.Getstarted",
+    "Microsoft.Microsoft3DViewer",
+    "Microsoft.MSPaint",
+    "microsoft.windowscommunicationsapps",
+    "Microsoft.SkypeApp",
+    "Microsoft.YourPhone",
+    "Microsoft.MicrosoftStickyNotes",
+    "Microsoft.BingWeather",
+    "Microsoft.BingNews",
+    "Microsoft.MicrosoftSolitaireCollection",
+    "Microsoft.DesktopAppInstaller",
+]
+
+DEFAULT_WINGET_CATALOG = {
+    "Google.Chrome": "Google Chrome",
+    "Mozilla.Firefox": "Mozilla Firefox",
+    "7zip.7zip": "7-Zip",
+    "Microsoft.VisualStudioCode": "Microsoft Visual Studio Code",
+    "VideoLAN.VLC": "VLC media player",
+    "Notepad++.Notepad++": "Notepad++",
+    "Git.Git": "Git",
+}
+
+
+# Registry markers of a pending restart: (hive, key path, value name or "" for
+# the key itself, reason). Installers often refuse to run until it happens.
+PENDING_REBOOT_MARKERS = [
+    (HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Component Based Servicing\RebootPending", "",
+     "Windows servicing (Component Based Servicing)"),
+    (HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\WindowsUpdate\Auto Update\RebootRequired", "",
+     "Windows Update"),
+    (HKEY_LOCAL_MACHINE, r"SYSTEM\CurrentControlSet\Control\Session Manager", "PendingFileRenameOperations",
+     "Pending file rename operations"),
+]
+
+# Profiles Windows knows about, one subkey per account SID, plus a "Default"
+# value pointing at the profile new accounts are copied from
+PROFILE_LIST_KEY = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList"
+# SIDs of user accounts (local, domain and Azure AD); service accounts such
+# as LocalSystem (S-1-5-18) have no profile worth configuring
+USER_SID_PREFIXES = ("S-1-5-21-", "S-1-12-1-")
+DEFAULT_PROFILE_SID = "Default"
+USER_HIVE_FILE = "NTUSER.DAT"
+
+# Profiles on the simulated machine: the signed-in administrator, two other
+# accounts and the Default profile
+SIMULATED_USER_PROFILES = [
+    {"sid": "S-1-5-21-3623811015-3361044348-30300820-1001", "path": r"C:\Users\Admin", "loaded": True},
+    {"sid": "S-1-5-21-3623811015-3361044348-30300820-1002", "path": r"C:\Users\Student", "loaded": False},
+    {"sid": "S-1-5-21-3623811015-3361044348-30300820-1003", "path": r"C:\Users\Lab", "loaded": False},
+    {"sid": DEFAULT_PROFILE_SID, "path": r"C:\Users\Default", "loaded": False},
+]
+
+
+class HiveMount:
+    """Outcome of mounting a user hive"""
+    MOUNTED = "mounted"
+    IN_USE = "in_use"  # Another process has the hive file open
+    FAILED = "failed"
+
+
+def data_dir() -> str:
+    """
+    Return the directory Better10 keeps its state in (history, logs, snapshots)
+
+    %LOCALAPPDATA%\\Better10 on Windows, ~/.better10 elsewhere. The
+    BETTER10_DATA_DIR environment variable overrides both.
+    """
+    path = os.environ.get("BETTER10_DATA_DIR")
+    if not path:
+        if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+            path = os.path.join(os.environ["LOCALAPPDATA"], "Better10")
+        else:
+            path = os.path.join(os.path.expanduser("~"), ".better10")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def new_run_id() -> str:
+    """Return a sortable identifier for a run, such as 20261018-153012-4f2a"""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + os.urandom(2).hex()
+
+
+def parse_hive(hive) -> int:
+    """
+    Normalize a hive given as a winreg constant or a name such as "HKLM"
+
+    Args:
+        hive: Integer hive constant or hive name (short or long form)
+
+    Returns:
+        Integer hive constant
+    """
+    if isinstance(hive, int):
+        return hive
+    if isinstance(hive, str) and hive.upper() in _HIVE_ALIASES:
+        return _HIVE_ALIASES[hive.upper()]
+    raise ValueError(f"Unknown registry hive: {hive}")
+
+
+def hive_name(hive: int) -> str:
+    """Return the short name ("HKLM", "HKCU", ...) for a hive constant"""
+    return HIVE_NAMES.get(hive, str(hive))
+
+
+def resolve_path(path: str) -> str:
+    """Resolve a path relative to the Better10 script directory"""
+    if not os.path.isabs(path):
+        path = os.path.join(SCRIPT_DIR, path)
+    return path
+
+
+def detect_installer_type(installer_path: str) -> str:
+    """Detect the installer type ('exe', 'msi', 'msix') from the file extension"""
+    ext = os.path.splitext(installer_path)[1].lower()
+    if ext == '.msi':
+        return 'msi'
+    elif ext == '.msix':
+        return 'msix'
+    return 'exe'
+
+
+# Marker line install_msix_packages prints for each package:
+# MARKER<TAB>index<TAB>OK, or MARKER<TAB>index<TAB>FAIL<TAB>message
+MSIX_RESULT_MARKER = "BETTER10-MSIX"
+# Event log holding boot and logon durations (event 100, one per boot)
+BOOT_PERFORMANCE_LOG = "Microsoft-Windows-Diagnostics-Performance/Operational"
+_MSIX_RESULT_PATTERN = re.compile(MSIX_RESULT_MARKER + r"\t(\d+)\t(OK|FAIL)(?:\t([^\r\n]*))?")
+
+_APPX_REMOVE_PATTERN = re.compile(
+    r"Get-AppxPackage\s+(?:-allusers\s+)?([\w.\-*]+)\s*\|\s*Remove-AppxPackage",
+    re.IGNORECASE
+)
+
+
+def appx_packages_in_command(command: str) -> List[str]:
+    """Return the package names removed by "Get-AppxPackage X | Remove-AppxPackage" pipelines in a command"""
+    return [match.group(1) for match in _APPX_REMOVE_PATTERN.finditer(command or "")]
+
+
+def parse_msix_results(stdout: str, count: int, fallback_error: str) -> List[Tuple[bool, str]]:
+    """
+    Read the per-package marker lines of an MSIX deployment session
+
+    Packages without a marker line (the session was killed or timed out
+    first) fail with fallback_error.
+    """
+    results = [(False, fallback_error)] * count
+    for match in _MSIX_RESULT_PATTERN.finditer(stdout or ""):
+        index = int(match.group(1))
+        if index < count:
+            results[index] = (True, "") if match.group(2) == "OK" else (False, match.group(3).strip())
+    return results
+
+
+def detect_tool_type(tool_path: str) -> str:
+    """Detect the tool type ('exe', 'ps1', 'bat', 'cmd') from the file extension"""
+    ext = os.path.splitext(tool_path)[1].lower()
+    return ext[1:] if ext.startswith('.') else ext
+
+
+class SystemBackend:
+    """
+    Interface for system-level operations
+
+    Every method returns the same tuples SystemOperations has always
+    returned, so WorkerThread does not care which backend it is driving.
+    """
+
+    name = "base"
+
+    def is_admin(self) -> bool:
+        """Check if the backend is running with administrator privileges"""
+        raise NotImplementedError
+
+    def run_powershell(self, command: str, as_admin: bool = False, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Execute a PowerShell command and return (success, stdout, stderr)"""
+        raise NotImplementedError
+
+    def run_winget(self, operation: str, package_id: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Execute a winget install/uninstall and return (success, stdout, stderr)"""
+        raise NotImplementedError
+
+    def run_installer(self, installer_path: str, installer_type: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Run an installer silently and return (success, stdout, stderr)"""
+        raise NotImplementedError
+
+    def run_tool(self, tool_path: str, tool_type: str = None, options: LaunchOptions = None,
+                 args: List[str] = None) -> Tuple[bool, str, str]:
+        """Run a tool from the Tools folder, with optional arguments, and return (success, stdout, stderr)"""
+        raise NotImplementedError
+
+    def run_executable(self, exe_path: str, args: List[str] = None, as_admin: bool = True, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Execute an external executable and return (success, stdout, stderr)"""
+        raise NotImplementedError
+
+    def set_registry_value(self, key_path: str, value_name: str, value, hive: int = HKEY_LOCAL_MACHINE) -> Tuple[bool, str]:
+        """Set a registry value and return (success, error_message)"""
+        raise NotImplementedError
+
+    def install_msix_packages(self, package_paths: List[str], dependency_paths: List[str] = None,
+                              options: LaunchOptions = None) -> List[Tuple[bool, str]]:
+        """
+        Deploy several MSIX packages in one session, with shared framework dependency files
+
+        Returns:
+            (success, error_message) for each package, in input order
+        """
+        raise NotImplementedError
+
+    def restart(self, delay: int = 5) -> Tuple[bool, str]:
+        """Restart the machine after a delay in seconds and return (success, error_message)"""
+        raise NotImplementedError
+
+    def machine_metrics(self) -> Dict:
+        """
+        Measure how lean the machine is right now, in one query
+
+        Returns:
+            Dict with "last_boot" (Unix time), "process_count",
+            "service_count" (running services), "commit_bytes" and
+            "startup_items", plus, when the boot performance event of the
+            last boot is available, "boot_event_time" (Unix time), "boot_ms"
+            (to the desktop), "logon_ms" (profile load and Explorer start)
+            and "post_boot_ms" (desktop to idle)
+        """
+        raise NotImplementedError
+
+    def schedule_logon_task(self, name: str, command: str, delay_minutes: int = 3) -> Tuple[bool, str]:
+        """Run a command elevated at the next logon, after a delay; returns (success, error_message)"""
+        raise NotImplementedError
+
+    def delete_scheduled_task(self, name: str) -> Tuple[bool, str]:
+        """Remove a task created by schedule_logon_task; returns (success, error_message)"""
+        raise NotImplementedError
+
+    def inventory(self, winget: bool = True) -> Dict[str, List[str]]:
+        """
+        Return what is installed, gathered with as few queries as possible
+
+        Returns:
+            Dict with "programs" (Programs and Features display names),
+            "appx_packages", "provisioned_packages" and, if winget is True,
+            "winget_packages" (package identifiers)
+        """
+        raise NotImplementedError
+
+    def read_registry_values(self, queries: List[Tuple[int, str, str]]) -> List[Optional[object]]:
+        """Read many (hive, key_path, value_name) values at once; None for missing values"""
+        return [state["value"] for state in self.read_registry_state(queries)]
+
+    def read_registry_state(self, queries: List[Tuple[int, str, str]]) -> List[Dict]:
+        """
+        Read the current state of many (hive, key_path, value_name) entries in one pass
+
+        Returns:
+            One dict per query with "key_exists", "missing_from" (the
+            shallowest missing key on the path, if the key does not exist),
+            "value_exists", "value" and "type"
+        """
+        raise NotImplementedError
+
+    def apply_registry_changes(self, changes: List[Dict]) -> List[Tuple[bool, str]]:
+        """
+        Apply registry changes, opening each key once
+
+        Each change is a dict with "action" ("set", "delete_value" or
+        "delete_key"), "hive" and "key_path", plus "value_name", "value"
+        and "type" for values. Value changes are grouped per key in first-
+        seen order. Key deletions run last, deepest first, and only remove
+        keys that are empty.
+
+        Returns:
+            (success, error_message) for each change, in input order
+        """
+        raise NotImplementedError
+
+    def user_profiles(self) -> List[Dict]:
+        """
+        Return the user profiles listed in ProfileList
+
+        Returns:
+            One dict per profile with "sid" (DEFAULT_PROFILE_SID for the
+            Default profile), "path" (the profile directory) and "loaded"
+            (True if its hive is already mounted at HKEY_USERS\\<sid>, as
+            for a signed-in user)
+        """
+        raise NotImplementedError
+
+    def load_user_hive(self, mount: str, hive_path: str) -> Tuple[str, str]:
+        """Mount a hive file at HKEY_USERS\\<mount> and return (HiveMount status, error_message)"""
+        raise NotImplementedError
+
+    def unload_user_hive(self, mount: str) -> Tuple[bool, str]:
+        """Unmount a hive mounted with load_user_hive and return (success, error_message)"""
+        raise NotImplementedError
+
+    def paths_exist(self, paths: List[str]) -> List[bool]:
+        """Check many paths at once (environment variables are expanded)"""
+        raise NotImplementedError
+
+    def file_sizes(self, paths: List[str]) -> List[Optional[int]]:
+        """Return the size in bytes of many files at once; None for files that do not exist"""
+        raise NotImplementedError
+
+    def free_disk_space(self, path: str = None) -> Optional[int]:
+        """Return the free bytes on the drive holding path (the system drive if None), or None if unknown"""
+        raise NotImplementedError
+
+    def winget_available(self) -> bool:
+        """Check whether winget can be launched"""
+        raise NotImplementedError
+
+    def pending_reboot(self) -> List[str]:
+        """
+        Return the reasons a restart is pending, read from the registry
+        markers Windows leaves behind (empty if none)
+        """
+        states = self.read_registry_state([(hive, key_path, value_name)
+                                           for hive, key_path, value_name, _ in PENDING_REBOOT_MARKERS])
+        return [reason for (_, _, value_name, reason), state in zip(PENDING_REBOOT_MARKERS, states)
+                if (state["value_exists"] if value_name else state["key_exists"])]
+
+
+class WindowsBackend(SystemBackend):
+    """Backend that performs real changes through winreg, ctypes and powershell.exe"""
+
+    _hive_privileges = False
+    _hive_privileges_lock = threading.Lock()
+    _elevated_cache: Optional[bool] = None
+
+    name = "windows"
+
+    def _launch(self, args, shell: bool, options: Optional[LaunchOptions], default_timeout: float,
+                what: str) -> Tuple[bool, str, str]:
+        """
+        Run a child under the process monitor and translate how it ended
+
+        Args:
+            args: Command line for run_monitored
+            shell: Run through the shell
+            options: Limits for this launch (backend defaults if None)
+            default_timeout: Timeout in seconds when options do not set one
+            what: Noun used in timeout and hang messages ("Installer", "Tool", ...)
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        returncode, stdout, stderr, status = run_monitored(args, shell, options, default_timeout)
+        if options is not None:
+            options.exit_code = returncode if status == ExitStatus.EXITED else None
+        if status == ExitStatus.TIMED_OUT:
+            timeout = options.timeout if options and options.timeout is not None else default_timeout
+            return False, stdout, f"{what} timed out after {timeout:.0f} seconds"
+        if status == ExitStatus.HUNG:
+            return False, stdout, (
+                f"{what} produced no output or CPU activity for "
+                f"{options.inactivity_timeout:.0f} seconds and was stopped"
+            )
+        return returncode == 0, stdout, stderr
+
+    def is_admin(self) -> bool:
+        """Check if the application is running with administrator privileges"""
+        try:
+            return ctypes.windll.shell32.IsUserAnAdmin() != 0
+        except:
+            return False
+
+    def _elevated(self) -> bool:
+        """
+        is_admin(), checked once
+
+        An elevated process (the broker, or a GUI started as administrator)
+        launches children directly instead of through Start-Process -Verb
+        RunAs, which would add a UAC round trip and hide their output from
+        the watchdog.
+        """
+        if self._elevated_cache is None:
+            self._elevated_cache = self.is_admin()
+        return self._elevated_cache
+
+    def run_powershell(self, command: str, as_admin: bool = False, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """
+        Execute a PowerShell command and return the result
+
+        Args:
+            command: PowerShell command to execute
+            as_admin: Whether to run as administrator (requires elevation)
+            options: Timeout and watchdog settings for this launch
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        try:
+            if as_admin and not self._elevated():
+                # Run PowerShell as administrator
+                ps_command = f'powershell.exe -Command "Start-Process powershell -ArgumentList \\"-NoProfile -ExecutionPolicy Bypass -Command {command}\\" -Verb RunAs -Wait"'
+            else:
+                # Run PowerShell normally
+                ps_command = f'powershell.exe -NoProfile -ExecutionPolicy Bypass -Command "{command}"'
+
+            return self._launch(ps_command, True, options, 300, "Command")
+        except Exception as e:
+            return False, "", str(e)
+
+    def run_winget(self, operation: str, package_id: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """
+        Execute winget command
+
+        Args:
+            operation: 'install', 'uninstall', 'list', etc.
+            package_id: Package identifier for install/uninstall
+            options: Timeout and watchdog settings for this launch
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        try:
+            if operation == "install" and package_id:
+                command = f'winget install --id "{package_id}" --silent --accept-package-agreements --accept-source-agreements'
+            elif operation == "uninstall" and package_id:
+                command = f'winget uninstall --id "{package_id}" --silent'
+            else:
+                return False, "", f"Invalid winget operation: {operation}"
+
+            return self._launch(command, True, options, 600, "Winget command")  # 10 minutes for installs
+        except Exception as e:
+            return False, "", str(e)
+
+    def run_installer(self, installer_path: str, installer_type: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """
+        Run an installer file with appropriate silent flags
+
+        Args:
+            installer_path: Path to the installer file
+            installer_type: Type of installer ('exe', 'msi', 'msix'). Auto-detected if None
+            options: Timeout and watchdog settings for this launch
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        try:
+            # Resolve the full path
+            installer_path = resolve_path(installer_path)
+
+            if not os.path.exists(installer_path):
+                return False, "", f"Installer not found: {installer_path}"
+
+            # Auto-detect installer type if not provided
+            if not installer_type:
+                installer_type = detect_installer_type(installer_path)
+
+            # Build command with silent install flags - use proper escaping
+            installer_path_escaped = installer_path.replace("'", "''").replace('$', '`$')
+
+            if self._elevated():
+                if installer_type == 'msi':
+                    command = ['msiexec.exe', '/i', installer_path, '/quiet', '/norestart', '/qn']
+                elif installer_type == 'msix':
+                    command = ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command',
+                               f"Add-AppxPackage -Path '{installer_path_escaped}' -ErrorAction Stop"]
+                else:
+                    command = [installer_path, '/S']
+                return self._launch(command, False, options, 600, "Installer")
+
+            if installer_type == 'msi':
+                # MSI silent install using msiexec
+                ps_command = f'$proc = Start-Process -FilePath "msiexec.exe" -ArgumentList "/i", \'{installer_path_escaped}\', "/quiet", "/norestart", "/qn" -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+            elif installer_type == 'msix':
+                # MSIX install using Add-AppxPackage (requires admin)
+                ps_command = f'$proc = Start-Process -FilePath "powershell.exe" -ArgumentList "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", "Add-AppxPackage -Path \'{installer_path_escaped}\' -ErrorAction Stop" -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+            else:
+                # EXE installer - try /S first (most common)
+                ps_command = f'$proc = Start-Process -FilePath \'{installer_path_escaped}\' -ArgumentList "/S" -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+
+            return self._launch(
+                ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', ps_command],
+                False, options, 600, "Installer"
+            )
+        except Exception as e:
+            return False, "", str(e)
+
+    def run_tool(self, tool_path: str, tool_type: str = None, options: LaunchOptions = None,
+                 args: List[str] = None) -> Tuple[bool, str, str]:
+        """
+        Run a tool from the Tools folder with admin privileges
+
+        Args:
+            tool_path: Path to the tool file
+            tool_type: Type of tool ('exe', 'ps1', 'bat', 'cmd'). Auto-detected if None
+            options: Timeout and watchdog settings for this launch
+            args: Arguments for the tool (an unattended launch profile), or None
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        try:
+            # Resolve the full path
+            tool_path = resolve_path(tool_path)
+
+            if not os.path.exists(tool_path):
+                return False, "", f"Tool not found: {tool_path}"
+
+            # Auto-detect tool type if not provided
+            if not tool_type:
+                tool_type = detect_tool_type(tool_path)
+
+            if self._elevated():
+                if tool_type == 'ps1':
+                    command = ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-File', tool_path]
+                elif tool_type in ['bat', 'cmd']:
+                    command = ['cmd.exe', '/c', tool_path]
+                else:
+                    command = [tool_path]
+                return self._launch(command + list(args or []), False, options, 600, "Tool")
+
+            # Run tool based on type - use proper PowerShell escaping
+            # Escape single quotes and dollar signs for PowerShell
+            tool_path_escaped = tool_path.replace("'", "''").replace('$', '`$')
+            # Start-Process joins ArgumentList with spaces, so arguments containing spaces need quotes
+            quoted_args = ["'" + (f'"{arg}"' if " " in arg else arg).replace("'", "''") + "'" for arg in (args or [])]
+            argument_list = ", ".join(quoted_args)
+            extra_args = ", " + argument_list if quoted_args else ""
+
+            if tool_type == 'ps1':
+                # PowerShell script - run with admin privileges
+                ps_command = f'$proc = Start-Process -FilePath "powershell.exe" -ArgumentList "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", \'{tool_path_escaped}\'{extra_args} -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+            elif tool_type in ['bat', 'cmd']:
+                # Batch file - run with admin privileges
+                ps_command = f'$proc = Start-Process -FilePath "cmd.exe" -ArgumentList "/c", \'{tool_path_escaped}\'{extra_args} -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+            elif args:
+                # EXE file with unattended arguments - run with admin privileges
+                ps_command = f'$proc = Start-Process -FilePath \'{tool_path_escaped}\' -ArgumentList {argument_list} -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+            else:
+                # EXE file - run with admin privileges
+                ps_command = f'$proc = Start-Process -FilePath \'{tool_path_escaped}\' -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+
+            return self._launch(
+                ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', ps_command],
+                False, options, 600, "Tool"
+            )
+        except Exception as e:
+            return False, "", str(e)
+
+    def run_executable(self, exe_path: str, args: List[str] = None, as_admin: bool = True, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """
+        Execute an external executable file
+
+        Args:
+            exe_path: Path to the executable file
+            args: List of arguments to pass to the executable
+            as_admin: Whether to run as administrator (default: True)
+            options: Timeout and watchdog settings for this launch
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        try:
+            # Resolve the full path (relative paths are relative to the script directory)
+            exe_path = resolve_path(exe_path)
+
+            # Check if file exists
+            if not os.path.exists(exe_path):
+                return False, "", f"Executable not found: {exe_path}"
+
+            # Build command
+            cmd = [exe_path] + list(args or [])
+
+            if as_admin and not self._elevated():
+                # Run as administrator using PowerShell Start-Process
+                # Escape path for PowerShell
+                exe_path_escaped = exe_path.replace("'", "''").replace('$', '`$')
+
+                if args:
+                    # Convert args list to PowerShell array syntax with proper escaping
+                    args_escaped = [arg.replace("'", "''").replace('$', '`$') for arg in args]
+                    args_array = ','.join([f"'{arg}'" for arg in args_escaped])
+                    ps_command = f'$proc = Start-Process -FilePath \'{exe_path_escaped}\' -ArgumentList {args_array} -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+                else:
+                    ps_command = f'$proc = Start-Process -FilePath \'{exe_path_escaped}\' -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+
+                # 10 minutes timeout
+                return self._launch(
+                    ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', ps_command],
+                    False, options, 600, "Executable"
+                )
+            else:
+                # Run normally
+                return self._launch(cmd, False, options, 600, "Executable")
+        except Exception as e:
+            return False, "", str(e)
+
+    def install_msix_packages(self, package_paths: List[str], dependency_paths: List[str] = None,
+                              options: LaunchOptions = None) -> List[Tuple[bool, str]]:
+        """
+        Deploy several MSIX packages in one PowerShell session
+
+        Every package gets the same -DependencyPath list, so frameworks are
+        resolved from the local files once instead of per package. Each
+        package reports its own result on a marker line; one failure does
+        not stop the others. Add-AppxPackage deploys for the current user
+        and needs no elevation.
+
+        Args:
+            package_paths: Packages to deploy, in order
+            dependency_paths: Framework packages to supply as dependencies
+            options: Timeout and watchdog settings for the whole session
+
+        Returns:
+            (success, error_message) for each package, in input order
+        """
+        def quote(path: str) -> str:
+            return "'" + resolve_path(path).replace("'", "''") + "'"
+
+        script = "\n".join([
+            "$ProgressPreference = 'SilentlyContinue'",
+            f"$dependencies = @({', '.join(quote(path) for path in dependency_paths or [])})",
+            f"$packages = @({', '.join(quote(path) for path in package_paths)})",
+            "for ($i = 0; $i -lt $packages.Count; $i++) {",
+            "    try {",
+            "        if ($dependencies.Count) {",
+            "            Add-AppxPackage -Path $packages[$i] -DependencyPath $dependencies -ErrorAction Stop",
+            "        } else {",
+            "            Add-AppxPackage -Path $packages[$i] -ErrorAction Stop",
+            "        }",
+            f"        Write-Output \"{MSIX_RESULT_MARKER}`t$i`tOK\"",
+            "    } catch {",
+            f"        Write-Output (\"{MSIX_RESULT_MARKER}`t$i`tFAIL`t\" + ($_.Exception.Message -replace '\\s+', ' '))",
+            "    }",
+            "}",
+        ])
+        # -EncodedCommand sidesteps quoting the script on the command line
+        encoded = base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+        try:
+            success, stdout, stderr = self._launch(
+                ['powershell.exe', '-NoProfile', '-NonInteractive', '-ExecutionPolicy', 'Bypass',
+                 '-EncodedCommand', encoded],
+                False, options, 600, "Package deployment"
+            )
+        except Exception as e:
+            return [(False, str(e))] * len(package_paths)
+        return parse_msix_results(stdout, len(package_paths), stderr or stdout or "Package deployment failed")
+
+    def set_registry_value(self, key_path: str, value_name: str, value, hive: int = HKEY_LOCAL_MACHINE) -> Tuple[bool, str]:
+        """
+        Set a registry value (supports both integer and string values)
+
+        Args:
+            key_path: Registry key path (e.g., "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Policies\\DataCollection")
+            value_name: Name of the value to set
+            value: Value to set (int for REG_DWORD, str for REG_SZ)
+            hive: Registry hive (HKEY_LOCAL_MACHINE or HKEY_CURRENT_USER)
+
+        Returns:
+            Tuple of (success: bool, error_message: str)
+        """
+        if winreg is None:
+            return False, "Registry access is only available on Windows"
+
+        # Determine registry type based on value type
+        if isinstance(value, int):
+            reg_type = winreg.REG_DWORD
+        elif isinstance(value, str):
+            reg_type = winreg.REG_SZ
+        else:
+            return False, f"Unsupported value type: {type(value)}"
+
+        return self.apply_registry_changes([{
+            "action": "set", "hive": hive, "key_path": key_path,
+            "value_name": value_name, "value": value, "type": reg_type
+        }])[0]
+
+    def inventory(self, winget: bool = True) -> Dict[str, List[str]]:
+        """Read installed programs from the Uninstall keys, Appx packages from PowerShell and winget packages from winget export"""
+        programs = set()
+        if winreg is not None:
+            uninstall_keys = [
+                (HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+                (HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
+                (HKEY_CURRENT_USER, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
+            ]
+            for hive, key_path in uninstall_keys:
+                try:
+                    key = winreg.OpenKey(hive, key_path)
+                except OSError:
+                    continue
+                try:
+                    for index in range(winreg.QueryInfoKey(key)[0]):
+                        try:
+                            with winreg.OpenKey(key, winreg.EnumKey(key, index)) as subkey:
+                                programs.add(winreg.QueryValueEx(subkey, "DisplayName")[0])
+                        except OSError:
+                            continue  # Entries without a DisplayName are not shown in Programs and Features
+                finally:
+                    winreg.CloseKey(key)
+
+        # One PowerShell session lists both installed and provisioned packages
+        success, stdout, _ = self.run_powershell(
+            "Get-AppxPackage -AllUsers | ForEach-Object { 'A ' + $_.Name }; "
+            "Get-AppxProvisionedPackage -Online | ForEach-Object { 'P ' + $_.DisplayName }"
+        )
+        appx_packages, provisioned_packages = set(), set()
+        for line in stdout.splitlines() if success else []:
+            kind, _, name = line.strip().partition(" ")
+            if name:
+                (appx_packages if kind == "A" else provisioned_packages).add(name)
+
+        inventory = {
+            "programs": sorted(programs),
+            "appx_packages": sorted(appx_packages),
+            "provisioned_packages": sorted(provisioned_packages),
+        }
+        if winget:
+            inventory["winget_packages"] = self._winget_packages()
+        return inventory
+
+    def _winget_packages(self) -> List[str]:
+        """List installed winget package identifiers with a single winget export"""
+        export_path = os.path.join(tempfile.gettempdir(), f"better10_winget_{os.getpid()}.json")
+        try:
+            # winget exits non-zero when some packages are not in a source, but still writes the file
+            self._launch(f'winget export -o "{export_path}" --accept-source-agreements', True, None, 120, "Winget command")
+            with open(export_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        finally:
+            if os.path.exists(export_path):
+                os.remove(export_path)
+        return sorted({package.get("PackageIdentifier")
+                       for source in data.get("Sources", [])
+                       for package in source.get("Packages", [])
+                       if package.get("PackageIdentifier")})
+
+    def read_registry_state(self, queries: List[Tuple[int, str, str]]) -> List[Dict]:
+        """Read entries in-process through winreg, opening each key once"""
+        if winreg is None:
+            raise OSError("Registry access is only available on Windows")
+
+        open_keys = {}
+
+        def open_key(hive, key_path):
+            cache_key = (hive, key_path.strip("\\").lower())
+            if cache_key not in open_keys:
+                try:
+                    open_keys[cache_key] = winreg.OpenKey(hive, key_path)
+                except OSError:
+                    open_keys[cache_key] = None
+            return open_keys[cache_key]
+
+        states = []
+        try:
+            for hive, key_path, value_name in queries:
+                state = {"key_exists": False, "missing_from": None, "value_exists": False, "value": None, "type": None}
+                key = open_key(hive, key_path)
+                if key is None:
+                    # Walk up to find the shallowest key a write would have to create
+                    parts = key_path.strip("\\").split("\\")
+                    missing = len(parts)
+                    while missing > 1 and open_key(hive, "\\".join(parts[:missing - 1])) is None:
+                        missing -= 1
+                    state["missing_from"] = "\\".join(parts[:missing])
+                else:
+                    state["key_exists"] = True
+                    try:
+                        state["value"], state["type"] = winreg.QueryValueEx(key, value_name)
+                        state["value_exists"] = True
+                    except OSError:
+                        pass
+                states.append(state)
+        finally:
+            for key in open_keys.values():
+                if key:
+                    winreg.CloseKey(key)
+        return states
+
+    def apply_registry_changes(self, changes: List[Dict]) -> List[Tuple[bool, str]]:
+        """Apply changes through winreg, creating or opening each key once"""
+        if winreg is None:
+            return [(False, "Registry access is only available on Windows")] * len(changes)
+
+        results: List[Tuple[bool, str]] = [(False, "")] * len(changes)
+        groups: Dict[Tuple[int, str], List[int]] = {}
+        key_deletions = []
+        for index, change in enumerate(changes):
+            if change["action"] == "delete_key":
+                key_deletions.append(index)
+            else:
+                groups.setdefault((change["hive"], change["key_path"].strip("\\").lower()), []).append(index)
+
+        for indexes in groups.values():
+            first = changes[indexes[0]]
+            try:
+                if any(changes[i]["action"] == "set" for i in indexes):
+                    key = winreg.CreateKeyEx(first["hive"], first["key_path"], 0, winreg.KEY_WRITE | winreg.KEY_READ)
+                else:
+                    key = winreg.OpenKey(first["hive"], first["key_path"], 0, winreg.KEY_WRITE | winreg.KEY_READ)
+            except FileNotFoundError:
+                # Deleting values from a key that is already gone leaves nothing to do
+                for i in indexes:
+                    results[i] = (True, "")
+                continue
+            except PermissionError:
+                for i in indexes:
+                    results[i] = (False, "Administrator privileges required")
+                continue
+            except Exception as e:
+                for i in indexes:
+                    results[i] = (False, str(e))
+                continue
+
+            try:
+                for i in indexes:
+                    change = changes[i]
+                    try:
+                        if change["action"] == "set":
+                            winreg.SetValueEx(key, change["value_name"], 0, change["type"], change["value"])
+                        else:
+                            try:
+                                winreg.DeleteValue(key, change["value_name"])
+                            except FileNotFoundError:
+                                pass
+                        results[i] = (True, "")
+                    except PermissionError:
+                        results[i] = (False, "Administrator privileges required")
+                    except Exception as e:
+                        results[i] = (False, str(e))
+            finally:
+                winreg.CloseKey(key)
+
+        for i in sorted(key_deletions, key=lambda i: -changes[i]["key_path"].count("\\")):
+            change = changes[i]
+            try:
+                key = winreg.OpenKey(change["hive"], change["key_path"])
+                try:
+                    subkeys, values, _ = winreg.QueryInfoKey(key)
+                finally:
+                    winreg.CloseKey(key)
+                if subkeys or values:
+                    results[i] = (False, f"{change['key_path']} is not empty and was kept")
+                    continue
+                winreg.DeleteKey(change["hive"], change["key_path"])
+                results[i] = (True, "")
+            except FileNotFoundError:
+                results[i] = (True, "")
+            except PermissionError:
+                results[i] = (False, "Administrator privileges required")
+            except Exception as e:
+                results[i] = (False, str(e))
+        return results
+
+    def user_profiles(self) -> List[Dict]:
+        if winreg is None:
+            raise OSError("Registry access is only available on Windows")
+        profiles = []
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, PROFILE_LIST_KEY) as profile_list:
+            index = 0
+            while True:
+                try:
+                    sid = winreg.EnumKey(profile_list, index)
+                except OSError:
+                    break
+                index += 1
+                # "<sid>.bak" keys are left behind by profiles Windows failed to load
+                if not sid.startswith(USER_SID_PREFIXES) or sid.lower().endswith(".bak"):
+                    continue
+                try:
+                    with winreg.OpenKey(profile_list, sid) as key:
+                        path = winreg.QueryValueEx(key, "ProfileImagePath")[0]
+                except OSError:
+                    continue
+                profiles.append({"sid": sid, "path": os.path.expandvars(path), "loaded": self._user_hive_loaded(sid)})
+            try:
+                default = winreg.QueryValueEx(profile_list, "Default")[0]
+                profiles.append({"sid": DEFAULT_PROFILE_SID, "path": os.path.expandvars(default), "loaded": False})
+            except OSError:
+                pass
+        return profiles
+
+    @staticmethod
+    def _user_hive_loaded(mount: str) -> bool:
+        try:
+            winreg.CloseKey(winreg.OpenKey(winreg.HKEY_USERS, mount))
+            return True
+        except OSError:
+            return False
+
+    @classmethod
+    def _enable_hive_privileges(cls):
+        """Enable SeBackupPrivilege and SeRestorePrivilege, which loading and unloading hives require"""
+        with cls._hive_privileges_lock:
+            if cls._hive_privileges:
+                return
+            from ctypes import wintypes
+
+            class LUID(ctypes.Structure):
+                _fields_ = [("LowPart", wintypes.DWORD), ("HighPart", wintypes.LONG)]
+
+            class LUID_AND_ATTRIBUTES(ctypes.Structure):
+                _fields_ = [("Luid", LUID), ("Attributes", wintypes.DWORD)]
+
+            class TOKEN_PRIVILEGES(ctypes.Structure):
+                _fields_ = [("PrivilegeCount", wintypes.DWORD), ("Privileges", LUID_AND_ATTRIBUTES * 1)]
+
+            advapi32 = ctypes.WinDLL("advapi32", use_last_error=True)
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+            token = wintypes.HANDLE()
+            # TOKEN_ADJUST_PRIVILEGES | TOKEN_QUERY
+            if not advapi32.OpenProcessToken(kernel32.GetCurrentProcess(), 0x0020 | 0x0008, ctypes.byref(token)):
+                raise ctypes.WinError(ctypes.get_last_error())
+            try:
+                for name in ("SeBackupPrivilege", "SeRestorePrivilege"):
+                    privileges = TOKEN_PRIVILEGES(1)
+                    privileges.Privileges[0].Attributes = 0x2  # SE_PRIVILEGE_ENABLED
+                    if not advapi32.LookupPrivilegeValueW(None, name, ctypes.byref(privileges.Privileges[0].Luid)):
+                        raise ctypes.WinError(ctypes.get_last_error())
+                    ctypes.set_last_error(0)
+                    advapi32.AdjustTokenPrivileges(token, False, ctypes.byref(privileges), 0, None, None)
+                    # Succeeds with ERROR_NOT_ALL_ASSIGNED when the token does not hold the privilege
+                    if ctypes.get_last_error():
+                        raise ctypes.WinError(ctypes.get_last_error())
+            finally:
+                kernel32.CloseHandle(token)
+            cls._hive_privileges = True
+
+    def load_user_hive(self, mount: str, hive_path: str) -> Tuple[str, str]:
+        if winreg is None:
+            return HiveMount.FAILED, "Registry access is only available on Windows"
+        try:
+            self._enable_hive_privileges()
+        except OSError as e:
+            return HiveMount.FAILED, f"Backup and restore privileges are not available: {e}"
+        try:
+            winreg.LoadKey(winreg.HKEY_USERS, mount, hive_path)
+        except OSError as e:
+            # ERROR_SHARING_VIOLATION, ERROR_LOCK_VIOLATION
+            if getattr(e, "winerror", None) in (32, 33):
+                return HiveMount.IN_USE, f"{hive_path} is in use by another process"
+            return HiveMount.FAILED, str(e)
+        return HiveMount.MOUNTED, ""
+
+    def unload_user_hive(self, mount: str) -> Tuple[bool, str]:
+        if winreg is None:
+            return False, "Registry access is only available on Windows"
+        advapi32 = ctypes.WinDLL("advapi32")
+        advapi32.RegUnLoadKeyW.argtypes = [ctypes.c_void_p, ctypes.c_wchar_p]
+        # Predefined keys are sign-extended handle values on 64-bit Windows
+        users = ctypes.c_void_p(ctypes.c_int32(HKEY_USERS).value)
+        error = 0
+        for attempt in range(5):
+            error = advapi32.RegUnLoadKeyW(users, mount)
+            # ERROR_ACCESS_DENIED while a key in the hive is still open somewhere
+            if error != 5:
+                break
+            time.sleep(0.2 * (attempt + 1))
+        if error:
+            return False, ctypes.FormatError(error)
+        return True, ""
+
+    def paths_exist(self, paths: List[str]) -> List[bool]:
+        return [os.path.exists(resolve_path(os.path.expandvars(path))) for path in paths]
+
+    def file_sizes(self, paths: List[str]) -> List[Optional[int]]:
+        sizes = []
+        for path in paths:
+            try:
+                sizes.append(os.path.getsize(resolve_path(os.path.expandvars(path))))
+            except OSError:
+                sizes.append(None)
+        return sizes
+
+    def free_disk_space(self, path: str = None) -> Optional[int]:
+        try:
+            return shutil.disk_usage(path or os.environ.get("SystemDrive", "C:") + "\\").free
+        except OSError:
+            return None
+
+    def winget_available(self) -> bool:
+        # winget is an App Execution Alias in %LOCALAPPDATA%\Microsoft\WindowsApps
+        return shutil.which("winget") is not None
+
+    def restart(self, delay: int = 5) -> Tuple[bool, str]:
+        """Schedule a restart with shutdown.exe"""
+        try:
+            result = subprocess.run(
+                ["shutdown", "/r", "/t", str(delay), "/c", "Restarting to finish Better10 changes"],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            if result.returncode != 0:
+                return False, result.stderr or result.stdout or "shutdown.exe failed"
+            return True, ""
+        except Exception as e:
+            return False, str(e)
+
+    def machine_metrics(self) -> Dict:
+        """
+        Measure the machine with one PowerShell session
+
+        Boot figures come from the latest event 100 of the
+        Diagnostics-Performance log, which Windows writes a few minutes
+        after each boot and which only administrators can read.
+        """
+        script = "\n".join([
+            "$ErrorActionPreference = 'SilentlyContinue'",
+            "$os = Get-CimInstance Win32_OperatingSystem",
+            "$result = [ordered]@{",
+            "    last_boot = ([DateTimeOffset]$os.LastBootUpTime).ToUnixTimeSeconds()",
+            "    process_count = @(Get-Process).Count",
+            "    service_count = @(Get-Service | Where-Object Status -eq 'Running').Count",
+            "    commit_bytes = [int64](Get-CimInstance Win32_PerfRawData_PerfOS_Memory).CommittedBytes",
+            "    startup_items = @(Get-CimInstance Win32_StartupCommand).Count",
+            "}",
+            f"$event = Get-WinEvent -FilterHashtable @{{LogName = '{BOOT_PERFORMANCE_LOG}'; Id = 100}} -MaxEvents 1",
+            "if ($event) {",
+            "    $data = @{}",
+            "    ([xml]$event.ToXml()).Event.EventData.Data | ForEach-Object { $data[$_.Name] = $_.'#text' }",
+            "    $result.boot_event_time = ([DateTimeOffset]$event.TimeCreated).ToUnixTimeSeconds()",
+            "    $result.boot_ms = [int64]$data['MainPathBootTime']",
+            "    $result.logon_ms = [int64]$data['BootUserProfileProcessingTime'] + [int64]$data['BootExplorerInitTime']",
+            "    $result.post_boot_ms = [int64]$data['BootPostBootTime']",
+            "}",
+            "$result | ConvertTo-Json -Compress",
+        ])
+        encoded = base64.b64encode(script.encode("utf-16-le")).decode("ascii")
+        success, stdout, stderr = self._launch(
+            ['powershell.exe', '-NoProfile', '-NonInteractive', '-ExecutionPolicy', 'Bypass', '-EncodedCommand', encoded],
+            False, None, 120, "Measurement"
+        )
+        if not success:
+            raise RuntimeError(stderr.strip() or "Measurement failed")
+        return json.loads(stdout.strip().splitlines()[-1])
+
+    def schedule_logon_task(self, name: str, command: str, delay_minutes: int = 3) -> Tuple[bool, str]:
+        """Create (or replace) a highest-privilege ONLOGON task with schtasks.exe"""
+        try:
+            result = subprocess.run(
+                ["schtasks", "/Create", "/F", "/TN", name, "/SC", "ONLOGON", "/RL", "HIGHEST",
+                 # /DELAY is mmmm:ss
+                 "/DELAY", f"{int(delay_minutes):04d}:00", "/TR", command],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            if result.returncode != 0:
+                return False, result.stderr.strip() or result.stdout.strip() or "schtasks.exe failed"
+            return True, ""
+        except Exception as e:
+            return False, str(e)
+
+    def delete_scheduled_task(self, name: str) -> Tuple[bool, str]:
+        try:
+            result = subprocess.run(["schtasks", "/Delete", "/F", "/TN", name],
+                                    capture_output=True, text=True, timeout=30)
+            if result.returncode != 0:
+                return False, result.stderr.strip() or result.stdout.strip() or "schtasks.exe failed"
+            return True, ""
+        except Exception as e:
+            return False, str(e)
+
+
+class SimulatedRegistry:
+    """
+    In-memory registry keyed like the real one
+
+    Key paths and value names are case-insensitive, as on Windows, but the
+    original spelling is preserved for reporting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (hive, lowercase key path) -> {lowercase value name: (name, value, type)}
+        self._keys: Dict[Tuple[int, str], Dict[str, Tuple[str, object, int]]] = {}
+
+    @staticmethod
+    def _normalize(key_path: str) -> str:
+        return key_path.strip("\\").lower()
+
+    def create_key(self, hive: int, key_path: str):
+        """Create a key (and implicitly its parents) if it does not exist"""
+        with self._lock:
+            self._keys.setdefault((hive, self._normalize(key_path)), {})
+
+    def key_exists(self, hive: int, key_path: str) -> bool:
+        """Check whether a key exists, either created directly or as the parent of another key"""
+        path = self._normalize(key_path)
+        with self._lock:
+            return (hive, path) in self._keys or any(
+                h == hive and k.startswith(path + "\\") for h, k in self._keys
+            )
+
+    def delete_key(self, hive: int, key_path: str) -> bool:
+        """Delete a key that has no values and no subkeys, returning False otherwise"""
+        path = self._normalize(key_path)
+        with self._lock:
+            if self._keys.get((hive, path)) or any(h == hive and k.startswith(path + "\\") for h, k in self._keys):
+                return False
+            self._keys.pop((hive, path), None)
+            return True
+
+    def set_value(self, hive: int, key_path: str, value_name: str, value, reg_type: int):
+        """Create the key if needed and set a value in it"""
+        with self._lock:
+            values = self._keys.setdefault((hive, self._normalize(key_path)), {})
+            values[value_name.lower()] = (value_name, value, reg_type)
+
+    def get_value(self, hive: int, key_path: str, value_name: str) -> Optional[Tuple[object, int]]:
+        """Return (value, type) or None if the key or value does not exist"""
+        with self._lock:
+            values = self._keys.get((hive, self._normalize(key_path)))
+            if values is None or value_name.lower() not in values:
+                return None
+            _, value, reg_type = values[value_name.lower()]
+            return value, reg_type
+
+    def delete_value(self, hive: int, key_path: str, value_name: str) -> bool:
+        """Delete a value, returning False if it did not exist"""
+        with self._lock:
+            values = self._keys.get((hive, self._normalize(key_path)))
+            if values is None or value_name.lower() not in values:
+                return False
+            del values[value_name.lower()]
+            return True
+
+    def detach(self, hive: int, key_path: str) -> Dict[str, Dict[str, Tuple[str, object, int]]]:
+        """Remove a key and everything below it, returning them keyed by path relative to the key"""
+        path = self._normalize(key_path)
+        with self._lock:
+            tree = {}
+            for h, k in list(self._keys):
+                if h == hive and (k == path or k.startswith(path + "\\")):
+                    tree[k[len(path) + 1:]] = self._keys.pop((h, k))
+            return tree
+
+    def attach(self, hive: int, key_path: str, tree: Dict[str, Dict[str, Tuple[str, object, int]]]):
+        """Add keys returned by detach() below a key"""
+        path = self._normalize(key_path)
+        with self._lock:
+            self._keys.setdefault((hive, path), {})
+            for relative, values in tree.items():
+                key = path + "\\" + relative if relative else path
+                self._keys[(hive, key)] = dict(values)
+
+    def value_count(self) -> int:
+        """Total number of values stored across all keys"""
+        with self._lock:
+            return sum(len(values) for values in self._keys.values())
+
+
+class SimulatedProcessRunner:
+    """
+    Stand-in for child processes
+
+    Each call sleeps for the configured latency (plus random jitter), fails
+    at the configured rate and produces the configured number of output
+    lines, which is enough to model the cost of a run without touching
+    the machine.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 output_lines: int = 0, seed: int = None, hang_rate: float = 0.0,
+                 failure_exit_codes: List[int] = None):
+        """
+        Args:
+            latency: Seconds each simulated process takes
+            jitter: Maximum random seconds added to the latency
+            failure_rate: Probability (0.0-1.0) that a process exits non-zero
+            output_lines: Lines of stdout each process produces
+            seed: Seed for the random generator, for reproducible runs
+            hang_rate: Probability (0.0-1.0) that a process hangs without output
+            failure_exit_codes: Exit codes a failing process picks from (e.g. 1618, 3010)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.output_lines = output_lines
+        self.hang_rate = hang_rate
+        self.failure_exit_codes = list(failure_exit_codes or [1])
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.launch_count = 0
+
+    def run(self, description: str, options: LaunchOptions = None, default_timeout: float = 600,
+            what: str = "Process") -> Tuple[bool, str, str]:
+        """
+        Simulate a child process
+
+        Timeouts, the inactivity watchdog and the disk-job limit behave as
+        they do for real children, so hung steps can be modelled too.
+
+        Args:
+            description: Command line or label of the simulated process
+            options: Timeout and watchdog settings for this launch
+            default_timeout: Timeout in seconds when options do not set one
+            what: Noun used in timeout and hang messages
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str)
+        """
+        options = options or LaunchOptions()
+        with disk_slot(options.resources):
+            return self._simulate(description, options, default_timeout, what)
+
+    def _simulate(self, description: str, options: LaunchOptions, default_timeout: float,
+                  what: str) -> Tuple[bool, str, str]:
+        timeout = options.timeout if options.timeout is not None else default_timeout
+
+        with self._lock:
+            self.launch_count += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter > 0 else 0.0)
+            failed = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            hung = self.hang_rate > 0 and self._random.random() < self.hang_rate
+            exit_code = self._random.choice(self.failure_exit_codes) if failed else 0
+
+        if hung:
+            inactivity = options.inactivity_timeout
+            if inactivity and inactivity < timeout:
+                time.sleep(inactivity)
+                if options.hang_action == HangAction.KILL:
+                    return False, "", (
+                        f"{what} produced no output or CPU activity for "
+                        f"{inactivity:.0f} seconds and was stopped"
+                    )
+                if options.on_hang:
+                    options.on_hang(inactivity)
+                time.sleep(timeout - inactivity)
+            else:
+                time.sleep(timeout)
+            return False, "", f"{what} timed out after {timeout:.0f} seconds"
+
+        if delay > timeout:
+            time.sleep(timeout)
+            return False, "", f"{what} timed out after {timeout:.0f} seconds"
+
+        # Output is spread over the run and reports progress, like a real installer
+        lines = []
+        for i in range(self.output_lines):
+            if delay > 0:
+                time.sleep(delay / self.output_lines)
+            line = f"[sim] {description}: output line {i + 1} ({(i + 1) * 100 // self.output_lines}%)\n"
+            lines.append(line)
+            if options.on_output:
+                options.on_output("stdout", line)
+        if delay > 0 and not self.output_lines:
+            time.sleep(delay)
+        stdout = "".join(lines)
+        options.exit_code = exit_code
+        if failed:
+            return False, stdout, f"[sim] {description}: simulated failure (exit code {exit_code})"
+        return True, stdout, ""
+
+
+class SimulatedBackend(SystemBackend):
+    """
+    Backend that models a Windows machine in memory
+
+    Registry writes land in a SimulatedRegistry, bloatware removals update
+    a fake Appx store, winget resolves against a fake catalog, and every
+    launch goes through a SimulatedProcessRunner.
+    """
+
+    name = "simulated"
+
+    def __init__(self, runner: SimulatedProcessRunner = None, admin: bool = True,
+                 appx_packages: List[str] = None, winget_catalog: Dict[str, str] = None,
+                 check_paths: bool = False, provisioned_packages: List[str] = None, files: List[str] = None,
+                 winget: bool = True, free_space: int = 100 * 1024 ** 3, user_profiles: List[Dict] = None,
+                 locked_profiles: List[str] = None, hive_latency: float = 0.0):
+        """
+        Args:
+            runner: Process runner used for every launch (a zero-latency runner if None)
+            admin: Whether the simulated session is elevated
+            appx_packages: Appx packages installed at start (DEFAULT_APPX_PACKAGES if None)
+            winget_catalog: Package id -> display name (DEFAULT_WINGET_CATALOG if None)
+            check_paths: Fail installers and tools whose file does not exist on disk
+            provisioned_packages: Appx packages provisioned for new users, which Remove-AppxPackage leaves alone
+            files: Paths that exist on the simulated machine
+            winget: Whether winget is installed
+            free_space: Free bytes on the simulated system drive
+            user_profiles: Profiles in ProfileList (SIMULATED_USER_PROFILES if None)
+            locked_profiles: SIDs of profiles whose hive another process holds open
+            hive_latency: Seconds it takes to load or unload a user hive
+        """
+        self.runner = runner or SimulatedProcessRunner()
+        self.admin = admin
+        self.registry = SimulatedRegistry()
+        self.appx_packages = set(appx_packages if appx_packages is not None else DEFAULT_APPX_PACKAGES)
+        self.winget_catalog = dict(winget_catalog if winget_catalog is not None else DEFAULT_WINGET_CATALOG)
+        self.winget_installed = set()
+        self.installed_programs = set()
+        self.tools_run: List[str] = []
+        self.check_paths = check_paths
+        self.restart_requested = False
+        self.booted = time.time()
+        self.scheduled_tasks: Dict[str, str] = {}  # Task name -> command line
+        self.provisioned_packages = set(provisioned_packages or [])
+        self.files = {path.lower() for path in files or []}
+        self.winget = winget
+        self.free_space = free_space
+        self.profiles = [dict(profile) for profile in
+                         (user_profiles if user_profiles is not None else SIMULATED_USER_PROFILES)]
+        self.locked_profiles = set(locked_profiles or [])
+        self.hive_latency = hive_latency
+        # Contents of the NTUSER.DAT files that are not mounted, by lowercase path
+        self.hive_files: Dict[str, Dict] = {}
+        self.mounted_hives: Dict[str, str] = {}  # Mount name -> hive file
+        self._lock = threading.Lock()
+
+    def is_admin(self) -> bool:
+        return self.admin
+
+    def _find_appx(self, name: str) -> Optional[str]:
+        """Return the stored spelling of an Appx package name, matched case-insensitively"""
+        for package in self.appx_packages:
+            if package.lower() == name.lower():
+                return package
+        return None
+
+    def run_powershell(self, command: str, as_admin: bool = False, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        success, stdout, stderr = self.runner.run(f"powershell {command[:60]}", options, 300, "Command")
+        if not success:
+            return success, stdout, stderr
+
+        # Get-AppxPackage <name> | Remove-AppxPackage exits 0 whether or not
+        # the package was present, exactly like the real cmdlets
+        with self._lock:
+            for name in appx_packages_in_command(command):
+                package = self._find_appx(name)
+                if package:
+                    self.appx_packages.discard(package)
+        return True, stdout, stderr
+
+    def run_winget(self, operation: str, package_id: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        if operation not in ("install", "uninstall") or not package_id:
+            return False, "", f"Invalid winget operation: {operation}"
+
+        success, stdout, stderr = self.runner.run(f"winget {operation} {package_id}", options, 600, "Winget command")
+        if not success:
+            return success, stdout, stderr
+
+        with self._lock:
+            if operation == "install":
+                if package_id not in self.winget_catalog:
+                    return False, stdout, "No package found matching input criteria."
+                self.winget_installed.add(package_id)
+                self.installed_programs.add(self.winget_catalog[package_id])
+            else:
+                if package_id not in self.winget_installed:
+                    return False, stdout, "No installed package found matching input criteria."
+                self.winget_installed.discard(package_id)
+                self.installed_programs.discard(self.winget_catalog.get(package_id, package_id))
+        return True, stdout, stderr
+
+    def run_installer(self, installer_path: str, installer_type: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        if self.check_paths and not os.path.exists(resolve_path(installer_path)):
+            return False, "", f"Installer not found: {resolve_path(installer_path)}"
+
+        installer_type = installer_type or detect_installer_type(installer_path)
+        success, stdout, stderr = self.runner.run(
+            f"{installer_type} installer {os.path.basename(installer_path)}", options, 600, "Installer"
+        )
+        if not success:
+            return success, stdout, stderr
+
+        name = os.path.splitext(os.path.basename(installer_path))[0]
+        with self._lock:
+            if installer_type == 'msix':
+                self.appx_packages.add(name)
+            else:
+                self.installed_programs.add(name)
+        return True, stdout, stderr
+
+    def install_msix_packages(self, package_paths: List[str], dependency_paths: List[str] = None,
+                              options: LaunchOptions = None) -> List[Tuple[bool, str]]:
+        # One simulated process for the whole session, like the real backend
+        success, stdout, stderr = self.runner.run(
+            f"msix deployment of {len(package_paths)} package(s) with {len(dependency_paths or [])} dependencies",
+            options, 600, "Package deployment"
+        )
+        if not success:
+            return [(False, stderr or stdout or "Package deployment failed")] * len(package_paths)
+
+        results = []
+        with self._lock:
+            for path in package_paths:
+                if self.check_paths and not os.path.exists(resolve_path(path)):
+                    results.append((False, f"Package not found: {resolve_path(path)}"))
+                    continue
+                self.appx_packages.add(os.path.splitext(os.path.basename(path))[0])
+                results.append((True, ""))
+        return results
+
+    def run_tool(self, tool_path: str, tool_type: str = None, options: LaunchOptions = None,
+                 args: List[str] = None) -> Tuple[bool, str, str]:
+        if self.check_paths and not os.path.exists(resolve_path(tool_path)):
+            return False, "", f"Tool not found: {resolve_path(tool_path)}"
+
+        description = " ".join(["tool", os.path.basename(tool_path)] + list(args or []))
+        success, stdout, stderr = self.runner.run(description, options, 600, "Tool")
+        if success:
+            with self._lock:
+                self.tools_run.append(tool_path)
+        return success, stdout, stderr
+
+    def run_executable(self, exe_path: str, args: List[str] = None, as_admin: bool = True, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        if self.check_paths and not os.path.exists(resolve_path(exe_path)):
+            return False, "", f"Executable not found: {resolve_path(exe_path)}"
+        return self.runner.run(" ".join([os.path.basename(exe_path)] + list(args or [])), options, 600, "Executable")
+
+    def set_registry_value(self, key_path: str, value_name: str, value, hive: int = HKEY_LOCAL_MACHINE) -> Tuple[bool, str]:
+        if isinstance(value, int):
+            reg_type = REG_DWORD
+        elif isinstance(value, str):
+            reg_type = REG_SZ
+        else:
+            return False, f"Unsupported value type: {type(value)}"
+
+        return self.apply_registry_changes([{
+            "action": "set", "hive": hive, "key_path": key_path,
+            "value_name": value_name, "value": value, "type": reg_type
+        }])[0]
+
+    def restart(self, delay: int = 5) -> Tuple[bool, str]:
+        self.restart_requested = True
+        return True, ""
+
+    def machine_metrics(self) -> Dict:
+        """
+        Model the machine's footprint from its simulated state
+
+        Every installed program adds a process, a service and a startup
+        item, every Appx package some memory and boot time. The simulated
+        machine booted when the backend was created.
+        """
+        with self._lock:
+            programs = len(self.installed_programs) + len(self.winget_installed)
+            packages = len(self.appx_packages)
+        boot_ms = 9000 + 400 * programs + 150 * packages
+        return {
+            "last_boot": int(self.booted), "process_count": 90 + programs + packages // 4,
+            "service_count": 70 + programs, "commit_bytes": (2048 + 120 * programs + 40 * packages) * 1024 ** 2,
+            "startup_items": 4 + programs, "boot_event_time": int(self.booted) + 120,
+            "boot_ms": boot_ms, "logon_ms": boot_ms // 4, "post_boot_ms": 15000 + 900 * programs,
+        }
+
+    def schedule_logon_task(self, name: str, command: str, delay_minutes: int = 3) -> Tuple[bool, str]:
+        with self._lock:
+            self.scheduled_tasks[name] = command
+        return True, ""
+
+    def delete_scheduled_task(self, name: str) -> Tuple[bool, str]:
+        with self._lock:
+            if self.scheduled_tasks.pop(name, None) is None:
+                return False, f"Task {name} does not exist"
+        return True, ""
+
+    def inventory(self, winget: bool = True) -> Dict[str, List[str]]:
+        with self._lock:
+            inventory = {
+                "programs": sorted(self.installed_programs),
+                "appx_packages": sorted(self.appx_packages),
+                "provisioned_packages": sorted(self.provisioned_packages),
+            }
+            if winget:
+                inventory["winget_packages"] = sorted(self.winget_installed)
+            return inventory
+
+    def read_registry_state(self, queries: List[Tuple[int, str, str]]) -> List[Dict]:
+        states = []
+        for hive, key_path, value_name in queries:
+            state = {"key_exists": self.registry.key_exists(hive, key_path), "missing_from": None,
+                     "value_exists": False, "value": None, "type": None}
+            if state["key_exists"]:
+                stored = self.registry.get_value(hive, key_path, value_name)
+                if stored:
+                    state["value_exists"] = True
+                    state["value"], state["type"] = stored
+            else:
+                parts = key_path.strip("\\").split("\\")
+                missing = len(parts)
+                while missing > 1 and not self.registry.key_exists(hive, "\\".join(parts[:missing - 1])):
+                    missing -= 1
+                state["missing_from"] = "\\".join(parts[:missing])
+            states.append(state)
+        return states
+
+    def apply_registry_changes(self, changes: List[Dict]) -> List[Tuple[bool, str]]:
+        results = []
+        for change in changes:
+            if change["hive"] == HKEY_LOCAL_MACHINE and not self.admin:
+                results.append((False, "Administrator privileges required"))
+            elif change["action"] == "set":
+                self.registry.set_value(change["hive"], change["key_path"], change["value_name"],
+                                        change["value"], change["type"])
+                results.append((True, ""))
+            elif change["action"] == "delete_value":
+                self.registry.delete_value(change["hive"], change["key_path"], change["value_name"])
+                results.append((True, ""))
+            else:
+                results.append(None)  # Key deletions run after all value changes
+        for i in sorted((i for i, result in enumerate(results) if result is None),
+                        key=lambda i: -changes[i]["key_path"].count("\\")):
+            change = changes[i]
+            if self.registry.delete_key(change["hive"], change["key_path"]):
+                results[i] = (True, "")
+            else:
+                results[i] = (False, f"{change['key_path']} is not empty and was kept")
+        return results
+
+    def user_profiles(self) -> List[Dict]:
+        return [dict(profile) for profile in self.profiles]
+
+    def load_user_hive(self, mount: str, hive_path: str) -> Tuple[str, str]:
+        time.sleep(self.hive_latency)
+        locked = {ntpath.join(profile["path"], USER_HIVE_FILE).lower()
+                  for profile in self.profiles if profile["sid"] in self.locked_profiles}
+        with self._lock:
+            if not self.admin:
+                return HiveMount.FAILED, "Administrator privileges required"
+            if hive_path.lower() in locked:
+                return HiveMount.IN_USE, f"{hive_path} is in use by another process"
+            if mount in self.mounted_hives or self.registry.key_exists(HKEY_USERS, mount):
+                return HiveMount.FAILED, f"HKEY_USERS\\{mount} is already in use"
+            self.mounted_hives[mount] = hive_path
+            tree = self.hive_files.pop(hive_path.lower(), {})
+        self.registry.attach(HKEY_USERS, mount, tree)
+        return HiveMount.MOUNTED, ""
+
+    def unload_user_hive(self, mount: str) -> Tuple[bool, str]:
+        time.sleep(self.hive_latency)
+        with self._lock:
+            hive_path = self.mounted_hives.pop(mount, None)
+            if hive_path is None:
+                return False, f"HKEY_USERS\\{mount} is not a mounted hive"
+            self.hive_files[hive_path.lower()] = self.registry.detach(HKEY_USERS, mount)
+        return True, ""
+
+    def paths_exist(self, paths: List[str]) -> List[bool]:
+        with self._lock:
+            return [path.lower() in self.files or (self.check_paths and os.path.exists(resolve_path(path)))
+                    for path in paths]
+
+    def file_sizes(self, paths: List[str]) -> List[Optional[int]]:
+        # Files on disk report their real size and the simulated machine's files count as empty;
+        # anything else is missing, as on Windows, even if launches do not check paths
+        sizes = []
+        for path in paths:
+            full_path = resolve_path(path)
+            if os.path.isfile(full_path):
+                sizes.append(os.path.getsize(full_path))
+            elif path.lower() in self.files:
+                sizes.append(0)
+            else:
+                sizes.append(None)
+        return sizes
+
+    def free_disk_space(self, path: str = None) -> Optional[int]:
+        return self.free_space
+
+    def winget_available(self) -> bool:
+        return self.winget
+
+
+def default_backend() -> SystemBackend:
+    """Return the backend for the current platform"""
+    return WindowsBackend()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Better10 benchmark suite
+
+Measures the execution engine, the log pipeline and startup against the
+simulated backend, so results are comparable across machines and do not
+touch the system.
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --only worker_throughput scan_apps_folder --repeat 5
+    python benchmark.py --compare baseline.json results.json --threshold 0.10
+
+Results are written as JSON. Compare mode prints the change for every
+metric present in both files and exits with status 1 if any metric
+regressed by more than the threshold.
+"""
+
+import sys
+import os
+import atexit
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import List, Dict, Tuple, Callable
+
+# Benchmarks run headless unless a platform is requested explicitly
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Run state written by the engine (registry snapshots, ...) must not land in the user's data directory
+if "BETTER10_DATA_DIR" not in os.environ:
+    os.environ["BETTER10_DATA_DIR"] = tempfile.mkdtemp(prefix="better10_bench_data_")
+    atexit.register(shutil.rmtree, os.environ["BETTER10_DATA_DIR"], True)
+
+from backends import HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, SCRIPT_DIR
+
+RESULTS_SCHEMA = 1
+
+# name -> (value, unit, higher_is_better) for a single sample
+Sample = Dict[str, Tuple[float, str, bool]]
+
+
+def synthetic_operations(count: int) -> List[Dict]:
+    """
+    Build a mixed plan of synthetic operations
+
+    The mix mirrors a typical profile: mostly registry writes and bloatware
+    removals, with some installs and tools.
+    """
+    templates = [
+        {'type': 'registry', 'key_path': 'SOFTWARE\\Better10\\Benchmark', 'value': 0, 'hive': HKEY_LOCAL_MACHINE},
+        {'type': 'registry', 'key_path': 'SOFTWARE\\Better10\\Benchmark', 'value': 'Deny', 'hive': HKEY_CURRENT_USER},
+        {'type': 'powershell', 'command': 'Get-AppxPackage Microsoft.BingNews | Remove-AppxPackage'},
+        {'type': 'winget_install', 'package_id': 'Google.Chrome'},
+        {'type': 'local_installer', 'path': 'Apps/benchmark_setup.exe', 'installer_type': 'exe'},
+        {'type': 'tool', 'path': 'Tools/benchmark.ps1', 'tool_type': 'ps1'},
+    ]
+    operations = []
+    for i in range(count):
+        operation = dict(templates[i % len(templates)])
+        operation['name'] = f"Synthetic operation {i}"
+        if operation['type'] == 'registry':
+            operation['value_name'] = f"Value{i}"
+        operations.append(operation)
+    return operations
+
+
+class BenchmarkContext:
+    """Lazily creates the Qt application and shared objects the benchmarks need"""
+
+    def __init__(self, quick: bool = False):
+        self.quick = quick
+        self._app = None
+
+    @property
+    def app(self):
+        if self._app is None:
+            from PyQt5.QtWidgets import QApplication
+            self._app = QApplication.instance() or QApplication([sys.argv[0]])
+        return self._app
+
+    def sizes(self, normal: List[int], quick: List[int]) -> List[int]:
+        return quick if self.quick else normal
+
+
+def bench_worker_throughput(ctx: BenchmarkContext) -> Sample:
+    """WorkerThread throughput with thousands of synthetic operations on a zero-latency backend"""
+    from better10 import WorkerThread
+    from backends import SimulatedBackend
+    from durations import TimeoutPolicy
+    from run_history import RunHistory
+
+    sample = {}
+    for count in ctx.sizes([1000, 5000], [500]):
+        # The run is still recorded (the cost is part of a run), but into a
+        # throwaway database so benchmarks do not show up in the history
+        worker = WorkerThread(synthetic_operations(count), backend=SimulatedBackend(), timeouts=TimeoutPolicy(),
+                              history=RunHistory(":memory:"))
+        start = time.perf_counter()
+        worker.run()
+        elapsed = time.perf_counter() - start
+        sample[f"worker_throughput[{count}]"] = (count / elapsed, "ops/s", True)
+    return sample
+
+
+def bench_log_pipeline(ctx: BenchmarkContext) -> Sample:
+    """Cross-thread log_signal delivery into LogsTab, and direct LogsTab appends"""
+    from PyQt5.QtCore import QThread, QEventLoop, QTimer, pyqtSignal
+    from better10 import LogsTab, LogLevel
+
+    class LogFlood(QThread):
+        log_signal = pyqtSignal(str, str)
+
+        def __init__(self, count):
+            super().__init__()
+            self.count = count
+
+        def run(self):
+            for i in range(self.count):
+                self.log_signal.emit(f"Benchmark message {i}", LogLevel.INFO)
+
+    ctx.app
+    count = 2000 if ctx.quick else 10000
+    sample = {}
+
+    # Cross-thread: the same queued connection WorkerThread uses
+    logs_tab = LogsTab()
+    flood = LogFlood(count)
+    loop = QEventLoop()
+    delivered = [0]
+
+    def on_delivered(message, level):
+        delivered[0] += 1
+        if delivered[0] == count:
+            loop.quit()
+
+    flood.log_signal.connect(logs_tab.add_log)
+    flood.log_signal.connect(on_delivered)
+    QTimer.singleShot(120000, loop.quit)  # Safety net
+    start = time.perf_counter()
+    flood.start()
+    loop.exec_()
+    elapsed = time.perf_counter() - start
+    flood.wait()
+    sample["log_signal_cross_thread"] = (delivered[0] / elapsed, "msgs/s", True)
+
+    # Direct appends in the GUI thread
+    logs_tab = LogsTab()
+    start = time.perf_counter()
+    for i in range(count):
+        logs_tab.add_log(f"Benchmark message {i}", LogLevel.INFO)
+    elapsed = time.perf_counter() - start
+    sample["logs_tab_append"] = (count / elapsed, "msgs/s", True)
+    return sample
+
+
+def bench_event_bus(ctx: BenchmarkContext) -> Sample:
+    """Publishing run events while one subscriber keeps up and one falls behind"""
+    from events import EventBus, LogMessage
+    from better10 import LogLevel
+
+    count = 20000 if ctx.quick else 100000
+    bus = EventBus()
+    bus.subscribe(lambda event: None, name="fast")
+    bus.subscribe(lambda event: time.sleep(0.001), name="slow", max_queue=1000)
+    start = time.perf_counter()
+    for i in range(count):
+        bus.publish(LogMessage("benchmark", f"Benchmark message {i}", LogLevel.INFO))
+    elapsed = time.perf_counter() - start
+    bus.close(timeout=5)
+    return {"event_bus_publish": (count / elapsed, "events/s", True)}
+
+
+def bench_update_operation_count(ctx: BenchmarkContext) -> Sample:
+    """Cost of update_operation_count as the catalogs grow"""
+    from PyQt5.QtWidgets import QCheckBox
+    from better10 import Better10MainWindow, SystemOperations
+    from backends import SimulatedBackend
+
+    ctx.app
+    SystemOperations.set_backend(SimulatedBackend())
+    sample = {}
+    for size in ctx.sizes([100, 1000, 5000], [100, 1000]):
+        window = Better10MainWindow()
+        for i in range(size):
+            checkbox = QCheckBox(f"Synthetic app {i}")
+            checkbox.setChecked(i % 2 == 0)
+            window.app_installer_tab.checkboxes[f"Synthetic app {i}"] = {
+                'checkbox': checkbox,
+                'type': 'local_installer',
+                'path': f"Apps/synthetic_{i}.exe",
+                'installer_type': 'exe'
+            }
+        calls = 50
+        start = time.perf_counter()
+        for _ in range(calls):
+            window.update_operation_count()
+        elapsed = time.perf_counter() - start
+        sample[f"update_operation_count[{size}]"] = (elapsed / calls * 1000, "ms", False)
+        window.deleteLater()
+    return sample
+
+
+def bench_scan_apps_folder(ctx: BenchmarkContext) -> Sample:
+    """Apps/ folder scanning with large directories"""
+    from better10 import scan_apps_folder
+
+    sample = {}
+    for size in ctx.sizes([1000, 10000], [1000]):
+        folder = tempfile.mkdtemp(prefix="better10_bench_")
+        try:
+            apps_folder = os.path.join(folder, "Apps")
+            tools_folder = os.path.join(folder, "Tools")
+            os.makedirs(apps_folder)
+            os.makedirs(tools_folder)
+            extensions = ['.exe', '.msi', '.msix', '.txt']
+            for i in range(size):
+                open(os.path.join(apps_folder, f"app_{i}_setup{extensions[i % 4]}"), "w").close()
+            start = time.perf_counter()
+            apps = scan_apps_folder(apps_folder, tools_folder)
+            elapsed = time.perf_counter() - start
+            assert len(apps) == size - size // 4
+            sample[f"scan_apps_folder[{size}]"] = (elapsed * 1000, "ms", False)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    return sample
+
+
+_STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {script_dir!r})
+import better10
+imported = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from backends import SimulatedBackend
+app = QApplication([sys.argv[0]])
+better10.SystemOperations.set_backend(SimulatedBackend())
+window = better10.Better10MainWindow()
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print((imported - start) * 1000, (shown - start) * 1000)
+"""
+
+
+def bench_startup(ctx: BenchmarkContext) -> Sample:
+    """Module import and first-window time, each measured in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT.format(script_dir=SCRIPT_DIR)],
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "Startup benchmark failed")
+    import_ms, window_ms = (float(v) for v in result.stdout.split()[-2:])
+    return {
+        "import_time": (import_ms, "ms", False),
+        "first_window_time": (window_ms, "ms", False),
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[BenchmarkContext], Sample]] = {
+    "worker_throughput": bench_worker_throughput,
+    "log_pipeline": bench_log_pipeline,
+    "event_bus": bench_event_bus,
+    "update_operation_count": bench_update_operation_count,
+    "scan_apps_folder": bench_scan_apps_folder,
+    "startup": bench_startup,
+}
+
+
+def run_benchmarks(names: List[str], repeat: int, quick: bool) -> Dict:
+    """
+    Run benchmarks and aggregate repeated samples
+
+    Args:
+        names: Benchmark names to run (keys of BENCHMARKS)
+        repeat: Number of samples per benchmark; the median is reported
+        quick: Use smaller workloads
+
+    Returns:
+        Results document ready to be written as JSON
+    """
+    ctx = BenchmarkContext(quick=quick)
+    results = {}
+    for name in names:
+        samples: Dict[str, List[float]] = {}
+        units: Dict[str, Tuple[str, bool]] = {}
+        for _ in range(repeat):
+            for metric, (value, unit, higher_is_better) in BENCHMARKS[name](ctx).items():
+                samples.setdefault(metric, []).append(value)
+                units[metric] = (unit, higher_is_better)
+        for metric, values in samples.items():
+            unit, higher_is_better = units[metric]
+            results[metric] = {
+                'value': statistics.median(values),
+                'unit': unit,
+                'higher_is_better': higher_is_better,
+                'samples': values,
+            }
+            print(f"{metric:<40} {results[metric]['value']:>14.2f} {unit}")
+
+    return {
+        'schema': RESULTS_SCHEMA,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': quick,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Compare two result documents
+
+    Args:
+        baseline: Earlier results document
+        current: Later results document
+        threshold: Relative change (e.g. 0.10 for 10%) beyond which a metric regresses
+
+    Returns:
+        Names of the metrics that regressed
+    """
+    regressions = []
+    base_results = baseline.get('results', {})
+    current_results = current.get('results', {})
+    print(f"{'metric':<40} {'baseline':>14} {'current':>14} {'change':>9}")
+    for metric in sorted(set(base_results) & set(current_results)):
+        old = base_results[metric]['value']
+        new = current_results[metric]['value']
+        change = (new - old) / old if old else 0.0
+        worse = -change if current_results[metric]['higher_is_better'] else change
+        flag = ""
+        if worse > threshold:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        elif worse < -threshold:
+            flag = "  improved"
+        print(f"{metric:<40} {old:>14.2f} {new:>14.2f} {change:>+8.1%}{flag}")
+
+    for metric in sorted(set(base_results) ^ set(current_results)):
+        print(f"{metric:<40} only in {'baseline' if metric in base_results else 'current'} run")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Better10 benchmark suite")
+    parser.add_argument("--output", "-o", metavar="FILE", help="Write results as JSON to FILE")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Samples per benchmark (median is reported)")
+    parser.add_argument("--quick", action="store_true", help="Use smaller workloads")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files instead of running benchmarks")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change that counts as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare_results(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+        return
+
+    document = run_benchmarks(args.only or list(BENCHMARKS), max(1, args.repeat), args.quick)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,20 +12,55 @@ Python Version: 3.10+
 
 import sys
 import os
-import subprocess
-import winreg
+import argparse
 import ctypes
+import heapq
+import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QTabWidget, QPushButton, QCheckBox, QTextEdit, QLabel, QScrollArea,
-    QMessageBox, QProgressBar, QShortcut
+    QMessageBox, QProgressBar, QShortcut, QFileDialog, QTableWidget, QTableWidgetItem,
+    QComboBox, QSpinBox, QHeaderView, QAbstractItemView
 )
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QFont, QColor, QPalette, QKeySequence
 
+from backends import (
+    SystemBackend, SimulatedBackend, SimulatedProcessRunner, default_backend,
+    HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, SCRIPT_DIR, new_run_id, hive_name
+)
+from profiles import load_profile, load_profile_settings
+from broker import BrokerBackend, BrokerError, launch_broker, serve_broker
+from durations import DurationHistory, TimeoutPolicy, CostEstimator
+from progress import ProgressTracker, format_eta
+from process_monitor import LaunchOptions, HangAction
+from exit_codes import ExitOutcome, RetryPolicy, classify_exit, operation_technology
+from script_export import export_plan
+from offline_registry import apply_to_image, HiveError
+from registry_pol import export_policy, PolicyFileError
+from tool_profiles import profile_for_tool, tool_operation, tool_launch_arguments
+from catalog_watcher import CatalogWatcher
+from log_viewer import LogViewerDialog
+from preflight import Preflight
+from staging import InstallerStager, StagingMode, StageStatus
+from msix import MsixBatch, is_framework_package
+from sampler import ResourceSampler
+from impact import ImpactReport
+from governor import ResourceGovernor, GovernorPolicy, CPU_PRIORITIES, IO_PRIORITIES, parse_cpu_list
+from profile_fanout import ProfileFanout, ProfileStatus, user_operations
+from profiling import Profiler, profiled
+from verification import RunVerifier, VerificationResult, VerificationStatus
+from registry_snapshot import RegistrySnapshot, resolve_run_id
+from run_log import RunLog, OUTPUT_LEVEL
+from events import (EventBus, EventKind, Overflow, PlanStarted, OpStarted, OpOutput, OpFinished,
+                    RunFinished, LogMessage, Progress)
+from run_history import RunHistory, RunRecorder, OperationOutcome, OPERATION_CATEGORIES, HISTORY_QUERIES, history_table
+
 
 class LogLevel:
     """Log level constants"""
@@ -36,495 +71,828 @@ class LogLevel:
 
 
 class SystemOperations:
-    """Handles all system-level operations"""
+    """
+    Handles all system-level operations
+
+    Calls are delegated to the active backend: WindowsBackend performs real
+    changes, SimulatedBackend models a machine in memory (see backends.py).
+    """
+    
+    backend: SystemBackend = default_backend()
+    
+    @classmethod
+    def set_backend(cls, backend: SystemBackend):
+        """Replace the backend used by SystemOperations and new WorkerThreads"""
+        cls.backend = backend
     
     @staticmethod
     def is_admin() -> bool:
         """Check if the application is running with administrator privileges"""
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin() != 0
-        except:
-            return False
+        return SystemOperations.backend.is_admin()
     
     @staticmethod
-    def run_powershell(command: str, as_admin: bool = False) -> Tuple[bool, str, str]:
-        """
-        Execute a PowerShell command and return the result
-        
-        Args:
-            command: PowerShell command to execute
-            as_admin: Whether to run as administrator (requires elevation)
-        
-        Returns:
-            Tuple of (success: bool, stdout: str, stderr: str)
-        """
-        try:
-            if as_admin:
-                # Run PowerShell as administrator
-                ps_command = f'powershell.exe -Command "Start-Process powershell -ArgumentList \\"-NoProfile -ExecutionPolicy Bypass -Command {command}\\" -Verb RunAs -Wait"'
-                result = subprocess.run(
-                    ps_command,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=300
-                )
-            else:
-                # Run PowerShell normally
-                ps_command = f'powershell.exe -NoProfile -ExecutionPolicy Bypass -Command "{command}"'
-                result = subprocess.run(
-                    ps_command,
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=300
-                )
-            
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
-        except subprocess.TimeoutExpired:
-            return False, "", "Command timed out after 300 seconds"
-        except Exception as e:
-            return False, "", str(e)
+    def run_powershell(command: str, as_admin: bool = False, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Execute a PowerShell command and return (success, stdout, stderr)"""
+        return SystemOperations.backend.run_powershell(command, as_admin, options)
     
     @staticmethod
-    def run_winget(operation: str, package_id: str = None) -> Tuple[bool, str, str]:
-        """
-        Execute winget command
-        
-        Args:
-            operation: 'install', 'uninstall', 'list', etc.
-            package_id: Package identifier for install/uninstall
-        
-        Returns:
-            Tuple of (success: bool, stdout: str, stderr: str)
-        """
-        try:
-            if operation == "install" and package_id:
-                command = f'winget install --id "{package_id}" --silent --accept-package-agreements --accept-source-agreements'
-            elif operation == "uninstall" and package_id:
-                command = f'winget uninstall --id "{package_id}" --silent'
-            else:
-                return False, "", f"Invalid winget operation: {operation}"
-            
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutes for installs
-            )
-            
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
-        except subprocess.TimeoutExpired:
-            return False, "", "Winget command timed out"
-        except Exception as e:
-            return False, "", str(e)
+    def run_winget(operation: str, package_id: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Execute a winget command and return (success, stdout, stderr)"""
+        return SystemOperations.backend.run_winget(operation, package_id, options)
     
     @staticmethod
-    def run_installer(installer_path: str, installer_type: str = None) -> Tuple[bool, str, str]:
-        """
-        Run an installer file with appropriate silent flags
-        
-        Args:
-            installer_path: Path to the installer file
-            installer_type: Type of installer ('exe', 'msi', 'msix'). Auto-detected if None
-        
-        Returns:
-            Tuple of (success: bool, stdout: str, stderr: str)
-        """
-        try:
-            # Resolve the full path
-            if not os.path.isabs(installer_path):
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                installer_path = os.path.join(script_dir, installer_path)
-            
-            if not os.path.exists(installer_path):
-                return False, "", f"Installer not found: {installer_path}"
-            
-            # Auto-detect installer type if not provided
-            if not installer_type:
-                ext = os.path.splitext(installer_path)[1].lower()
-                if ext == '.msi':
-                    installer_type = 'msi'
-                elif ext == '.msix':
-                    installer_type = 'msix'
-                else:
-                    installer_type = 'exe'
-            
-            # Build command with silent install flags - use proper escaping
-            installer_path_escaped = installer_path.replace("'", "''").replace('$', '`$')
-            
-            if installer_type == 'msi':
-                # MSI silent install using msiexec
-                ps_command = f'$proc = Start-Process -FilePath "msiexec.exe" -ArgumentList "/i", \'{installer_path_escaped}\', "/quiet", "/norestart", "/qn" -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-            elif installer_type == 'msix':
-                # MSIX install using Add-AppxPackage (requires admin)
-                ps_command = f'$proc = Start-Process -FilePath "powershell.exe" -ArgumentList "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", "Add-AppxPackage -Path \'{installer_path_escaped}\' -ErrorAction Stop" -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-            else:
-                # EXE installer - try /S first (most common)
-                ps_command = f'$proc = Start-Process -FilePath \'{installer_path_escaped}\' -ArgumentList "/S" -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-            
-            result = subprocess.run(
-                ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', ps_command],
-                shell=False,
-                capture_output=True,
-                text=True,
-                timeout=600
-            )
-            
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
-        except subprocess.TimeoutExpired:
-            return False, "", "Installer timed out after 600 seconds"
-        except Exception as e:
-            return False, "", str(e)
+    def run_installer(installer_path: str, installer_type: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Run an installer file with silent flags and return (success, stdout, stderr)"""
+        return SystemOperations.backend.run_installer(installer_path, installer_type, options)
+    
+    @staticmethod
+    def run_tool(tool_path: str, tool_type: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Run a tool from the Tools folder and return (success, stdout, stderr)"""
+        return SystemOperations.backend.run_tool(tool_path, tool_type, options)
     
     @staticmethod
-    def run_tool(tool_path: str, tool_type: str = None) -> Tuple[bool, str, str]:
+    def run_executable(exe_path: str, args: List[str] = None, as_admin: bool = True, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        """Execute an external executable file and return (success, stdout, stderr)"""
+        return SystemOperations.backend.run_executable(exe_path, args, as_admin, options)
+    
+    @staticmethod
+    def set_registry_value(key_path: str, value_name: str, value, hive: int = HKEY_LOCAL_MACHINE) -> Tuple[bool, str]:
+        """Set a registry value and return (success, error_message)"""
+        return SystemOperations.backend.set_registry_value(key_path, value_name, value, hive)
+
+
+class WorkerThread(QThread):
+    """
+    Background thread for executing operations without freezing the UI
+    
+    The run is published as typed events on self.events (see events.py);
+    sinks subscribe there. The Qt signals are fed from the same stream for
+    widgets that connect to them.
+    """
+    
+    log_signal = pyqtSignal(str, str)  # message, level
+    progress_signal = pyqtSignal(int)  # percentage
+    eta_signal = pyqtSignal(float)  # estimated seconds remaining
+    finished_signal = pyqtSignal(bool)  # success
+    
+    def __init__(self, operations: List[Dict], parent=None, backend: SystemBackend = None,
+                 timeouts: TimeoutPolicy = None, retry: RetryPolicy = None, verifier: RunVerifier = None,
+                 history: RunHistory = None):
+        super().__init__(parent)
+        self.operations = operations
+        self.backend = backend or SystemOperations.backend
+        # Timeouts come from this backend's duration history, so simulated
+        # runs never skew the limits used on a real machine
+        self.timeouts = timeouts or TimeoutPolicy(DurationHistory.for_backend(self.backend.name))
+        self.retry = retry or RetryPolicy()
+        self.costs = CostEstimator(self.timeouts.history)
+        self.progress: Optional[ProgressTracker] = None
+        self.verifier = verifier or RunVerifier(self.backend)
+        self.cancelled = False
+        self.success_count = 0
+        self.failure_count = 0
+        self.retry_count = 0
+        self.profile_failures = 0
+        self.stager: Optional[InstallerStager] = None
+        self.msix_batch: Optional[MsixBatch] = None
+        self.governor = ResourceGovernor()
+        self.sampler: Optional[ResourceSampler] = None
+        self.plan_name: Optional[str] = None  # Profile the plan came from, recorded with impact measurements
+        self.impact_baseline: Optional[Tuple[float, Dict]] = None
+        self.reboot_required: List[str] = []  # Names of operations that need a restart to finish
+        self.succeeded_operations: List[Dict] = []
+        self.run_id = new_run_id()
+        self.verification_results: List[VerificationResult] = []
+        self.history = history or RunHistory.for_backend(self.backend.name)
+        self.recorder = RunRecorder(self.run_id, operations)
+        self.run_log = RunLog(self.backend.name, self.run_id)
+        self.current_operation = ""
+        self.events = EventBus()
+        # The run log and the history must not lose anything: the log keeps every
+        # message and all child output for the log viewer, the history every
+        # outcome. They make publishers wait for room; only display sinks drop.
+        self.events.subscribe(self.write_log, name="run log", kinds=(EventKind.LOG, EventKind.OP_OUTPUT),
+                              overflow=Overflow.BLOCK)
+        self.events.subscribe(self.record_outcome, name="run history", kinds=(EventKind.OP_FINISHED,),
+                              overflow=Overflow.BLOCK)
+        self.events.subscribe(self.forward_to_signals, name="signals",
+                              kinds=(EventKind.LOG, EventKind.PROGRESS, EventKind.RUN_FINISHED))
+    
+    def execute_operation(self, operation: Dict, options: LaunchOptions) -> Tuple[bool, str, str]:
         """
-        Run a tool from the Tools folder with admin privileges
+        Execute a single operation against the backend
         
         Args:
-            tool_path: Path to the tool file
-            tool_type: Type of tool ('exe', 'ps1', 'bat', 'cmd'). Auto-detected if None
+            operation: Operation dict
+            options: Launch options; the backend stores the child's exit code in them
         
         Returns:
-            Tuple of (success: bool, stdout: str, stderr: str)
+            Tuple of (success: bool, error_message: str, output: str)
         """
-        try:
-            # Resolve the full path
-            if not os.path.isabs(tool_path):
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                tool_path = os.path.join(script_dir, tool_path)
-            
-            if not os.path.exists(tool_path):
-                return False, "", f"Tool not found: {tool_path}"
-            
-            # Auto-detect tool type if not provided
-            if not tool_type:
-                ext = os.path.splitext(tool_path)[1].lower()
-                tool_type = ext[1:] if ext.startswith('.') else ext
-            
-            # Run tool based on type - use proper PowerShell escaping
-            # Escape single quotes and dollar signs for PowerShell
-            tool_path_escaped = tool_path.replace("'", "''").replace('$', '`$')
-            
-            if tool_type == 'ps1':
-                # PowerShell script - run with admin privileges
-                ps_command = f'$proc = Start-Process -FilePath "powershell.exe" -ArgumentList "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", \'{tool_path_escaped}\' -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-            elif tool_type in ['bat', 'cmd']:
-                # Batch file - run with admin privileges
-                ps_command = f'$proc = Start-Process -FilePath "cmd.exe" -ArgumentList "/c", \'{tool_path_escaped}\' -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
+        op_type = operation.get('type')
+        success = False
+        error_msg = ""
+        stdout = stderr = ""
+        
+        if op_type == 'winget_install':
+            package_id = operation.get('package_id')
+            if not package_id:
+                error_msg = "Package ID is missing"
             else:
-                # EXE file - run with admin privileges
-                ps_command = f'$proc = Start-Process -FilePath \'{tool_path_escaped}\' -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-            
-            result = subprocess.run(
-                ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', ps_command],
-                shell=False,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutes timeout
-            )
-            
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
-        except subprocess.TimeoutExpired:
-            return False, "", "Tool timed out after 600 seconds"
-        except Exception as e:
-            return False, "", str(e)
-    
-    @staticmethod
-    def run_executable(exe_path: str, args: List[str] = None, as_admin: bool = True) -> Tuple[bool, str, str]:
-        """
-        Execute an external executable file
+                success, stdout, stderr = self.backend.run_winget(
+                    'install',
+                    package_id,
+                    options
+                )
+                if not success:
+                    error_msg = stderr or stdout or "Winget installation failed"
         
-        Args:
-            exe_path: Path to the executable file
-            args: List of arguments to pass to the executable
-            as_admin: Whether to run as administrator (default: True)
+        elif op_type == 'winget_uninstall':
+            package_id = operation.get('package_id')
+            if not package_id:
+                error_msg = "Package ID is missing"
+            else:
+                success, stdout, stderr = self.backend.run_winget(
+                    'uninstall',
+                    package_id,
+                    options
+                )
+                if not success:
+                    error_msg = stderr or stdout or "Winget uninstallation failed"
         
-        Returns:
-            Tuple of (success: bool, stdout: str, stderr: str)
-        """
-        try:
-            # Resolve the full path
-            if not os.path.isabs(exe_path):
-                # If relative path, resolve relative to script directory
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                exe_path = os.path.join(script_dir, exe_path)
-            
-            # Check if file exists
-            if not os.path.exists(exe_path):
-                return False, "", f"Executable not found: {exe_path}"
-            
-            # Build command
-            if args:
-                cmd = [exe_path] + args
+        elif op_type == 'powershell':
+            command = operation.get('command')
+            if not command:
+                error_msg = "PowerShell command is missing"
             else:
-                cmd = exe_path
-            
-            if as_admin:
-                # Run as administrator using PowerShell Start-Process
-                # Escape path for PowerShell
-                exe_path_escaped = exe_path.replace("'", "''").replace('$', '`$')
-                
-                if args:
-                    # Convert args list to PowerShell array syntax with proper escaping
-                    args_escaped = [arg.replace("'", "''").replace('$', '`$') for arg in args]
-                    args_array = ','.join([f"'{arg}'" for arg in args_escaped])
-                    ps_command = f'$proc = Start-Process -FilePath \'{exe_path_escaped}\' -ArgumentList {args_array} -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-                else:
-                    ps_command = f'$proc = Start-Process -FilePath \'{exe_path_escaped}\' -Verb RunAs -PassThru; if ($proc) {{ $proc.WaitForExit(); exit $proc.ExitCode }} else {{ exit 1 }}'
-                
-                result = subprocess.run(
-                    ['powershell.exe', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-Command', ps_command],
-                    shell=False,
-                    capture_output=True,
-                    text=True,
-                    timeout=600  # 10 minutes timeout
+                success, stdout, stderr = self.backend.run_powershell(command, options=options)
+                if not success:
+                    error_msg = stderr or stdout or "PowerShell command failed"
+        
+        elif op_type == 'registry':
+            key_path = operation.get('key_path')
+            value_name = operation.get('value_name')
+            value = operation.get('value')
+            if not key_path or not value_name:
+                error_msg = "Registry key path or value name is missing"
+            else:
+                success, error_msg = self.backend.set_registry_value(
+                    key_path,
+                    value_name,
+                    value,
+                    operation.get('hive', HKEY_LOCAL_MACHINE)
                 )
+                if not success and not error_msg:
+                    error_msg = "Registry operation failed"
+        
+        elif op_type == 'executable':
+            exe_path = operation.get('exe_path')
+            if not exe_path:
+                error_msg = "Executable path is missing"
             else:
-                # Run normally
-                result = subprocess.run(
-                    cmd,
-                    shell=False,
-                    capture_output=True,
-                    text=True,
-                    timeout=600
+                success, stdout, stderr = self.backend.run_executable(
+                    exe_path,
+                    operation.get('args', []),
+                    operation.get('as_admin', True),
+                    options
                 )
-            
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
-        except subprocess.TimeoutExpired:
-            return False, "", "Executable timed out after 600 seconds"
-        except Exception as e:
-            return False, "", str(e)
+                if not success:
+                    error_msg = stderr or stdout or "Executable failed"
+        
+        elif op_type == 'local_installer':
+            if not operation.get('path'):
+                error_msg = "Installer path is missing"
+            elif self.msix_batch is not None and self.msix_batch.covers(operation):
+                success, stdout, stderr = self.msix_batch.install(
+                    operation, options, self.installer_path,
+                    self.stager.release if self.stager is not None else None
+                )
+                if not success:
+                    error_msg = stderr or stdout or "Package deployment failed"
+            else:
+                installer_path, error_msg = self.installer_path(operation)
+                if installer_path:
+                    success, stdout, stderr = self.backend.run_installer(
+                        installer_path,
+                        operation.get('installer_type'),
+                        options
+                    )
+                    if not success:
+                        error_msg = stderr or stdout or "Installer failed"
+                    if self.stager is not None:
+                        self.stager.release(installer_path)
+        
+        elif op_type == 'tool':
+            tool_path = operation.get('path')
+            args, args_error = tool_launch_arguments(operation)
+            if not tool_path:
+                error_msg = "Tool path is missing"
+            elif args_error:
+                error_msg = args_error
+            else:
+                success, stdout, stderr = self.backend.run_tool(
+                    tool_path,
+                    operation.get('tool_type'),
+                    options,
+                    args
+                )
+                if not success:
+                    # Combine stdout and stderr for better error reporting
+                    error_details = ""
+                    if stderr:
+                        error_details += f"STDERR: {stderr[:500]}"
+                    if stdout:
+                        if error_details:
+                            error_details += " | "
+                        error_details += f"STDOUT: {stdout[:500]}"
+                    error_msg = error_details or "Tool failed (check logs for details)"
+        else:
+            error_msg = f"Unknown operation type: {op_type}"
+        
+        return success, error_msg, stdout + stderr
     
-    @staticmethod
-    def set_registry_value(key_path: str, value_name: str, value, hive: int = winreg.HKEY_LOCAL_MACHINE) -> Tuple[bool, str]:
+    def installer_path(self, operation: Dict) -> Tuple[Optional[str], str]:
         """
-        Set a registry value (supports both integer and string values)
-        
-        Args:
-            key_path: Registry key path (e.g., "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Policies\\DataCollection")
-            value_name: Name of the value to set
-            value: Value to set (int for REG_DWORD, str for REG_SZ)
-            hive: Registry hive (HKEY_LOCAL_MACHINE or HKEY_CURRENT_USER)
+        Return the path to launch a local installer from: its staged copy if there is one
         
         Returns:
-            Tuple of (success: bool, error_message: str)
+            Tuple of (path, "") or (None, error message) if it must not be run
         """
-        try:
-            # Determine registry type based on value type
-            if isinstance(value, int):
-                reg_type = winreg.REG_DWORD
-            elif isinstance(value, str):
-                reg_type = winreg.REG_SZ
-            else:
-                return False, f"Unsupported value type: {type(value)}"
-            
-            # Open the registry key with write access
-            key = winreg.OpenKey(hive, key_path, 0, winreg.KEY_WRITE)
-            winreg.SetValueEx(key, value_name, 0, reg_type, value)
-            winreg.CloseKey(key)
-            return True, ""
-        except FileNotFoundError:
-            # Key doesn't exist, create it
-            try:
-                # Determine registry type again for the new key
-                if isinstance(value, int):
-                    reg_type = winreg.REG_DWORD
-                elif isinstance(value, str):
-                    reg_type = winreg.REG_SZ
-                else:
-                    return False, f"Unsupported value type: {type(value)}"
-                
-                key = winreg.CreateKey(hive, key_path)
-                winreg.SetValueEx(key, value_name, 0, reg_type, value)
-                winreg.CloseKey(key)
-                return True, ""
-            except Exception as e:
-                return False, str(e)
-        except PermissionError:
-            return False, "Administrator privileges required"
-        except Exception as e:
-            return False, str(e)
-
-
-class WorkerThread(QThread):
-    """Background thread for executing operations without freezing the UI"""
+        installer_path = operation['path']
+        if self.stager is None:
+            return installer_path, ""
+        staged = self.stager.local_path(installer_path, operation.get('sha256'))
+        if staged.status == StageStatus.MISMATCH:
+            return None, staged.detail
+        if staged.status == StageStatus.FAILED:
+            self.log(f"⚠ Could not stage {os.path.basename(installer_path)} locally "
+                     f"({staged.detail}); running it from its source", LogLevel.WARNING)
+        return staged.path, ""
     
-    log_signal = pyqtSignal(str, str)  # message, level
-    progress_signal = pyqtSignal(int)  # percentage
-    finished_signal = pyqtSignal(bool)  # success
-    
-    def __init__(self, operations: List[Dict], parent=None):
-        super().__init__(parent)
-        self.operations = operations
-        self.cancelled = False
-        self.success_count = 0
-        self.failure_count = 0
+    def wait_until(self, deadline: float) -> bool:
+        """
+        Sleep until a time.monotonic() deadline, waking early on cancel
+        
+        Returns:
+            False if the run was cancelled while waiting
+        """
+        while not self.cancelled:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, 0.25))
+        return False
     
+    @profiled("worker_run")
     def run(self):
-        """Execute all operations sequentially"""
+        """
+        Execute all operations sequentially
+        
+        Transient failures (e.g. msiexec 1618, another installation in progress)
+        are requeued with backoff behind the remaining work instead of failing.
+        """
         total_ops = len(self.operations)
         
+        self.events.publish(PlanStarted(self.run_id, self.plan_name, total_ops, self.backend.name))
         if total_ops == 0:
-            self.log_signal.emit("No operations to execute", LogLevel.WARNING)
-            self.finished_signal.emit(True)
+            self.log("No operations to execute", LogLevel.WARNING)
+            self.finish_run(True)
             return
         
-        self.log_signal.emit(f"Starting execution of {total_ops} operation(s)...", LogLevel.INFO)
-        
-        for idx, operation in enumerate(self.operations):
+        self.log(f"Starting execution of {total_ops} operation(s)...", LogLevel.INFO)
+        if self.governor.policy != GovernorPolicy.FAST or self.governor.disk_job_limit() or self.governor.affinity:
+            self.log(self.governor.describe(), LogLevel.INFO)
+        self.save_registry_snapshot()
+        if ImpactReport.enabled and RunHistory.enabled:
+            self.log("Measuring the machine before the run (boot, idle footprint, disk and CPU)...",
+                     LogLevel.INFO)
+            self.impact_baseline = ImpactReport(self.backend, self.history).baseline()
+        
+        # Upcoming installers are copied off slow media while earlier operations run
+        if InstallerStager.mode != StagingMode.OFF:
+            self.stager = InstallerStager(self.operations)
+            self.stager.start()
+        if MsixBatch.enabled:
+            self.msix_batch = MsixBatch(self.backend, self.operations,
+                                        on_log=lambda message: self.log(message, LogLevel.INFO))
+        
+        if ResourceSampler.enabled:
+            self.sampler = ResourceSampler()
+            self.events.subscribe(self.track_usage, name="resource sampler",
+                                  kinds=(EventKind.OP_STARTED, EventKind.OP_FINISHED))
+            self.sampler.start()
+        
+        # Progress is weighted by expected cost and refreshed by a ticker, so
+        # it keeps moving during long operations
+        self.progress = ProgressTracker([self.costs.estimate(op) for op in self.operations])
+        ticker_stop = threading.Event()
+        ticker = threading.Thread(target=self.tick_progress, args=(ticker_stop,), daemon=True)
+        ticker.start()
+        
+        pending = deque((index, operation, 1) for index, operation in enumerate(self.operations))
+        deferred = []  # Heap of (ready_at, sequence, index, operation, attempt)
+        sequence = 0
+        
+        while pending or deferred:
             if self.cancelled:
-                self.log_signal.emit("Operation cancelled by user", LogLevel.WARNING)
+                self.log("Operation cancelled by user", LogLevel.WARNING)
                 break
             
+            if pending:
+                index, operation, attempt = pending.popleft()
+            else:
+                ready_at, _, index, operation, attempt = heapq.heappop(deferred)
+                if not self.wait_until(ready_at):
+                    continue
+            
             op_type = operation.get('type')
             op_name = operation.get('name', 'Unknown operation')
+            self.current_operation = op_name
             
-            self.log_signal.emit(f"Executing: {op_name}", LogLevel.INFO)
+            if attempt > 1:
+                self.log(f"Retrying: {op_name} (attempt {attempt} of {self.retry.max_attempts})", LogLevel.INFO)
+            else:
+                self.log(f"Executing: {op_name}", LogLevel.INFO)
             
-            success = False
-            error_msg = ""
+            options = self.timeouts.launch_options(
+                operation,
+                on_hang=lambda idle, name=op_name: self.log(
+                    f"⚠ {name} has shown no output or CPU activity for {idle:.0f} seconds and may be waiting on a hidden prompt",
+                    LogLevel.WARNING
+                ),
+                on_output=lambda stream, line, index=index, name=op_name: self.on_output(index, name, stream, line)
+            )
+            options.resources = self.governor.limits_for(operation)
+            started = time.monotonic()
+            self.progress.start(index)
+            self.events.publish(OpStarted(self.run_id, index, op_name, op_type, attempt))
             
             try:
-                if op_type == 'winget_install':
-                    package_id = operation.get('package_id')
-                    if not package_id:
-                        error_msg = "Package ID is missing"
-                    else:
-                        success, stdout, stderr = SystemOperations.run_winget(
-                            'install',
-                            package_id
-                        )
-                        if not success:
-                            error_msg = stderr or stdout or "Winget installation failed"
-                
-                elif op_type == 'winget_uninstall':
-                    package_id = operation.get('package_id')
-                    if not package_id:
-                        error_msg = "Package ID is missing"
-                    else:
-                        success, stdout, stderr = SystemOperations.run_winget(
-                            'uninstall',
-                            package_id
-                        )
-                        if not success:
-                            error_msg = stderr or stdout or "Winget uninstallation failed"
-                
-                elif op_type == 'powershell':
-                    command = operation.get('command')
-                    if not command:
-                        error_msg = "PowerShell command is missing"
-                    else:
-                        success, stdout, stderr = SystemOperations.run_powershell(command)
-                        if not success:
-                            error_msg = stderr or stdout or "PowerShell command failed"
+                success, error_msg, output = self.execute_operation(operation, options)
                 
-                elif op_type == 'registry':
-                    key_path = operation.get('key_path')
-                    value_name = operation.get('value_name')
-                    value = operation.get('value')
-                    if not key_path or not value_name:
-                        error_msg = "Registry key path or value name is missing"
-                    else:
-                        success, error_msg = SystemOperations.set_registry_value(
-                            key_path,
-                            value_name,
-                            value,
-                            operation.get('hive', winreg.HKEY_LOCAL_MACHINE)
-                        )
-                        if not success and not error_msg:
-                            error_msg = "Registry operation failed"
+                outcome = ExitOutcome.SUCCESS if success else ExitOutcome.FAILURE
+                if not success and op_type != 'registry':
+                    outcome, description = classify_exit(operation_technology(operation), options.exit_code, output)
+                    if (outcome == ExitOutcome.FAILURE and options.exit_code is not None
+                            and description.lower() not in error_msg.lower()):
+                        error_msg = f"{error_msg} [{description}]"
+                    elif outcome == ExitOutcome.TRANSIENT:
+                        error_msg = description
                 
-                elif op_type == 'executable':
-                    exe_path = operation.get('exe_path')
-                    if not exe_path:
-                        error_msg = "Executable path is missing"
-                    else:
-                        success, stdout, stderr = SystemOperations.run_executable(
-                            exe_path,
-                            operation.get('args', []),
-                            operation.get('as_admin', True)
+                elapsed = time.monotonic() - started
+                if outcome == ExitOutcome.TRANSIENT:
+                    if attempt < self.retry.max_attempts:
+                        self.events.publish(OpFinished(self.run_id, index, op_name, OpFinished.RETRY, elapsed,
+                                                       options.exit_code, error_msg, attempt))
+                        delay = self.retry.backoff(attempt)
+                        self.retry_count += 1
+                        self.log(
+                            f"↻ {op_name}: {error_msg}; requeued behind other work, retrying in {delay:.0f}s",
+                            LogLevel.WARNING
                         )
-                        if not success:
-                            error_msg = stderr or stdout or "Executable failed"
+                        heapq.heappush(deferred, (time.monotonic() + delay, sequence, index, operation, attempt + 1))
+                        sequence += 1
+                        self.progress.release(index)
+                        self.current_operation = ""
+                        continue
+                    error_msg = f"{error_msg} (still failing after {attempt} attempts)"
                 
-                elif op_type == 'local_installer':
-                    installer_path = operation.get('path')
-                    if not installer_path:
-                        error_msg = "Installer path is missing"
+                if outcome in (ExitOutcome.SUCCESS, ExitOutcome.SUCCESS_REBOOT):
+                    self.success_count += 1
+                    self.succeeded_operations.append(operation)
+                    if self.msix_batch is not None and self.msix_batch.covers(operation):
+                        self.timeouts.record(operation, self.msix_batch.duration(operation, elapsed))
                     else:
-                        success, stdout, stderr = SystemOperations.run_installer(
-                            installer_path,
-                            operation.get('installer_type')
-                        )
-                        if not success:
-                            error_msg = stderr or stdout or "Installer failed"
-                
-                elif op_type == 'tool':
-                    tool_path = operation.get('path')
-                    if not tool_path:
-                        error_msg = "Tool path is missing"
+                        self.timeouts.record(operation, elapsed)
+                    self.events.publish(OpFinished(self.run_id, index, op_name, outcome, elapsed,
+                                                   options.exit_code, attempt=attempt))
+                    if outcome == ExitOutcome.SUCCESS_REBOOT:
+                        self.reboot_required.append(op_name)
+                        self.log(f"✓ {op_name} completed successfully (restart required)", LogLevel.SUCCESS)
                     else:
-                        success, stdout, stderr = SystemOperations.run_tool(
-                            tool_path,
-                            operation.get('tool_type')
-                        )
-                        if not success:
-                            # Combine stdout and stderr for better error reporting
-                            error_details = ""
-                            if stderr:
-                                error_details += f"STDERR: {stderr[:500]}"
-                            if stdout:
-                                if error_details:
-                                    error_details += " | "
-                                error_details += f"STDOUT: {stdout[:500]}"
-                            error_msg = error_details or "Tool failed (check logs for details)"
-                else:
-                    error_msg = f"Unknown operation type: {op_type}"
-                
-                if success:
-                    self.success_count += 1
-                    self.log_signal.emit(f"✓ {op_name} completed successfully", LogLevel.SUCCESS)
+                        self.log(f"✓ {op_name} completed successfully", LogLevel.SUCCESS)
                 else:
                     self.failure_count += 1
+                    self.events.publish(OpFinished(self.run_id, index, op_name, OperationOutcome.FAILURE, elapsed,
+                                                   options.exit_code, error_msg, attempt))
                     # Truncate long error messages
                     display_error = error_msg[:300] + "..." if len(error_msg) > 300 else error_msg
-                    self.log_signal.emit(f"✗ {op_name} failed: {display_error}", LogLevel.ERROR)
+                    self.log(f"✗ {op_name} failed: {display_error}", LogLevel.ERROR)
             
             except Exception as e:
                 self.failure_count += 1
+                self.events.publish(OpFinished(self.run_id, index, op_name, OperationOutcome.FAILURE,
+                                               time.monotonic() - started, error=str(e), attempt=attempt))
                 error_str = str(e)[:300] + "..." if len(str(e)) > 300 else str(e)
-                self.log_signal.emit(f"✗ {op_name} error: {error_str}", LogLevel.ERROR)
+                self.log(f"✗ {op_name} error: {error_str}", LogLevel.ERROR)
             
-            # Update progress
-            progress = int((idx + 1) / total_ops * 100) if total_ops > 0 else 100
-            self.progress_signal.emit(progress)
+            self.progress.finish(index)
+            self.emit_progress()
+            self.current_operation = ""
+        
+        ticker_stop.set()
+        ticker.join()
+        # The sampler and the history read what their subscriptions collected
+        self.events.flush()
+        self.timeouts.save()
+        if self.stager is not None:
+            self.stager.close()
+        if self.sampler is not None:
+            self.sampler.stop()
+        
+        if ProfileFanout.enabled and not self.cancelled:
+            self.fan_out_user_settings()
+        
+        if self.verifier.enabled and self.succeeded_operations and not self.cancelled:
+            self.verify_effects()
+        mismatch_count = sum(1 for result in self.verification_results
+                             if result.status == VerificationStatus.MISMATCH)
+        self.save_history()
         
         # Execution summary
-        self.log_signal.emit("", LogLevel.INFO)  # Empty line for readability
-        self.log_signal.emit("=== Execution Summary ===", LogLevel.INFO)
-        self.log_signal.emit(f"Total operations: {total_ops}", LogLevel.INFO)
-        self.log_signal.emit(f"✓ Successful: {self.success_count}", LogLevel.SUCCESS)
+        self.log("", LogLevel.INFO)  # Empty line for readability
+        self.log("=== Execution Summary ===", LogLevel.INFO)
+        self.log(f"Total operations: {total_ops}", LogLevel.INFO)
+        self.log(f"✓ Successful: {self.success_count}", LogLevel.SUCCESS)
         if self.failure_count > 0:
-            self.log_signal.emit(f"✗ Failed: {self.failure_count}", LogLevel.ERROR)
+            self.log(f"✗ Failed: {self.failure_count}", LogLevel.ERROR)
         else:
-            self.log_signal.emit("✗ Failed: 0", LogLevel.INFO)
+            self.log("✗ Failed: 0", LogLevel.INFO)
+        if self.retry_count > 0:
+            self.log(f"↻ Retries after transient failures: {self.retry_count}", LogLevel.INFO)
+        staged_counts = self.stager.summary() if self.stager is not None else {}
+        if staged_counts.get(StageStatus.STAGED) or staged_counts.get(StageStatus.CACHED):
+            self.log(
+                f"Installers run from the local cache: {staged_counts.get(StageStatus.STAGED, 0)} staged, "
+                f"{staged_counts.get(StageStatus.CACHED, 0)} already cached", LogLevel.INFO
+            )
+        if self.verification_results:
+            verified_count = sum(1 for result in self.verification_results
+                                 if result.status == VerificationStatus.VERIFIED)
+            unchecked_count = len(self.verification_results) - verified_count - mismatch_count
+            self.log(
+                f"Verification: {verified_count} confirmed, {mismatch_count} not in effect, {unchecked_count} unchecked",
+                LogLevel.ERROR if mismatch_count else LogLevel.INFO
+            )
+        if self.sampler is not None:
+            self.report_resource_usage()
+        if self.profile_failures:
+            self.log(f"✗ User profiles not fully updated: {self.profile_failures}", LogLevel.ERROR)
+        if self.reboot_required:
+            self.log(
+                f"⟳ Restart required to finish: {', '.join(self.reboot_required)}",
+                LogLevel.WARNING
+            )
         
-        overall_success = self.failure_count == 0
-        self.finished_signal.emit(overall_success)
+        overall_success = self.failure_count == 0 and mismatch_count == 0 and self.profile_failures == 0
+        self.finish_run(overall_success)
+    
+    def finish_run(self, success: bool):
+        """Publish the end of the run, deliver every queued event and close the run log"""
+        self.events.flush()
+        for line in self.events.overflow_report():
+            self.log(f"⚠ Event subscriber {line}", LogLevel.WARNING)
+        self.events.publish(RunFinished(self.run_id, success, self.success_count, self.failure_count,
+                                        self.retry_count, self.cancelled, list(self.reboot_required)))
+        self.events.close()
+        self.run_log.close()
+    
+    def log(self, message: str, level: str):
+        """Publish a message for the user, tagged with the running operation"""
+        self.events.publish(LogMessage(self.run_id, message, level, self.current_operation))
+    
+    def on_output(self, index: int, operation_name: str, stream: str, line: str):
+        """Handle a line of child output: advance progress and publish it (it is not shown in the Logs tab)"""
+        self.progress.report_output(line)
+        self.events.publish(OpOutput(self.run_id, index, operation_name, stream, line))
+    
+    def emit_progress(self):
+        """Publish the weighted progress and the ETA"""
+        self.events.publish(Progress(self.run_id, self.progress.percent(), self.progress.eta()))
+    
+    def write_log(self, event):
+        """Run log subscriber: persist messages and child output"""
+        if event.kind == EventKind.OP_OUTPUT:
+            self.run_log.write(OUTPUT_LEVEL, event.name, event.line, event.time)
+        else:
+            self.run_log.write(event.level, event.operation, event.message, event.time)
+    
+    def record_outcome(self, event: OpFinished):
+        """Run history subscriber: record each attempt's outcome"""
+        if event.outcome == OpFinished.RETRY:
+            self.recorder.attempt(event.index, event.duration, event.exit_code, event.error)
+        else:
+            self.recorder.finish(event.index, event.outcome, event.duration, event.exit_code, event.error)
+    
+    def track_usage(self, event):
+        """Resource sampler subscriber: attribute samples to the running operations"""
+        if event.kind == EventKind.OP_STARTED:
+            self.sampler.operation_started(event.index, event.name, event.monotonic)
+        else:
+            self.sampler.operation_finished(event.index, event.monotonic)
+    
+    def forward_to_signals(self, event):
+        """Qt signal subscriber: feed the signals the GUI connects to"""
+        if event.kind == EventKind.LOG:
+            self.log_signal.emit(event.message, event.level)
+        elif event.kind == EventKind.PROGRESS:
+            self.progress_signal.emit(event.percent)
+            self.eta_signal.emit(event.eta)
+        else:
+            self.finished_signal.emit(event.success)
+    
+    def tick_progress(self, stop: threading.Event):
+        """Refresh progress twice a second while operations run, emitting only when it changes"""
+        last = None
+        while not stop.wait(0.5):
+            current = (self.progress.percent(), int(self.progress.eta()))
+            if current != last:
+                last = current
+                self.emit_progress()
+    
+    def save_registry_snapshot(self):
+        """Record the previous state of every registry value this run writes, so it can be rolled back"""
+        if not any(op.get('type') == 'registry' for op in self.operations):
+            return
+        try:
+            snapshot = RegistrySnapshot.capture(self.backend, self.operations, self.run_id)
+            snapshot.save()
+        except Exception as e:
+            self.log(f"⚠ Registry snapshot could not be saved: {str(e)[:300]}", LogLevel.WARNING)
+            return
+        self.log(
+            f"Registry snapshot saved for {len(snapshot.entries)} value(s); undo with --rollback {self.run_id}",
+            LogLevel.INFO
+        )
+    
+    def fan_out_user_settings(self):
+        """Apply the run's HKCU registry settings to every user profile, concurrently"""
+        if not user_operations(self.operations):
+            return
+        self.current_operation = "User profiles"
+        self.log("Applying user settings to every profile...", LogLevel.INFO)
+        try:
+            results = ProfileFanout(self.backend).run(self.operations)
+        except Exception as e:
+            self.profile_failures += 1
+            self.log(f"✗ User profiles could not be listed: {str(e)[:300]}", LogLevel.ERROR)
+            self.current_operation = ""
+            return
+        for result in results:
+            if result.status == ProfileStatus.APPLIED:
+                self.log(f"✓ {result.label}: {result.applied_count} setting(s) applied", LogLevel.SUCCESS)
+                if result.detail:
+                    # Applied, but the hive could not be unloaded
+                    self.log(f"⚠ {result.label}: {result.detail[:300]}", LogLevel.WARNING)
+            elif result.status == ProfileStatus.IN_USE:
+                self.log(f"⚠ {result.label} skipped: {result.detail}", LogLevel.WARNING)
+            else:
+                self.profile_failures += 1
+                self.log(
+                    f"✗ {result.label}: {result.applied_count} of {len(result.results)} setting(s) applied. "
+                    f"{result.detail[:300]}", LogLevel.ERROR
+                )
+        self.current_operation = ""
+    
+    def verify_effects(self):
+        """Check that the operations which reported success actually took effect"""
+        self.log(f"Verifying {len(self.succeeded_operations)} operation(s)...", LogLevel.INFO)
+        try:
+            self.verification_results = self.verifier.verify(self.succeeded_operations)
+        except Exception as e:
+            self.log(f"Verification could not run: {str(e)[:300]}", LogLevel.WARNING)
+            return
+        for result in self.verification_results:
+            if result.status == VerificationStatus.MISMATCH:
+                self.log(f"✗ {result.name} is not in effect: {result.detail}", LogLevel.ERROR)
+    
+    def report_resource_usage(self):
+        """Log which operations were CPU- or I/O-bound and save the samples"""
+        for line in self.sampler.summary_lines():
+            self.log(line, LogLevel.INFO)
+        try:
+            path = self.sampler.save(self.backend.name, self.run_id)
+            self.log(f"Resource samples saved to {path}", LogLevel.INFO)
+        except OSError as e:
+            self.log(f"⚠ Resource samples could not be saved: {e}", LogLevel.WARNING)
+    
+    def save_history(self):
+        """Store the run's plan and outcomes in the run history, in one transaction"""
+        if not RunHistory.enabled:
+            return
+        for result in self.verification_results:
+            self.recorder.verified(result.operation, result.status)
+        self.recorder.end(self.cancelled)
+        try:
+            self.history.save(self.recorder)
+        except Exception as e:
+            self.log(f"⚠ Run history could not be saved: {str(e)[:300]}", LogLevel.WARNING)
+            return
+        if self.impact_baseline is not None and not self.cancelled:
+            self.save_impact_baseline()
+    
+    def save_impact_baseline(self):
+        """Store the before-run measurements and schedule the after-boot ones"""
+        try:
+            scheduled, error = ImpactReport(self.backend, self.history).store_baseline(
+                self.run_id, self.plan_name, *self.impact_baseline)
+        except Exception as e:
+            self.log(f"⚠ Impact baseline could not be saved: {str(e)[:300]}", LogLevel.WARNING)
+            return
+        if scheduled:
+            self.log("Impact report: the machine is measured again after the next restart "
+                     "(see --history impact)", LogLevel.INFO)
+        else:
+            self.log(f"⚠ Could not schedule the after-restart measurement ({error}); "
+                     "run Better10 with --impact-followup after restarting", LogLevel.WARNING)
     
     def cancel(self):
         """Cancel the operation"""
         self.cancelled = True
 
 
+def catalog_path(file_path: str) -> str:
+    """Return a catalog path relative to the script directory when possible, absolute otherwise"""
+    try:
+        relative_path = os.path.relpath(file_path, SCRIPT_DIR)
+    except ValueError:
+        # Different drive on Windows
+        return file_path
+    return file_path if relative_path.startswith('..') else relative_path
+
+
+def app_entry(file_path: str) -> Optional[Tuple[str, Dict]]:
+    """
+    Build the catalog entry for one file in the Apps folder
+    
+    Returns:
+        Tuple of (display name, local_installer entry), or None if the file is not an installer
+    """
+    filename = os.path.basename(file_path)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ['.exe', '.msi', '.msix']:
+        return None
+    
+    # Clean up the name for display
+    app_name = os.path.splitext(filename)[0]
+    # Remove version numbers and common suffixes
+    app_name = app_name.replace('_windows_x64', '').replace('_x64', '').replace('_amd64', '')
+    app_name = app_name.replace('_setup', '').replace('_installer', '').replace('_portable', '')
+    app_name = app_name.replace('-', ' ').replace('_', ' ')
+    # Capitalize words
+    app_name = ' '.join(word.capitalize() for word in app_name.split())
+    
+    installer_type = ext[1:] if ext.startswith('.') else ext
+    if installer_type == 'msix' and is_framework_package(file_path):
+        # Frameworks are deployed as dependencies of the apps next to them
+        return None
+    
+    return app_name, {
+        'type': 'local_installer',
+        'path': catalog_path(file_path),
+        'installer_type': installer_type,
+        'filename': filename
+    }
+
+
+def tool_entry(file_path: str) -> Optional[Tuple[str, Dict]]:
+    """
+    Build the catalog entry for one file in the Tools folder
+    
+    Returns:
+        Tuple of (display name, tool entry), or None if the file is not a tool
+    """
+    filename = os.path.basename(file_path)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ['.exe', '.ps1', '.bat', '.cmd']:
+        return None
+    
+    # Clean up the name for display
+    tool_name = os.path.splitext(filename)[0]
+    tool_name = tool_name.replace('-', ' ').replace('_', ' ')
+    tool_name = ' '.join(word.capitalize() for word in tool_name.split())
+    
+    tool_type = ext[1:] if ext.startswith('.') else ext
+    
+    return tool_name, {
+        'type': 'tool',
+        'path': catalog_path(file_path),
+        'tool_type': tool_type,
+        'filename': filename
+    }
+
+
+def scan_apps_folder(apps_folder: str, tools_folder: str = None) -> Dict[str, Dict]:
+    """
+    Scan a folder for installers
+    
+    Args:
+        apps_folder: Folder containing .exe, .msi and .msix installers
+        tools_folder: Folder whose files are excluded from the apps catalog
+    
+    Returns:
+        Dict of display name -> local_installer entry
+    """
+    # Get list of files in Tools folder to exclude from Apps
+    tools_files = set()
+    if tools_folder and os.path.exists(tools_folder):
+        tools_files = {f.lower() for f in os.listdir(tools_folder) if os.path.isfile(os.path.join(tools_folder, f))}
+    
+    apps = {}
+    
+    # Load apps from Apps folder (excluding those in Tools folder)
+    if os.path.exists(apps_folder):
+        for filename in os.listdir(apps_folder):
+            # Skip if this file exists in Tools folder
+            if filename.lower() in tools_files:
+                continue
+            
+            file_path = os.path.join(apps_folder, filename)
+            if os.path.isfile(file_path):
+                entry = app_entry(file_path)
+                if entry:
+                    apps[entry[0]] = entry[1]
+    
+    return apps
+
+
+def scan_tools_folder(tools_folder: str) -> Dict[str, Dict]:
+    """
+    Scan a folder for tools
+    
+    Args:
+        tools_folder: Folder containing .exe, .ps1, .bat and .cmd tools
+    
+    Returns:
+        Dict of display name -> tool entry
+    """
+    tools = {}
+    
+    # Load tools from Tools folder
+    if os.path.exists(tools_folder):
+        for filename in os.listdir(tools_folder):
+            file_path = os.path.join(tools_folder, filename)
+            if os.path.isfile(file_path):
+                entry = tool_entry(file_path)
+                if entry:
+                    tools[entry[0]] = entry[1]
+    
+    return tools
+
+
+def apply_catalog_rows(tab, make_entry, added: List[str], removed: List[str], changed: List[str]) -> int:
+    """
+    Apply folder changes to a catalog tab's checkbox rows
+    
+    Rows are matched to files by name. Removed files drop their row,
+    added files get a new one, and a changed file's row keeps its place
+    and checked state with its entry refreshed.
+    
+    Args:
+        tab: ApplicationInstallerTab or ToolsTab (checkboxes, scroll_layout, add_catalog_row)
+        make_entry: app_entry or tool_entry
+        added, removed, changed: Full paths of the affected files
+    
+    Returns:
+        Number of rows added, removed or updated
+    """
+    def row_for(file_path):
+        filename = os.path.basename(file_path).lower()
+        for name, data in tab.checkboxes.items():
+            if data.get('filename', '').lower() == filename:
+                return name
+        return None
+    
+    def remove_row(name):
+        checkbox = tab.checkboxes.pop(name)['checkbox']
+        tab.scroll_layout.removeWidget(checkbox)
+        checkbox.deleteLater()
+    
+    count = 0
+    for file_path in removed:
+        name = row_for(file_path)
+        if name is not None:
+            remove_row(name)
+            count += 1
+    
+    for file_path in list(added) + list(changed):
+        entry = make_entry(file_path) if os.path.isfile(file_path) else None
+        name = row_for(file_path)
+        if name is not None and entry is not None and entry[0] == name:
+            # Same display name: refresh the row's data, keeping its place and checked state
+            tab.checkboxes[name].update({key: value for key, value in entry[1].items() if key != 'type'})
+            count += 1
+            continue
+        if name is not None:
+            remove_row(name)
+            count += 1
+        if entry is not None and entry[0] not in tab.checkboxes:
+            # A display name already taken by another file keeps its first row
+            tab.add_catalog_row(*entry)
+            count += 1
+    return count
+
+
 class ApplicationInstallerTab(QWidget):
     """Tab for installing applications via winget"""
     
@@ -559,73 +927,16 @@ class ApplicationInstallerTab(QWidget):
         # Scrollable area for checkboxes
         scroll = QScrollArea()
         scroll_widget = QWidget()
-        scroll_layout = QVBoxLayout()
-        
-        # Scan Apps folder for installers
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        apps_folder = os.path.join(script_dir, "Apps")
-        tools_folder = os.path.join(script_dir, "Tools")
-        
-        # Get list of files in Tools folder to exclude from Apps
-        tools_files = set()
-        if os.path.exists(tools_folder):
-            tools_files = {f.lower() for f in os.listdir(tools_folder) if os.path.isfile(os.path.join(tools_folder, f))}
+        self.scroll_layout = QVBoxLayout()
         
-        self.apps = {}
-        
-        # Load apps from Apps folder (excluding those in Tools folder)
-        if os.path.exists(apps_folder):
-            for filename in os.listdir(apps_folder):
-                # Skip if this file exists in Tools folder
-                if filename.lower() in tools_files:
-                    continue
-                    
-                file_path = os.path.join(apps_folder, filename)
-                if os.path.isfile(file_path):
-                    ext = os.path.splitext(filename)[1].lower()
-                    if ext in ['.exe', '.msi', '.msix']:
-                        # Clean up the name for display
-                        app_name = os.path.splitext(filename)[0]
-                        # Remove version numbers and common suffixes
-                        app_name = app_name.replace('_windows_x64', '').replace('_x64', '').replace('_amd64', '')
-                        app_name = app_name.replace('_setup', '').replace('_installer', '').replace('_portable', '')
-                        app_name = app_name.replace('-', ' ').replace('_', ' ')
-                        # Capitalize words
-                        app_name = ' '.join(word.capitalize() for word in app_name.split())
-                        
-                        # Store relative path from script directory
-                        relative_path = os.path.join("Apps", filename)
-                        installer_type = ext[1:] if ext.startswith('.') else ext
-                        
-                        self.apps[app_name] = {
-                            'type': 'local_installer',
-                            'path': relative_path,
-                            'installer_type': installer_type,
-                            'filename': filename
-                        }
+        # Scan Apps folder for installers (excluding files that live in Tools)
+        self.apps = scan_apps_folder(os.path.join(SCRIPT_DIR, "Apps"), os.path.join(SCRIPT_DIR, "Tools"))
         
         self.checkboxes = {}
         for app_name, app_info in self.apps.items():
-            if isinstance(app_info, dict):
-                # Local installer
-                display_name = f"{app_name} (Local Installer)"
-                checkbox = QCheckBox(display_name)
-                checkbox.setChecked(False)
-                self.checkboxes[app_name] = {
-                    'checkbox': checkbox,
-                    'type': app_info['type'],
-                    'path': app_info['path'],
-                    'installer_type': app_info['installer_type']
-                }
-            else:
-                # Winget package (legacy support)
-                checkbox = QCheckBox(app_name)
-                checkbox.setChecked(False)
-                self.checkboxes[app_name] = {'checkbox': checkbox, 'package_id': app_info, 'type': 'winget_install'}
-            
-            scroll_layout.addWidget(checkbox)
+            self.add_catalog_row(app_name, app_info)
         
-        scroll_widget.setLayout(scroll_layout)
+        scroll_widget.setLayout(self.scroll_layout)
         scroll.setWidget(scroll_widget)
         scroll.setWidgetResizable(True)
         layout.addWidget(scroll)
@@ -652,6 +963,37 @@ class ApplicationInstallerTab(QWidget):
         layout.addLayout(button_layout)
         self.setLayout(layout)
     
+    def add_catalog_row(self, app_name: str, app_info):
+        """Add the checkbox row for one catalog entry"""
+        if isinstance(app_info, dict):
+            # Local installer
+            display_name = f"{app_name} (Local Installer)"
+            checkbox = QCheckBox(display_name)
+            checkbox.setChecked(False)
+            self.checkboxes[app_name] = {
+                'checkbox': checkbox,
+                'type': app_info['type'],
+                'path': app_info['path'],
+                'installer_type': app_info['installer_type'],
+                'filename': app_info['filename']
+            }
+        else:
+            # Winget package (legacy support)
+            checkbox = QCheckBox(app_name)
+            checkbox.setChecked(False)
+            self.checkboxes[app_name] = {'checkbox': checkbox, 'package_id': app_info, 'type': 'winget_install'}
+        
+        self.scroll_layout.addWidget(checkbox)
+    
+    def apply_catalog_changes(self, added: List[str], removed: List[str], changed: List[str]) -> int:
+        """
+        Update only the rows for files added to, removed from or changed in the Apps folder
+        
+        Returns:
+            Number of rows added, removed or updated
+        """
+        return apply_catalog_rows(self, app_entry, added, removed, changed)
+    
     def select_all(self):
         """Select all application checkboxes"""
         for app_data in self.checkboxes.values():
@@ -905,70 +1247,70 @@ class PrivacyTelemetryTab(QWidget):
                 'value_name': 'AllowTelemetry',
                 'value': 0,
                 'description': 'Disables Windows telemetry data collection',
-                'hive': winreg.HKEY_LOCAL_MACHINE
+                'hive': HKEY_LOCAL_MACHINE
             },
             "Disable Advertising ID": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\AdvertisingInfo',
                 'value_name': 'Enabled',
                 'value': 0,
                 'description': 'Disables advertising ID tracking',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable Background App Access": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\BackgroundAccessApplications',
                 'value_name': 'GlobalUserDisabled',
                 'value': 1,
                 'description': 'Disables background app access globally',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable Location Tracking": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\CapabilityAccessManager\\ConsentStore\\location',
                 'value_name': 'Value',
                 'value': 'Deny',
                 'description': 'Disables location tracking',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable Diagnostic Data": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Policies\\DataCollection',
                 'value_name': 'AllowTelemetry',
                 'value': 0,
                 'description': 'Disables diagnostic data collection',
-                'hive': winreg.HKEY_LOCAL_MACHINE
+                'hive': HKEY_LOCAL_MACHINE
             },
             "Disable Tailored Experiences": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Privacy',
                 'value_name': 'TailoredExperiencesWithDiagnosticDataEnabled',
                 'value': 0,
                 'description': 'Disables tailored experiences based on diagnostic data',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable Activity History": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Privacy',
                 'value_name': 'EnableActivityFeed',
                 'value': 0,
                 'description': 'Disables activity history tracking',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable App Launch Tracking": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced',
                 'value_name': 'Start_TrackProgs',
                 'value': 0,
                 'description': 'Disables app launch tracking',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable Cortana Data Collection": {
                 'key_path': 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Search',
                 'value_name': 'CortanaConsent',
                 'value': 0,
                 'description': 'Disables Cortana data collection',
-                'hive': winreg.HKEY_CURRENT_USER
+                'hive': HKEY_CURRENT_USER
             },
             "Disable Wi-Fi Sense": {
                 'key_path': 'SOFTWARE\\Microsoft\\WcmSvc\\wifinetworkmanager\\config',
                 'value_name': 'AutoConnectAllowedOEM',
                 'value': 0,
                 'description': 'Disables Wi-Fi Sense automatic connection',
-                'hive': winreg.HKEY_LOCAL_MACHINE
+                'hive': HKEY_LOCAL_MACHINE
             }
         }
         
@@ -981,7 +1323,7 @@ class PrivacyTelemetryTab(QWidget):
                 'key_path': setting_info['key_path'],
                 'value_name': setting_info['value_name'],
                 'value': setting_info['value'],
-                'hive': setting_info.get('hive', winreg.HKEY_LOCAL_MACHINE)
+                'hive': setting_info.get('hive', HKEY_LOCAL_MACHINE)
             }
             scroll_layout.addWidget(checkbox)
         
@@ -990,6 +1332,15 @@ class PrivacyTelemetryTab(QWidget):
         scroll.setWidgetResizable(True)
         layout.addWidget(scroll)
         
+        self.all_profiles_checkbox = QCheckBox("Also apply user settings to every profile on this PC")
+        self.all_profiles_checkbox.setChecked(ProfileFanout.enabled)
+        self.all_profiles_checkbox.setToolTip(
+            "Per-user settings normally reach only the account running Better10. This also writes them\n"
+            "to every other profile and to the Default profile new accounts are created from"
+        )
+        self.all_profiles_checkbox.toggled.connect(self.toggle_all_profiles)
+        layout.addWidget(self.all_profiles_checkbox)
+        
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.setSpacing(4)
@@ -1012,6 +1363,10 @@ class PrivacyTelemetryTab(QWidget):
         layout.addLayout(button_layout)
         self.setLayout(layout)
     
+    def toggle_all_profiles(self, enabled: bool):
+        """Turn the fan-out of HKCU settings to every user profile on or off"""
+        ProfileFanout.configure(enabled=enabled)
+    
     def select_all(self):
         """Select all privacy settings"""
         for setting_data in self.checkboxes.values():
@@ -1077,54 +1432,28 @@ class ToolsTab(QWidget):
         # Scrollable area
         scroll = QScrollArea()
         scroll_widget = QWidget()
-        scroll_layout = QVBoxLayout()
+        self.scroll_layout = QVBoxLayout()
         
         # Scan Tools folder
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        tools_folder = os.path.join(script_dir, "Tools")
-        
-        self.tools = {}
-        
-        # Load tools from Tools folder
-        if os.path.exists(tools_folder):
-            for filename in os.listdir(tools_folder):
-                file_path = os.path.join(tools_folder, filename)
-                if os.path.isfile(file_path):
-                    ext = os.path.splitext(filename)[1].lower()
-                    if ext in ['.exe', '.ps1', '.bat', '.cmd']:
-                        # Clean up the name for display
-                        tool_name = os.path.splitext(filename)[0]
-                        tool_name = tool_name.replace('-', ' ').replace('_', ' ')
-                        tool_name = ' '.join(word.capitalize() for word in tool_name.split())
-                        
-                        # Store relative path from script directory
-                        relative_path = os.path.join("Tools", filename)
-                        tool_type = ext[1:] if ext.startswith('.') else ext
-                        
-                        self.tools[tool_name] = {
-                            'type': 'tool',
-                            'path': relative_path,
-                            'tool_type': tool_type,
-                            'filename': filename
-                        }
+        self.tools = scan_tools_folder(os.path.join(SCRIPT_DIR, "Tools"))
         
         self.checkboxes = {}
         for tool_name, tool_info in self.tools.items():
-            checkbox = QCheckBox(f"{tool_name} ({tool_info['filename']})")
-            checkbox.setChecked(False)
-            self.checkboxes[tool_name] = {
-                'checkbox': checkbox,
-                'type': tool_info['type'],
-                'path': tool_info['path'],
-                'tool_type': tool_info['tool_type']
-            }
-            scroll_layout.addWidget(checkbox)
+            self.add_catalog_row(tool_name, tool_info)
         
-        scroll_widget.setLayout(scroll_layout)
+        scroll_widget.setLayout(self.scroll_layout)
         scroll.setWidget(scroll_widget)
         scroll.setWidgetResizable(True)
         layout.addWidget(scroll)
         
+        self.unattended_checkbox = QCheckBox("Run known tools unattended with their bundled config")
+        self.unattended_checkbox.setChecked(True)
+        self.unattended_checkbox.setToolTip(
+            "Tools with a launch profile (see tool_profiles.py) run silently\n"
+            "instead of opening their window and waiting for you to close it"
+        )
+        layout.addWidget(self.unattended_checkbox)
+        
         # Buttons
         button_layout = QHBoxLayout()
         button_layout.setSpacing(4)
@@ -1147,6 +1476,31 @@ class ToolsTab(QWidget):
         layout.addLayout(button_layout)
         self.setLayout(layout)
     
+    def add_catalog_row(self, tool_name: str, tool_info: Dict):
+        """Add the checkbox row for one tool"""
+        checkbox = QCheckBox(f"{tool_name} ({tool_info['filename']})")
+        checkbox.setChecked(False)
+        profile = profile_for_tool(tool_info['path'])
+        if profile:
+            checkbox.setToolTip(f"Runs unattended: {profile.describe()}")
+        self.checkboxes[tool_name] = {
+            'checkbox': checkbox,
+            'type': tool_info['type'],
+            'path': tool_info['path'],
+            'tool_type': tool_info['tool_type'],
+            'filename': tool_info['filename']
+        }
+        self.scroll_layout.addWidget(checkbox)
+    
+    def apply_catalog_changes(self, added: List[str], removed: List[str], changed: List[str]) -> int:
+        """
+        Update only the rows for files added to, removed from or changed in the Tools folder
+        
+        Returns:
+            Number of rows added, removed or updated
+        """
+        return apply_catalog_rows(self, tool_entry, added, removed, changed)
+    
     def select_all(self):
         """Select all tool checkboxes"""
         for tool_data in self.checkboxes.values():
@@ -1157,17 +1511,18 @@ class ToolsTab(QWidget):
         for tool_data in self.checkboxes.values():
             tool_data['checkbox'].setChecked(False)
     
+    def selected_operations(self) -> List[Dict]:
+        """Return the operations for the checked tools"""
+        unattended = self.unattended_checkbox.isChecked()
+        return [
+            tool_operation(f"Run {tool_name}", tool_data['path'], tool_data['tool_type'], unattended)
+            for tool_name, tool_data in self.checkboxes.items()
+            if tool_data['checkbox'].isChecked()
+        ]
+    
     def run_selected(self):
         """Get list of selected tools to run"""
-        selected = []
-        for tool_name, tool_data in self.checkboxes.items():
-            if tool_data['checkbox'].isChecked():
-                selected.append({
-                    'type': 'tool',
-                    'name': f"Run {tool_name}",
-                    'path': tool_data['path'],
-                    'tool_type': tool_data['tool_type']
-                })
+        selected = self.selected_operations()
         
         if not selected:
             QMessageBox.warning(self, "No Selection", "Please select at least one tool to run.")
@@ -1209,13 +1564,39 @@ class LogsTab(QWidget):
         layout.addWidget(self.log_text)
         
         # Clear button
+        bottom_layout = QHBoxLayout()
+        self.profile_checkbox = QCheckBox("Record performance profile")
+        self.profile_checkbox.setChecked(Profiler.enabled)
+        self.profile_checkbox.setToolTip(
+            "Profile the next runs with cProfile and a stack sampler, writing\n"
+            "pstats and flame-graph files to the Better10 data folder"
+        )
+        self.profile_checkbox.toggled.connect(self.toggle_profiling)
+        bottom_layout.addWidget(self.profile_checkbox)
+        bottom_layout.addStretch()
+        
+        open_btn = QPushButton("Open Log...")
+        open_btn.clicked.connect(self.open_log_viewer)
+        open_btn.setToolTip("Browse, filter and search the saved logs of previous runs, including process output")
+        open_btn.setStyleSheet("padding: 4px 12px; font-size: 9pt;")
+        bottom_layout.addWidget(open_btn)
+        
         clear_btn = QPushButton("Clear Logs")
         clear_btn.clicked.connect(self.clear_logs)
         clear_btn.setStyleSheet("padding: 4px 12px; font-size: 9pt;")
-        layout.addWidget(clear_btn)
+        bottom_layout.addWidget(clear_btn)
+        layout.addLayout(bottom_layout)
         
         self.setLayout(layout)
     
+    def toggle_profiling(self, enabled: bool):
+        """Turn profiling of the GUI and engine on or off"""
+        Profiler.configure(enabled=enabled)
+        if enabled:
+            self.add_log(f"Profiling enabled; reports are written to {Profiler.session_dir()}", LogLevel.INFO)
+        else:
+            self.add_log("Profiling disabled", LogLevel.INFO)
+    
     def add_log(self, message: str, level: str = LogLevel.INFO):
         """Add a log entry"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -1241,6 +1622,109 @@ class LogsTab(QWidget):
     def clear_logs(self):
         """Clear all logs"""
         self.log_text.clear()
+    
+    def open_log_viewer(self):
+        """Open the saved run logs in the lazy-paging viewer"""
+        viewer = LogViewerDialog(SystemOperations.backend.name, self)
+        viewer.setAttribute(Qt.WA_DeleteOnClose)
+        viewer.show()
+
+
+class HistoryTab(QWidget):
+    """Tab for querying the run history (slowest steps, frequent failures, recent runs)"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+    
+    def init_ui(self):
+        """Initialize the UI for the history view"""
+        layout = QVBoxLayout()
+        layout.setSpacing(4)
+        layout.setContentsMargins(6, 6, 6, 6)
+        
+        # Header
+        header = QLabel("Run History")
+        header.setToolTip("Outcomes and durations of previous runs on this machine")
+        header_font = QFont()
+        header_font.setPointSize(11)
+        header_font.setBold(True)
+        header.setFont(header_font)
+        layout.addWidget(header)
+        
+        # Query controls
+        controls = QHBoxLayout()
+        self.query_combo = QComboBox()
+        for key, title in HISTORY_QUERIES.items():
+            self.query_combo.addItem(title, key)
+        self.query_combo.currentIndexChanged.connect(self.refresh)
+        controls.addWidget(self.query_combo)
+        
+        self.group_combo = QComboBox()
+        self.group_combo.addItem("All operations", None)
+        for key, title in OPERATION_CATEGORIES.items():
+            self.group_combo.addItem(title, key)
+        self.group_combo.setToolTip("Limit the slowest and failure queries to one kind of operation")
+        self.group_combo.currentIndexChanged.connect(self.refresh)
+        controls.addWidget(self.group_combo)
+        
+        controls.addWidget(QLabel("Last"))
+        self.runs_spin = QSpinBox()
+        self.runs_spin.setRange(1, 1000)
+        self.runs_spin.setValue(30)
+        self.runs_spin.valueChanged.connect(self.refresh)
+        controls.addWidget(self.runs_spin)
+        controls.addWidget(QLabel("runs"))
+        controls.addStretch()
+        
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        refresh_btn.setStyleSheet("padding: 4px 12px; font-size: 9pt;")
+        controls.addWidget(refresh_btn)
+        layout.addLayout(controls)
+        
+        # Results
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #8b949e; font-size: 9pt;")
+        layout.addWidget(self.status_label)
+        
+        self.setLayout(layout)
+    
+    def refresh(self):
+        """Run the selected query against the active backend's history"""
+        query = self.query_combo.currentData()
+        self.group_combo.setEnabled(query != "runs")
+        history = RunHistory.for_backend(SystemOperations.backend.name)
+        try:
+            headers, rows = history_table(history, query, self.group_combo.currentData(), self.runs_spin.value())
+        except Exception as e:
+            headers, rows = [], []
+            self.status_label.setText(f"Run history could not be read: {str(e)[:300]}")
+        else:
+            self.status_label.setText(f"{len(rows)} row(s)" if rows else "No matching runs recorded yet")
+        
+        self.table.clear()
+        self.table.setColumnCount(len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column, text in enumerate(row):
+                item = QTableWidgetItem(text)
+                item.setToolTip(text)
+                self.table.setItem(row_index, column, item)
+        self.table.resizeColumnsToContents()
+    
+    def showEvent(self, event):
+        """Refresh whenever the tab is shown, so it includes the latest run"""
+        super().showEvent(event)
+        self.refresh()
 
 
 class Better10MainWindow(QMainWindow):
@@ -1284,11 +1768,17 @@ class Better10MainWindow(QMainWindow):
         self.tabs.setElideMode(Qt.ElideRight)  # Elide text if too long
         
         # Create tabs
-        self.logs_tab = LogsTab()
-        self.app_installer_tab = ApplicationInstallerTab(self.logs_tab.add_log)
-        self.bloatware_tab = BloatwareRemovalTab(self.logs_tab.add_log)
-        self.privacy_tab = PrivacyTelemetryTab(self.logs_tab.add_log)
-        self.tools_tab = ToolsTab(self.logs_tab.add_log)
+        with Profiler.section("build_logs_tab"):
+            self.logs_tab = LogsTab()
+        with Profiler.section("build_apps_tab"):
+            self.app_installer_tab = ApplicationInstallerTab(self.logs_tab.add_log)
+        with Profiler.section("build_bloatware_tab"):
+            self.bloatware_tab = BloatwareRemovalTab(self.logs_tab.add_log)
+        with Profiler.section("build_privacy_tab"):
+            self.privacy_tab = PrivacyTelemetryTab(self.logs_tab.add_log)
+        with Profiler.section("build_tools_tab"):
+            self.tools_tab = ToolsTab(self.logs_tab.add_log)
+        self.history_tab = HistoryTab()
         
         # Add tabs with shorter names to prevent truncation
         self.tabs.addTab(self.app_installer_tab, "Apps")
@@ -1306,6 +1796,9 @@ class Better10MainWindow(QMainWindow):
         self.tabs.addTab(self.logs_tab, "Logs")
         self.tabs.setTabToolTip(4, "Logs / Status - View operation logs and status")
         
+        self.tabs.addTab(self.history_tab, "History")
+        self.tabs.setTabToolTip(5, "Run History - Slowest steps, frequent failures and previous runs")
+        
         main_layout.addWidget(self.tabs)
         
         # Execute button with operation count
@@ -1324,6 +1817,11 @@ class Better10MainWindow(QMainWindow):
         self.execute_btn.setToolTip("Execute all selected operations from all tabs (Ctrl+E)")
         execute_layout.addWidget(self.execute_btn)
         
+        self.export_btn = QPushButton("Export Script...")
+        self.export_btn.clicked.connect(self.export_script)
+        self.export_btn.setToolTip("Save the selected operations as a standalone PowerShell script")
+        execute_layout.addWidget(self.export_btn)
+        
         execute_layout.addStretch()
         main_layout.addLayout(execute_layout)
         
@@ -1336,6 +1834,12 @@ class Better10MainWindow(QMainWindow):
         # Update operation count initially
         self.update_operation_count()
         
+        # Pick up installers and tools added to the folders while the app is open
+        self.catalog_watcher = CatalogWatcher(
+            [os.path.join(SCRIPT_DIR, "Apps"), os.path.join(SCRIPT_DIR, "Tools")], self
+        )
+        self.catalog_watcher.folder_changed.connect(self.on_catalog_changed)
+        
         # Setup keyboard shortcuts
         self.setup_shortcuts()
         
@@ -1352,11 +1856,46 @@ class Better10MainWindow(QMainWindow):
         logs_shortcut = QShortcut(QKeySequence("Ctrl+L"), self)
         logs_shortcut.activated.connect(lambda: self.tabs.setCurrentIndex(4))
         
-        # Ctrl+1-5 to switch tabs
-        for i in range(5):
+        # Ctrl+1-6 to switch tabs
+        for i in range(6):
             tab_shortcut = QShortcut(QKeySequence(f"Ctrl+{i+1}"), self)
             tab_shortcut.activated.connect(lambda idx=i: self.tabs.setCurrentIndex(idx))
     
+    def on_catalog_changed(self, folder: str, added: List[str], removed: List[str], changed: List[str]):
+        """Apply a debounced batch of Apps or Tools folder changes to the affected rows only"""
+        apps_folder = os.path.join(SCRIPT_DIR, "Apps")
+        tools_folder = os.path.join(SCRIPT_DIR, "Tools")
+        before = {data['checkbox'] for tab in (self.app_installer_tab, self.tools_tab)
+                  for data in tab.checkboxes.values()}
+        
+        if os.path.abspath(folder) == os.path.abspath(tools_folder):
+            count = self.tools_tab.apply_catalog_changes(added, removed, changed)
+            # Files in Tools are hidden from the Apps catalog, so an installer
+            # moving in or out of Tools shows or hides its Apps row
+            shadowed = [os.path.join(apps_folder, os.path.basename(path)) for path in added
+                        if self.catalog_watcher.contains(apps_folder, os.path.basename(path))]
+            unshadowed = [os.path.join(apps_folder, os.path.basename(path)) for path in removed
+                          if self.catalog_watcher.contains(apps_folder, os.path.basename(path))]
+            count += self.app_installer_tab.apply_catalog_changes(unshadowed, shadowed, [])
+        else:
+            in_tools = lambda path: self.catalog_watcher.contains(tools_folder, os.path.basename(path))
+            count = self.app_installer_tab.apply_catalog_changes(
+                [path for path in added if not in_tools(path)], removed, [path for path in changed if not in_tools(path)]
+            )
+        
+        for tab in (self.app_installer_tab, self.tools_tab):
+            for data in tab.checkboxes.values():
+                if data['checkbox'] not in before:
+                    data['checkbox'].stateChanged.connect(self.update_operation_count)
+        self.update_operation_count()
+        
+        if count:
+            self.logs_tab.add_log(
+                f"{os.path.basename(folder)} folder changed: {len(added)} added, {len(removed)} removed, "
+                f"{len(changed)} modified ({count} row(s) updated)",
+                LogLevel.INFO
+            )
+    
     def connect_checkbox_signals(self):
         """Connect all checkbox signals to update operation count"""
         # Application Installer tab
@@ -1429,13 +1968,8 @@ class Better10MainWindow(QMainWindow):
         else:
             self.logs_tab.add_log("Running with administrator privileges.", LogLevel.SUCCESS)
     
-    def execute_all_operations(self):
-        """Collect all selected operations from all tabs and execute them"""
-        if self.worker_thread and self.worker_thread.isRunning():
-            QMessageBox.warning(self, "Operation in Progress", "An operation is already in progress. Please wait.")
-            return
-        
-        # Collect operations from all tabs
+    def collect_selected_operations(self) -> List[Dict]:
+        """Collect the selected operations from all tabs, in execution order"""
         all_operations = []
         
         # Application installer
@@ -1481,19 +2015,54 @@ class Better10MainWindow(QMainWindow):
                 })
         
         # Tools from Tools folder (Advanced Options)
-        for tool_name, tool_data in self.tools_tab.checkboxes.items():
-            if tool_data['checkbox'].isChecked():
-                all_operations.append({
-                    'type': 'tool',
-                    'name': f"Run {tool_name}",
-                    'path': tool_data['path'],
-                    'tool_type': tool_data['tool_type']
-                })
+        all_operations.extend(self.tools_tab.selected_operations())
+        
+        return all_operations
+    
+    def export_script(self):
+        """Export the selected operations as a standalone PowerShell script"""
+        all_operations = self.collect_selected_operations()
+        if not all_operations:
+            QMessageBox.information(self, "No Operations Selected", "Please select at least one operation to export.")
+            return
+        
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export PowerShell Script", os.path.join(SCRIPT_DIR, "better10_plan.ps1"),
+            "PowerShell scripts (*.ps1)"
+        )
+        if not path:
+            return
+        
+        try:
+            digest, count = export_plan(path, all_operations, os.path.splitext(os.path.basename(path))[0])
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Export Failed", f"Could not export the script:\n\n{e}")
+            return
+        
+        self.logs_tab.add_log(f"Exported {count} operation(s) to {path}", LogLevel.SUCCESS)
+        self.logs_tab.add_log(f"Script SHA-256: {digest}", LogLevel.INFO)
+        self.statusBar().showMessage(f"Exported {count} operation(s) to {os.path.basename(path)}")
+    
+    def execute_all_operations(self):
+        """Collect all selected operations from all tabs and execute them"""
+        with Profiler.section("execute_all_operations"):
+            self.start_execution()
+    
+    def start_execution(self):
+        """Check, confirm and start the selected operations (the body of execute_all_operations)"""
+        if self.worker_thread and self.worker_thread.isRunning():
+            QMessageBox.warning(self, "Operation in Progress", "An operation is already in progress. Please wait.")
+            return
+        
+        all_operations = self.collect_selected_operations()
         
         if not all_operations:
             QMessageBox.information(self, "No Operations Selected", "Please select at least one operation to execute.")
             return
         
+        if not self.run_preflight(all_operations):
+            return
+        
         # Check for Windows Defender operations
         defender_ops = [op for op in all_operations if "Defender" in op.get('name', '') or "defender" in op.get('name', '').lower()]
         
@@ -1577,9 +2146,47 @@ class Better10MainWindow(QMainWindow):
         self.worker_thread = WorkerThread(all_operations)
         self.worker_thread.log_signal.connect(self.logs_tab.add_log)
         self.worker_thread.progress_signal.connect(self.progress_bar.setValue)
+        self.worker_thread.eta_signal.connect(
+            lambda seconds, count=len(all_operations): self.statusBar().showMessage(
+                f"Executing {count} operation(s)... {format_eta(seconds)}"
+            )
+        )
         self.worker_thread.finished_signal.connect(self.on_operations_finished)
         self.worker_thread.start()
     
+    def run_preflight(self, operations: List[Dict]) -> bool:
+        """
+        Check the whole plan against the machine before anything runs
+        
+        Returns:
+            True if the run should go ahead
+        """
+        if not Preflight.enabled:
+            return True
+        
+        report = Preflight(SystemOperations.backend).run(operations)
+        for check in report.failures:
+            self.logs_tab.add_log(f"Pre-flight: {check.name}: {check.detail}", LogLevel.ERROR)
+        for check in report.warnings:
+            self.logs_tab.add_log(f"Pre-flight: {check.name}: {check.detail}", LogLevel.WARNING)
+        if report.passed:
+            return True
+        
+        self.statusBar().showMessage(f"Pre-flight checks failed ({len(report.failures)} problem(s))")
+        reply = QMessageBox.critical(
+            self,
+            "Pre-flight Checks Failed",
+            "<b>This run would fail:</b><br><br>"
+            + "<br>".join(line.replace("&", "&amp;").replace("<", "&lt;") for line in report.lines())
+            + "<br><br>Fix these problems and try again, or ignore them to run anyway.",
+            QMessageBox.Abort | QMessageBox.Ignore,
+            QMessageBox.Abort
+        )
+        if reply == QMessageBox.Ignore:
+            self.logs_tab.add_log("Pre-flight problems ignored; running anyway", LogLevel.WARNING)
+            return True
+        return False
+    
     def on_operations_finished(self, success: bool):
         """Called when all operations are finished"""
         self.progress_bar.setVisible(False)
@@ -1588,6 +2195,33 @@ class Better10MainWindow(QMainWindow):
         self.logs_tab.add_log("All operations completed.", LogLevel.INFO)
         self.statusBar().showMessage("Ready - Operations completed")
         self.update_operation_count()  # Update count after operations
+        
+        if self.history_tab.isVisible():
+            self.history_tab.refresh()
+        
+        if Profiler.enabled:
+            self.logs_tab.add_log(f"Performance profile written to {Profiler.session_dir()}", LogLevel.INFO)
+        
+        if self.worker_thread.reboot_required:
+            self.prompt_restart(self.worker_thread.reboot_required)
+    
+    def prompt_restart(self, operation_names: List[str]):
+        """Ask once, at the end of a run, whether to restart for the steps that need it"""
+        reply = QMessageBox.question(
+            self,
+            "Restart Required",
+            "<b>The following changes need a restart to finish:</b><br><br>"
+            + "<br>".join(f"• {name}" for name in operation_names)
+            + "<br><br>Restart now?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            success, error_msg = SystemOperations.backend.restart()
+            if success:
+                self.logs_tab.add_log("Restarting in 5 seconds...", LogLevel.WARNING)
+            else:
+                self.logs_tab.add_log(f"Restart failed: {error_msg}", LogLevel.ERROR)
 
 
 def is_admin():
@@ -1659,10 +2293,398 @@ def run_as_admin():
         return True  # Failed to elevate, continue anyway
 
 
+def parse_exit_codes(text: str) -> List[int]:
+    """Parse a comma-separated list of decimal or 0x-prefixed exit codes"""
+    try:
+        return [int(code, 0) for code in text.split(",") if code.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid exit code list: {text!r}")
+
+
+def parse_priority(text: str) -> Tuple[str, Dict]:
+    """Parse CATEGORY=CPU[,IO], e.g. "installer=idle,very_low" """
+    category, _, priorities = text.partition("=")
+    cpu_priority, _, io_priority = priorities.partition(",")
+    settings = {"cpu_priority": cpu_priority.strip()}
+    if io_priority:
+        settings["io_priority"] = io_priority.strip()
+    if (category.strip() not in OPERATION_CATEGORIES or category.strip() == "registry"
+            or settings["cpu_priority"] not in CPU_PRIORITIES
+            or settings.get("io_priority", IO_PRIORITIES[-1]) not in IO_PRIORITIES):
+        raise argparse.ArgumentTypeError(
+            f"invalid priority {text!r}: expected CATEGORY=CPU[,IO] with CPU one of {', '.join(CPU_PRIORITIES)} "
+            f"and IO one of {', '.join(IO_PRIORITIES)}")
+    return category.strip(), settings
+
+
+def parse_cpus(text: str) -> List[int]:
+    """Parse a CPU list such as "2-5,7" """
+    try:
+        cpus = parse_cpu_list(text)
+    except ValueError:
+        cpus = None
+    if not cpus:
+        raise argparse.ArgumentTypeError(f"invalid CPU list: {text!r}")
+    return cpus
+
+
+def configure_governor(args: argparse.Namespace, profile_settings: Dict = None):
+    """Configure the resource governor from a profile's settings, then from the command line, which wins"""
+    if profile_settings:
+        ResourceGovernor.configure_from_profile(profile_settings)
+    ResourceGovernor.configure(policy=args.resource_policy, max_disk_jobs=args.max_disk_jobs,
+                               affinity=args.cpu_affinity, categories=dict(args.priority or []))
+
+
+def parse_arguments(argv: List[str]) -> Tuple[argparse.Namespace, List[str]]:
+    """
+    Parse Better10 command-line options
+    
+    Unknown options are returned untouched so Qt can still consume its own.
+    
+    Returns:
+        Tuple of (parsed options, remaining arguments)
+    """
+    parser = argparse.ArgumentParser(description="Better10 - Windows 10 Post-Install Automation Tool")
+    parser.add_argument("--run", metavar="PROFILE",
+                        help="Execute the operations in a profile file without opening the GUI")
+    parser.add_argument("--rollback", metavar="RUN_ID",
+                        help="Restore the registry values changed by a run ('latest' for the most recent) and exit")
+    parser.add_argument("--list-snapshots", action="store_true",
+                        help="List the runs that can be rolled back and exit")
+    parser.add_argument("--export-script", nargs=2, metavar=("PROFILE", "SCRIPT"),
+                        help="Write the operations in a profile as a standalone PowerShell script and exit")
+    parser.add_argument("--apply-offline", nargs=2, metavar=("PROFILE", "IMAGE_DIR"),
+                        help="Write the registry operations in a profile into the hives of a mounted Windows image "
+                             "(HKCU goes to the Default profile) and exit")
+    parser.add_argument("--export-policy", nargs=2, metavar=("PROFILE", "GPO_DIR"),
+                        help="Merge the Policies registry settings in a profile into the Registry.pol files "
+                             "of a Group Policy Object directory and exit")
+    
+    agent = parser.add_argument_group("agent mode")
+    agent.add_argument("--agent", action="store_true",
+                       help="Serve the operation engine over JSON-RPC instead of opening the GUI (see agent.py)")
+    agent.add_argument("--agent-bind", default="127.0.0.1:8765", metavar="HOST:PORT",
+                       help="Address the agent listens on (default: 127.0.0.1:8765)")
+    agent.add_argument("--agent-token", default=os.environ.get("BETTER10_AGENT_TOKEN"), metavar="TOKEN",
+                       help="Token clients must send (default: $BETTER10_AGENT_TOKEN); "
+                            "required unless the agent binds a loopback address")
+    
+    elevation = parser.add_argument_group("elevation")
+    elevation.add_argument("--no-broker", action="store_true",
+                           help="Re-launch the whole application as administrator instead of starting "
+                                "an elevated broker for the privileged calls")
+    elevation.add_argument("--broker", action="store_true",
+                           help="Use a broker process even when no elevation is needed (try the channel with --simulate)")
+    # Internal: started by launch_broker() with the path of its handoff file
+    elevation.add_argument("--broker-serve", metavar="HANDOFF", help=argparse.SUPPRESS)
+    
+    limits = parser.add_argument_group("timeouts")
+    limits.add_argument("--inactivity-timeout", type=float, default=None, metavar="SECONDS",
+                        help="Flag a child with no output and no CPU activity for this long (0 disables; default: 90)")
+    limits.add_argument("--hang-action", choices=[HangAction.KILL, HangAction.WARN], default=None,
+                        help="Kill a hung child, or only warn and wait for the timeout (default: kill)")
+    limits.add_argument("--fixed-timeouts", action="store_true",
+                        help="Use the fixed 300/600 second timeouts instead of deriving them from history")
+    
+    retries = parser.add_argument_group("retries and verification")
+    retries.add_argument("--max-attempts", type=int, default=None, metavar="N",
+                         help="Attempts for a step that keeps hitting transient failures (default: 4)")
+    retries.add_argument("--retry-delay", type=float, default=None, metavar="SECONDS",
+                         help="Backoff before the first retry, doubled on each further attempt (default: 15)")
+    retries.add_argument("--no-verify", action="store_true",
+                         help="Skip the post-run check that each operation actually took effect")
+    retries.add_argument("--skip-preflight", action="store_true",
+                         help="Run even if the pre-flight checks (files, disk space, pending restart, winget, elevation) fail")
+    
+    staging = parser.add_argument_group("installers")
+    staging.add_argument("--stage-installers", choices=[StagingMode.AUTO, StagingMode.ALWAYS, StagingMode.OFF],
+                         default=None,
+                         help="Copy upcoming installers to a local cache while earlier operations run: "
+                              "auto stages only those on removable, optical or network drives (default: auto)")
+    staging.add_argument("--staging-lookahead", type=int, default=None, metavar="N",
+                         help="Installers staged ahead of the one running (default: 2)")
+    staging.add_argument("--staging-max-gb", type=float, default=None, metavar="GB",
+                         help="Disk space the staging cache may use; least recently used installers are evicted "
+                              "(default: 8)")
+    
+    staging.add_argument("--no-msix-batch", action="store_true",
+                         help="Deploy each MSIX package in its own session instead of all of them in one")
+    
+    resources = parser.add_argument_group("resources")
+    resources.add_argument("--resource-policy", choices=[GovernorPolicy.FAST, GovernorPolicy.USABLE], default=None,
+                           help="fast finishes as soon as possible; usable lowers the priority of launched "
+                                "processes and runs one disk-heavy job at a time (default: fast)")
+    resources.add_argument("--max-disk-jobs", type=int, default=None, metavar="N",
+                           help="Installers, Appx removals and installer copies allowed to run at once "
+                                "(0: unlimited; default: set by the policy)")
+    resources.add_argument("--cpu-affinity", type=parse_cpus, default=None, metavar="CPUS",
+                           help="Run launched processes only on these CPUs, e.g. 2-7")
+    resources.add_argument("--priority", type=parse_priority, action="append", default=None,
+                           metavar="CATEGORY=CPU[,IO]",
+                           help="CPU and I/O priority for one operation category, e.g. installer=idle,very_low "
+                                "(repeatable)")
+    
+    fanout = parser.add_argument_group("user profiles")
+    fanout.add_argument("--all-profiles", action="store_true",
+                        help="Also apply HKCU registry settings to every user profile and the Default profile")
+    fanout.add_argument("--skip-default-profile", action="store_true",
+                        help="With --all-profiles, leave the Default profile (used for new accounts) untouched")
+    fanout.add_argument("--profile-workers", type=int, default=None, metavar="N",
+                        help="Profiles updated concurrently (default: 4)")
+    
+    diagnostics = parser.add_argument_group("diagnostics")
+    diagnostics.add_argument("--profile", action="store_true",
+                             help="Profile startup, tab builds and runs (cProfile, sampled stacks, phase timings)")
+    diagnostics.add_argument("--profile-memory", action="store_true",
+                             help="With --profile, also trace memory allocations (slower)")
+    diagnostics.add_argument("--no-sampling", action="store_true",
+                             help="Do not sample CPU, memory and disk use during runs")
+    diagnostics.add_argument("--sample-interval", type=float, default=None, metavar="SECONDS",
+                             help="Seconds between resource samples during runs (default: 1)")
+    
+    history = parser.add_argument_group("run history")
+    history.add_argument("--history", choices=list(HISTORY_QUERIES), default=None,
+                         help="Print recent runs, the slowest operations or the most frequent failures and exit")
+    history.add_argument("--history-filter", choices=list(OPERATION_CATEGORIES), default=None, metavar="CATEGORY",
+                         help="Limit --history slowest/failures to one category: " + ", ".join(OPERATION_CATEGORIES))
+    history.add_argument("--history-runs", type=int, default=30, metavar="N",
+                         help="Number of most recent runs --history looks at (default: 30)")
+    history.add_argument("--measure-impact", action="store_true",
+                         help="Measure boot time, idle footprint, disk and CPU before the run and again after "
+                              "the next restart, and store the comparison in the run history")
+    history.add_argument("--impact-followup", action="store_true",
+                         help="Take the after-restart measurements of earlier --measure-impact runs and exit "
+                              "(normally run by a logon task)")
+    history.add_argument("--impact-settle", type=float, default=None, metavar="MINUTES",
+                         help="Uptime to wait for after a restart before measuring (default: 3)")
+    history.add_argument("--no-history", action="store_true",
+                         help="Do not record this run in the run history")
+    
+    simulation = parser.add_argument_group("simulation")
+    simulation.add_argument("--simulate", action="store_true",
+                            help="Use the simulated backend; no changes are made to this machine")
+    simulation.add_argument("--sim-latency", type=float, default=0.0, metavar="SECONDS",
+                            help="Duration of each simulated process")
+    simulation.add_argument("--sim-jitter", type=float, default=0.0, metavar="SECONDS",
+                            help="Maximum random time added to each simulated process")
+    simulation.add_argument("--sim-failure-rate", type=float, default=0.0, metavar="RATE",
+                            help="Probability (0.0-1.0) that a simulated process fails")
+    simulation.add_argument("--sim-output-lines", type=int, default=0, metavar="LINES",
+                            help="Lines of output each simulated process produces")
+    simulation.add_argument("--sim-hang-rate", type=float, default=0.0, metavar="RATE",
+                            help="Probability (0.0-1.0) that a simulated process hangs without output")
+    simulation.add_argument("--sim-seed", type=int, default=None,
+                            help="Random seed for reproducible simulations")
+    simulation.add_argument("--sim-exit-codes", type=parse_exit_codes, default=None, metavar="CODES",
+                            help="Comma-separated exit codes a failing simulated process picks from (e.g. 1618,3010)")
+    simulation.add_argument("--sim-check-paths", action="store_true",
+                            help="Fail simulated installers and tools whose file does not exist on disk")
+    simulation.add_argument("--sim-free-space", type=float, default=100.0, metavar="GB",
+                            help="Free space on the simulated system drive (default: 100)")
+    simulation.add_argument("--sim-no-winget", action="store_true",
+                            help="Simulate a machine without winget")
+    simulation.add_argument("--sim-pending-reboot", action="store_true",
+                            help="Simulate a machine with a restart pending")
+    simulation.add_argument("--sim-locked-profile", action="append", default=None, metavar="SID",
+                            help="Simulate a user profile whose hive another process holds open (repeatable)")
+    return parser.parse_known_args(argv)
+
+
+def run_headless(operations: List[Dict], backend: SystemBackend = None, name: str = None) -> bool:
+    """
+    Execute operations without the GUI, printing log messages to stdout
+    
+    WorkerThread.run() is called directly in the current thread, so no
+    Qt event loop is needed. name identifies the profile in impact reports.
+    
+    Returns:
+        True if every operation succeeded
+    """
+    if Preflight.enabled:
+        report = Preflight(backend or SystemOperations.backend).run(operations)
+        for line in report.lines():
+            print(f"[PREFLIGHT] {line}")
+        if not report.passed:
+            print(f"Pre-flight checks failed in {report.seconds:.2f}s; nothing was run (--skip-preflight runs anyway)")
+            return False
+    
+    worker = WorkerThread(operations, backend=backend)
+    worker.plan_name = name
+    result = {'success': False}
+    
+    def on_event(event):
+        if event.kind == EventKind.LOG:
+            print(f"[{event.level}] {event.message}")
+        else:
+            result.update(success=event.success)
+    
+    worker.events.subscribe(on_event, name="console", kinds=(EventKind.LOG, EventKind.RUN_FINISHED))
+    worker.run()
+    if worker.reboot_required:
+        print("A restart is required to finish: " + ", ".join(worker.reboot_required))
+    return result['success']
+
+
+def run_rollback(run_id: str, backend: SystemBackend = None) -> bool:
+    """
+    Restore the registry values a run changed, printing what happened
+    
+    Returns:
+        True if every value and key was restored
+    """
+    backend = backend or SystemOperations.backend
+    resolved = resolve_run_id(backend.name, run_id)
+    path = RegistrySnapshot.path_for(backend.name, resolved) if resolved else None
+    if not path or not os.path.exists(path):
+        print(f"No registry snapshot found for run {run_id}")
+        return False
+    
+    snapshot = RegistrySnapshot.load(path)
+    results = snapshot.restore(backend)
+    failures = [(change, error) for change, success, error in results if not success]
+    for change, error in failures:
+        target = f"{hive_name(change['hive'])}\\{change['key_path']}"
+        if change.get('value_name'):
+            target += f" [{change['value_name']}]"
+        print(f"✗ {target}: {error}")
+    print(f"Rolled back run {snapshot.run_id}: {len(results) - len(failures)} of {len(results)} change(s) applied")
+    return not failures
+
+
+def run_impact_followup(backend: SystemBackend = None) -> bool:
+    """
+    Take the after-boot measurements of runs measured with --measure-impact, printing the comparison
+    
+    Returns:
+        False if the machine could not be measured
+    """
+    backend = backend or SystemOperations.backend
+    report = ImpactReport(backend, RunHistory.for_backend(backend.name), on_log=print)
+    try:
+        completed = report.follow_up()
+    except Exception as e:
+        print(f"Impact follow-up failed: {e}")
+        return False
+    for result in completed:
+        print("\n".join(ImpactReport.report_lines(result)))
+    return True
+
+
+def print_history(query: str, group: str = None, runs: int = 30, backend: SystemBackend = None):
+    """Print a run history query as an aligned text table"""
+    backend = backend or SystemOperations.backend
+    headers, rows = history_table(RunHistory.for_backend(backend.name), query, group, runs)
+    if not rows:
+        print("No matching runs recorded yet")
+        return
+    widths = [max(len(text) for text in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print("  ".join(text.ljust(width) for text, width in zip(row, widths)).rstrip())
+
+
 def main():
     """Main entry point"""
-    # Check if running as admin, if not, elevate and restart
-    if not is_admin():
+    args, qt_args = parse_arguments(sys.argv[1:])
+    
+    if args.export_script:
+        # Export needs neither elevation nor a backend
+        profile_path, script_path = args.export_script
+        digest, count = export_plan(script_path, load_profile(profile_path),
+                                    os.path.splitext(os.path.basename(profile_path))[0])
+        print(f"Exported {count} operation(s) to {script_path}")
+        print(f"SHA-256: {digest}")
+        sys.exit(0)
+    
+    if args.apply_offline:
+        # Editing image hives needs neither elevation nor Windows
+        profile_path, image_dir = args.apply_offline
+        operations = load_profile(profile_path)
+        results = apply_to_image(image_dir, operations)
+        for operation, success, error in results:
+            print(f"{'OK  ' if success else 'FAIL'} {operation.get('name', '')}" + (f": {error}" if error else ""))
+        skipped = len(operations) - len(results)
+        failed = sum(1 for _, success, _ in results if not success)
+        print(f"Applied {len(results) - failed} of {len(results)} registry operation(s) to {image_dir}"
+              + (f"; {skipped} other operation(s) need a running system" if skipped else ""))
+        sys.exit(1 if failed else 0)
+    
+    if args.export_policy:
+        profile_path, gpo_dir = args.export_policy
+        operations = load_profile(profile_path)
+        try:
+            counts = export_policy(gpo_dir, operations)
+        except (PolicyFileError, HiveError, OSError) as e:
+            print(f"Policy export failed: {e}")
+            sys.exit(1)
+        for section, count in sorted(counts.items()):
+            print(f"{section}: {count} policy setting(s)")
+        print(f"Exported {sum(counts.values())} of {len(operations)} operation(s) to {gpo_dir}"
+              + (" (run 'gpupdate /force' to apply local policy now)" if counts else ""))
+        sys.exit(0)
+    
+    if args.simulate:
+        SystemOperations.set_backend(SimulatedBackend(runner=SimulatedProcessRunner(
+            latency=args.sim_latency,
+            jitter=args.sim_jitter,
+            failure_rate=args.sim_failure_rate,
+            output_lines=args.sim_output_lines,
+            seed=args.sim_seed,
+            hang_rate=args.sim_hang_rate,
+            failure_exit_codes=args.sim_exit_codes
+        ), check_paths=args.sim_check_paths, winget=not args.sim_no_winget,
+            free_space=int(args.sim_free_space * 1024 ** 3), locked_profiles=args.sim_locked_profile))
+        if args.sim_pending_reboot:
+            SystemOperations.backend.set_registry_value(
+                r"SYSTEM\CurrentControlSet\Control\Session Manager", "PendingFileRenameOperations", "\\??\\C:\\pending.tmp"
+            )
+    
+    if args.broker_serve:
+        # This is the (elevated) broker: serve the process that started it, then exit
+        sys.exit(0 if serve_broker(SystemOperations.backend, args.broker_serve) else 1)
+    
+    TimeoutPolicy.configure(
+        inactivity_timeout=args.inactivity_timeout,
+        hang_action=args.hang_action,
+        adaptive=False if args.fixed_timeouts else None
+    )
+    RetryPolicy.configure(max_attempts=args.max_attempts, base_delay=args.retry_delay)
+    RunVerifier.configure(enabled=False if args.no_verify else None)
+    Preflight.configure(enabled=False if args.skip_preflight else None)
+    Profiler.configure(enabled=args.profile or None, trace_memory=args.profile_memory or None)
+    ResourceSampler.configure(enabled=False if args.no_sampling else None, interval=args.sample_interval)
+    RunHistory.configure(enabled=False if args.no_history else None)
+    ImpactReport.configure(enabled=args.measure_impact or None, settle_minutes=args.impact_settle)
+    InstallerStager.configure(mode=args.stage_installers, lookahead=args.staging_lookahead,
+                              max_bytes=int(args.staging_max_gb * 1024 ** 3) if args.staging_max_gb is not None else None)
+    MsixBatch.configure(enabled=False if args.no_msix_batch else None)
+    configure_governor(args)
+    ProfileFanout.configure(enabled=args.all_profiles or None,
+                            include_default=False if args.skip_default_profile else None,
+                            max_workers=args.profile_workers)
+    
+    if args.history:
+        # Reading the history needs no elevation
+        print_history(args.history, args.history_filter, args.history_runs)
+        sys.exit(0)
+    
+    # The simulated backend never touches the machine, so it needs no elevation
+    needs_elevation = not args.simulate and not is_admin()
+    
+    if args.broker or (needs_elevation and not args.no_broker):
+        # Only a small broker process is elevated; this process (and the GUI) stays unprivileged
+        if needs_elevation:
+            print("Starting the Better10 broker with administrator privileges... A UAC prompt will appear.")
+        try:
+            client = launch_broker([arg for arg in sys.argv[1:] if arg != "--broker"], elevate=needs_elevation)
+        except BrokerError as e:
+            print(f"Failed to start the broker: {e}")
+        else:
+            SystemOperations.set_backend(BrokerBackend(client))
+            needs_elevation = False
+    
+    # Without a broker, elevate and restart the whole application
+    if needs_elevation and args.no_broker:
         print("="*60)
         print("Better10 requires administrator privileges")
         print("="*60)
@@ -1677,10 +2699,10 @@ def main():
         if not elevation_success:
             # Successfully launched elevated version, exit this instance
             print("Elevated instance launched. This window will close...")
-            import time
             time.sleep(2)  # Give user time to see the message
             sys.exit(0)
-        
+    
+    if needs_elevation:
         # If we get here, elevation failed (user cancelled UAC or error occurred)
         print("\n" + "="*60)
         print("Elevation cancelled or failed.")
@@ -1694,7 +2716,48 @@ def main():
         # Still launch the GUI but show warning
         # User can choose to continue or close
     
-    app = QApplication(sys.argv)
+    if args.list_snapshots:
+        for run_id in RegistrySnapshot.list_runs(SystemOperations.backend.name):
+            print(run_id)
+        sys.exit(0)
+    
+    if args.rollback:
+        sys.exit(0 if run_rollback(args.rollback) else 1)
+    
+    if args.impact_followup:
+        sys.exit(0 if run_impact_followup() else 1)
+    
+    if args.run:
+        operations = load_profile(args.run)
+        settings = load_profile_settings(args.run)
+        try:
+            configure_governor(args, settings.get("resources"))
+        except ValueError as e:
+            print(f"Invalid resources section in {args.run}: {e}")
+            sys.exit(1)
+        name = settings.get("name") or os.path.splitext(os.path.basename(args.run))[0]
+        sys.exit(0 if run_headless(operations, name=name) else 1)
+    
+    if args.agent:
+        from agent import serve_agent
+        try:
+            serve_agent(SystemOperations.backend, args.agent_bind, args.agent_token)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        sys.exit(0)
+    
+    app, window = start_gui(args, qt_args)
+    if Profiler.enabled:
+        window.logs_tab.add_log(f"Profiling enabled; reports are written to {Profiler.session_dir()}", LogLevel.INFO)
+    
+    sys.exit(app.exec_())
+
+
+@profiled("startup")
+def start_gui(args, qt_args: List[str]) -> Tuple[QApplication, Better10MainWindow]:
+    """Create the application and show the main window"""
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Set application style
     app.setStyle('Fusion')
@@ -1869,9 +2932,11 @@ def main():
     app.setStyleSheet(dark_stylesheet)
     
     window = Better10MainWindow()
+    if args.simulate:
+        window.setWindowTitle(window.windowTitle() + " [Simulation]")
+        window.logs_tab.add_log("Simulation mode: operations run against the simulated backend, not this machine.", LogLevel.WARNING)
     window.show()
-    
-    sys.exit(app.exec_())
+    return app, window
 
 
 if __name__ == "__main__":
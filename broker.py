@@ -0,0 +1,676 @@
+"""
+Privileged broker for Better10
+
+Without a broker, main() re-launches the whole PyQt5 GUI as administrator,
+and every installer and tool launch adds its own Start-Process -Verb RunAs
+round trip. With the broker, only a small helper process is elevated:
+
+- the GUI starts it once through a single UAC prompt and keeps running
+  as the signed-in user
+- every SystemBackend call the GUI makes (registry reads and writes,
+  installers, tools, winget, hive mounts) is sent to the broker as a typed
+  request and executed there by the real backend
+- the output lines and hang reports of a child process are streamed back
+  while it runs, so the watchdog and the Logs tab behave as before
+- the broker serves one client and exits when that connection closes
+
+The channel is a TCP socket on 127.0.0.1 carrying length-prefixed JSON
+frames. Both ends prove they hold a 32-byte secret with HMAC-SHA256 over
+a fresh nonce from the other end, so the secret never crosses the socket,
+and a process that merely finds the port can neither issue requests nor
+pose as the broker. The secret is handed to the broker in a file in the
+data directory, which the broker deletes as soon as it has read it.
+
+The same code runs on Linux, so the channel can be exercised with the
+simulated backend:
+
+    python better10.py --simulate --broker --run lab_profile.json
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import struct
+import socket
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
+
+from backends import SystemBackend, HKEY_LOCAL_MACHINE, SCRIPT_DIR, data_dir
+from process_monitor import LaunchOptions, ResourceLimits
+
+PROTOCOL_VERSION = 1
+SECRET_BYTES = 32
+NONCE_BYTES = 16
+
+_FRAME_HEADER = struct.Struct(">I")
+# Largest frame either end accepts; inventories and registry batches stay far below it
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Seconds the broker waits for its client to connect and authenticate
+ACCEPT_TIMEOUT = 60.0
+# Seconds one connection may take to complete the handshake
+HANDSHAKE_TIMEOUT = 2.0
+# Seconds the GUI waits for the broker to start, including the UAC prompt
+STARTUP_TIMEOUT = 120.0
+# Requests the broker executes at the same time for its client
+MAX_CONCURRENT_CALLS = 8
+
+# Requests the broker accepts: SystemBackend method -> parameter names. Only
+# these methods can be called, and only with these parameters.
+BROKER_METHODS = {
+    "is_admin": (),
+    "run_powershell": ("command", "as_admin"),
+    "run_winget": ("operation", "package_id"),
+    "run_installer": ("installer_path", "installer_type"),
+    "run_tool": ("tool_path", "tool_type", "args"),
+    "run_executable": ("exe_path", "args", "as_admin"),
+    "set_registry_value": ("key_path", "value_name", "value", "hive"),
+    "install_msix_packages": ("package_paths", "dependency_paths"),
+    "restart": ("delay",),
+    "machine_metrics": (),
+    "schedule_logon_task": ("name", "command", "delay_minutes"),
+    "delete_scheduled_task": ("name",),
+    "inventory": ("winget",),
+    "read_registry_state": ("queries",),
+    "apply_registry_changes": ("changes",),
+    "user_profiles": (),
+    "load_user_hive": ("mount", "hive_path"),
+    "unload_user_hive": ("mount",),
+    "paths_exist": ("paths",),
+    "file_sizes": ("paths",),
+    "free_disk_space": ("path",),
+    "winget_available": (),
+    "pending_reboot": (),
+}
+
+# Methods that launch a child process and take LaunchOptions
+LAUNCH_METHODS = {"run_powershell", "run_winget", "run_installer", "run_tool", "run_executable",
+                  "install_msix_packages"}
+
+
+class BrokerError(Exception):
+    """The broker could not be started or reached, or rejected a request"""
+
+
+def _encode(value):
+    """json.dumps hook for the registry data JSON has no type for"""
+    if isinstance(value, (bytes, bytearray)):
+        return {"$bytes": bytes(value).hex()}
+    raise TypeError(f"Cannot send {type(value).__name__} to the broker")
+
+
+def _decode(obj: Dict):
+    """json.loads hook reversing _encode"""
+    if len(obj) == 1 and "$bytes" in obj:
+        return bytes.fromhex(obj["$bytes"])
+    return obj
+
+
+def send_frame(sock: socket.socket, message: Dict):
+    """Send one message as a length-prefixed JSON frame"""
+    payload = json.dumps(message, default=_encode).encode("utf-8")
+    sock.sendall(_FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> Optional[Dict]:
+    """
+    Receive one message
+
+    Returns:
+        The message, or None if the connection was closed
+    """
+    header = _recv_exact(sock, _FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = _FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise BrokerError(f"Frame of {size} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        return None
+    message = json.loads(payload.decode("utf-8"), object_hook=_decode)
+    if not isinstance(message, dict):
+        raise BrokerError("Malformed frame")
+    return message
+
+
+def proof(secret: bytes, role: str, nonce: str) -> str:
+    """HMAC-SHA256 proving knowledge of the secret for the other end's nonce"""
+    return hmac.new(secret, f"better10-broker/{PROTOCOL_VERSION}/{role}/{nonce}".encode("ascii"),
+                    hashlib.sha256).hexdigest()
+
+
+def _check_proof(secret: bytes, role: str, nonce: str, supplied) -> bool:
+    return isinstance(supplied, str) and hmac.compare_digest(proof(secret, role, nonce), supplied)
+
+
+def _options_to_wire(options: Optional[LaunchOptions]) -> Optional[Dict]:
+    if options is None:
+        return None
+    return {"timeout": options.timeout, "inactivity_timeout": options.inactivity_timeout,
+            "hang_action": options.hang_action,
+            "resources": options.resources.to_dict() if options.resources is not None else None}
+
+
+class BrokerServer:
+    """
+    Executes typed backend requests for one authenticated client
+
+    Requests run on a small thread pool, so a long installer does not hold
+    up the registry reads the GUI makes meanwhile. Frames going back to
+    the client are serialized with a lock.
+    """
+
+    def __init__(self, backend: SystemBackend, secret: bytes, host: str = "127.0.0.1", port: int = 0,
+                 accept_timeout: float = ACCEPT_TIMEOUT):
+        """
+        Args:
+            backend: Backend that executes the requests (WindowsBackend when elevated)
+            secret: Shared secret the client must prove it holds
+            host: Address to listen on (loopback only)
+            port: Port to listen on (0 picks a free one)
+            accept_timeout: Seconds to wait for an authenticated client before giving up
+        """
+        self.backend = backend
+        self.secret = secret
+        self.accept_timeout = accept_timeout
+        self.listener = socket.create_server((host, port))
+        self._send_lock = threading.Lock()
+        self._client: Optional[socket.socket] = None
+        self._accepting = True
+        self._client_ready = threading.Condition()
+
+    @property
+    def port(self) -> int:
+        return self.listener.getsockname()[1]
+
+    def serve(self) -> bool:
+        """
+        Serve the first client that authenticates, until it disconnects
+
+        Every connection is authenticated on its own thread, so connections
+        that stay silent or fail the handshake cannot hold up the real
+        client; they are dropped and the broker keeps waiting until the
+        accept timeout.
+
+        Returns:
+            True if a client was served, False if none authenticated in time
+        """
+        threading.Thread(target=self._accept_loop, name="broker-accept", daemon=True).start()
+        try:
+            with self._client_ready:
+                self._client_ready.wait_for(lambda: self._client is not None, self.accept_timeout)
+                # Stop accepting: nobody else gets to talk to this broker
+                self._accepting = False
+                conn = self._client
+        finally:
+            self.listener.close()
+        if conn is None:
+            return False
+        conn.settimeout(None)
+        with conn:
+            self._session(conn)
+        return True
+
+    def _accept_loop(self):
+        # A short timeout, so the loop notices when serve() stops accepting
+        self.listener.settimeout(0.5)
+        while self._accepting:
+            try:
+                conn, _ = self.listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # The listener was closed
+            threading.Thread(target=self._authenticate, args=(conn,), name="broker-handshake",
+                             daemon=True).start()
+
+    def _authenticate(self, conn: socket.socket):
+        conn.settimeout(HANDSHAKE_TIMEOUT)
+        try:
+            authenticated = self._handshake(conn)
+        except (OSError, ValueError, BrokerError):
+            authenticated = False
+        with self._client_ready:
+            if authenticated and self._accepting:
+                self._client = conn
+                self._accepting = False
+                self._client_ready.notify_all()
+                return
+        conn.close()
+
+    def _handshake(self, conn: socket.socket) -> bool:
+        nonce = os.urandom(NONCE_BYTES).hex()
+        send_frame(conn, {"type": "hello", "version": PROTOCOL_VERSION, "nonce": nonce})
+        reply = recv_frame(conn)
+        if (not reply or reply.get("type") != "auth" or reply.get("version") != PROTOCOL_VERSION
+                or not _check_proof(self.secret, "client", nonce, reply.get("proof"))
+                or not isinstance(reply.get("nonce"), str)):
+            return False
+        send_frame(conn, {"type": "welcome", "proof": proof(self.secret, "broker", reply["nonce"]),
+                          "backend": self.backend.name, "pid": os.getpid()})
+        return True
+
+    def _send(self, conn: socket.socket, message: Dict):
+        with self._send_lock:
+            try:
+                send_frame(conn, message)
+            except OSError:
+                pass  # The client is gone; the session loop notices on its next read
+
+    def _session(self, conn: socket.socket):
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CALLS, thread_name_prefix="broker-call") as pool:
+            while True:
+                try:
+                    message = recv_frame(conn)
+                except (OSError, ValueError, BrokerError):
+                    break
+                if message is None:
+                    break
+                if message.get("type") == "call":
+                    pool.submit(self._execute, conn, message)
+
+    def _execute(self, conn: socket.socket, message: Dict):
+        call_id = message.get("id")
+        method = message.get("method")
+        params = message.get("params") or {}
+        try:
+            if method not in BROKER_METHODS:
+                raise BrokerError(f"Unknown request: {method}")
+            if not isinstance(params, dict) or not set(params) <= set(BROKER_METHODS[method]):
+                raise BrokerError(f"Invalid parameters for {method}")
+            options = None
+            if method in LAUNCH_METHODS:
+                wire = message.get("options")
+                if wire is not None:
+                    options = LaunchOptions(
+                        timeout=wire.get("timeout"), inactivity_timeout=wire.get("inactivity_timeout"),
+                        hang_action=wire.get("hang_action"),
+                        resources=ResourceLimits.from_dict(wire["resources"]) if wire.get("resources") else None,
+                        on_hang=lambda idle: self._send(conn, {"type": "hang", "id": call_id, "idle": idle}),
+                        on_output=lambda stream, line: self._send(
+                            conn, {"type": "output", "id": call_id, "stream": stream, "line": line}),
+                    )
+                params = dict(params, options=options)
+            result = getattr(self.backend, method)(**params)
+        except Exception as e:
+            self._send(conn, {"type": "error", "id": call_id, "message": str(e)})
+            return
+        self._send(conn, {"type": "result", "id": call_id, "result": result,
+                          "exit_code": options.exit_code if options else None})
+
+
+def serve_broker(backend: SystemBackend, handoff_path: str) -> bool:
+    """
+    Run the broker for the client that wrote a handoff file
+
+    Reads and deletes the secret, then writes the port it listens on back
+    to the same path for the client to pick up.
+
+    Returns:
+        True if a client was served
+    """
+    with open(handoff_path, "r", encoding="utf-8") as f:
+        secret = bytes.fromhex(json.load(f)["secret"])
+    os.remove(handoff_path)
+
+    server = BrokerServer(backend, secret)
+    temp_path = handoff_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"port": server.port, "pid": os.getpid()}, f)
+    os.replace(temp_path, handoff_path)
+    return server.serve()
+
+
+class _PendingCall:
+    """A request waiting for its result, with the options its output is streamed to"""
+
+    def __init__(self, options: Optional[LaunchOptions]):
+        self.options = options
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[str] = None
+
+
+class BrokerClient:
+    """
+    Authenticated connection to a broker
+
+    call() may be used from several threads at once; a reader thread
+    routes each frame to the call it belongs to.
+    """
+
+    def __init__(self, port: int, secret: bytes, host: str = "127.0.0.1", process=None, timeout: float = 10.0):
+        """
+        Args:
+            port: Port the broker listens on
+            secret: Secret shared with the broker
+            host: Address the broker listens on
+            process: Popen of a broker this process started, if any (kept so it can be reaped)
+            timeout: Seconds allowed for connecting and the handshake
+        """
+        self.secret = secret
+        self.process = process
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, _PendingCall] = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+        self._closed: Optional[str] = None
+        try:
+            self._handshake()
+        except (OSError, ValueError):
+            self.sock.close()
+            raise BrokerError("Handshake with the broker failed")
+        except BrokerError:
+            self.sock.close()
+            raise
+        self.sock.settimeout(None)
+        self._reader = threading.Thread(target=self._read_loop, name="broker-reader", daemon=True)
+        self._reader.start()
+
+    def _handshake(self):
+        hello = recv_frame(self.sock)
+        if not hello or hello.get("type") != "hello" or hello.get("version") != PROTOCOL_VERSION:
+            raise BrokerError("The broker speaks a different protocol")
+        nonce = os.urandom(NONCE_BYTES).hex()
+        send_frame(self.sock, {"type": "auth", "version": PROTOCOL_VERSION, "nonce": nonce,
+                               "proof": proof(self.secret, "client", hello.get("nonce", ""))})
+        welcome = recv_frame(self.sock)
+        if not welcome or welcome.get("type") != "welcome":
+            raise BrokerError("The broker rejected the secret")
+        if not _check_proof(self.secret, "broker", nonce, welcome.get("proof")):
+            raise BrokerError("The process on the broker port could not prove it is the broker")
+        self.backend_name = welcome.get("backend", "broker")
+        self.broker_pid = welcome.get("pid")
+
+    def _read_loop(self):
+        reason = "The broker closed the connection"
+        try:
+            while True:
+                message = recv_frame(self.sock)
+                if message is None:
+                    break
+                with self._pending_lock:
+                    pending = self._pending.get(message.get("id"))
+                if pending is None:
+                    continue
+                kind = message.get("type")
+                options = pending.options
+                if kind == "output":
+                    if options and options.on_output:
+                        options.on_output(message.get("stream", "stdout"), message.get("line", ""))
+                elif kind == "hang":
+                    if options and options.on_hang:
+                        options.on_hang(message.get("idle", 0))
+                elif kind in ("result", "error"):
+                    if options is not None:
+                        options.exit_code = message.get("exit_code")
+                    pending.result = message.get("result")
+                    pending.error = message.get("message") if kind == "error" else None
+                    with self._pending_lock:
+                        self._pending.pop(message.get("id"), None)
+                    pending.done.set()
+        except (OSError, ValueError, BrokerError) as e:
+            reason = f"Lost the connection to the broker: {e}"
+        self._fail_pending(reason)
+
+    def _fail_pending(self, reason: str):
+        with self._pending_lock:
+            self._closed = reason
+            pending, self._pending = list(self._pending.values()), {}
+        for call in pending:
+            call.error = reason
+            call.done.set()
+
+    def call(self, method: str, options: LaunchOptions = None, **params):
+        """
+        Execute a backend method in the broker
+
+        Output lines and hang reports are delivered to the options'
+        callbacks as they arrive, and the child's exit code is stored in
+        options.exit_code, as with a local backend.
+
+        Raises:
+            BrokerError: If the broker rejected the request, raised, or is gone
+        """
+        pending = _PendingCall(options)
+        with self._pending_lock:
+            if self._closed:
+                raise BrokerError(self._closed)
+            self._next_id += 1
+            call_id = self._next_id
+            self._pending[call_id] = pending
+        message = {"type": "call", "id": call_id, "method": method, "params": params}
+        if method in LAUNCH_METHODS:
+            message["options"] = _options_to_wire(options)
+        try:
+            with self._send_lock:
+                send_frame(self.sock, message)
+        except OSError as e:
+            with self._pending_lock:
+                self._pending.pop(call_id, None)
+            raise BrokerError(f"Lost the connection to the broker: {e}")
+        pending.done.wait()
+        if pending.error is not None:
+            raise BrokerError(pending.error)
+        return pending.result
+
+    def close(self):
+        """Close the connection, which also stops the broker"""
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def launch_broker(arguments: List[str] = None, elevate: bool = True,
+                  timeout: float = STARTUP_TIMEOUT) -> BrokerClient:
+    """
+    Start a broker process and connect to it
+
+    Args:
+        arguments: Extra command-line arguments for the broker (for example
+            the --simulate options, so it builds the same backend)
+        elevate: Start it with administrator privileges (one UAC prompt);
+            otherwise it runs as a plain child process
+        timeout: Seconds to wait for it to start listening
+
+    Returns:
+        Connected BrokerClient
+
+    Raises:
+        BrokerError: If the broker could not be started or did not come up in time
+    """
+    secret = os.urandom(SECRET_BYTES)
+    handoff_path = os.path.join(data_dir(), f"broker-{os.getpid()}-{os.urandom(4).hex()}.json")
+    # Created exclusively and readable only by this user (on POSIX)
+    fd = os.open(handoff_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"secret": secret.hex()}, f)
+
+    if getattr(sys, 'frozen', False):
+        command = [sys.executable]
+    else:
+        command = [sys.executable, os.path.join(SCRIPT_DIR, "better10.py")]
+    command += ["--broker-serve", handoff_path] + list(arguments or [])
+
+    process = None
+    try:
+        if elevate:
+            import ctypes
+            # SW_HIDE: the broker has no window of its own
+            result = ctypes.windll.shell32.ShellExecuteW(
+                None, "runas", command[0], subprocess.list2cmdline(command[1:]), os.getcwd(), 0
+            )
+            if result <= 32:
+                raise BrokerError(f"Elevation was cancelled or failed (ShellExecute error {result})")
+        else:
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + timeout
+        port = None
+        while port is None:
+            if process is not None and process.poll() is not None:
+                raise BrokerError(f"The broker exited with code {process.returncode} before it was ready")
+            if time.monotonic() > deadline:
+                raise BrokerError(f"The broker did not start within {timeout:.0f} seconds")
+            try:
+                with open(handoff_path, "r", encoding="utf-8") as f:
+                    port = json.load(f).get("port")
+            except (OSError, ValueError):
+                pass  # Not rewritten yet (or being replaced right now)
+            if port is None:
+                time.sleep(0.1)
+    except BrokerError:
+        if process is not None and process.poll() is None:
+            process.kill()
+        raise
+    finally:
+        try:
+            os.remove(handoff_path)
+        except OSError:
+            pass
+
+    return BrokerClient(port, secret, process=process)
+
+
+class BrokerBackend(SystemBackend):
+    """
+    Backend that forwards every call to an elevated broker
+
+    Its name is the broker's backend name, so durations, history, logs and
+    snapshots land in the same files as when the GUI itself was elevated.
+    A broker that has gone away makes the launch and registry write methods
+    fail like any other failed call; queries raise BrokerError.
+    """
+
+    def __init__(self, client: BrokerClient):
+        self.client = client
+        self.name = client.backend_name
+
+    def close(self):
+        self.client.close()
+
+    def _launch(self, method: str, options: Optional[LaunchOptions], **params) -> Tuple[bool, str, str]:
+        try:
+            return tuple(self.client.call(method, options, **params))
+        except BrokerError as e:
+            return False, "", str(e)
+
+    def is_admin(self) -> bool:
+        return self.client.call("is_admin")
+
+    def run_powershell(self, command: str, as_admin: bool = False, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        return self._launch("run_powershell", options, command=command, as_admin=as_admin)
+
+    def run_winget(self, operation: str, package_id: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        return self._launch("run_winget", options, operation=operation, package_id=package_id)
+
+    def run_installer(self, installer_path: str, installer_type: str = None, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        return self._launch("run_installer", options, installer_path=installer_path, installer_type=installer_type)
+
+    def run_tool(self, tool_path: str, tool_type: str = None, options: LaunchOptions = None,
+                 args: List[str] = None) -> Tuple[bool, str, str]:
+        return self._launch("run_tool", options, tool_path=tool_path, tool_type=tool_type, args=args)
+
+    def run_executable(self, exe_path: str, args: List[str] = None, as_admin: bool = True, options: LaunchOptions = None) -> Tuple[bool, str, str]:
+        return self._launch("run_executable", options, exe_path=exe_path, args=args, as_admin=as_admin)
+
+    def set_registry_value(self, key_path: str, value_name: str, value, hive: int = HKEY_LOCAL_MACHINE) -> Tuple[bool, str]:
+        try:
+            return tuple(self.client.call("set_registry_value", key_path=key_path, value_name=value_name,
+                                          value=value, hive=hive))
+        except BrokerError as e:
+            return False, str(e)
+
+    def install_msix_packages(self, package_paths: List[str], dependency_paths: List[str] = None,
+                              options: LaunchOptions = None) -> List[Tuple[bool, str]]:
+        try:
+            return [tuple(result) for result in self.client.call(
+                "install_msix_packages", options, package_paths=package_paths, dependency_paths=dependency_paths)]
+        except BrokerError as e:
+            return [(False, str(e))] * len(package_paths)
+
+    def restart(self, delay: int = 5) -> Tuple[bool, str]:
+        try:
+            return tuple(self.client.call("restart", delay=delay))
+        except BrokerError as e:
+            return False, str(e)
+
+    def machine_metrics(self) -> Dict:
+        return self.client.call("machine_metrics")
+
+    def schedule_logon_task(self, name: str, command: str, delay_minutes: int = 3) -> Tuple[bool, str]:
+        try:
+            return tuple(self.client.call("schedule_logon_task", name=name, command=command,
+                                          delay_minutes=delay_minutes))
+        except BrokerError as e:
+            return False, str(e)
+
+    def delete_scheduled_task(self, name: str) -> Tuple[bool, str]:
+        try:
+            return tuple(self.client.call("delete_scheduled_task", name=name))
+        except BrokerError as e:
+            return False, str(e)
+
+    def inventory(self, winget: bool = True) -> Dict[str, List[str]]:
+        return self.client.call("inventory", winget=winget)
+
+    def read_registry_state(self, queries: List[Tuple[int, str, str]]) -> List[Dict]:
+        return self.client.call("read_registry_state", queries=[list(query) for query in queries])
+
+    def apply_registry_changes(self, changes: List[Dict]) -> List[Tuple[bool, str]]:
+        try:
+            return [tuple(result) for result in self.client.call("apply_registry_changes", changes=changes)]
+        except BrokerError as e:
+            return [(False, str(e))] * len(changes)
+
+    def user_profiles(self) -> List[Dict]:
+        return self.client.call("user_profiles")
+
+    def load_user_hive(self, mount: str, hive_path: str) -> Tuple[str, str]:
+        return tuple(self.client.call("load_user_hive", mount=mount, hive_path=hive_path))
+
+    def unload_user_hive(self, mount: str) -> Tuple[bool, str]:
+        try:
+            return tuple(self.client.call("unload_user_hive", mount=mount))
+        except BrokerError as e:
+            return False, str(e)
+
+    def paths_exist(self, paths: List[str]) -> List[bool]:
+        return self.client.call("paths_exist", paths=paths)
+
+    def file_sizes(self, paths: List[str]) -> List[Optional[int]]:
+        return self.client.call("file_sizes", paths=paths)
+
+    def free_disk_space(self, path: str = None) -> Optional[int]:
+        return self.client.call("free_disk_space", path=path)
+
+    def winget_available(self) -> bool:
+        return self.client.call("winget_available")
+
+    def pending_reboot(self) -> List[str]:
+        return self.client.call("pending_reboot")
@@ -0,0 +1,133 @@
+"""
+Live folder watching for the Apps and Tools catalogs
+
+The Apps and Tools folders are watched for changes, so installers and
+tools dropped in while Better10 is open show up without a restart. Change
+notifications only say that a folder changed. Each folder keeps a
+snapshot of its files (name -> size and modification time), and the new
+listing is diffed against it to find what was added, removed or
+modified. Only those catalog rows are then touched.
+
+Notifications are debounced. A burst, such as copying 200 installers,
+becomes one refresh once the folder has been quiet for DEBOUNCE_MS. A
+refresh is never postponed by more than MAX_DELAY_MS, so a slow
+continuous copy still shows progress.
+"""
+
+import os
+import time
+from typing import List, Dict, Tuple
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+# File name -> (size, modification time in ns)
+FolderSnapshot = Dict[str, Tuple[int, int]]
+
+
+def snapshot_folder(folder: str) -> FolderSnapshot:
+    """Return the size and modification time of every file directly in a folder"""
+    snapshot = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    # Removed between listing and stat
+                    continue
+    except OSError:
+        pass
+    return snapshot
+
+
+def diff_snapshots(old: FolderSnapshot, new: FolderSnapshot) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Compare two snapshots of a folder
+
+    Returns:
+        Tuple of (added, removed, changed) file names, each sorted
+    """
+    added = sorted(name for name in new if name not in old)
+    removed = sorted(name for name in old if name not in new)
+    changed = sorted(name for name in new if name in old and new[name] != old[name])
+    return added, removed, changed
+
+
+class CatalogWatcher(QObject):
+    """
+    Watches catalog folders and reports debounced, per-file changes
+
+    The parent folder is watched too, so a catalog folder that is created,
+    deleted or renamed after startup is picked up.
+    """
+
+    # folder, added paths, removed paths, changed paths
+    folder_changed = pyqtSignal(str, list, list, list)
+
+    DEBOUNCE_MS = 500
+    MAX_DELAY_MS = 3000
+
+    def __init__(self, folders: List[str], parent=None):
+        super().__init__(parent)
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.snapshots: Dict[str, FolderSnapshot] = {folder: snapshot_folder(folder) for folder in self.folders}
+        self._dirty = set()
+        self._first_event = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._watch_existing()
+
+    def _watch_existing(self):
+        """(Re)add watches; Qt drops the watch on a folder that is deleted or renamed"""
+        watched = set(self._watcher.directories())
+        for folder in self.folders + sorted({os.path.dirname(folder) for folder in self.folders}):
+            if folder not in watched and os.path.isdir(folder):
+                self._watcher.addPath(folder)
+
+    def _on_directory_changed(self, path: str):
+        path = os.path.abspath(path)
+        if path in self.folders:
+            self._dirty.add(path)
+        else:
+            # The parent changed: a catalog folder may have appeared or gone
+            self._dirty.update(folder for folder in self.folders if os.path.dirname(folder) == path)
+        if not self._dirty:
+            return
+
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+        waited_ms = (now - self._first_event) * 1000
+        self._timer.start(int(max(0, min(self.DEBOUNCE_MS, self.MAX_DELAY_MS - waited_ms))))
+
+    def flush(self):
+        """Diff every folder that changed since the last refresh and report the differences"""
+        self._timer.stop()
+        self._first_event = None
+        dirty, self._dirty = self._dirty, set()
+        self._watch_existing()
+
+        for folder in self.folders:
+            if folder not in dirty:
+                continue
+            snapshot = snapshot_folder(folder)
+            added, removed, changed = diff_snapshots(self.snapshots[folder], snapshot)
+            self.snapshots[folder] = snapshot
+            if added or removed or changed:
+                self.folder_changed.emit(
+                    folder,
+                    [os.path.join(folder, name) for name in added],
+                    [os.path.join(folder, name) for name in removed],
+                    [os.path.join(folder, name) for name in changed]
+                )
+
+    def contains(self, folder: str, filename: str) -> bool:
+        """Check whether a watched folder held a file (case-insensitive) at the last refresh"""
+        return filename.lower() in {name.lower() for name in self.snapshots.get(os.path.abspath(folder), {})}
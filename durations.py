@@ -0,0 +1,304 @@
+"""
+Operation duration history and adaptive timeouts for Better10
+
+Every successful operation records how long it took, both for the
+operation itself (its package id, installer path or command) and for its
+kind ("powershell", "local_installer:msi", "tool:exe", ...). Timeouts are
+derived from that history instead of the fixed 300/600 second limits,
+so a step that normally finishes in 20 seconds is not given 10 minutes.
+The pooled kind history is only used for operations without history of
+their own: three quick installs must not cut short the next large one.
+"""
+
+import os
+import json
+import hashlib
+import statistics
+import threading
+from typing import List, Dict, Optional
+
+from backends import data_dir, resolve_path
+from process_monitor import LaunchOptions, HangAction
+
+
+# Fixed limits used until an operation kind has enough history
+DEFAULT_TIMEOUTS = {
+    'powershell': 300,
+    'winget_install': 600,
+    'winget_uninstall': 600,
+    'local_installer': 600,
+    'tool': 600,
+    'executable': 600,
+}
+
+# Shortest timeout ever derived per operation type. Installers are given
+# room, since the history of one package says little about its next version.
+TIMEOUT_FLOORS = {
+    'powershell': 30,
+    'winget_install': 300,
+    'winget_uninstall': 120,
+    'local_installer': 300,
+    'tool': 60,
+    'executable': 60,
+}
+
+# Rough cost in seconds of each operation type before it has any history
+DEFAULT_COSTS = {
+    'registry': 0.05,
+    'powershell': 5.0,
+    'winget_install': 90.0,
+    'winget_uninstall': 30.0,
+    'local_installer': 60.0,
+    'tool': 30.0,
+    'executable': 30.0,
+}
+
+# Installer throughput assumed when sizing an installer without history
+INSTALLER_BYTES_PER_SECOND = 8 * 1024 * 1024
+
+# Operation kinds the inactivity watchdog must leave alone. msiexec hands
+# the install to the Windows Installer service, and Add-AppxPackage hands
+# an MSIX deployment (a whole batch of them, in one session) to the AppX
+# deployment service. Neither service is part of the launched process
+# tree, so a busy install looks idle from here.
+WATCHDOG_EXEMPT_KINDS = {'local_installer:msi', 'local_installer:msix'}
+
+
+def operation_kind(operation: Dict) -> str:
+    """
+    Return the history key for an operation
+
+    Installers and tools are split by file type, because an MSI and a
+    PowerShell script have very different costs.
+    """
+    op_type = operation.get('type', 'unknown')
+    subtype = operation.get('installer_type') or operation.get('tool_profile') or operation.get('tool_type')
+    return f"{op_type}:{subtype}" if subtype else op_type
+
+
+def operation_key(operation: Dict) -> Optional[str]:
+    """
+    Return the history key of one particular operation
+
+    The key is the operation's kind and what it acts on: the package id,
+    installer or tool path, executable or (hashed) PowerShell command.
+
+    Returns:
+        The key, or None if the operation has nothing to identify it by
+    """
+    target = operation.get('package_id') or operation.get('path') or operation.get('exe_path')
+    if target:
+        target = str(target).replace('/', '\\').lower()
+    elif operation.get('command'):
+        target = hashlib.sha1(operation['command'].encode('utf-8')).hexdigest()[:16]
+    else:
+        return None
+    return f"{operation_kind(operation)}@{target}"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the value at a fraction (0.0-1.0) of the sorted values, interpolating linearly"""
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile() of empty list")
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class DurationHistory:
+    """
+    Recent durations per history key, persisted as JSON
+
+    Keys are operation kinds and operation keys (see operation_key). Only
+    the most recent max_samples durations are kept for each, so the history
+    follows changes in the machine or the installers.
+    """
+
+    def __init__(self, path: str = None, max_samples: int = 50):
+        """
+        Args:
+            path: JSON file to load from and save to (in-memory only if None)
+            max_samples: Durations kept per operation kind
+        """
+        self.path = path
+        self.max_samples = max_samples
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._samples = {kind: [float(v) for v in values][-max_samples:]
+                                 for kind, values in data.get("durations", {}).items()}
+            except (OSError, ValueError, AttributeError):
+                # A corrupt history only costs us the adaptive behaviour
+                self._samples = {}
+
+    @classmethod
+    def for_backend(cls, backend_name: str) -> "DurationHistory":
+        """Return the history stored in the data directory for a backend"""
+        return cls(os.path.join(data_dir(), f"durations_{backend_name}.json"))
+
+    def record(self, kind: str, seconds: float):
+        """Record a duration for an operation kind"""
+        with self._lock:
+            samples = self._samples.setdefault(kind, [])
+            samples.append(round(seconds, 3))
+            del samples[:-self.max_samples]
+
+    def samples(self, kind: str) -> List[float]:
+        """Return a copy of the recorded durations for an operation kind"""
+        with self._lock:
+            return list(self._samples.get(kind, []))
+
+    def kinds(self) -> List[str]:
+        """Return all operation kinds with recorded durations"""
+        with self._lock:
+            return list(self._samples)
+
+    def save(self):
+        """Write the history to disk (no-op for in-memory histories)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"durations": self._samples}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+
+class TimeoutPolicy:
+    """
+    Derives per-operation timeouts and watchdog settings
+
+    Once an operation (or, failing that, its kind) has min_samples
+    durations, its timeout becomes multiplier x the 95th percentile,
+    clamped between the type's floor and the fixed default. The class
+    attributes are the defaults main() configures from the command line.
+    """
+
+    inactivity_timeout: Optional[float] = 90.0
+    hang_action: str = HangAction.KILL
+    adaptive: bool = True
+
+    def __init__(self, history: DurationHistory = None, multiplier: float = 3.0,
+                 floor: float = None, min_samples: int = 3):
+        """
+        Args:
+            history: Duration history to derive timeouts from (in-memory if None)
+            multiplier: Headroom applied to the 95th percentile
+            floor: Shortest timeout ever derived, in seconds (default: TIMEOUT_FLOORS)
+            min_samples: Durations needed before a kind gets an adaptive timeout
+        """
+        self.history = history or DurationHistory()
+        self.multiplier = multiplier
+        self.floor = floor
+        self.min_samples = min_samples
+
+    @classmethod
+    def configure(cls, inactivity_timeout: float = None, hang_action: str = None, adaptive: bool = None):
+        """Change the defaults used by new policies (0 disables the watchdog)"""
+        if inactivity_timeout is not None:
+            cls.inactivity_timeout = inactivity_timeout or None
+        if hang_action is not None:
+            cls.hang_action = hang_action
+        if adaptive is not None:
+            cls.adaptive = adaptive
+
+    def timeout_for(self, operation: Dict) -> Optional[float]:
+        """
+        Return the timeout in seconds for an operation
+
+        An operation's own "timeout" (set by tool profiles, or in a profile
+        file) takes precedence.
+
+        Returns:
+            Timeout in seconds, or None for operation types that launch no process
+        """
+        if operation.get('timeout'):
+            return float(operation['timeout'])
+        default = DEFAULT_TIMEOUTS.get(operation.get('type'))
+        if default is None:
+            return None
+        if not self.adaptive:
+            return default
+
+        samples = self.samples_for(operation)
+        if len(samples) < self.min_samples:
+            return default
+        floor = self.floor if self.floor is not None else TIMEOUT_FLOORS.get(operation.get('type'), 30)
+        derived = percentile(samples, 0.95) * self.multiplier
+        return min(default, max(floor, derived))
+
+    def samples_for(self, operation: Dict) -> List[float]:
+        """Return the operation's own durations if it has enough, else those of its kind"""
+        key = operation_key(operation)
+        if key is not None:
+            samples = self.history.samples(key)
+            if len(samples) >= self.min_samples:
+                return samples
+        return self.history.samples(operation_kind(operation))
+
+    def inactivity_timeout_for(self, operation: Dict) -> Optional[float]:
+        """Return the watchdog window for an operation, or None if it is exempt"""
+        if operation_kind(operation) in WATCHDOG_EXEMPT_KINDS:
+            return None
+        return self.inactivity_timeout
+
+    def launch_options(self, operation: Dict, on_hang=None, on_output=None) -> LaunchOptions:
+        """Build the LaunchOptions for an operation"""
+        return LaunchOptions(
+            timeout=self.timeout_for(operation),
+            inactivity_timeout=self.inactivity_timeout_for(operation),
+            hang_action=self.hang_action,
+            on_hang=on_hang,
+            on_output=on_output
+        )
+
+    def record(self, operation: Dict, seconds: float):
+        """Record how long a successful operation took, for the operation and for its kind"""
+        self.history.record(operation_kind(operation), seconds)
+        key = operation_key(operation)
+        if key is not None:
+            self.history.record(key, seconds)
+
+    def save(self):
+        """Persist the duration history"""
+        try:
+            self.history.save()
+        except OSError:
+            pass
+
+
+class CostEstimator:
+    """
+    Expected duration of operations, used to weight progress
+
+    The median of the operation's own recorded durations, or else of its
+    kind's, is used when there is any history. Otherwise a local installer
+    is sized from its file, and every other operation falls back to
+    DEFAULT_COSTS.
+    """
+
+    def __init__(self, history: DurationHistory = None):
+        self.history = history or DurationHistory()
+
+    def estimate(self, operation: Dict) -> float:
+        """Return the expected duration of an operation in seconds"""
+        key = operation_key(operation)
+        samples = (self.history.samples(key) if key is not None else []) or \
+            self.history.samples(operation_kind(operation))
+        if samples:
+            return max(0.01, statistics.median(samples))
+
+        op_type = operation.get('type')
+        if op_type == 'local_installer' and operation.get('path'):
+            try:
+                size = os.path.getsize(resolve_path(operation['path']))
+                return max(5.0, size / INSTALLER_BYTES_PER_SECOND)
+            except OSError:
+                pass
+        return DEFAULT_COSTS.get(op_type, 10.0)
@@ -0,0 +1,333 @@
+"""
+Run events for Better10
+
+WorkerThread publishes what happens during a run as typed events on an
+EventBus instead of human-readable text:
+
+- plan_started: the plan, its size and the backend it runs against
+- op_started: an operation (or a retry of one) starts
+- op_output: a line of child output
+- op_finished: an operation ends, with its outcome, duration and exit code
+- run_finished: the run ends, with its counts
+- log and progress: the messages and progress shown to the user
+
+Every sink (the Logs tab, the run log file, the resource sampler, the run
+history, agent streaming) subscribes on its own. Each subscriber has a
+bounded queue and a dispatcher thread, so publishing never waits on a sink:
+when a queue is full the oldest event is dropped and counted. Sinks that
+must see every event they subscribe to (the run log file, the run history)
+make the publisher wait for room instead; with a queue of thousands of
+events that only happens when the sink itself cannot keep up, such as a
+disk too slow for a child's output.
+
+Events of one run are delivered to each subscriber in the order they were
+published. Handlers must not publish on the bus they are subscribed to.
+"""
+
+import time
+import threading
+from collections import deque
+from typing import List, Dict, Optional, Callable, Iterable
+
+
+class EventKind:
+    """Kinds of run events"""
+    PLAN_STARTED = "plan_started"
+    OP_STARTED = "op_started"
+    OP_OUTPUT = "op_output"
+    OP_FINISHED = "op_finished"
+    RUN_FINISHED = "run_finished"
+    LOG = "log"
+    PROGRESS = "progress"
+
+
+class Event:
+    """
+    Base of all run events
+
+    time is the wall-clock time the event was published; monotonic is the
+    time.monotonic() value of the same moment, for sinks that measure spans.
+    """
+
+    kind = ""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.time = time.time()
+        self.monotonic = time.monotonic()
+
+    def fields(self) -> Dict:
+        """The event's own fields"""
+        return {}
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable form"""
+        return {"kind": self.kind, "run_id": self.run_id, "time": round(self.time, 3), **self.fields()}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.fields()}>"
+
+
+class PlanStarted(Event):
+    kind = EventKind.PLAN_STARTED
+
+    def __init__(self, run_id: str, name: Optional[str], operation_count: int, backend: str):
+        super().__init__(run_id)
+        self.name = name
+        self.operation_count = operation_count
+        self.backend = backend
+
+    def fields(self) -> Dict:
+        return {"name": self.name, "operation_count": self.operation_count, "backend": self.backend}
+
+
+class OpStarted(Event):
+    kind = EventKind.OP_STARTED
+
+    def __init__(self, run_id: str, index: int, name: str, op_type: str, attempt: int = 1):
+        super().__init__(run_id)
+        self.index = index
+        self.name = name
+        self.op_type = op_type
+        self.attempt = attempt
+
+    def fields(self) -> Dict:
+        return {"index": self.index, "name": self.name, "op_type": self.op_type, "attempt": self.attempt}
+
+
+class OpOutput(Event):
+    kind = EventKind.OP_OUTPUT
+
+    def __init__(self, run_id: str, index: int, name: str, stream: str, line: str):
+        super().__init__(run_id)
+        self.index = index
+        self.name = name
+        self.stream = stream
+        self.line = line
+
+    def fields(self) -> Dict:
+        return {"index": self.index, "name": self.name, "stream": self.stream, "line": self.line}
+
+
+class OpFinished(Event):
+    """
+    An operation attempt ended
+
+    outcome is an OperationOutcome value, or "retry" when a transient
+    failure was requeued; duration is in seconds.
+    """
+
+    kind = EventKind.OP_FINISHED
+    RETRY = "retry"
+
+    def __init__(self, run_id: str, index: int, name: str, outcome: str, duration: float,
+                 exit_code: Optional[int] = None, error: str = None, attempt: int = 1):
+        super().__init__(run_id)
+        self.index = index
+        self.name = name
+        self.outcome = outcome
+        self.duration = duration
+        self.exit_code = exit_code
+        self.error = error
+        self.attempt = attempt
+
+    def fields(self) -> Dict:
+        return {"index": self.index, "name": self.name, "outcome": self.outcome,
+                "duration": round(self.duration, 3), "exit_code": self.exit_code,
+                "error": self.error, "attempt": self.attempt}
+
+
+class RunFinished(Event):
+    kind = EventKind.RUN_FINISHED
+
+    def __init__(self, run_id: str, success: bool, successful: int = 0, failed: int = 0, retries: int = 0,
+                 cancelled: bool = False, reboot_required: List[str] = None):
+        super().__init__(run_id)
+        self.success = success
+        self.successful = successful
+        self.failed = failed
+        self.retries = retries
+        self.cancelled = cancelled
+        self.reboot_required = reboot_required or []
+
+    def fields(self) -> Dict:
+        return {"success": self.success, "successful": self.successful, "failed": self.failed,
+                "retries": self.retries, "cancelled": self.cancelled, "reboot_required": self.reboot_required}
+
+
+class LogMessage(Event):
+    """A message for the user; operation is the one running when it was logged"""
+
+    kind = EventKind.LOG
+
+    def __init__(self, run_id: str, message: str, level: str, operation: str = ""):
+        super().__init__(run_id)
+        self.message = message
+        self.level = level
+        self.operation = operation
+
+    def fields(self) -> Dict:
+        return {"message": self.message, "level": self.level, "operation": self.operation}
+
+
+class Progress(Event):
+    kind = EventKind.PROGRESS
+
+    def __init__(self, run_id: str, percent: int, eta: float):
+        super().__init__(run_id)
+        self.percent = percent
+        self.eta = eta
+
+    def fields(self) -> Dict:
+        return {"percent": self.percent, "eta": round(self.eta, 1)}
+
+
+class Overflow:
+    """What publishing does when a subscriber's queue is full"""
+    DROP_OLDEST = "drop_oldest"  # Drop the subscriber's oldest queued event; never waits
+    BLOCK = "block"              # Wait for room; for sinks that must see every event
+
+
+class Subscription:
+    """
+    One subscriber: its handler, queue and dispatcher thread
+
+    dropped counts the events discarded because the queue was full, errors
+    the events the handler raised on (the first message is kept in error).
+    """
+
+    def __init__(self, handler: Callable[[Event], None], name: str, kinds: Optional[Iterable[str]],
+                 max_queue: int, overflow: str):
+        self.handler = handler
+        self.name = name
+        self.kinds = frozenset(kinds) if kinds else None
+        self.max_queue = max(1, max_queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self.errors = 0
+        self.error: Optional[str] = None
+        self._queue = deque()
+        self._busy = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"events-{name}", daemon=True)
+        self._thread.start()
+
+    def wants(self, event: Event) -> bool:
+        return self.kinds is None or event.kind in self.kinds
+
+    def offer(self, event: Event):
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == Overflow.BLOCK:
+                    self._condition.wait_for(lambda: len(self._queue) < self.max_queue or self._closed)
+                    if self._closed:
+                        return
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+            self._queue.append(event)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+                event = self._queue.popleft()
+                self._busy = True
+                self._condition.notify_all()
+            try:
+                self.handler(event)
+            except Exception as e:
+                self.errors += 1
+                if self.error is None:
+                    self.error = f"{type(e).__name__}: {e}"
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued event has been handled; False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def close(self, timeout: float = None):
+        """Deliver the queued events, then stop the dispatcher"""
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+
+class EventBus:
+    """
+    Delivers published events to every interested subscriber
+
+    Safe to publish from any thread. Subscribers added after an event was
+    published do not see it.
+    """
+
+    DEFAULT_QUEUE = 10000
+
+    def __init__(self):
+        self.subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def subscribe(self, handler: Callable[[Event], None], name: str = None, kinds: Iterable[str] = None,
+                  max_queue: int = DEFAULT_QUEUE, overflow: str = Overflow.DROP_OLDEST) -> Subscription:
+        """
+        Add a subscriber
+
+        Args:
+            handler: Called with each event, in the subscriber's own thread
+            name: Name used for the dispatcher thread and in drop reports
+            kinds: EventKind values to receive (default: all)
+            max_queue: Events queued for this subscriber before overflow applies
+            overflow: Overflow value
+        """
+        subscription = Subscription(handler, name or getattr(handler, "__name__", "subscriber"),
+                                    kinds, max_queue, overflow)
+        with self._lock:
+            self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+        subscription.close()
+
+    def publish(self, event: Event):
+        """Queue an event for every subscriber that wants it"""
+        if self._closed:
+            return
+        # The list is replaced, never changed in place, so it can be read without the lock
+        for subscription in self.subscriptions:
+            if subscription.wants(event):
+                subscription.offer(event)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every subscriber has handled the events published so far"""
+        return all([subscription.flush(timeout) for subscription in self.subscriptions])
+
+    def close(self, timeout: float = None):
+        """Deliver the queued events and stop every dispatcher; later events are ignored"""
+        self._closed = True
+        for subscription in self.subscriptions:
+            subscription.close(timeout)
+
+    def overflow_report(self) -> List[str]:
+        """One line per subscriber that dropped events or whose handler failed"""
+        lines = []
+        for subscription in self.subscriptions:
+            if subscription.dropped:
+                lines.append(f"{subscription.name} fell behind and missed {subscription.dropped} event(s)")
+            if subscription.errors:
+                lines.append(f"{subscription.name} failed on {subscription.errors} event(s): {subscription.error}")
+        return lines
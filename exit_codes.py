@@ -0,0 +1,152 @@
+"""
+Exit code classification and retry scheduling for Better10
+
+A non-zero exit does not always mean failure: msiexec returns 3010 when an
+install succeeded but needs a restart, and 1618 when it could not start
+because another installation holds the Windows Installer mutex. Each
+installer technology gets a table mapping exit codes to an outcome, and
+transient outcomes are retried with backoff instead of failing the step.
+"""
+
+import os
+from typing import Dict, Tuple, Optional
+
+
+class ExitOutcome:
+    """What an exit code means for the operation"""
+    SUCCESS = "success"
+    SUCCESS_REBOOT = "success_reboot"  # Succeeded, restart needed to finish
+    TRANSIENT = "transient"            # Temporary collision; retry later
+    FAILURE = "failure"
+
+
+# Codes shared by MSI and by the many EXE installers that wrap an MSI
+# (InstallShield, WiX Burn bundles, ...)
+_MSI_CODES = {
+    0: (ExitOutcome.SUCCESS, "Success"),
+    1641: (ExitOutcome.SUCCESS_REBOOT, "Success, the installer initiated a restart"),
+    3010: (ExitOutcome.SUCCESS_REBOOT, "Success, restart required to complete"),
+    1618: (ExitOutcome.TRANSIENT, "Another installation is already in progress"),
+    1602: (ExitOutcome.FAILURE, "Installation cancelled by user"),
+    1603: (ExitOutcome.FAILURE, "Fatal error during installation"),
+    1619: (ExitOutcome.FAILURE, "Installation package could not be opened"),
+    1620: (ExitOutcome.FAILURE, "Installation package is invalid"),
+    1625: (ExitOutcome.FAILURE, "Installation prohibited by system policy"),
+    1633: (ExitOutcome.FAILURE, "Installation package is not supported on this platform"),
+    1638: (ExitOutcome.SUCCESS, "Another version of this product is already installed"),
+}
+
+EXIT_CODE_TABLES: Dict[str, Dict[int, Tuple[str, str]]] = {
+    'msi': _MSI_CODES,
+    'exe': dict(_MSI_CODES),
+    'winget': {
+        0: (ExitOutcome.SUCCESS, "Success"),
+        0x8A150008: (ExitOutcome.TRANSIENT, "Download failed"),
+        0x8A15002B: (ExitOutcome.SUCCESS, "No applicable upgrade; package is up to date"),
+        0x8A150061: (ExitOutcome.SUCCESS, "Package is already installed"),
+        0x8A150101: (ExitOutcome.TRANSIENT, "Application is currently running"),
+        0x8A150102: (ExitOutcome.TRANSIENT, "Another installation is already in progress"),
+        0x8A150103: (ExitOutcome.TRANSIENT, "One or more files are in use"),
+        0x8A150104: (ExitOutcome.FAILURE, "Installer is missing a dependency"),
+        0x8A150105: (ExitOutcome.FAILURE, "Not enough disk space"),
+        0x8A150106: (ExitOutcome.FAILURE, "Not enough memory"),
+        0x8A150107: (ExitOutcome.TRANSIENT, "No network connection"),
+        0x8A150108: (ExitOutcome.FAILURE, "Installation error; contact support"),
+        0x8A150109: (ExitOutcome.SUCCESS_REBOOT, "Success, restart required to complete"),
+        0x8A15010A: (ExitOutcome.FAILURE, "A restart is required before installing"),
+        0x8A15010B: (ExitOutcome.SUCCESS_REBOOT, "Success, the installer initiated a restart"),
+        0x8A15010C: (ExitOutcome.FAILURE, "Installation cancelled by user"),
+        0x8A15010D: (ExitOutcome.SUCCESS, "Another version is already installed"),
+        0x8A15010E: (ExitOutcome.FAILURE, "A higher version is already installed"),
+        0x8A15010F: (ExitOutcome.FAILURE, "Installation blocked by policy"),
+        0x8A150111: (ExitOutcome.TRANSIENT, "Package is in use by another application"),
+    },
+    'msix': {
+        0: (ExitOutcome.SUCCESS, "Success"),
+    },
+}
+
+# HRESULTs that appear in Add-AppxPackage / Remove-AppxPackage error text.
+# PowerShell itself only exits with 1, so these are matched in the output.
+OUTPUT_MARKERS = {
+    'msix': [
+        ("0x80073D02", ExitOutcome.TRANSIENT, "Package resources are in use"),
+        ("0x80073CFB", ExitOutcome.SUCCESS, "Package is already installed"),
+    ],
+    'powershell': [
+        ("0x80073D02", ExitOutcome.TRANSIENT, "Package resources are in use"),
+    ],
+}
+
+
+def operation_technology(operation: Dict) -> str:
+    """Return the exit-code table key for an operation"""
+    op_type = operation.get('type')
+    if op_type in ('winget_install', 'winget_uninstall'):
+        return 'winget'
+    if op_type == 'local_installer':
+        installer_type = operation.get('installer_type')
+        if not installer_type:
+            ext = os.path.splitext(operation.get('path', ''))[1].lower()
+            installer_type = ext[1:] if ext in ('.msi', '.msix') else 'exe'
+        return installer_type
+    if op_type == 'executable':
+        return 'exe'
+    if op_type == 'tool' and operation.get('tool_profile'):
+        return f"tool:{operation['tool_profile']}"
+    return op_type or 'unknown'
+
+
+def classify_exit(technology: str, exit_code: Optional[int], output: str = "") -> Tuple[str, str]:
+    """
+    Classify how a child process ended
+
+    Args:
+        technology: Table key ('msi', 'exe', 'msix', 'winget', 'tool', ...)
+        exit_code: Process exit code, or None if it never exited normally
+        output: Combined stdout/stderr, searched for known HRESULTs
+
+    Returns:
+        Tuple of (ExitOutcome value, description)
+    """
+    for marker, outcome, description in OUTPUT_MARKERS.get(technology, []):
+        if marker.lower() in output.lower():
+            return outcome, f"{description} ({marker})"
+
+    if exit_code is None:
+        return ExitOutcome.FAILURE, "Process did not exit normally"
+
+    # Windows reports exit codes as unsigned DWORDs; winget HRESULTs are often
+    # seen as negative numbers when they pass through PowerShell
+    code = exit_code & 0xFFFFFFFF
+    table = EXIT_CODE_TABLES.get(technology, {})
+    if code in table:
+        return table[code]
+    if code == 0:
+        return ExitOutcome.SUCCESS, "Success"
+    return ExitOutcome.FAILURE, f"Exit code {code if code < 0x10000 else hex(code)}"
+
+
+class RetryPolicy:
+    """
+    Backoff settings for transient failures
+
+    The class attributes are the defaults main() configures from the
+    command line.
+    """
+
+    max_attempts: int = 4
+    base_delay: float = 15.0
+    max_delay: float = 120.0
+
+    @classmethod
+    def configure(cls, max_attempts: int = None, base_delay: float = None):
+        """Change the defaults used by new policies"""
+        if max_attempts is not None:
+            cls.max_attempts = max(1, max_attempts)
+        if base_delay is not None:
+            cls.base_delay = max(0.0, base_delay)
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay in seconds before retrying after the given attempt (1-based)"""
+        return min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
@@ -0,0 +1,196 @@
+"""
+Resource governor for Better10
+
+Installers, Appx removals and tools compete with whoever is using the
+machine while a plan runs. The governor decides, per operation category
+(see run_history.operation_category), how the children of an operation are
+scheduled:
+
+- CPU priority and I/O priority, applied to the child and its descendants
+- an optional CPU affinity, e.g. to keep a core free for the desktop
+- whether the launch is disk-heavy; at most max_disk_jobs disk-heavy jobs
+  (launches, and installer copies made by the stager) run at once
+
+A policy picks the defaults: "fast" finishes as soon as possible and
+leaves scheduling alone, "usable" lowers priorities and runs one disk-heavy
+job at a time so the machine stays responsive. Every setting can be
+overridden from the command line or from the "resources" section of a
+profile file:
+
+    "resources": {
+        "policy": "usable",
+        "max_disk_jobs": 2,
+        "affinity": "2-7",
+        "categories": {
+            "installer": {"cpu_priority": "idle", "io_priority": "very_low"}
+        }
+    }
+"""
+
+from typing import List, Dict, Optional
+
+from process_monitor import CpuPriority, IoPriority, ResourceLimits
+from run_history import OPERATION_CATEGORIES, operation_category
+
+
+class GovernorPolicy:
+    """How launched children share the machine"""
+    FAST = "fast"      # Finish as soon as possible
+    USABLE = "usable"  # Keep the desktop responsive while the plan runs
+
+
+# Per category: (CPU priority, I/O priority, disk-heavy). Registry operations
+# launch nothing and are not listed.
+POLICY_DEFAULTS = {
+    GovernorPolicy.FAST: {
+        "installer": (CpuPriority.NORMAL, IoPriority.NORMAL, True),
+        "bloatware": (CpuPriority.NORMAL, IoPriority.NORMAL, True),
+        "tool": (CpuPriority.NORMAL, IoPriority.NORMAL, False),
+        "script": (CpuPriority.NORMAL, IoPriority.NORMAL, False),
+    },
+    GovernorPolicy.USABLE: {
+        "installer": (CpuPriority.BELOW_NORMAL, IoPriority.LOW, True),
+        "bloatware": (CpuPriority.BELOW_NORMAL, IoPriority.LOW, True),
+        "tool": (CpuPriority.BELOW_NORMAL, IoPriority.NORMAL, False),
+        "script": (CpuPriority.BELOW_NORMAL, IoPriority.NORMAL, False),
+    },
+}
+# Disk-heavy jobs allowed at once when max_disk_jobs is not set (None: unlimited)
+POLICY_DISK_JOBS = {GovernorPolicy.FAST: None, GovernorPolicy.USABLE: 1}
+
+CPU_PRIORITIES = (CpuPriority.IDLE, CpuPriority.BELOW_NORMAL, CpuPriority.NORMAL, CpuPriority.ABOVE_NORMAL)
+IO_PRIORITIES = (IoPriority.VERY_LOW, IoPriority.LOW, IoPriority.NORMAL)
+CATEGORY_SETTINGS = ("cpu_priority", "io_priority", "affinity", "disk_heavy")
+
+
+def parse_cpu_list(value) -> Optional[List[int]]:
+    """
+    Parse a CPU list such as "2-5,7" (or a list of numbers, from a profile)
+
+    Returns:
+        Sorted CPU numbers, or None for an empty list
+    """
+    if value is None:
+        return None
+    if isinstance(value, list):
+        cpus = value
+    else:
+        cpus = []
+        for part in str(value).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            first, _, last = part.partition("-")
+            try:
+                cpus.extend(range(int(first), int(last or first) + 1))
+            except ValueError:
+                raise ValueError(f"Invalid CPU list: {value!r}")
+    if any(not isinstance(cpu, int) or cpu < 0 for cpu in cpus):
+        raise ValueError(f"Invalid CPU list: {value!r}")
+    return sorted(set(cpus)) or None
+
+
+def _check_category(category: str, settings: Dict) -> Dict:
+    if category not in OPERATION_CATEGORIES or category == "registry":
+        raise ValueError(f"Unknown operation category: {category!r}")
+    if not isinstance(settings, dict):
+        raise ValueError(f"Settings for {category} must be an object")
+    unknown = set(settings) - set(CATEGORY_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown setting(s) for {category}: {', '.join(sorted(unknown))}")
+    if settings.get("cpu_priority", CpuPriority.NORMAL) not in CPU_PRIORITIES:
+        raise ValueError(f"Invalid CPU priority for {category}: {settings['cpu_priority']!r}")
+    if settings.get("io_priority", IoPriority.NORMAL) not in IO_PRIORITIES:
+        raise ValueError(f"Invalid I/O priority for {category}: {settings['io_priority']!r}")
+    checked = dict(settings)
+    if "affinity" in checked:
+        checked["affinity"] = parse_cpu_list(checked["affinity"])
+    return checked
+
+
+class ResourceGovernor:
+    """
+    Chooses the ResourceLimits for each operation
+
+    The class attributes are the defaults main() configures from the
+    command line and the profile being run.
+    """
+
+    policy: str = GovernorPolicy.FAST
+    max_disk_jobs: Optional[int] = None  # None: the policy's default; 0: unlimited
+    affinity: Optional[List[int]] = None
+    categories: Dict[str, Dict] = {}     # Per-category overrides of the policy defaults
+
+    @classmethod
+    def configure(cls, policy: str = None, max_disk_jobs: int = None, affinity: List[int] = None,
+                  categories: Dict[str, Dict] = None):
+        """Change the defaults used by new governors; category overrides are merged"""
+        if policy is not None:
+            if policy not in POLICY_DEFAULTS:
+                raise ValueError(f"Unknown resource policy: {policy!r}")
+            cls.policy = policy
+        if max_disk_jobs is not None:
+            cls.max_disk_jobs = max(0, max_disk_jobs)
+        if affinity is not None:
+            cls.affinity = affinity
+        if categories:
+            merged = {category: dict(settings) for category, settings in cls.categories.items()}
+            for category, settings in categories.items():
+                merged.setdefault(category, {}).update(_check_category(category, settings))
+            cls.categories = merged
+
+    @classmethod
+    def configure_from_profile(cls, settings: Dict):
+        """
+        Apply the "resources" section of a profile file
+
+        Raises:
+            ValueError: If the section is malformed
+        """
+        if not isinstance(settings, dict):
+            raise ValueError("The resources section must be an object")
+        unknown = set(settings) - {"policy", "max_disk_jobs", "affinity", "categories"}
+        if unknown:
+            raise ValueError(f"Unknown resource setting(s): {', '.join(sorted(unknown))}")
+        max_disk_jobs = settings.get("max_disk_jobs")
+        if max_disk_jobs is not None and (not isinstance(max_disk_jobs, int) or max_disk_jobs < 0):
+            raise ValueError(f"Invalid max_disk_jobs: {max_disk_jobs!r}")
+        cls.configure(policy=settings.get("policy"), max_disk_jobs=max_disk_jobs,
+                      affinity=parse_cpu_list(settings.get("affinity")),
+                      categories=settings.get("categories"))
+
+    def disk_job_limit(self) -> Optional[int]:
+        """Disk-heavy jobs allowed at once (None: unlimited)"""
+        if self.max_disk_jobs is None:
+            return POLICY_DISK_JOBS[self.policy]
+        return self.max_disk_jobs or None
+
+    def limits_for(self, operation: Dict) -> ResourceLimits:
+        """Return the ResourceLimits for an operation's launches"""
+        category = operation_category(operation)
+        cpu_priority, io_priority, disk_heavy = POLICY_DEFAULTS[self.policy].get(
+            category, (CpuPriority.NORMAL, IoPriority.NORMAL, False))
+        overrides = self.categories.get(category, {})
+        return ResourceLimits(
+            cpu_priority=overrides.get("cpu_priority", cpu_priority),
+            io_priority=overrides.get("io_priority", io_priority),
+            affinity=overrides.get("affinity", self.affinity),
+            disk_heavy=overrides.get("disk_heavy", disk_heavy),
+            max_disk_jobs=self.disk_job_limit()
+        )
+
+    def staging_limits(self) -> ResourceLimits:
+        """ResourceLimits for installer copies, which are scheduled like installers"""
+        cpu_priority, io_priority, _ = POLICY_DEFAULTS[self.policy]["installer"]
+        overrides = self.categories.get("installer", {})
+        return ResourceLimits(overrides.get("cpu_priority", cpu_priority), overrides.get("io_priority", io_priority),
+                              disk_heavy=True, max_disk_jobs=self.disk_job_limit())
+
+    def describe(self) -> str:
+        """One-line summary for the log"""
+        limit = self.disk_job_limit()
+        text = f"Resource policy: {self.policy}, " + \
+               (f"{limit} disk-heavy job(s) at a time" if limit else "no limit on disk-heavy jobs")
+        if self.affinity:
+            text += f", CPUs {','.join(str(cpu) for cpu in self.affinity)}"
+        return text
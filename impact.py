@@ -0,0 +1,287 @@
+"""
+Before/after impact measurement for Better10
+
+Better10 is meant to make machines leaner. With --measure-impact a run
+measures the machine before it starts and again after the next boot, and
+stores both with the deltas in the run history, so profiles can be judged
+on what they actually changed:
+
+- boot, logon and desktop-ready durations, from the boot performance
+  event Windows logs after every boot
+- processes, running services and committed memory at idle, and the
+  number of startup items
+- a short CPU benchmark (SHA-256 throughput) and disk benchmark
+  (sequential write speed and flush latency), a few seconds in total
+
+The after-boot measurement is taken by a logon task the run schedules;
+it waits until the boot event of the new boot has been written and the
+machine has been up for settle_minutes, stores the report and removes the
+task. --impact-followup does the same by hand, and --history impact lists
+the reports.
+"""
+
+import os
+import sys
+import time
+import hashlib
+from typing import List, Dict, Tuple, Optional, Callable
+
+from backends import SystemBackend, data_dir
+from run_history import RunHistory
+
+# Metric -> (label, unit, lower is better)
+IMPACT_METRICS = {
+    "boot_ms": ("Boot", "ms", True),
+    "logon_ms": ("Logon", "ms", True),
+    "post_boot_ms": ("Desktop ready", "ms", True),
+    "process_count": ("Processes", "", True),
+    "service_count": ("Services", "", True),
+    "commit_bytes": ("Committed memory", "bytes", True),
+    "startup_items": ("Startup items", "", True),
+    "cpu_hash_mbps": ("CPU", "MB/s", False),
+    "disk_write_mbps": ("Disk write", "MB/s", False),
+    "disk_flush_ms": ("Disk flush", "ms", True),
+}
+
+FOLLOWUP_TASK = "Better10\\ImpactFollowUp"
+CPU_BENCHMARK_SECONDS = 1.0
+DISK_BENCHMARK_BYTES = 64 * 1024 ** 2
+DISK_FLUSH_WRITES = 32
+BLOCK_SIZE = 1024 ** 2
+# Taken from the boot performance event
+BOOT_METRICS = ("boot_ms", "logon_ms", "post_boot_ms")
+# How often the follow-up checks for the boot event while it waits
+FOLLOWUP_POLL_SECONDS = 30
+
+
+def cpu_benchmark(seconds: float = CPU_BENCHMARK_SECONDS) -> float:
+    """Return the SHA-256 throughput of one core in MB/s"""
+    block = os.urandom(BLOCK_SIZE)
+    digest = hashlib.sha256()
+    hashed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        digest.update(block)
+        hashed += len(block)
+    return hashed / (time.perf_counter() - start) / 1024 ** 2
+
+
+def disk_benchmark(directory: str, size: int = DISK_BENCHMARK_BYTES,
+                   flushes: int = DISK_FLUSH_WRITES) -> Tuple[float, float]:
+    """
+    Measure the disk holding a directory
+
+    A file of the given size is written and flushed to disk, then small
+    writes are each flushed on their own. The file is removed afterwards.
+
+    Returns:
+        Tuple of (sequential write MB/s, average flush latency in ms)
+    """
+    path = os.path.join(directory, f"impact-benchmark-{os.getpid()}.tmp")
+    # Random data, so compressing or deduplicating storage cannot shortcut the writes
+    block = os.urandom(BLOCK_SIZE)
+    try:
+        start = time.perf_counter()
+        with open(path, "wb", buffering=0) as f:
+            for _ in range(max(1, size // BLOCK_SIZE)):
+                f.write(block)
+            os.fsync(f.fileno())
+        write_mbps = size / (time.perf_counter() - start) / 1024 ** 2
+
+        small = block[:4096]
+        start = time.perf_counter()
+        with open(path, "r+b", buffering=0) as f:
+            for index in range(flushes):
+                f.seek((index * 7919 * 4096) % size)
+                f.write(small)
+                os.fsync(f.fileno())
+        flush_ms = (time.perf_counter() - start) * 1000 / flushes
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return write_mbps, flush_ms
+
+
+def measure(backend: SystemBackend, metrics: Dict = None) -> Dict:
+    """
+    Take every impact measurement
+
+    Args:
+        backend: Backend queried for the machine metrics
+        metrics: Machine metrics already queried, to add the benchmarks to
+
+    A failed system query is recorded under "error"; the benchmarks still
+    run.
+    """
+    if metrics is None:
+        try:
+            metrics = backend.machine_metrics()
+        except Exception as e:
+            metrics = {"error": str(e)}
+    metrics = dict(metrics)
+    metrics["cpu_hash_mbps"] = cpu_benchmark()
+    try:
+        metrics["disk_write_mbps"], metrics["disk_flush_ms"] = disk_benchmark(data_dir())
+    except OSError as e:
+        metrics["error"] = (metrics.get("error", "") + "; " if metrics.get("error") else "") + f"Disk benchmark: {e}"
+    return metrics
+
+
+def compare(before: Dict, after: Dict) -> Dict[str, Dict]:
+    """
+    Return the change of every metric measured both times
+
+    Returns:
+        Dict of metric -> {"before", "after", "change", "percent", "better"}
+    """
+    deltas = {}
+    for name, (_, _, lower_is_better) in IMPACT_METRICS.items():
+        old, new = before.get(name), after.get(name)
+        if old is None or new is None:
+            continue
+        change = new - old
+        deltas[name] = {
+            "before": old, "after": new, "change": change,
+            "percent": 100.0 * change / old if old else None,
+            "better": change < 0 if lower_is_better else change > 0,
+        }
+    return deltas
+
+
+def format_value(name: str, value: float) -> str:
+    unit = IMPACT_METRICS[name][1]
+    if unit == "ms":
+        if value >= 1000:
+            return f"{value / 1000:.1f}s"
+        return f"{value:.1f} ms" if value >= 10 else f"{value:.2f} ms"
+    if unit == "bytes":
+        return f"{value / 1024 ** 2:.0f} MB"
+    if unit:
+        return f"{value:.0f} {unit}"
+    return f"{value:.0f}"
+
+
+def format_delta(name: str, delta: Optional[Dict]) -> str:
+    """Format one entry of compare() for a table cell ("" if not measured)"""
+    if not delta:
+        return ""
+    sign = "+" if delta["change"] > 0 else "-" if delta["change"] < 0 else "±"
+    text = sign + format_value(name, abs(delta["change"]))
+    if delta["percent"] is not None:
+        text += f" ({delta['percent']:+.0f}%)"
+    return text
+
+
+def followup_command() -> str:
+    """Command line that runs this copy of Better10 with --impact-followup"""
+    if getattr(sys, 'frozen', False):
+        return f'"{sys.executable}" --impact-followup'
+    return f'"{sys.executable}" "{os.path.abspath(sys.argv[0])}" --impact-followup'
+
+
+class ImpactReport:
+    """
+    Takes the before and after measurements of runs
+
+    The class attributes are the defaults main() configures from the
+    command line.
+    """
+
+    enabled: bool = False
+    settle_minutes: float = 3.0   # Uptime before the after-boot measurement
+    wait_minutes: float = 15.0    # How long the follow-up waits for the boot event
+
+    def __init__(self, backend: SystemBackend, history: RunHistory,
+                 on_log: Callable[[str], None] = None):
+        self.backend = backend
+        self.history = history
+        self.on_log = on_log or (lambda message: None)
+
+    @classmethod
+    def configure(cls, enabled: bool = None, settle_minutes: float = None):
+        """Change the defaults used by new reports"""
+        if enabled is not None:
+            cls.enabled = enabled
+        if settle_minutes is not None:
+            cls.settle_minutes = max(0.0, settle_minutes)
+
+    def baseline(self) -> Tuple[float, Dict]:
+        """Measure the machine before a run; returns (time, measurements)"""
+        measured = time.time()
+        return measured, measure(self.backend)
+
+    def store_baseline(self, run_id: str, profile: Optional[str], measured: float, before: Dict) -> Tuple[bool, str]:
+        """
+        Store a baseline with its (already saved) run and schedule the after-boot measurement
+
+        Returns:
+            Tuple of (task scheduled: bool, error_message: str)
+        """
+        self.history.save_impact_baseline(run_id, profile, measured, before)
+        return self.backend.schedule_logon_task(FOLLOWUP_TASK, followup_command(), max(1, round(self.settle_minutes)))
+
+    def _wait_for_boot_metrics(self, booted_after: float) -> Optional[Dict]:
+        """Wait for a boot after a time to be settled and logged; None if there has been no such boot"""
+        deadline = time.time() + self.wait_minutes * 60
+        while True:
+            metrics = self.backend.machine_metrics()
+            last_boot = metrics.get("last_boot") or 0
+            if last_boot <= booted_after:
+                return None
+            settled = time.time() - last_boot >= self.settle_minutes * 60
+            logged = (metrics.get("boot_event_time") or 0) >= last_boot
+            if settled and logged:
+                return metrics
+            if time.time() >= deadline:
+                # The latest event describes an earlier boot
+                return {name: value for name, value in metrics.items() if name not in BOOT_METRICS}
+            self.on_log("Waiting for Windows to log the boot performance of this boot...")
+            time.sleep(min(FOLLOWUP_POLL_SECONDS, max(1.0, deadline - time.time())))
+
+    def follow_up(self) -> List[Dict]:
+        """
+        Complete the pending reports of runs measured before the last boot
+
+        Returns:
+            The completed reports (run_id, profile, deltas)
+        """
+        pending = self.history.impact_reports(pending=True, limit=1000)
+        if not pending:
+            self.on_log("No impact measurements are waiting for a restart")
+            return []
+        oldest = min(report["measured_before"] for report in pending)
+        try:
+            metrics = self._wait_for_boot_metrics(oldest)
+        except Exception as e:
+            self.on_log(f"Could not measure the machine: {e}")
+            return []
+        if metrics is None:
+            self.on_log("The machine has not restarted since the run; restart it to finish the impact report")
+            return []
+
+        measured = time.time()
+        after = measure(self.backend, metrics)
+        completed = []
+        for report in pending:
+            if report["measured_before"] >= metrics["last_boot"]:
+                continue  # Taken after this boot; it waits for the next one
+            deltas = compare(report["before"], after)
+            self.history.save_impact_result(report["run_id"], measured, after, deltas)
+            completed.append({"run_id": report["run_id"], "profile": report["profile"], "deltas": deltas})
+        if len(completed) == len(pending):
+            self.backend.delete_scheduled_task(FOLLOWUP_TASK)
+        return completed
+
+    @staticmethod
+    def report_lines(report: Dict) -> List[str]:
+        """Format a completed report, one metric per line"""
+        title = f"Impact of run {report['run_id']}" + (f" ({report['profile']})" if report.get("profile") else "")
+        lines = [title]
+        for name, delta in report["deltas"].items():
+            label = IMPACT_METRICS[name][0]
+            verdict = "" if not delta["change"] else (" better" if delta["better"] else " worse")
+            lines.append(f"  {label}: {format_value(name, delta['before'])} -> {format_value(name, delta['after'])}, "
+                         f"{format_delta(name, delta)}{verdict}")
+        return lines
@@ -0,0 +1,320 @@
+"""
+Viewer for persisted run logs
+
+Opens a run log (see run_log.py) of any size without loading it: the
+LogIndex is built in the background, the list view asks the model only for
+the rows on screen, and each row is decoded from the memory map when it is
+drawn. Level and operation filters are answered from the index; text
+searches run on a worker thread so the window never blocks. While the
+index is still growing, new lines are appended to the current view.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QTableView, QHeaderView, QAbstractItemView,
+    QLabel, QPushButton, QFileDialog
+)
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer
+from PyQt5.QtGui import QFont, QColor
+
+from run_log import LogIndex, LogLine, LineSet, OUTPUT_LEVEL, list_logs
+
+# Decoded lines kept for repainting the visible window
+LINE_CACHE_SIZE = 2048
+# How often the view picks up newly indexed lines (ms)
+POLL_MS = 200
+
+# Level filter title -> levels (None for all)
+LEVEL_FILTERS = {
+    "All levels": None,
+    "Messages only": ["INFO", "SUCCESS", "WARNING", "ERROR"],
+    "Warnings and errors": ["WARNING", "ERROR"],
+    "Errors": ["ERROR"],
+    "Process output": [OUTPUT_LEVEL],
+}
+
+LEVEL_COLORS = {
+    "SUCCESS": "#4CAF50",
+    "WARNING": "#FF9800",
+    "ERROR": "#F44336",
+    "INFO": "#2196F3",
+    OUTPUT_LEVEL: "#8b949e",
+}
+
+
+class LogLinesModel(QAbstractListModel):
+    """
+    Rows of a LogIndex, optionally filtered
+
+    Without a filter row N is line N. With one, the rows are the lines in a
+    LineSet, so any row is found with one bisect.
+    """
+
+    def __init__(self, index: LogIndex, parent=None):
+        super().__init__(parent)
+        self.log_index = index
+        self.rows: Optional[LineSet] = None
+        self.row_total = 0
+        self.criteria: Dict = {}
+        self.checked = 0  # Lines already considered for the current rows
+        self._cache: Dict[int, LogLine] = {}
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.row_total
+
+    def line_at(self, row: int) -> LogLine:
+        number = row if self.rows is None else self.rows[row]
+        line = self._cache.get(number)
+        if line is None:
+            if len(self._cache) >= LINE_CACHE_SIZE:
+                self._cache.clear()
+            line = self._cache[number] = self.log_index.line(number)
+        return line
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.row_total:
+            return None
+        if role == Qt.DisplayRole:
+            line = self.line_at(index.row())
+            if not line.level:
+                return line.message
+            operation = f"[{line.operation}] " if line.operation else ""
+            return f"{line.timestamp}  {line.level:<7}  {operation}{line.message}"
+        if role == Qt.ForegroundRole:
+            color = LEVEL_COLORS.get(self.line_at(index.row()).level)
+            return QColor(color) if color else None
+        return None
+
+    def set_rows(self, criteria: Dict, rows: Optional[LineSet], checked: int):
+        """Replace the rows with a filter result covering lines [0, checked)"""
+        self.beginResetModel()
+        self.criteria = criteria
+        self.rows = rows
+        self.checked = checked
+        self.row_total = checked if rows is None else len(rows)
+        self.endResetModel()
+
+    def grow(self):
+        """Append the lines indexed since the last call that match the current filter"""
+        available = self.log_index.line_count
+        if available <= self.checked:
+            return
+        if self.rows is None:
+            added = available - self.checked
+        else:
+            new_rows = self.log_index.filter(first=self.checked, last=available, **self.criteria)
+            added = len(new_rows)
+        self.checked = available
+        if not added:
+            return
+        self.beginInsertRows(QModelIndex(), self.row_total, self.row_total + added - 1)
+        if self.rows is not None:
+            self.rows.extend(new_rows)
+        self.row_total += added
+        self.endInsertRows()
+
+
+class LogViewerDialog(QDialog):
+    """Browse, filter and search past run logs"""
+
+    def __init__(self, backend_name: str, parent=None, path: str = None):
+        super().__init__(parent)
+        self.backend_name = backend_name
+        self.log_index: Optional[LogIndex] = None
+        self.model: Optional[LogLinesModel] = None
+        self._filter_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-filter")
+        self._pending = None  # (future, criteria, checked) of a filter in progress
+        self._operations: List[str] = []
+        self.init_ui()
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.poll)
+        self._timer.start(POLL_MS)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.timeout.connect(self.apply_filter)
+
+        self.reload_logs(path)
+
+    def init_ui(self):
+        """Initialize the UI for the viewer"""
+        self.setWindowTitle("Better10 - Run Logs")
+        self.resize(1000, 650)
+        layout = QVBoxLayout()
+        layout.setSpacing(4)
+        layout.setContentsMargins(6, 6, 6, 6)
+
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Run"))
+        self.log_combo = QComboBox()
+        self.log_combo.currentIndexChanged.connect(self.on_log_selected)
+        top.addWidget(self.log_combo, 1)
+        open_btn = QPushButton("Open File...")
+        open_btn.clicked.connect(self.open_file)
+        top.addWidget(open_btn)
+        layout.addLayout(top)
+
+        filters = QHBoxLayout()
+        self.level_combo = QComboBox()
+        for title, levels in LEVEL_FILTERS.items():
+            self.level_combo.addItem(title, levels)
+        self.level_combo.currentIndexChanged.connect(self.apply_filter)
+        filters.addWidget(self.level_combo)
+        self.operation_combo = QComboBox()
+        self.operation_combo.addItem("All operations", None)
+        self.operation_combo.currentIndexChanged.connect(self.apply_filter)
+        filters.addWidget(self.operation_combo, 1)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search (case-insensitive)")
+        self.search_edit.textChanged.connect(lambda: self._search_timer.start(300))
+        self.search_edit.returnPressed.connect(self.apply_filter)
+        filters.addWidget(self.search_edit, 1)
+        layout.addLayout(filters)
+
+        # A table with fixed row heights maps the scroll position to a row
+        # arithmetically; QListView lays out every row on each reset
+        self.view = QTableView()
+        self.view.setFont(QFont("Consolas", 8))
+        self.view.setShowGrid(False)
+        self.view.setWordWrap(False)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.horizontalHeader().setVisible(False)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        rows = self.view.verticalHeader()
+        rows.setVisible(False)
+        rows.setSectionResizeMode(QHeaderView.Fixed)
+        rows.setDefaultSectionSize(self.view.fontMetrics().height() + 2)
+        layout.addWidget(self.view)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #8b949e; font-size: 9pt;")
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+    def reload_logs(self, select: str = None):
+        """List the backend's run logs, newest first, and open one"""
+        paths = list_logs(self.backend_name)
+        if select and select not in paths:
+            paths.insert(0, select)
+        self.log_combo.blockSignals(True)
+        self.log_combo.clear()
+        for path in paths:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            self.log_combo.addItem(f"{os.path.basename(path)}  ({size / 1024 / 1024:.1f} MB)", path)
+        self.log_combo.blockSignals(False)
+        if paths:
+            self.log_combo.setCurrentIndex(paths.index(select) if select else 0)
+            self.on_log_selected()
+        else:
+            self.status_label.setText("No run logs recorded yet")
+
+    def open_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Log", "", "Logs (*.log);;All Files (*)")
+        if path:
+            self.reload_logs(path)
+
+    def on_log_selected(self):
+        path = self.log_combo.currentData()
+        if path:
+            self.open_log(path)
+
+    def open_log(self, path: str):
+        """Map a log and start indexing it; the first page shows as soon as its chunk is indexed"""
+        self.close_index()
+        try:
+            self.log_index = LogIndex(path)
+        except (OSError, ValueError) as e:
+            self.status_label.setText(f"Log could not be opened: {e}")
+            return
+        self.model = LogLinesModel(self.log_index, self)
+        self.view.setModel(self.model)
+        self._operations = []
+        self.operation_combo.blockSignals(True)
+        self.operation_combo.clear()
+        self.operation_combo.addItem("All operations", None)
+        self.operation_combo.blockSignals(False)
+        self.log_index.start()
+        self.apply_filter()
+
+    def criteria(self) -> Dict:
+        return {
+            "levels": self.level_combo.currentData(),
+            "operation": self.operation_combo.currentData(),
+            "text": self.search_edit.text() or None,
+        }
+
+    def apply_filter(self):
+        """Re-filter the lines indexed so far on the worker thread"""
+        if self.log_index is None:
+            return
+        criteria = self.criteria()
+        checked = self.log_index.line_count
+        if not any(value is not None for value in criteria.values()):
+            self._pending = None
+            self.model.set_rows({}, None, checked)
+            return
+        future = self._filter_pool.submit(self.log_index.filter, last=checked, **criteria)
+        self._pending = (future, criteria, checked)
+        self.update_status()
+
+    def poll(self):
+        """Pick up finished filters, newly indexed lines and operations"""
+        if self.log_index is None:
+            return
+        if self._pending is not None:
+            future, criteria, checked = self._pending
+            if future.done():
+                self._pending = None
+                try:
+                    self.model.set_rows(criteria, future.result(), checked)
+                except Exception as e:
+                    self.status_label.setText(f"Filter failed: {e}")
+                    return
+        if self._pending is None:
+            self.model.grow()
+
+        operations = self.log_index.operation_names()
+        if len(operations) != len(self._operations):
+            self.operation_combo.blockSignals(True)
+            for name in operations[len(self._operations):]:
+                self.operation_combo.addItem(name, name)
+            self.operation_combo.blockSignals(False)
+            self._operations = operations
+        self.update_status()
+
+    def update_status(self):
+        if self.log_index is None or self.model is None:
+            return
+        total = self.log_index.line_count
+        if self._pending is not None:
+            text = "Filtering..."
+        elif self.model.rows is None:
+            text = f"{total:,} lines"
+        else:
+            text = f"{self.model.row_total:,} of {total:,} lines"
+        if not self.log_index.done:
+            text += f" (indexing {self.log_index.progress():.0%})"
+        self.status_label.setText(text)
+
+    def close_index(self):
+        if self._pending is not None:
+            self._pending[0].cancel()
+            self._pending = None
+        if self.log_index is not None:
+            self.view.setModel(None)
+            self.model.deleteLater()
+            self.model = None
+            # Wait for a running filter before unmapping the file it reads
+            self._filter_pool.submit(lambda: None).result()
+            self.log_index.close()
+            self.log_index = None
+
+    def done(self, result: int):
+        self._timer.stop()
+        self.close_index()
+        self._filter_pool.shutdown(wait=True)
+        super().done(result)
@@ -0,0 +1,297 @@
+"""
+Batched MSIX deployment for Better10
+
+run_installer deploys one .msix per PowerShell session, and each
+Add-AppxPackage call resolves the package's framework dependencies
+(VCLibs, UI.Xaml, the .NET Native runtime, ...) on its own, from the Store
+when no dependency paths are given. MsixBatch deploys every MSIX package of
+a plan in one session instead:
+
+- the manifests of the selected packages are read to find the frameworks
+  they depend on (name, minimum version and architecture)
+- framework packages found next to them in Apps/ (or in a Dependencies
+  subfolder, as Store downloads lay them out) are matched to those
+  dependencies and passed as -DependencyPath, so each framework is
+  resolved once for the whole batch
+- each package is still deployed and reported separately: one failing
+  package does not fail the others
+
+The batch is deployed when the first MSIX operation of a plan runs; the
+other MSIX operations then complete with their own result straight away.
+"""
+
+import os
+import time
+import platform
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from typing import List, Dict, Tuple, Optional, Callable
+
+from backends import SystemBackend, detect_installer_type, resolve_path
+from process_monitor import LaunchOptions
+
+PACKAGE_EXTENSIONS = ('.msix', '.appx')
+BUNDLE_EXTENSIONS = ('.msixbundle', '.appxbundle')
+# Store downloads put frameworks in Dependencies\<arch>\ next to the app
+DEPENDENCY_FOLDER = "Dependencies"
+
+_ARCHITECTURES = {
+    "amd64": "x64", "x86_64": "x64", "x64": "x64",
+    "arm64": "arm64", "aarch64": "arm64",
+    "x86": "x86", "i386": "x86", "i686": "x86",
+}
+
+
+class PackageInfo:
+    """Identity and dependencies read from a package manifest"""
+
+    def __init__(self, path: str, name: str, version: Tuple[int, ...], architecture: str,
+                 framework: bool = False, dependencies: List[Tuple[str, Tuple[int, ...]]] = None):
+        self.path = path
+        self.name = name
+        self.version = version
+        self.architecture = architecture
+        self.framework = framework
+        self.dependencies = dependencies or []  # (package name, minimum version)
+
+
+def parse_version(text: str) -> Tuple[int, ...]:
+    """Parse a four-part package version such as "14.0.33519.0" """
+    try:
+        return tuple(int(part) for part in (text or "0").split("."))
+    except ValueError:
+        return (0,)
+
+
+def machine_architecture() -> str:
+    """Return this machine's package architecture ("x64", "x86" or "arm64")"""
+    return _ARCHITECTURES.get(platform.machine().lower(), "x64")
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_manifest(path: str, data: bytes) -> PackageInfo:
+    """Read a package's AppxManifest.xml, whichever schema version it uses"""
+    root = ElementTree.fromstring(data)
+    identity, framework, dependencies = None, False, []
+    for element in root.iter():
+        tag = _local_name(element.tag)
+        if tag == "Identity" and identity is None:
+            identity = element.attrib
+        elif tag == "Framework":
+            framework = (element.text or "").strip().lower() == "true"
+        elif tag == "PackageDependency":
+            dependencies.append((element.get("Name", ""), parse_version(element.get("MinVersion"))))
+    if identity is None:
+        raise ValueError("Manifest has no Identity element")
+    return PackageInfo(path, identity.get("Name", ""), parse_version(identity.get("Version")),
+                       identity.get("ProcessorArchitecture", "neutral").lower(), framework, dependencies)
+
+
+def read_package(path: str, architecture: str = None) -> Optional[PackageInfo]:
+    """
+    Read the identity and dependencies of a package or bundle
+
+    A bundle reports the dependencies of the package it would deploy on
+    this architecture.
+
+    Returns:
+        PackageInfo, or None if the file is not a readable package
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            if os.path.splitext(path)[1].lower() not in BUNDLE_EXTENSIONS:
+                return _parse_manifest(path, archive.read("AppxManifest.xml"))
+
+            bundle = ElementTree.fromstring(archive.read("AppxMetadata/AppxBundleManifest.xml"))
+            identity = next(e.attrib for e in bundle.iter() if _local_name(e.tag) == "Identity")
+            wanted = architecture or machine_architecture()
+            inner = [(e.get("Architecture", "neutral").lower(), e.get("FileName")) for e in bundle.iter()
+                     if _local_name(e.tag) == "Package" and e.get("Type", "application") == "application"]
+            inner.sort(key=lambda item: (item[0] != wanted, item[0] != "neutral"))
+            info = PackageInfo(path, identity.get("Name", ""), parse_version(identity.get("Version")), "neutral")
+            if inner and inner[0][1]:
+                with archive.open(inner[0][1]) as nested, zipfile.ZipFile(nested) as package:
+                    info.dependencies = _parse_manifest(path, package.read("AppxManifest.xml")).dependencies
+            return info
+    except (OSError, KeyError, ValueError, StopIteration, zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+
+
+def is_framework_package(path: str) -> bool:
+    """Check whether a package file is a framework (a dependency, not an app)"""
+    info = read_package(path)
+    return info is not None and info.framework
+
+
+def find_frameworks(folders: List[str]) -> List[PackageInfo]:
+    """Return the framework packages in some folders and their Dependencies subfolders"""
+    frameworks, seen = [], set()
+    for folder in folders:
+        for directory, subdirectories, files in os.walk(folder):
+            if directory == folder:
+                subdirectories[:] = [name for name in subdirectories if name.lower() == DEPENDENCY_FOLDER.lower()]
+            for filename in files:
+                path = os.path.join(directory, filename)
+                if os.path.splitext(filename)[1].lower() not in PACKAGE_EXTENSIONS or os.path.normcase(path) in seen:
+                    continue
+                seen.add(os.path.normcase(path))
+                info = read_package(path)
+                if info is not None and info.framework:
+                    frameworks.append(info)
+    return frameworks
+
+
+def resolve_dependencies(packages: List[PackageInfo], frameworks: List[PackageInfo],
+                         architecture: str = None) -> Tuple[List[str], List[str]]:
+    """
+    Choose the framework files that satisfy the packages' dependencies
+
+    For each dependency the newest framework with the same name, at least
+    the minimum version and a usable architecture (the package's own, or
+    this machine's for neutral packages, or neutral) is chosen.
+
+    Returns:
+        Tuple of (framework paths, names of dependencies with no local match;
+        Windows may already have those installed)
+    """
+    machine = architecture or machine_architecture()
+    chosen: Dict[Tuple[str, str], PackageInfo] = {}
+    missing = []
+    for package in packages:
+        wanted = package.architecture if package.architecture != "neutral" else machine
+        for name, min_version in package.dependencies:
+            candidates = [framework for framework in frameworks
+                          if framework.name.lower() == name.lower() and framework.version >= min_version
+                          and framework.architecture in (wanted, "neutral")]
+            if not candidates:
+                if name not in missing:
+                    missing.append(name)
+                continue
+            best = max(candidates, key=lambda framework: framework.version)
+            key = (best.name.lower(), best.architecture)
+            if key not in chosen or chosen[key].version < best.version:
+                chosen[key] = best
+    return [framework.path for framework in chosen.values()], missing
+
+
+def is_msix_operation(operation: Dict) -> bool:
+    if operation.get('type') != 'local_installer' or not operation.get('path'):
+        return False
+    return (operation.get('installer_type') or detect_installer_type(operation['path'])) == 'msix'
+
+
+class MsixBatch:
+    """
+    Deploys the MSIX operations of a plan in one session
+
+    The class attribute is the default main() configures from the command
+    line.
+    """
+
+    enabled: bool = True
+
+    def __init__(self, backend: SystemBackend, operations: List[Dict],
+                 on_log: Callable[[str], None] = None):
+        """
+        Args:
+            backend: Backend the packages are deployed with
+            operations: The plan; its MSIX local_installer operations form the batch
+            on_log: Called with a message describing each deployment session
+        """
+        self.backend = backend
+        self.operations = [operation for operation in operations if is_msix_operation(operation)]
+        self.on_log = on_log
+        self._deployed = set()
+        self._results: Dict[int, Tuple[bool, str, str]] = {}
+        self._shares: Dict[int, float] = {}
+
+    @classmethod
+    def configure(cls, enabled: bool = None):
+        """Change the defaults used by new batches"""
+        if enabled is not None:
+            cls.enabled = enabled
+
+    def covers(self, operation: Dict) -> bool:
+        """Check whether an operation is deployed by this batch"""
+        return any(operation is candidate for candidate in self.operations)
+
+    def install(self, operation: Dict, options: LaunchOptions,
+                resolve: Callable[[Dict], Tuple[Optional[str], str]],
+                release: Callable[[str], None] = None) -> Tuple[bool, str, str]:
+        """
+        Return an operation's deployment result, deploying the batch if needed
+
+        The first call deploys this operation together with every batch
+        operation not deployed yet. Later calls return the stored result;
+        a retried operation is deployed again, with whatever is still pending.
+
+        Args:
+            operation: The MSIX operation being executed
+            options: Its launch options; output and the exit code are those of the whole session
+            resolve: Returns (path to deploy, error) for an operation, e.g. a staged copy
+            release: Called with each resolved path once the session has ended
+
+        Returns:
+            Tuple of (success: bool, stdout: str, stderr: str) for this operation
+        """
+        stored = self._results.pop(id(operation), None)
+        if stored is not None:
+            return stored
+
+        batch = [operation] + [candidate for candidate in self.operations
+                               if candidate is not operation and id(candidate) not in self._deployed]
+        paths, deployable = [], []
+        for candidate in batch:
+            self._deployed.add(id(candidate))
+            path, error = resolve(candidate)
+            if error:
+                self._results[id(candidate)] = (False, "", error)
+            else:
+                paths.append(path)
+                deployable.append(candidate)
+
+        if deployable:
+            # Frameworks are looked for next to the original files, not the staged copies
+            sources = [resolve_path(candidate['path']) for candidate in deployable]
+            packages = [info for info in (read_package(path) for path in sources) if info is not None]
+            frameworks = find_frameworks(sorted({os.path.dirname(path) for path in sources}))
+            dependencies, missing = resolve_dependencies(packages, frameworks)
+            if self.on_log:
+                message = (f"Deploying {len(paths)} MSIX package(s) in one session with "
+                           f"{len(dependencies)} framework dependenc{'y' if len(dependencies) == 1 else 'ies'} from Apps")
+                if missing:
+                    message += f" ({', '.join(missing)} not found locally, left to Windows)"
+                self.on_log(message)
+            if options is not None:
+                if options.timeout is not None:
+                    options.timeout *= len(paths)
+                # The deployment service does the work, outside the session's process tree,
+                # even for operations whose installer type was left to detection
+                options.inactivity_timeout = None
+            started = time.monotonic()
+            try:
+                results = self.backend.install_msix_packages(paths, dependencies, options)
+            finally:
+                if release is not None:
+                    for path in paths:
+                        release(path)
+            share = (time.monotonic() - started) / len(deployable)
+            for candidate, (success, error) in zip(deployable, results):
+                self._results[id(candidate)] = (success, "", "" if success else error)
+                self._shares[id(candidate)] = share
+
+        return self._results.pop(id(operation))
+
+    def duration(self, operation: Dict, elapsed: float) -> float:
+        """
+        Return the time to record for a batch operation
+
+        The session's time is split evenly across the packages it deployed,
+        instead of being charged to the operation that started it while the
+        others complete in no time. elapsed is returned for an operation
+        this batch has not deployed.
+        """
+        return self._shares.pop(id(operation), elapsed)
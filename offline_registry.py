@@ -0,0 +1,754 @@
+"""
+Offline registry hive editing for Better10
+
+Applying registry settings machine by machine does not scale; baking them
+into a Windows image once does. This module reads and writes registry hive
+files (the regf format of SOFTWARE, SYSTEM and NTUSER.DAT) directly, in
+pure Python, so it runs on any platform against a mounted or extracted
+image. The registry operations of a profile are applied exactly as
+WorkerThread would apply them on a live machine:
+
+- HKLM\\SOFTWARE\\... goes to Windows/System32/config/SOFTWARE
+- HKLM\\SYSTEM\\... goes to Windows/System32/config/SYSTEM, with
+  CurrentControlSet resolved through SYSTEM\\Select\\Current
+- HKCU\\... goes to the Default profile, Users/Default/NTUSER.DAT, so
+  every account created from the image starts with the setting
+
+Hives are edited in place, the way Windows does it. New cells come from
+free space or from a new hive bin, replaced cells are marked free, and on
+save the base block gets new sequence numbers, the data size and its
+checksum. Everything the edit does not touch (security descriptors,
+classes, unknown flags) is preserved byte for byte. A hive whose sequence
+numbers differ has transaction log entries that were never written back;
+it is refused, because editing it would lose them.
+
+Format reference: the Windows registry file format specification
+(https://github.com/msuhanov/regf).
+"""
+
+import os
+import struct
+import time
+from typing import List, Dict, Tuple, Optional
+
+from backends import (
+    HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, REG_SZ, REG_EXPAND_SZ, REG_BINARY, REG_DWORD,
+    REG_MULTI_SZ, REG_QWORD, parse_hive, hive_name
+)
+
+BASE_BLOCK_SIZE = 4096
+HBIN_HEADER_SIZE = 32
+HBIN_ALIGNMENT = 4096
+NO_CELL = 0xFFFFFFFF
+# Value data above this size is split into "db" segments (format 1.4 and later)
+BIG_DATA_SEGMENT = 16344
+# Subkey lists above this size are split into leaves under an "ri" index
+MAX_LEAF_ELEMENTS = 1012
+LEAF_SPLIT_SIZE = 512
+
+# nk flags
+KEY_HIVE_ENTRY = 0x0004
+KEY_NO_DELETE = 0x0008
+KEY_COMP_NAME = 0x0020
+# vk flags
+VALUE_COMP_NAME = 0x0001
+
+# Offsets in an nk cell (after the 4-byte cell size)
+_NK_FLAGS = 0x02
+_NK_TIMESTAMP = 0x04
+_NK_PARENT = 0x10
+_NK_SUBKEY_COUNT = 0x14
+_NK_SUBKEY_LIST = 0x1C
+_NK_VOLATILE_LIST = 0x20
+_NK_VALUE_COUNT = 0x24
+_NK_VALUE_LIST = 0x28
+_NK_SECURITY = 0x2C
+_NK_CLASS = 0x30
+_NK_MAX_SUBKEY_NAME = 0x34
+_NK_MAX_VALUE_NAME = 0x3C
+_NK_MAX_VALUE_DATA = 0x40
+_NK_NAME_LENGTH = 0x48
+_NK_HEADER = 0x4C
+
+# Offsets in a vk cell
+_VK_NAME_LENGTH = 0x02
+_VK_DATA_SIZE = 0x04
+_VK_DATA_OFFSET = 0x08
+_VK_TYPE = 0x0C
+_VK_FLAGS = 0x10
+_VK_HEADER = 0x14
+
+# Offsets in an sk cell
+_SK_REFERENCES = 0x0C
+
+# Image-relative hive files
+SOFTWARE_HIVE = "Windows/System32/config/SOFTWARE"
+SYSTEM_HIVE = "Windows/System32/config/SYSTEM"
+DEFAULT_USER_HIVE = "Users/Default/NTUSER.DAT"
+
+
+class HiveError(Exception):
+    """A hive file is malformed, or cannot be edited safely"""
+
+
+def filetime(timestamp: float = None) -> int:
+    """Convert a Unix timestamp (now by default) to a Windows FILETIME"""
+    return int(((time.time() if timestamp is None else timestamp) + 11644473600) * 10_000_000)
+
+
+def base_block_checksum(block: bytes) -> int:
+    """XOR of the first 127 dwords of a base block, avoiding the reserved values 0 and 0xFFFFFFFF"""
+    checksum = 0
+    for (dword,) in struct.iter_unpack("<I", block[:508]):
+        checksum ^= dword
+    if checksum == 0xFFFFFFFF:
+        return 0xFFFFFFFE
+    return checksum or 1
+
+
+def _upcase(name: str) -> str:
+    """Upper-case a name one UTF-16 unit at a time, as the kernel does for comparisons"""
+    if name.isascii():
+        return name.upper()
+    return "".join(char.upper() if len(char.upper()) == 1 else char for char in name)
+
+
+def _sort_key(name: str) -> bytes:
+    """Order of names in subkey lists: upper-cased, compared by UTF-16 code unit"""
+    return _upcase(name).encode("utf-16-be")
+
+
+def name_hash(name: str) -> int:
+    """Hash stored in "lh" subkey lists"""
+    value = 0
+    for char in _upcase(name):
+        value = (value * 37 + ord(char)) & 0xFFFFFFFF
+    return value
+
+
+def _encode_name(name: str) -> Tuple[bytes, bool]:
+    """Return (stored bytes, compressed); names that fit in Latin-1 are stored one byte per character"""
+    try:
+        return name.encode("latin-1"), True
+    except UnicodeEncodeError:
+        return name.encode("utf-16-le"), False
+
+
+def encode_value(value, reg_type: int) -> bytes:
+    """Encode value data for a registry type"""
+    if reg_type == REG_DWORD:
+        return struct.pack("<I", int(value) & 0xFFFFFFFF)
+    if reg_type == REG_QWORD:
+        return struct.pack("<Q", int(value) & 0xFFFFFFFFFFFFFFFF)
+    if reg_type in (REG_SZ, REG_EXPAND_SZ):
+        return (str(value) + "\0").encode("utf-16-le")
+    if reg_type == REG_MULTI_SZ:
+        return ("".join(str(item) + "\0" for item in value) + "\0").encode("utf-16-le")
+    return bytes(value)
+
+
+def decode_value(data: bytes, reg_type: int):
+    """Decode value data; unknown types are returned as bytes"""
+    if reg_type == REG_DWORD and len(data) >= 4:
+        return struct.unpack_from("<I", data)[0]
+    if reg_type == REG_QWORD and len(data) >= 8:
+        return struct.unpack_from("<Q", data)[0]
+    if reg_type in (REG_SZ, REG_EXPAND_SZ):
+        return data.decode("utf-16-le", errors="replace").split("\0", 1)[0]
+    if reg_type == REG_MULTI_SZ:
+        return [item for item in data.decode("utf-16-le", errors="replace").split("\0") if item]
+    return bytes(data)
+
+
+def value_type_for(value) -> int:
+    """Registry type for an operation's value, matching the backends (int -> DWORD, str -> SZ)"""
+    if isinstance(value, bool) or isinstance(value, int):
+        return REG_DWORD
+    if isinstance(value, str):
+        return REG_SZ
+    if isinstance(value, (bytes, bytearray)):
+        return REG_BINARY
+    if isinstance(value, (list, tuple)):
+        return REG_MULTI_SZ
+    raise HiveError(f"Unsupported value type: {type(value).__name__}")
+
+
+def _sid(authority: int, *sub_authorities: int) -> bytes:
+    return (struct.pack("<BB", 1, len(sub_authorities)) + authority.to_bytes(6, "big")
+            + b"".join(struct.pack("<I", sub) for sub in sub_authorities))
+
+
+def default_security_descriptor() -> bytes:
+    """
+    Self-relative security descriptor for the root of a new hive
+
+    Owner Administrators, group SYSTEM; SYSTEM and Administrators get full
+    control and Users read access, inherited by subkeys.
+    """
+    system, administrators, users = _sid(5, 18), _sid(5, 32, 544), _sid(5, 32, 545)
+    aces = b""
+    for sid, mask in ((system, 0xF003F), (administrators, 0xF003F), (users, 0x20019)):
+        # ACCESS_ALLOWED_ACE, CONTAINER_INHERIT_ACE
+        aces += struct.pack("<BBHI", 0, 0x02, 8 + len(sid), mask) + sid
+    dacl = struct.pack("<BBHHH", 2, 0, 8 + len(aces), 3, 0) + aces
+    owner_offset = 20
+    group_offset = owner_offset + len(administrators)
+    dacl_offset = group_offset + len(system)
+    # SE_SELF_RELATIVE | SE_DACL_PRESENT
+    header = struct.pack("<BBHIIII", 1, 0, 0x8004, owner_offset, group_offset, 0, dacl_offset)
+    return header + administrators + system + dacl
+
+
+class RegistryHive:
+    """
+    A registry hive file held in memory
+
+    Key paths are relative to the hive root and case-insensitive
+    ("Policies\\Microsoft\\Windows\\DataCollection" in the SOFTWARE hive).
+    """
+
+    def __init__(self, data: bytes, path: str = None):
+        self.data = bytearray(data)
+        self.path = path
+        if len(self.data) < BASE_BLOCK_SIZE or self.data[:4] != b"regf":
+            raise HiveError(f"{path or 'data'} is not a registry hive")
+        primary, secondary = struct.unpack_from("<II", self.data, 4)
+        self.dirty = primary != secondary
+        self.minor_version = struct.unpack_from("<I", self.data, 0x18)[0]
+        stored = struct.unpack_from("<I", self.data, 0x1FC)[0]
+        if stored != base_block_checksum(self.data[:BASE_BLOCK_SIZE]):
+            raise HiveError(f"{path or 'Hive'} has an invalid base block checksum")
+        self.root = struct.unpack_from("<I", self.data, 0x24)[0]
+        self.bins_size = struct.unpack_from("<I", self.data, 0x28)[0]
+        if BASE_BLOCK_SIZE + self.bins_size > len(self.data):
+            raise HiveError(f"{path or 'Hive'} is truncated")
+        del self.data[BASE_BLOCK_SIZE + self.bins_size:]
+        self._free: Optional[List[List[int]]] = None  # [offset, size] of free cells, built on first allocation
+        self.modified = False
+
+    @classmethod
+    def load(cls, path: str) -> "RegistryHive":
+        with open(path, "rb") as f:
+            return cls(f.read(), path)
+
+    @classmethod
+    def create(cls, file_name: str = "", root_name: str = "ROOT") -> "RegistryHive":
+        """Return a new, empty hive (format 1.5) with a root key and a default security descriptor"""
+        block = bytearray(BASE_BLOCK_SIZE)
+        struct.pack_into("<4sIIQIIIIII", block, 0, b"regf", 1, 1, filetime(), 1, 5, 0, 1, 0, HBIN_ALIGNMENT)
+        struct.pack_into("<I", block, 0x2C, 1)  # Clustering factor
+        name = file_name.encode("utf-16-le")[:62]
+        block[0x30:0x30 + len(name)] = name
+        struct.pack_into("<I", block, 0x1FC, base_block_checksum(block))
+        hive = cls(bytes(block) + cls._empty_bin(0, HBIN_ALIGNMENT))
+
+        # Like Windows, put the root key in the first cell; some tools look for it there
+        hive.root = hive._new_key_cell(root_name, NO_CELL, NO_CELL, KEY_HIVE_ENTRY | KEY_NO_DELETE)
+        descriptor = default_security_descriptor()
+        security = hive._allocate(struct.pack("<2sHIIII", b"sk", 0, 0, 0, 1, len(descriptor)) + descriptor)
+        # A lone sk cell is its own list neighbour
+        struct.pack_into("<II", hive.data, hive._cell(security) + 4, security, security)
+        hive._set_u32(hive.root, _NK_SECURITY, security)
+        struct.pack_into("<I", hive.data, 0x24, hive.root)
+        return hive
+
+    # Low-level cell access
+
+    def _cell(self, offset: int) -> int:
+        """File position of a cell's data (just after its size field)"""
+        return BASE_BLOCK_SIZE + offset + 4
+
+    def _cell_size(self, offset: int) -> int:
+        return abs(struct.unpack_from("<i", self.data, BASE_BLOCK_SIZE + offset)[0])
+
+    def _u16(self, offset: int, field: int) -> int:
+        return struct.unpack_from("<H", self.data, self._cell(offset) + field)[0]
+
+    def _u32(self, offset: int, field: int) -> int:
+        return struct.unpack_from("<I", self.data, self._cell(offset) + field)[0]
+
+    def _set_u32(self, offset: int, field: int, value: int):
+        struct.pack_into("<I", self.data, self._cell(offset) + field, value)
+
+    def _signature(self, offset: int) -> bytes:
+        position = self._cell(offset)
+        return bytes(self.data[position:position + 2])
+
+    @staticmethod
+    def _empty_bin(offset: int, size: int) -> bytes:
+        header = struct.pack("<4sII8sQI", b"hbin", offset, size, b"\0" * 8, filetime(), 0)
+        # The rest of the bin is one free cell
+        return header + struct.pack("<i", size - HBIN_HEADER_SIZE) + b"\0" * (size - HBIN_HEADER_SIZE - 4)
+
+    def _scan_free_cells(self) -> List[List[int]]:
+        free = []
+        position = 0
+        while position < self.bins_size:
+            start = BASE_BLOCK_SIZE + position
+            if self.data[start:start + 4] != b"hbin":
+                raise HiveError(f"Missing hive bin at offset {position:#x}")
+            bin_size = struct.unpack_from("<I", self.data, start + 8)[0]
+            cell = position + HBIN_HEADER_SIZE
+            while cell < position + bin_size:
+                size = struct.unpack_from("<i", self.data, BASE_BLOCK_SIZE + cell)[0]
+                if size == 0:
+                    raise HiveError(f"Zero-sized cell at offset {cell:#x}")
+                if size > 0:
+                    free.append([cell, size])
+                cell += abs(size)
+            position += bin_size
+        return free
+
+    def _allocate(self, payload: bytes) -> int:
+        """Store payload in a new cell and return the cell offset"""
+        needed = (len(payload) + 4 + 7) & ~7
+        if self._free is None:
+            self._free = self._scan_free_cells()
+        for entry in self._free:
+            offset, size = entry
+            if size >= needed:
+                # Split the free cell; the remainder stays free if it can hold a cell
+                if size - needed >= 8:
+                    entry[0], entry[1] = offset + needed, size - needed
+                    struct.pack_into("<i", self.data, BASE_BLOCK_SIZE + offset + needed, size - needed)
+                else:
+                    needed = size
+                    self._free.remove(entry)
+                break
+        else:
+            bin_size = (needed + HBIN_HEADER_SIZE + HBIN_ALIGNMENT - 1) // HBIN_ALIGNMENT * HBIN_ALIGNMENT
+            offset = self.bins_size + HBIN_HEADER_SIZE
+            self.data += self._empty_bin(self.bins_size, bin_size)
+            self.bins_size += bin_size
+            remainder = bin_size - HBIN_HEADER_SIZE - needed
+            if remainder >= 8:
+                struct.pack_into("<i", self.data, BASE_BLOCK_SIZE + offset + needed, remainder)
+                self._free.append([offset + needed, remainder])
+            else:
+                needed += remainder
+        struct.pack_into("<i", self.data, BASE_BLOCK_SIZE + offset, -needed)
+        position = self._cell(offset)
+        self.data[position:position + len(payload)] = payload
+        self.modified = True
+        return offset
+
+    def _release(self, offset: int):
+        """Mark a cell free"""
+        if offset == NO_CELL:
+            return
+        size = self._cell_size(offset)
+        struct.pack_into("<i", self.data, BASE_BLOCK_SIZE + offset, size)
+        if self._free is not None:
+            self._free.append([offset, size])
+
+    def _replace_cell(self, offset: int, payload: bytes) -> int:
+        """
+        Rewrite a list cell in place if the payload fits, else move it
+
+        Moved lists get half their size again as slack, so a list that
+        grows one element at a time is not reallocated on every insert.
+        """
+        if offset != NO_CELL and self._cell_size(offset) - 4 >= len(payload):
+            position = self._cell(offset)
+            self.data[position:position + len(payload)] = payload
+            return offset
+        new = self._allocate(payload + bytes(len(payload) // 2 & ~3))
+        self._release(offset)
+        return new
+
+    # Keys
+
+    def key_name(self, key: int) -> str:
+        length = self._u16(key, _NK_NAME_LENGTH)
+        position = self._cell(key) + _NK_HEADER
+        raw = bytes(self.data[position:position + length])
+        if self._u16(key, _NK_FLAGS) & KEY_COMP_NAME:
+            return raw.decode("latin-1")
+        return raw.decode("utf-16-le", errors="replace")
+
+    def _list_elements(self, list_offset: int) -> List[Tuple[int, int]]:
+        """Return (nk offset, name hash or None) for every element of a subkey list, in order"""
+        if list_offset == NO_CELL:
+            return []
+        signature = self._signature(list_offset)
+        count = self._u16(list_offset, 2)
+        position = self._cell(list_offset) + 4
+        if signature == b"lh":
+            return [struct.unpack_from("<II", self.data, position + 8 * i) for i in range(count)]
+        if signature == b"lf":
+            # lf lists store the first four characters of the name instead of a hash
+            return [(struct.unpack_from("<I", self.data, position + 8 * i)[0], None) for i in range(count)]
+        offsets = struct.unpack_from(f"<{count}I", self.data, position)
+        if signature == b"li":
+            return [(offset, None) for offset in offsets]
+        if signature == b"ri":
+            return [element for leaf in offsets for element in self._list_elements(leaf)]
+        raise HiveError(f"Unknown subkey list {signature!r} at offset {list_offset:#x}")
+
+    def subkeys(self, key: int) -> List[int]:
+        return [offset for offset, _ in self._list_elements(self._u32(key, _NK_SUBKEY_LIST))]
+
+    def find_subkey(self, key: int, name: str) -> Optional[int]:
+        wanted = _upcase(name)
+        wanted_hash = name_hash(name)
+        for offset, stored_hash in self._list_elements(self._u32(key, _NK_SUBKEY_LIST)):
+            if stored_hash is not None and stored_hash != wanted_hash:
+                continue
+            if _upcase(self.key_name(offset)) == wanted:
+                return offset
+        return None
+
+    @staticmethod
+    def _split(path: str) -> List[str]:
+        return [part for part in path.replace("/", "\\").split("\\") if part]
+
+    def key(self, path: str) -> Optional[int]:
+        """Return the cell offset of a key, or None if it does not exist"""
+        key = self.root
+        for name in self._split(path):
+            key = self.find_subkey(key, name)
+            if key is None:
+                return None
+        return key
+
+    def subkey_names(self, path: str = "") -> List[str]:
+        key = self.key(path)
+        return [] if key is None else [self.key_name(offset) for offset in self.subkeys(key)]
+
+    def _new_key_cell(self, name: str, parent: int, security: int, flags: int = 0) -> int:
+        encoded, compressed = _encode_name(name)
+        header = struct.pack(
+            "<2sHQIIIIIIIIIIIIIIIHH", b"nk", flags | (KEY_COMP_NAME if compressed else 0), filetime(), 0,
+            parent, 0, 0, NO_CELL, NO_CELL, 0, NO_CELL, security, NO_CELL, 0, 0, 0, 0, 0, len(encoded), 0
+        )
+        return self._allocate(header + encoded)
+
+    def _write_subkey_list(self, old_list: int, elements: List[Tuple[int, int]]) -> int:
+        """
+        Write a subkey index ("lh" leaves, under an "ri" root when large) in place of old_list
+
+        elements are (nk offset, name hash), sorted by name.
+        """
+        def leaf(chunk):
+            return (struct.pack("<2sH", b"lh", len(chunk))
+                    + b"".join(struct.pack("<II", offset, hashed) for offset, hashed in chunk))
+        if len(elements) <= MAX_LEAF_ELEMENTS and old_list != NO_CELL and self._signature(old_list) != b"ri":
+            return self._replace_cell(old_list, leaf(elements))
+        self._release_subkey_list(old_list)
+        if len(elements) <= MAX_LEAF_ELEMENTS:
+            return self._allocate(leaf(elements))
+        leaves = [self._allocate(leaf(elements[i:i + LEAF_SPLIT_SIZE])) for i in range(0, len(elements), LEAF_SPLIT_SIZE)]
+        return self._allocate(struct.pack("<2sH", b"ri", len(leaves)) + struct.pack(f"<{len(leaves)}I", *leaves))
+
+    def _release_subkey_list(self, list_offset: int):
+        if list_offset == NO_CELL:
+            return
+        if self._signature(list_offset) == b"ri":
+            count = self._u16(list_offset, 2)
+            for leaf in struct.unpack_from(f"<{count}I", self.data, self._cell(list_offset) + 4):
+                self._release(leaf)
+        self._release(list_offset)
+
+    def _touch(self, key: int):
+        struct.pack_into("<Q", self.data, self._cell(key) + _NK_TIMESTAMP, filetime())
+
+    def _raise_maximum(self, key: int, field: int, value: int, low_bits: bool = False):
+        current = self._u32(key, field)
+        if low_bits:
+            # The upper bits of the subkey name maximum hold flags since Windows Vista
+            if value > current & 0xFFFF:
+                self._set_u32(key, field, (current & 0xFFFF0000) | min(value, 0xFFFF))
+        elif value > current:
+            self._set_u32(key, field, value)
+
+    def _check_writable(self):
+        if self.dirty:
+            raise HiveError(f"{self.path or 'Hive'} has unapplied transaction log entries; "
+                            "load it once in Windows (or replay its logs) before editing it offline")
+
+    def create_key(self, path: str) -> int:
+        """Return a key's cell offset, creating it and any missing parents"""
+        self._check_writable()
+        key = self.root
+        for name in self._split(path):
+            child = self.find_subkey(key, name)
+            if child is None:
+                child = self._add_subkey(key, name)
+            key = child
+        return key
+
+    def _add_subkey(self, parent: int, name: str) -> int:
+        security = self._u32(parent, _NK_SECURITY)
+        child = self._new_key_cell(name, parent, security)
+        if security != NO_CELL:
+            self._set_u32(security, _SK_REFERENCES, self._u32(security, _SK_REFERENCES) + 1)
+
+        old_list = self._u32(parent, _NK_SUBKEY_LIST)
+        elements = [(offset, name_hash(self.key_name(offset)) if stored_hash is None else stored_hash)
+                    for offset, stored_hash in self._list_elements(old_list)]
+        # Subkey lists are kept sorted, so the new key's place is found by bisection
+        wanted = _sort_key(name)
+        low, high = 0, len(elements)
+        while low < high:
+            middle = (low + high) // 2
+            if _sort_key(self.key_name(elements[middle][0])) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        elements.insert(low, (child, name_hash(name)))
+        self._set_u32(parent, _NK_SUBKEY_LIST, self._write_subkey_list(old_list, elements))
+        self._set_u32(parent, _NK_SUBKEY_COUNT, len(elements))
+        self._raise_maximum(parent, _NK_MAX_SUBKEY_NAME, len(name) * 2, low_bits=True)
+        self._touch(parent)
+        return child
+
+    # Values
+
+    def _value_offsets(self, key: int) -> List[int]:
+        count = self._u32(key, _NK_VALUE_COUNT)
+        if not count:
+            return []
+        return list(struct.unpack_from(f"<{count}I", self.data, self._cell(self._u32(key, _NK_VALUE_LIST))))
+
+    def value_name(self, value: int) -> str:
+        length = self._u16(value, _VK_NAME_LENGTH)
+        position = self._cell(value) + _VK_HEADER
+        raw = bytes(self.data[position:position + length])
+        if self._u16(value, _VK_FLAGS) & VALUE_COMP_NAME:
+            return raw.decode("latin-1")
+        return raw.decode("utf-16-le", errors="replace")
+
+    def _value_data(self, value: int) -> bytes:
+        size = self._u32(value, _VK_DATA_SIZE)
+        if size & 0x80000000:
+            # Up to 4 bytes are stored in the data offset field itself
+            size &= 0x7FFFFFFF
+            position = self._cell(value) + _VK_DATA_OFFSET
+            return bytes(self.data[position:position + min(size, 4)])
+        offset = self._u32(value, _VK_DATA_OFFSET)
+        if size == 0 or offset == NO_CELL:
+            return b""
+        if self._signature(offset) == b"db" and size > BIG_DATA_SEGMENT and self.minor_version >= 4:
+            count = self._u16(offset, 2)
+            segments = struct.unpack_from(f"<{count}I", self.data, self._cell(self._u32(offset, 4)))
+            data = b"".join(bytes(self.data[self._cell(segment):self._cell(segment) + BIG_DATA_SEGMENT])
+                            for segment in segments)
+            return data[:size]
+        position = self._cell(offset)
+        return bytes(self.data[position:position + size])
+
+    def find_value(self, key: int, name: str) -> Optional[int]:
+        wanted = name.lower()
+        for value in self._value_offsets(key):
+            if self.value_name(value).lower() == wanted:
+                return value
+        return None
+
+    def values(self, path: str) -> Dict[str, Tuple[int, object]]:
+        """Return every value of a key as name -> (type, decoded data); "" is the default value"""
+        key = self.key(path)
+        if key is None:
+            return {}
+        return {self.value_name(value): (self._u32(value, _VK_TYPE),
+                                         decode_value(self._value_data(value), self._u32(value, _VK_TYPE)))
+                for value in self._value_offsets(key)}
+
+    def get_value(self, path: str, name: str) -> Optional[Tuple[int, object]]:
+        """Return (type, decoded data) of a value, or None if it does not exist"""
+        key = self.key(path)
+        value = None if key is None else self.find_value(key, name)
+        if value is None:
+            return None
+        reg_type = self._u32(value, _VK_TYPE)
+        return reg_type, decode_value(self._value_data(value), reg_type)
+
+    def _store_data(self, data: bytes) -> Tuple[int, int]:
+        """Return the (data size field, data offset field) for value data"""
+        if len(data) <= 4:
+            return len(data) | 0x80000000, struct.unpack("<I", data.ljust(4, b"\0"))[0]
+        if len(data) > BIG_DATA_SEGMENT and self.minor_version >= 4:
+            segments = [self._allocate(data[i:i + BIG_DATA_SEGMENT]) for i in range(0, len(data), BIG_DATA_SEGMENT)]
+            segment_list = self._allocate(struct.pack(f"<{len(segments)}I", *segments))
+            return len(data), self._allocate(struct.pack("<2sHI", b"db", len(segments), segment_list))
+        return len(data), self._allocate(data)
+
+    def _release_data(self, value: int):
+        size = self._u32(value, _VK_DATA_SIZE)
+        offset = self._u32(value, _VK_DATA_OFFSET)
+        if size & 0x80000000 or size == 0 or offset == NO_CELL:
+            return
+        if self._signature(offset) == b"db" and size > BIG_DATA_SEGMENT and self.minor_version >= 4:
+            segment_list = self._u32(offset, 4)
+            count = self._u16(offset, 2)
+            for segment in struct.unpack_from(f"<{count}I", self.data, self._cell(segment_list)):
+                self._release(segment)
+            self._release(segment_list)
+        self._release(offset)
+
+    def set_value(self, path: str, name: str, value, reg_type: int = None):
+        """Create or replace a value, creating the key if needed"""
+        reg_type = value_type_for(value) if reg_type is None else reg_type
+        data = encode_value(value, reg_type)
+        key = self.create_key(path)
+        existing = self.find_value(key, name)
+        size_field, offset_field = self._store_data(data)
+
+        if existing is not None:
+            self._release_data(existing)
+            struct.pack_into("<III", self.data, self._cell(existing) + _VK_DATA_SIZE, size_field, offset_field, reg_type)
+        else:
+            encoded, compressed = _encode_name(name)
+            vk = self._allocate(struct.pack("<2sHIIIHH", b"vk", len(encoded), size_field, offset_field, reg_type,
+                                            VALUE_COMP_NAME if compressed else 0, 0) + encoded)
+            offsets = self._value_offsets(key) + [vk]
+            old_list = self._u32(key, _NK_VALUE_LIST) if offsets[:-1] else NO_CELL
+            self._set_u32(key, _NK_VALUE_LIST, self._replace_cell(old_list, struct.pack(f"<{len(offsets)}I", *offsets)))
+            self._set_u32(key, _NK_VALUE_COUNT, len(offsets))
+            self._raise_maximum(key, _NK_MAX_VALUE_NAME, len(name) * 2)
+        self._raise_maximum(key, _NK_MAX_VALUE_DATA, len(data))
+        self._touch(key)
+        self.modified = True
+
+    def delete_value(self, path: str, name: str) -> bool:
+        """Delete a value; returns False if it did not exist"""
+        self._check_writable()
+        key = self.key(path)
+        value = None if key is None else self.find_value(key, name)
+        if value is None:
+            return False
+        offsets = [offset for offset in self._value_offsets(key) if offset != value]
+        if offsets:
+            self._replace_cell(self._u32(key, _NK_VALUE_LIST), struct.pack(f"<{len(offsets)}I", *offsets))
+        else:
+            self._release(self._u32(key, _NK_VALUE_LIST))
+            self._set_u32(key, _NK_VALUE_LIST, NO_CELL)
+        self._set_u32(key, _NK_VALUE_COUNT, len(offsets))
+        self._release_data(value)
+        self._release(value)
+        self._touch(key)
+        self.modified = True
+        return True
+
+    # Saving
+
+    def to_bytes(self) -> bytes:
+        """Return the hive file with an updated base block (sequence numbers, size, timestamp, checksum)"""
+        block = self.data
+        primary = (struct.unpack_from("<I", block, 4)[0] + 1) & 0xFFFFFFFF
+        struct.pack_into("<IIQ", block, 4, primary, primary, filetime())
+        struct.pack_into("<II", block, 0x24, self.root, self.bins_size)
+        struct.pack_into("<I", block, 0x1FC, base_block_checksum(block[:BASE_BLOCK_SIZE]))
+        return bytes(block)
+
+    def save(self, path: str = None):
+        """Write the hive atomically (to the file it was loaded from by default)"""
+        path = path or self.path
+        self._check_writable()
+        temporary = path + ".better10.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(temporary, path)
+        self.modified = False
+
+
+def find_case_insensitive(root: str, relative: str) -> Optional[str]:
+    """Resolve a path under root component by component, ignoring case (images mounted on Linux)"""
+    path = root
+    for part in relative.split("/"):
+        try:
+            match = next((name for name in os.listdir(path) if name.lower() == part.lower()), None)
+        except OSError:
+            return None
+        if match is None:
+            return None
+        path = os.path.join(path, match)
+    return path
+
+
+def hive_location(hive, key_path: str) -> Tuple[str, str]:
+    """
+    Map a live-registry location to an image hive file and a path inside it
+
+    Returns:
+        Tuple of (image-relative hive file, key path inside the hive)
+    """
+    hive = parse_hive(hive)
+    parts = [part for part in key_path.split("\\") if part]
+    if hive == HKEY_CURRENT_USER:
+        return DEFAULT_USER_HIVE, "\\".join(parts)
+    if hive == HKEY_LOCAL_MACHINE and parts:
+        root = parts[0].upper()
+        if root == "SOFTWARE":
+            return SOFTWARE_HIVE, "\\".join(parts[1:])
+        if root == "SYSTEM":
+            return SYSTEM_HIVE, "\\".join(parts[1:])
+    raise HiveError(f"{hive_name(hive)}\\{key_path} is not stored in an image hive Better10 edits "
+                    f"(HKLM\\SOFTWARE, HKLM\\SYSTEM and HKCU are)")
+
+
+def resolve_control_set(system: RegistryHive, key_path: str) -> str:
+    """Replace CurrentControlSet, a link that only exists on a running system, with the control set it points to"""
+    parts = key_path.split("\\")
+    if parts and parts[0].lower() == "currentcontrolset":
+        current = system.get_value("Select", "Current")
+        if current is None:
+            raise HiveError("SYSTEM hive has no Select\\Current value")
+        parts[0] = f"ControlSet{current[1]:03d}"
+    return "\\".join(parts)
+
+
+def apply_to_image(image_dir: str, operations: List[Dict]) -> List[Tuple[Dict, bool, str]]:
+    """
+    Apply the registry operations of a plan to a mounted Windows image
+
+    Each hive is loaded once, every operation for it is applied, and it is
+    saved once. Operations of other types are not applicable offline and
+    are not returned.
+
+    Returns:
+        List of (operation, success, error message) for the registry operations
+    """
+    hives: Dict[str, Optional[RegistryHive]] = {}
+    errors: Dict[str, str] = {}  # Hive file -> why it could not be loaded or saved
+    applied = []  # (operation, hive file or None, error message)
+
+    for operation in operations:
+        if operation.get('type') != 'registry':
+            continue
+        relative = None
+        try:
+            relative, key_path = hive_location(operation.get('hive', HKEY_LOCAL_MACHINE), operation.get('key_path', ''))
+            if relative not in hives:
+                hives[relative] = None
+                path = find_case_insensitive(image_dir, relative)
+                if path is None:
+                    errors[relative] = f"{relative} not found in {image_dir}"
+                else:
+                    try:
+                        hives[relative] = RegistryHive.load(path)
+                    except (OSError, HiveError) as e:
+                        errors[relative] = str(e)
+            hive = hives[relative]
+            if hive is None:
+                raise HiveError(errors[relative])
+            if relative == SYSTEM_HIVE:
+                key_path = resolve_control_set(hive, key_path)
+            hive.set_value(key_path, operation.get('value_name', ''), operation.get('value'))
+            applied.append((operation, relative, ""))
+        except (HiveError, ValueError) as e:
+            applied.append((operation, None, str(e)))
+
+    for relative, hive in hives.items():
+        if hive is not None and hive.modified:
+            try:
+                hive.save()
+            except (OSError, HiveError) as e:
+                errors[relative] = f"Could not save {relative}: {e}"
+
+    results = []
+    for operation, relative, error in applied:
+        if relative is not None and relative in errors:
+            # Nothing in this hive was written after all
+            error = errors[relative]
+        results.append((operation, not error, error))
+    return results
@@ -0,0 +1,208 @@
+"""
+Pre-flight checks for Better10
+
+A missing installer, a pending restart, a machine without winget, a full
+disk or a non-elevated session used to surface one operation at a time,
+sometimes after a 10-minute install had already run. Before the first
+operation starts, the whole plan is checked up front:
+
+- elevation
+- every installer, tool and executable exists (and a tool's unattended config)
+- free space on the system drive covers the installers
+- no restart is pending
+- winget is installed, if the plan uses it
+
+The probes are independent and each is a single batched query, so they
+run concurrently and a doomed run is rejected in well under a second,
+with one consolidated report.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
+
+from backends import SystemBackend
+from tool_profiles import tool_launch_arguments
+
+# Installers unpack next to themselves before installing, and the installed
+# product is usually larger than its installer
+DISK_SPACE_FACTOR = 3
+# Always keep this much free on the system drive (1 GiB)
+DISK_SPACE_RESERVE = 1024 ** 3
+
+
+class CheckStatus:
+    """Result of one pre-flight check"""
+    PASSED = "passed"
+    WARNING = "warning"  # Worth knowing, but the run can still succeed
+    FAILED = "failed"    # The run, or part of it, is bound to fail
+
+
+class PreflightCheck:
+    """Outcome of one pre-flight probe"""
+
+    def __init__(self, name: str, status: str, detail: str = ""):
+        self.name = name
+        self.status = status
+        self.detail = detail
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "status": self.status, "detail": self.detail}
+
+
+class PreflightReport:
+    """All pre-flight checks for a plan"""
+
+    def __init__(self, checks: List[PreflightCheck], seconds: float):
+        self.checks = checks
+        self.seconds = seconds
+
+    @property
+    def failures(self) -> List[PreflightCheck]:
+        return [check for check in self.checks if check.status == CheckStatus.FAILED]
+
+    @property
+    def warnings(self) -> List[PreflightCheck]:
+        return [check for check in self.checks if check.status == CheckStatus.WARNING]
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures
+
+    def lines(self) -> List[str]:
+        """One line per check that did not pass, failures first"""
+        return ([f"✗ {check.name}: {check.detail}" for check in self.failures]
+                + [f"⚠ {check.name}: {check.detail}" for check in self.warnings])
+
+
+def format_size(size: float) -> str:
+    """Format a byte count for the report ("1.4 GB")"""
+    if size < 1024:
+        return f"{size:.0f} bytes"
+    for unit in ("KB", "MB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GB"
+
+
+def _operation_files(operation: Dict) -> List[str]:
+    """Return the files an operation launches"""
+    op_type = operation.get('type')
+    if op_type in ('local_installer', 'tool') and operation.get('path'):
+        return [operation['path']]
+    if op_type == 'executable' and operation.get('exe_path'):
+        return [operation['exe_path']]
+    return []
+
+
+class Preflight:
+    """
+    Checks a plan against the machine before it runs
+
+    The class attribute is the default main() configures from the
+    command line.
+    """
+
+    enabled: bool = True
+
+    def __init__(self, backend: SystemBackend):
+        self.backend = backend
+
+    @classmethod
+    def configure(cls, enabled: bool = None):
+        """Change the default used by new pre-flight runs"""
+        if enabled is not None:
+            cls.enabled = enabled
+
+    def run(self, operations: List[Dict]) -> PreflightReport:
+        """Run every probe concurrently and collect the results"""
+        started = time.monotonic()
+        files = list(dict.fromkeys(path for op in operations for path in _operation_files(op)))
+        uses_winget = any(op.get('type', '').startswith('winget_') for op in operations)
+        installs = any(op.get('type') in ('local_installer', 'winget_install') for op in operations)
+
+        with ThreadPoolExecutor(max_workers=5, thread_name_prefix="preflight") as pool:
+            probes = [
+                ("Administrator privileges", pool.submit(self.backend.is_admin)),
+                ("Files", pool.submit(self.backend.file_sizes, files) if files else None),
+                ("Free disk space", pool.submit(self.backend.free_disk_space)),
+                ("Pending restart", pool.submit(self.backend.pending_reboot)),
+                ("Winget", pool.submit(self.backend.winget_available) if uses_winget else None),
+            ]
+            results = {name: self._collect(future) for name, future in probes}
+
+        checks = [self._check_admin(*results["Administrator privileges"])]
+        sizes, sizes_error = results["Files"]
+        if files:
+            checks.append(self._check_files(operations, files, sizes, sizes_error))
+            checks.append(self._check_disk_space(sizes, *results["Free disk space"]))
+        checks.append(self._check_pending_reboot(*results["Pending restart"], installs))
+        if uses_winget:
+            checks.append(self._check_winget(*results["Winget"]))
+        return PreflightReport(checks, time.monotonic() - started)
+
+    @staticmethod
+    def _collect(future) -> Tuple[object, str]:
+        """Return (result, error message) for an optional probe"""
+        if future is None:
+            return None, ""
+        try:
+            return future.result(), ""
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    @staticmethod
+    def _check_admin(is_admin, error: str) -> PreflightCheck:
+        name = "Administrator privileges"
+        if error:
+            return PreflightCheck(name, CheckStatus.WARNING, f"Could not be checked: {error}")
+        if not is_admin:
+            return PreflightCheck(name, CheckStatus.FAILED,
+                                  "Not running elevated; registry, Appx and installer steps will be denied")
+        return PreflightCheck(name, CheckStatus.PASSED)
+
+    @staticmethod
+    def _check_files(operations: List[Dict], files: List[str], sizes, error: str) -> PreflightCheck:
+        name = "Files"
+        if error:
+            return PreflightCheck(name, CheckStatus.WARNING, f"Could not be checked: {error}")
+        problems = [f"{path} not found" for path, size in zip(files, sizes) if size is None]
+        # A tool's unattended config is checked the same way it is resolved at launch
+        problems.extend(message for op in operations if op.get('type') == 'tool'
+                        for message in [tool_launch_arguments(op)[1]] if message)
+        if problems:
+            return PreflightCheck(name, CheckStatus.FAILED, "; ".join(problems))
+        return PreflightCheck(name, CheckStatus.PASSED)
+
+    @staticmethod
+    def _check_disk_space(sizes, free, error: str) -> PreflightCheck:
+        name = "Free disk space"
+        if error or free is None:
+            return PreflightCheck(name, CheckStatus.WARNING, f"Could not be checked: {error or 'unknown'}")
+        needed = sum(size for size in sizes or [] if size) * DISK_SPACE_FACTOR + DISK_SPACE_RESERVE
+        if free < needed:
+            return PreflightCheck(name, CheckStatus.FAILED,
+                                  f"{format_size(free)} free on the system drive, about {format_size(needed)} needed")
+        return PreflightCheck(name, CheckStatus.PASSED)
+
+    @staticmethod
+    def _check_pending_reboot(reasons, error: str, installs: bool) -> PreflightCheck:
+        name = "Pending restart"
+        if error:
+            return PreflightCheck(name, CheckStatus.WARNING, f"Could not be checked: {error}")
+        if reasons:
+            # Installers commonly refuse to run (or roll back) until the restart happens
+            status = CheckStatus.FAILED if installs else CheckStatus.WARNING
+            return PreflightCheck(name, status, "Restart Windows first (" + ", ".join(reasons) + ")")
+        return PreflightCheck(name, CheckStatus.PASSED)
+
+    @staticmethod
+    def _check_winget(available, error: str) -> PreflightCheck:
+        name = "Winget"
+        if error:
+            return PreflightCheck(name, CheckStatus.WARNING, f"Could not be checked: {error}")
+        if not available:
+            return PreflightCheck(name, CheckStatus.FAILED,
+                                  "winget is not installed; install App Installer from the Microsoft Store")
+        return PreflightCheck(name, CheckStatus.PASSED)
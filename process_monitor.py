@@ -0,0 +1,540 @@
+"""
+Child process supervision for Better10
+
+run_monitored() replaces subprocess.run() for every launch. Besides the
+hard timeout it watches the whole process tree: a child that produces no
+output and uses no CPU for the inactivity window (a GUI tool waiting on a
+hidden dialog, an installer stuck on a prompt) is killed, or reported
+through a callback, in seconds instead of running into the timeout.
+
+Launches can also carry ResourceLimits: a CPU priority, an I/O priority
+and a CPU affinity applied to the child and to every descendant the
+watchdog finds, and a flag marking the launch as disk-heavy. Disk-heavy
+launches wait for a slot while their max_disk_jobs of them are running.
+"""
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+import ctypes
+import platform
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Tuple, Optional, Callable
+
+
+class HangAction:
+    """What to do with a child that stopped making progress"""
+    KILL = "kill"  # Kill the process tree and fail the operation
+    WARN = "warn"  # Report it and keep waiting until the hard timeout
+
+
+class ExitStatus:
+    """How a monitored process ended"""
+    EXITED = "exited"
+    TIMED_OUT = "timed_out"
+    HUNG = "hung"
+
+
+class CpuPriority:
+    """Scheduling priority of a child process"""
+    IDLE = "idle"
+    BELOW_NORMAL = "below_normal"
+    NORMAL = "normal"
+    ABOVE_NORMAL = "above_normal"
+
+
+class IoPriority:
+    """Disk priority of a child process"""
+    VERY_LOW = "very_low"  # Only uses the disk when nothing else does
+    LOW = "low"
+    NORMAL = "normal"
+
+
+class ResourceLimits:
+    """Scheduling settings for a child process and everything it starts"""
+
+    def __init__(self, cpu_priority: str = CpuPriority.NORMAL, io_priority: str = IoPriority.NORMAL,
+                 affinity: List[int] = None, disk_heavy: bool = False, max_disk_jobs: int = None):
+        """
+        Args:
+            cpu_priority: CpuPriority value
+            io_priority: IoPriority value
+            affinity: CPU numbers the processes may run on (all if None)
+            disk_heavy: The launch counts against max_disk_jobs
+            max_disk_jobs: Disk-heavy launches allowed to run at once (unlimited if None)
+        """
+        self.cpu_priority = cpu_priority
+        self.io_priority = io_priority
+        self.affinity = sorted(set(affinity)) if affinity else None
+        self.disk_heavy = disk_heavy
+        self.max_disk_jobs = max_disk_jobs
+
+    @property
+    def changes_scheduling(self) -> bool:
+        """Whether anything has to be applied to the launched processes"""
+        return (self.cpu_priority != CpuPriority.NORMAL or self.io_priority != IoPriority.NORMAL
+                or self.affinity is not None)
+
+    def to_dict(self) -> Dict:
+        return {"cpu_priority": self.cpu_priority, "io_priority": self.io_priority, "affinity": self.affinity,
+                "disk_heavy": self.disk_heavy, "max_disk_jobs": self.max_disk_jobs}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ResourceLimits":
+        return cls(data.get("cpu_priority", CpuPriority.NORMAL), data.get("io_priority", IoPriority.NORMAL),
+                   data.get("affinity"), bool(data.get("disk_heavy")), data.get("max_disk_jobs"))
+
+
+class LaunchOptions:
+    """Per-launch limits and callbacks passed to the backend run_* methods"""
+
+    def __init__(self, timeout: float = None, inactivity_timeout: float = None,
+                 hang_action: str = HangAction.KILL,
+                 on_hang: Callable[[float], None] = None,
+                 on_output: Callable[[str, str], None] = None,
+                 resources: ResourceLimits = None):
+        """
+        Args:
+            timeout: Hard limit in seconds (the backend default if None)
+            inactivity_timeout: Seconds without output or CPU progress before the
+                child counts as hung (watchdog disabled if None or 0)
+            hang_action: HangAction.KILL or HangAction.WARN
+            on_hang: Called with the idle seconds when a hung child is detected
+            on_output: Called with ("stdout" | "stderr", line) for every line of output
+            resources: Priorities, affinity and disk-job limit (left alone if None)
+        """
+        self.timeout = timeout
+        self.inactivity_timeout = inactivity_timeout
+        self.hang_action = hang_action
+        self.on_hang = on_hang
+        self.on_output = on_output
+        self.resources = resources
+        # Filled in by the backend once the child has exited (None if it was
+        # killed, timed out or never started)
+        self.exit_code: Optional[int] = None
+
+
+# CPU seconds a process tree must gain before it counts as making progress.
+# Idle GUI message pumps stay well below this.
+CPU_PROGRESS_EPSILON = 0.05
+
+POLL_INTERVAL = 0.5
+
+
+if sys.platform == "win32":
+    from ctypes import wintypes
+
+    TH32CS_SNAPPROCESS = 0x00000002
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", wintypes.LONG),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", wintypes.WCHAR * 260),
+        ]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.GetCurrentThread.restype = wintypes.HANDLE
+    _ntdll = ctypes.WinDLL("ntdll")
+
+    PROCESS_SET_INFORMATION = 0x0200
+    PROCESS_IO_PRIORITY = 33  # PROCESSINFOCLASS ProcessIoPriority
+    THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+PRIORITY_CLASSES = {
+    CpuPriority.IDLE: 0x00000040,
+    CpuPriority.BELOW_NORMAL: 0x00004000,
+    CpuPriority.NORMAL: 0x00000020,
+    CpuPriority.ABOVE_NORMAL: 0x00008000,
+}
+# Windows IO_PRIORITY_HINT values
+IO_PRIORITY_HINTS = {IoPriority.VERY_LOW: 0, IoPriority.LOW: 1, IoPriority.NORMAL: 2}
+NICE_VALUES = {CpuPriority.IDLE: 19, CpuPriority.BELOW_NORMAL: 10, CpuPriority.NORMAL: 0, CpuPriority.ABOVE_NORMAL: -5}
+
+# Linux ioprio_set(2): the class sits above IOPRIO_CLASS_SHIFT, the level (0-7) below it
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASS_BE = 2
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_VALUES = {
+    IoPriority.VERY_LOW: IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT,
+    IoPriority.LOW: (IOPRIO_CLASS_BE << IOPRIO_CLASS_SHIFT) | 7,
+    IoPriority.NORMAL: (IOPRIO_CLASS_BE << IOPRIO_CLASS_SHIFT) | 4,
+}
+SYS_IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "i686": 289, "i386": 289}.get(platform.machine().lower())
+
+
+def process_parents() -> Dict[int, int]:
+    """
+    Map every running process id to its parent process id
+
+    Returns:
+        Dict of pid -> parent pid (empty if the platform is not supported)
+    """
+    parents = {}
+    if sys.platform == "win32":
+        snapshot = _kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+        if not snapshot or snapshot == INVALID_HANDLE_VALUE:
+            return parents
+        try:
+            entry = PROCESSENTRY32W()
+            entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+            more = _kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+            while more:
+                parents[entry.th32ProcessID] = entry.th32ParentProcessID
+                more = _kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+        finally:
+            _kernel32.CloseHandle(snapshot)
+    elif os.path.isdir("/proc"):
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{name}/stat", "rb") as f:
+                    stat = f.read()
+                # The command name may contain spaces, so split after the closing parenthesis
+                fields = stat[stat.rindex(b")") + 2:].split()
+                parents[int(name)] = int(fields[1])
+            except (OSError, ValueError, IndexError):
+                continue
+    return parents
+
+
+def process_tree(pid: int) -> List[int]:
+    """Return pid followed by all of its descendants"""
+    children: Dict[int, List[int]] = {}
+    for child, parent in process_parents().items():
+        if child != parent:
+            children.setdefault(parent, []).append(child)
+
+    tree = [pid]
+    index = 0
+    while index < len(tree):
+        tree.extend(children.get(tree[index], []))
+        index += 1
+    return tree
+
+
+def process_cpu_time(pid: int) -> Optional[float]:
+    """
+    Return the CPU seconds (user + kernel) used by a single process
+
+    Returns:
+        CPU seconds, or None if the process is gone or the platform is not supported
+    """
+    if sys.platform == "win32":
+        handle = _kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            creation, exited, kernel, user = (ctypes.c_ulonglong() for _ in range(4))
+            if not _kernel32.GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exited),
+                                             ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            # FILETIME values are in 100 ns units
+            return (kernel.value + user.value) / 10_000_000
+        finally:
+            _kernel32.CloseHandle(handle)
+    elif os.path.isdir("/proc"):
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+            fields = stat[stat.rindex(b")") + 2:].split()
+            # utime and stime are fields 14 and 15 of the full stat line
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return None
+    return None
+
+
+def process_tree_cpu_time(pid: int, tree: List[int] = None) -> Optional[float]:
+    """
+    Return the CPU seconds used by a process and all of its descendants
+
+    Elevated children started with Start-Process -Verb RunAs are descendants
+    of the launching PowerShell, so they are included.
+
+    Args:
+        pid: Root of the tree
+        tree: process_tree(pid), if the caller already has it
+
+    Returns:
+        CPU seconds, or None if CPU time cannot be measured on this platform
+    """
+    total = None
+    for member in tree or process_tree(pid):
+        cpu = process_cpu_time(member)
+        if cpu is not None:
+            total = (total or 0.0) + cpu
+    return total
+
+
+def _set_ioprio(pid: int, io_priority: str) -> bool:
+    if SYS_IOPRIO_SET is None:
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.syscall(SYS_IOPRIO_SET, IOPRIO_WHO_PROCESS, pid, IOPRIO_VALUES[io_priority]) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def apply_resource_limits(pid: int, limits: ResourceLimits) -> bool:
+    """
+    Apply a CPU priority, I/O priority and affinity to a running process
+
+    Failures are not errors: a process may already be gone, or belong to
+    another user (an elevated child of an unelevated launcher).
+
+    Returns:
+        True if every setting was applied
+    """
+    applied = True
+    if sys.platform == "win32":
+        handle = _kernel32.OpenProcess(PROCESS_SET_INFORMATION | PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            applied = bool(_kernel32.SetPriorityClass(handle, PRIORITY_CLASSES[limits.cpu_priority]))
+            hint = ctypes.c_ulong(IO_PRIORITY_HINTS[limits.io_priority])
+            applied &= _ntdll.NtSetInformationProcess(handle, PROCESS_IO_PRIORITY, ctypes.byref(hint),
+                                                      ctypes.sizeof(hint)) == 0
+            if limits.affinity is not None:
+                mask = sum(1 << cpu for cpu in limits.affinity)
+                applied &= bool(_kernel32.SetProcessAffinityMask(handle, ctypes.c_size_t(mask)))
+        finally:
+            _kernel32.CloseHandle(handle)
+        return applied
+
+    try:
+        os.setpriority(os.PRIO_PROCESS, pid, NICE_VALUES[limits.cpu_priority])
+    except (OSError, AttributeError):
+        applied = False
+    if sys.platform.startswith("linux"):
+        applied &= _set_ioprio(pid, limits.io_priority)
+    if limits.affinity is not None:
+        try:
+            os.sched_setaffinity(pid, limits.affinity)
+        except (OSError, AttributeError, ValueError):
+            applied = False
+    return applied
+
+
+def lower_current_thread(limits: ResourceLimits):
+    """
+    Give the calling thread the CPU and I/O priority of some limits
+
+    Used for work Better10 does itself, such as copying installers, which
+    should yield to the desktop the way governed children do.
+    """
+    if not limits.changes_scheduling:
+        return
+    if sys.platform == "win32":
+        # Background mode lowers the thread's CPU, I/O and memory priority together
+        _kernel32.SetThreadPriority(_kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN)
+    elif sys.platform.startswith("linux"):
+        # Linux schedules threads individually: the thread id addresses just this thread
+        apply_resource_limits(threading.get_native_id(), limits)
+
+
+class DiskSlots:
+    """
+    Counts the disk-heavy jobs running in this process
+
+    Each job brings its own cap, so launches configured differently (e.g.
+    by two clients of the broker) still share one count.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.active = 0
+
+    @contextmanager
+    def hold(self, limit: Optional[int]):
+        """Wait until fewer than limit disk-heavy jobs run (no wait if limit is None), then run one"""
+        with self._condition:
+            while limit and self.active >= limit:
+                self._condition.wait()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+
+DISK_SLOTS = DiskSlots()
+
+
+def disk_slot(limits: Optional[ResourceLimits]):
+    """Return a context manager holding a disk slot for a disk-heavy launch, and nothing otherwise"""
+    if limits is None or not limits.disk_heavy:
+        return nullcontext()
+    return DISK_SLOTS.hold(limits.max_disk_jobs)
+
+
+def kill_process_tree(proc: subprocess.Popen):
+    """Kill a process together with everything it started"""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ['taskkill', '/T', '/F', '/PID', str(proc.pid)],
+                capture_output=True,
+                timeout=30
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except Exception:
+        pass
+    try:
+        proc.kill()
+    except Exception:
+        pass
+
+
+def run_monitored(args, shell: bool = False, options: LaunchOptions = None,
+                  default_timeout: float = 600) -> Tuple[Optional[int], str, str, str]:
+    """
+    Run a child process under the timeout and inactivity watchdog
+
+    A disk-heavy launch first waits for a disk slot; the timeout starts
+    once the child does.
+
+    Args:
+        args: Command line (string when shell=True, list otherwise)
+        shell: Run through the shell
+        options: Limits and callbacks for this launch
+        default_timeout: Hard timeout used when options.timeout is not set
+
+    Returns:
+        Tuple of (returncode: int or None, stdout: str, stderr: str, status: ExitStatus value)
+    """
+    options = options or LaunchOptions()
+    with disk_slot(options.resources):
+        return _supervise(args, shell, options, default_timeout)
+
+
+def _supervise(args, shell: bool, options: LaunchOptions,
+               default_timeout: float) -> Tuple[Optional[int], str, str, str]:
+    timeout = options.timeout if options.timeout is not None else default_timeout
+    limits = options.resources if options.resources is not None and options.resources.changes_scheduling else None
+
+    popen_kwargs = {}
+    if sys.platform != "win32":
+        # Own process group so the whole tree can be killed
+        popen_kwargs['start_new_session'] = True
+    elif limits is not None:
+        # The priority class is set at creation, before the child runs any code
+        popen_kwargs['creationflags'] = PRIORITY_CLASSES[limits.cpu_priority]
+
+    proc = subprocess.Popen(
+        args,
+        shell=shell,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace',
+        **popen_kwargs
+    )
+
+    stdout_lines: List[str] = []
+    stderr_lines: List[str] = []
+    last_output = [time.monotonic()]
+
+    def read_stream(stream, lines, name):
+        for line in iter(stream.readline, ''):
+            lines.append(line)
+            last_output[0] = time.monotonic()
+            if options.on_output:
+                options.on_output(name, line)
+        stream.close()
+
+    readers = [
+        threading.Thread(target=read_stream, args=(proc.stdout, stdout_lines, "stdout"), daemon=True),
+        threading.Thread(target=read_stream, args=(proc.stderr, stderr_lines, "stderr"), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    # Descendants are governed as the watchdog discovers them
+    governed = set()
+    if limits is not None:
+        apply_resource_limits(proc.pid, limits)
+        governed.add(proc.pid)
+
+    start = time.monotonic()
+    last_activity = start
+    last_cpu = None
+    warned = False
+    status = ExitStatus.EXITED
+
+    while True:
+        try:
+            proc.wait(timeout=POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+
+        now = time.monotonic()
+        if now - start >= timeout:
+            status = ExitStatus.TIMED_OUT
+            kill_process_tree(proc)
+            break
+
+        if limits is None and not options.inactivity_timeout:
+            continue
+        tree = process_tree(proc.pid)
+        if limits is not None:
+            for member in tree:
+                if member not in governed:
+                    governed.add(member)
+                    apply_resource_limits(member, limits)
+        if not options.inactivity_timeout:
+            continue
+
+        cpu = process_tree_cpu_time(proc.pid, tree)
+        if cpu is None:
+            # Without CPU figures a quiet child cannot be told apart from a hung one
+            continue
+        if last_cpu is None or cpu - last_cpu > CPU_PROGRESS_EPSILON:
+            last_cpu = cpu
+            last_activity = now
+        elif cpu < last_cpu:
+            # A child exited and took its CPU time out of the total; measure
+            # the survivors from here rather than from the old total
+            last_cpu = cpu
+        last_activity = max(last_activity, last_output[0])
+
+        idle = now - last_activity
+        if idle >= options.inactivity_timeout:
+            if options.hang_action == HangAction.KILL:
+                status = ExitStatus.HUNG
+                kill_process_tree(proc)
+                break
+            if not warned:
+                warned = True
+                if options.on_hang:
+                    options.on_hang(idle)
+        else:
+            warned = False
+
+    proc.wait()
+    for reader in readers:
+        reader.join(timeout=5)
+
+    return proc.returncode, ''.join(stdout_lines), ''.join(stderr_lines), status
@@ -0,0 +1,185 @@
+"""
+HKCU fan-out for Better10
+
+Registry settings under HKEY_CURRENT_USER only reach the account running
+Better10, which on a shared machine is rarely the only one that matters.
+With fan-out enabled, the HKCU registry operations of a run are also
+applied to every profile in ProfileList and to the Default profile new
+accounts are copied from:
+
+- a profile whose hive is already loaded (a signed-in user) is written
+  through HKEY_USERS\\<SID> directly
+- any other profile's NTUSER.DAT is mounted at a temporary
+  HKEY_USERS\\Better10_<pid>_<n> key, written and unloaded again
+- a hive another process holds open is reported as in use and skipped;
+  nothing is forced
+
+Profiles are independent, so they are processed concurrently. All the
+settings for one profile go through a single apply_registry_changes call,
+which opens each key once.
+"""
+
+import os
+import ntpath
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
+
+from backends import (
+    SystemBackend, HiveMount, HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, HKEY_USERS, USER_HIVE_FILE, DEFAULT_PROFILE_SID,
+    REG_SZ, REG_DWORD, parse_hive
+)
+
+MOUNT_PREFIX = "Better10_"
+
+
+class ProfileStatus:
+    """Outcome of applying the settings to one profile"""
+    APPLIED = "applied"
+    PARTIAL = "partial"  # Mounted, but some settings failed
+    IN_USE = "in_use"    # Skipped: the hive is locked by another process
+    FAILED = "failed"
+
+
+class ProfileResult:
+    """Outcome of one profile"""
+
+    def __init__(self, profile: Dict, status: str, detail: str = "", results: List[Tuple[bool, str]] = None):
+        self.profile = profile
+        self.status = status
+        self.detail = detail
+        self.results = results or []
+
+    @property
+    def label(self) -> str:
+        name = ntpath.basename(self.profile["path"].rstrip("\\")) or self.profile["path"]
+        return "Default profile" if self.profile["sid"] == DEFAULT_PROFILE_SID else f"{name} ({self.profile['sid']})"
+
+    @property
+    def applied_count(self) -> int:
+        return sum(1 for success, _ in self.results if success)
+
+
+def user_operations(operations: List[Dict]) -> List[Dict]:
+    """Return the HKCU registry operations of a plan"""
+    selected = []
+    for operation in operations:
+        if operation.get('type') != 'registry' or not operation.get('key_path') or not operation.get('value_name'):
+            continue
+        try:
+            if parse_hive(operation.get('hive', HKEY_LOCAL_MACHINE)) == HKEY_CURRENT_USER:
+                selected.append(operation)
+        except ValueError:
+            continue
+    return selected
+
+
+def registry_type(value) -> int:
+    """Registry type set_registry_value would use for a value (None if unsupported)"""
+    if isinstance(value, int):
+        return REG_DWORD
+    if isinstance(value, str):
+        return REG_SZ
+    return None
+
+
+class ProfileFanout:
+    """
+    Applies HKCU operations to every user profile
+
+    The class attributes are the defaults main() configures from the
+    command line; the Privacy tab toggle flips enabled at runtime.
+    """
+
+    enabled: bool = False
+    include_default: bool = True
+    max_workers: int = 4
+
+    _mount_numbers = itertools.count(1)
+
+    def __init__(self, backend: SystemBackend):
+        self.backend = backend
+
+    @classmethod
+    def configure(cls, enabled: bool = None, include_default: bool = None, max_workers: int = None):
+        """Change the defaults used by new fan-outs"""
+        if enabled is not None:
+            cls.enabled = enabled
+        if include_default is not None:
+            cls.include_default = include_default
+        if max_workers is not None:
+            cls.max_workers = max(1, max_workers)
+
+    def profiles(self) -> List[Dict]:
+        return [profile for profile in self.backend.user_profiles()
+                if self.include_default or profile["sid"] != DEFAULT_PROFILE_SID]
+
+    def run(self, operations: List[Dict]) -> List[ProfileResult]:
+        """
+        Apply the HKCU registry operations in a plan to every profile
+
+        Returns:
+            One ProfileResult per profile, in ProfileList order
+        """
+        selected = user_operations(operations)
+        if not selected:
+            return []
+        profiles = self.profiles()
+        if not profiles:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(profiles)),
+                                thread_name_prefix="profile-fanout") as pool:
+            return list(pool.map(lambda profile: self.apply_to_profile(profile, selected), profiles))
+
+    def apply_to_profile(self, profile: Dict, operations: List[Dict]) -> ProfileResult:
+        """Mount a profile's hive if needed, apply the operations in one batch and unmount it"""
+        if profile.get("loaded"):
+            return self._apply(profile, profile["sid"], operations)
+
+        # Profile paths are Windows paths whatever platform the plan is built on
+        hive_path = ntpath.join(profile["path"], USER_HIVE_FILE)
+        mount = f"{MOUNT_PREFIX}{os.getpid()}_{next(self._mount_numbers)}"
+        try:
+            status, error = self.backend.load_user_hive(mount, hive_path)
+        except Exception as e:
+            status, error = HiveMount.FAILED, str(e)
+        if status == HiveMount.IN_USE:
+            return ProfileResult(profile, ProfileStatus.IN_USE, error)
+        if status != HiveMount.MOUNTED:
+            return ProfileResult(profile, ProfileStatus.FAILED, f"Could not load {hive_path}: {error}")
+
+        try:
+            result = self._apply(profile, mount, operations)
+        finally:
+            unloaded, error = self.backend.unload_user_hive(mount)
+        if not unloaded:
+            # The changes are in the hive; it stays mounted until the next restart
+            result.detail = (result.detail + "; " if result.detail else "") + \
+                f"HKEY_USERS\\{mount} could not be unloaded: {error}"
+        return result
+
+    def _apply(self, profile: Dict, mount: str, operations: List[Dict]) -> ProfileResult:
+        changes = []
+        for operation in operations:
+            key_path = operation['key_path'].strip("\\")
+            changes.append({
+                "action": "set", "hive": HKEY_USERS, "key_path": f"{mount}\\{key_path}",
+                "value_name": operation['value_name'], "value": operation.get('value'),
+                "type": registry_type(operation.get('value')),
+            })
+        unsupported = {i for i, change in enumerate(changes) if change["type"] is None}
+        try:
+            applied = iter(self.backend.apply_registry_changes(
+                [change for i, change in enumerate(changes) if i not in unsupported]))
+        except Exception as e:
+            return ProfileResult(profile, ProfileStatus.FAILED, str(e))
+        results = [(False, f"Unsupported value type: {type(operations[i].get('value')).__name__}")
+                   if i in unsupported else next(applied) for i in range(len(changes))]
+
+        failures = [(operation.get('name', operation['value_name']), error)
+                    for operation, (success, error) in zip(operations, results) if not success]
+        if not failures:
+            return ProfileResult(profile, ProfileStatus.APPLIED, results=results)
+        detail = "; ".join(f"{name}: {error}" for name, error in failures[:3])
+        status = ProfileStatus.PARTIAL if len(failures) < len(results) else ProfileStatus.FAILED
+        return ProfileResult(profile, status, detail, results)
@@ -0,0 +1,91 @@
+"""
+Profile files for Better10
+
+A profile is a saved plan: a JSON document holding the same operation
+dicts WorkerThread executes. Registry hives are written by name ("HKLM",
+"HKCU") so profiles stay readable and portable between machines.
+
+Besides the operations, a profile may hold settings for the run, such as
+the "resources" section read by the resource governor.
+
+Example:
+    {
+        "name": "Lab baseline",
+        "resources": {"policy": "usable"},
+        "operations": [
+            {"type": "registry", "name": "Disable Telemetry",
+             "key_path": "SOFTWARE\\\\Policies\\\\Microsoft\\\\Windows\\\\DataCollection",
+             "value_name": "AllowTelemetry", "value": 0, "hive": "HKLM"}
+        ]
+    }
+"""
+
+import json
+from typing import List, Dict
+
+from backends import parse_hive, hive_name
+
+
+def normalize_operation(operation: Dict) -> Dict:
+    """Return a copy of an operation with its hive converted to a winreg constant"""
+    normalized = dict(operation)
+    if 'hive' in normalized:
+        normalized['hive'] = parse_hive(normalized['hive'])
+    return normalized
+
+
+def serialize_operation(operation: Dict) -> Dict:
+    """Return a copy of an operation with its hive converted to a name"""
+    serialized = dict(operation)
+    if isinstance(serialized.get('hive'), int):
+        serialized['hive'] = hive_name(serialized['hive'])
+    return serialized
+
+
+def load_profile(path: str) -> List[Dict]:
+    """
+    Load the operations from a profile file
+
+    Args:
+        path: Path to the JSON profile (either {"operations": [...]} or a bare list)
+
+    Returns:
+        List of operation dicts ready for WorkerThread
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    operations = data.get("operations", []) if isinstance(data, dict) else data
+    if not isinstance(operations, list):
+        raise ValueError(f"Profile {path} does not contain an operation list")
+    return [normalize_operation(op) for op in operations]
+
+
+def load_profile_settings(path: str) -> Dict:
+    """
+    Load the run settings from a profile file
+
+    Returns:
+        Every top-level entry except the operations (empty for a bare list)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        return {}
+    return {key: value for key, value in data.items() if key != "operations"}
+
+
+def save_profile(path: str, operations: List[Dict], name: str = None):
+    """
+    Save operations to a profile file
+
+    Args:
+        path: Destination path
+        operations: Operation dicts to save
+        name: Optional display name stored in the profile
+    """
+    data = {"operations": [serialize_operation(op) for op in operations]}
+    if name:
+        data["name"] = name
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
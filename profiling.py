@@ -0,0 +1,209 @@
+"""
+Profiling hooks for Better10
+
+Enabled with --profile (or the toggle in the Logs tab), the slow paths
+are wrapped in profiled sections: startup, the tab builds,
+execute_all_operations and WorkerThread.run. Each outermost section
+writes its reports into one directory per session under
+data_dir()/profiling (named after the start time and process id):
+
+- NN-section.pstats: cProfile statistics (python -m pstats, snakeviz, ...)
+- NN-section.collapsed: stacks sampled every few milliseconds, one
+  "frame;frame;frame count" line per stack, the input format of
+  flamegraph.pl, speedscope and inferno
+- NN-section.memory.txt: top allocation sites and peak traced memory,
+  with --profile-memory (tracemalloc)
+- phases.trace.json: wall-clock time of every section and phase, in
+  Chrome trace format (chrome://tracing, Perfetto)
+
+Sections nest. Inside a profiled section, an inner section only records
+its phase, because its time is already in the outer profile.
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Optional
+
+from backends import data_dir
+
+# Frames kept per sampled stack (deeper frames are dropped from the root side)
+MAX_STACK_DEPTH = 64
+# Allocation sites listed in a memory report
+MEMORY_TOP_SITES = 30
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.counts[";".join(reversed(names))] += 1
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """
+    Profiling switches and the current session
+
+    The class attributes are the defaults main() configures from the
+    command line; the Logs tab toggle flips enabled at runtime.
+    """
+
+    enabled: bool = False
+    trace_memory: bool = False
+    sample_interval: float = 0.005
+
+    _lock = threading.Lock()
+    _local = threading.local()
+    _session_dir: Optional[str] = None
+    _sequence = 0
+    _epoch = time.perf_counter()
+    _events: List[Dict] = []
+
+    @classmethod
+    def configure(cls, enabled: bool = None, trace_memory: bool = None, sample_interval: float = None):
+        """Change the profiling switches"""
+        if enabled is not None:
+            cls.enabled = enabled
+        if trace_memory is not None:
+            cls.trace_memory = trace_memory
+        if sample_interval is not None:
+            cls.sample_interval = sample_interval
+
+    @classmethod
+    def session_dir(cls) -> str:
+        """Return this session's report directory, creating it on first use"""
+        with cls._lock:
+            if cls._session_dir is None:
+                session = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+                cls._session_dir = os.path.join(data_dir(), "profiling", session)
+                os.makedirs(cls._session_dir, exist_ok=True)
+            return cls._session_dir
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str):
+        """Record the wall-clock time of a phase (no-op when profiling is off)"""
+        if not cls.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter()
+            with cls._lock:
+                cls._events.append({
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": round((started - cls._epoch) * 1e6), "dur": round((finished - started) * 1e6),
+                })
+
+    @classmethod
+    @contextmanager
+    def section(cls, name: str):
+        """
+        Profile a section with cProfile, a stack sampler and optionally tracemalloc
+
+        Reports are written when the outermost section of a thread ends.
+        """
+        if not cls.enabled or getattr(cls._local, "active", False):
+            with cls.phase(name):
+                yield
+            return
+
+        cls._local.active = True
+        profile = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), cls.sample_interval)
+        started_tracing = cls.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        try:
+            # On Python 3.12+ only one cProfile can be active at a time; the
+            # sampler and phase tracer still cover a section that overlaps another
+            profile.enable()
+            profiling = True
+        except ValueError:
+            profiling = False
+        sampler.start()
+        try:
+            with cls.phase(name):
+                yield
+        finally:
+            if profiling:
+                profile.disable()
+            sampler.stop()
+            memory = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            peak = tracemalloc.get_traced_memory()[1] if memory else 0
+            if started_tracing:
+                tracemalloc.stop()
+            cls._local.active = False
+            try:
+                cls._write_reports(name, profile if profiling else None, sampler, memory, peak)
+            except OSError:
+                pass
+
+    @classmethod
+    def _write_reports(cls, name: str, profile: Optional[cProfile.Profile], sampler: StackSampler,
+                       memory: Optional[tracemalloc.Snapshot], peak: int):
+        directory = cls.session_dir()
+        with cls._lock:
+            cls._sequence += 1
+            prefix = os.path.join(directory, f"{cls._sequence:02d}-{name}")
+            events = list(cls._events)
+
+        if profile is not None:
+            pstats.Stats(profile).dump_stats(prefix + ".pstats")
+        sampler.write(prefix + ".collapsed")
+        if memory is not None:
+            with open(prefix + ".memory.txt", "w", encoding="utf-8") as f:
+                f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n\n")
+                for stat in memory.statistics("lineno")[:MEMORY_TOP_SITES]:
+                    f.write(f"{stat}\n")
+        with open(os.path.join(directory, "phases.trace.json"), "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def profiled(name: str):
+    """Decorator that runs a function as a profiled section"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with Profiler.section(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
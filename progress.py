@@ -0,0 +1,144 @@
+"""
+Cost-weighted progress and ETA for Better10
+
+Each operation contributes its expected duration to the progress bar
+instead of one equal step, so a 10-minute installer moves the bar further
+than a registry write. While an operation runs, its share fills from
+whichever is further along: progress reported in its output ("45%",
+"12.0 MB / 40.0 MB") or the time elapsed against its expected cost.
+"""
+
+import re
+import time
+import threading
+from typing import List, Optional
+
+# Hold the running operation short of done until it has actually finished
+MAX_PARTIAL = 0.95
+
+_PERCENT_PATTERN = re.compile(r"(?<![\d.])(\d{1,3}(?:\.\d+)?)\s*%")
+_SIZE_PATTERN = re.compile(r"([\d.]+)\s*([KMG]i?B)\s*/\s*([\d.]+)\s*([KMG]i?B)", re.IGNORECASE)
+_UNITS = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_progress(line: str) -> Optional[float]:
+    """
+    Extract a completion fraction (0.0-1.0) from a line of output
+
+    Recognizes percentages and "done / total" sizes, as printed by winget
+    and most installers and download tools.
+    """
+    match = _SIZE_PATTERN.search(line)
+    if match:
+        done = float(match.group(1)) * _UNITS[match.group(2)[0].lower()]
+        total = float(match.group(3)) * _UNITS[match.group(4)[0].lower()]
+        if total > 0:
+            return min(1.0, done / total)
+    matches = _PERCENT_PATTERN.findall(line)
+    if matches:
+        percent = float(matches[-1])
+        if percent <= 100:
+            return percent / 100
+    return None
+
+
+def format_eta(seconds: float) -> str:
+    """Format a remaining time for the status bar ("about 3 min remaining")"""
+    if seconds < 60:
+        return "less than a minute remaining"
+    minutes = int(round(seconds / 60))
+    if minutes < 60:
+        return f"about {minutes} min remaining"
+    return f"about {minutes // 60} h {minutes % 60:02d} min remaining"
+
+
+class ProgressTracker:
+    """
+    Progress of a run, weighted by the expected cost of each operation
+
+    Thread-safe: output callbacks report sub-step progress from reader
+    threads while WorkerThread marks operations started and finished.
+    """
+
+    def __init__(self, weights: List[float]):
+        """
+        Args:
+            weights: Expected duration in seconds of each operation, in plan order
+        """
+        self.weights = [max(0.01, weight) for weight in weights]
+        self.total = sum(self.weights)
+        self._finished = [False] * len(self.weights)
+        self._done_weight = 0.0
+        self._done_seconds = 0.0
+        self._current: Optional[int] = None
+        self._current_started = 0.0
+        self._reported = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, index: int):
+        """Mark an operation as running"""
+        with self._lock:
+            self._current = index
+            self._current_started = time.monotonic()
+            self._reported = 0.0
+
+    def report_output(self, line: str):
+        """Feed a line of the running operation's output; progress in it advances the bar"""
+        fraction = parse_progress(line)
+        if fraction is not None:
+            with self._lock:
+                self._reported = max(self._reported, min(fraction, MAX_PARTIAL))
+
+    def finish(self, index: int):
+        """Mark an operation as done (succeeded or failed for good)"""
+        with self._lock:
+            if not self._finished[index]:
+                self._finished[index] = True
+                self._done_weight += self.weights[index]
+                if self._current == index:
+                    self._done_seconds += time.monotonic() - self._current_started
+            if self._current == index:
+                self._current = None
+
+    def release(self, index: int):
+        """Stop tracking a running operation without finishing it (it was requeued for a retry)"""
+        with self._lock:
+            if self._current == index:
+                self._done_seconds += time.monotonic() - self._current_started
+                self._current = None
+
+    def _partial(self, now: float) -> float:
+        """Completed fraction of the running operation (lock held)"""
+        if self._current is None:
+            return 0.0
+        elapsed = now - self._current_started
+        by_time = min(MAX_PARTIAL, elapsed / self.weights[self._current])
+        return max(self._reported, by_time)
+
+    def percent(self) -> int:
+        """Weighted completion of the whole run, 0-100"""
+        with self._lock:
+            if self.total <= 0:
+                return 100
+            partial = self._partial(time.monotonic())
+            current_weight = self.weights[self._current] if self._current is not None else 0.0
+            return min(100, int((self._done_weight + partial * current_weight) / self.total * 100))
+
+    def eta(self) -> float:
+        """
+        Estimated seconds until the run finishes
+
+        Remaining expected cost is scaled by how actual durations have
+        compared with the estimates so far in this run.
+        """
+        with self._lock:
+            now = time.monotonic()
+            remaining = sum(weight for weight, done in zip(self.weights, self._finished) if not done)
+            if self._current is not None:
+                remaining -= self._partial(now) * self.weights[self._current]
+            if self._done_weight > 0 and self._done_seconds > 0:
+                # Clamp so one surprising step does not swing the estimate wildly
+                ratio = min(4.0, max(0.25, self._done_seconds / self._done_weight))
+            else:
+                ratio = 1.0
+            return max(0.0, remaining * ratio)
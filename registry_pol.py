@@ -0,0 +1,321 @@
+"""
+Registry.pol generation for Better10
+
+Settings under a Policies key (SOFTWARE\\Policies\\..., and
+SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Policies\\...) belong to
+Group Policy. Written with winreg they are slow to push machine by
+machine and a policy refresh can overwrite them. This module turns the
+policy registry operations of a plan into Registry.pol files instead, so
+they are applied through the local Group Policy Object.
+
+A Registry.pol file is an 8-byte header ("PReg", version 1) followed by
+entries of the form
+
+    [key;value;type;size;data]
+
+where the brackets and semicolons are UTF-16LE characters, key and value
+are NUL-terminated UTF-16LE strings, type and size are 32-bit
+little-endian integers, and data is size raw bytes. Value names starting
+with "**" are instructions (such as "**del.Name" to delete a value) and
+are kept as they are.
+
+A GPO directory holds Machine\\Registry.pol (HKLM), User\\Registry.pol
+(HKCU) and gpt.ini, whose version Windows compares to decide whether to
+reapply the policy. Existing files are parsed and merged, so running an
+export twice, or into a GPO that already has other settings, changes only
+the values in the plan.
+
+Writing the files is enough for local policy. A domain GPO is not deployed
+by editing its SYSVOL folder: clients compare the versionNumber and
+extension attributes of the GPO's Active Directory object, which this
+module does not touch. Import the files with the Group Policy Management
+Console (or bump the GPO there) to deploy them to a domain.
+"""
+
+import os
+import re
+import struct
+from typing import List, Dict, Tuple, Optional
+
+from backends import HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, REG_SZ, parse_hive
+from offline_registry import encode_value, decode_value, value_type_for, find_case_insensitive
+
+POL_SIGNATURE = b"PReg"
+POL_VERSION = 1
+POL_FILE_NAME = "Registry.pol"
+
+MACHINE_SECTION = "Machine"
+USER_SECTION = "User"
+SECTION_HIVES = {MACHINE_SECTION: HKEY_LOCAL_MACHINE, USER_SECTION: HKEY_CURRENT_USER}
+
+# Registry client-side extension and the Administrative Templates tool that edits it
+REGISTRY_EXTENSION = "{35378EAC-683F-11D2-A89A-00C04FBBCFA2}"
+SECTION_TOOLS = {
+    MACHINE_SECTION: "{D02B1F72-3407-48AE-BA88-E8213C6761F1}",
+    USER_SECTION: "{D02B1F73-3407-48AE-BA88-E8213C6761F1}",
+}
+EXTENSION_KEYS = {MACHINE_SECTION: "gPCMachineExtensionNames", USER_SECTION: "gPCUserExtensionNames"}
+
+DELETE_PREFIX = "**del."
+
+_OPEN = "[".encode("utf-16-le")
+_CLOSE = "]".encode("utf-16-le")
+_SEPARATOR = ";".encode("utf-16-le")
+
+
+class PolicyFileError(Exception):
+    """A Registry.pol file is malformed"""
+
+
+class PolicyEntry:
+    """One [key;value;type;size;data] record"""
+
+    def __init__(self, key: str, value: str, reg_type: int, data: bytes):
+        self.key = key
+        self.value = value
+        self.reg_type = reg_type
+        self.data = data
+
+    @property
+    def decoded(self):
+        return decode_value(self.data, self.reg_type)
+
+    def matches(self, key: str, value: str) -> bool:
+        return self.key.lower() == key.lower() and self.value.lower() == value.lower()
+
+    def to_bytes(self) -> bytes:
+        return b"".join((
+            _OPEN, (self.key + "\0").encode("utf-16-le"), _SEPARATOR,
+            (self.value + "\0").encode("utf-16-le"), _SEPARATOR,
+            struct.pack("<I", self.reg_type), _SEPARATOR,
+            struct.pack("<I", len(self.data)), _SEPARATOR,
+            self.data, _CLOSE,
+        ))
+
+    def __repr__(self) -> str:
+        return f"PolicyEntry({self.key!r}, {self.value!r}, {self.reg_type}, {self.decoded!r})"
+
+
+def _read_string(data: bytes, position: int) -> Tuple[str, int]:
+    """Read a NUL-terminated UTF-16LE string; returns (text, position after the NUL)"""
+    end = position
+    while end + 1 < len(data) and data[end:end + 2] != b"\0\0":
+        end += 2
+    if end + 1 >= len(data):
+        raise PolicyFileError(f"Unterminated string at offset {position}")
+    return data[position:end].decode("utf-16-le"), end + 2
+
+
+def _expect(data: bytes, position: int, token: bytes) -> int:
+    if data[position:position + 2] != token:
+        raise PolicyFileError(f"Expected {token.decode('utf-16-le')!r} at offset {position}")
+    return position + 2
+
+
+def parse_pol(data: bytes) -> List[PolicyEntry]:
+    """Parse the contents of a Registry.pol file"""
+    if len(data) < 8 or data[:4] != POL_SIGNATURE:
+        raise PolicyFileError("Not a Registry.pol file (missing PReg signature)")
+    version = struct.unpack_from("<I", data, 4)[0]
+    if version != POL_VERSION:
+        raise PolicyFileError(f"Unsupported Registry.pol version {version}")
+
+    entries = []
+    position = 8
+    while position < len(data):
+        position = _expect(data, position, _OPEN)
+        key, position = _read_string(data, position)
+        position = _expect(data, position, _SEPARATOR)
+        value, position = _read_string(data, position)
+        position = _expect(data, position, _SEPARATOR)
+        if position + 10 > len(data):
+            raise PolicyFileError(f"Truncated entry for {key}\\{value}")
+        reg_type = struct.unpack_from("<I", data, position)[0]
+        position = _expect(data, position + 4, _SEPARATOR)
+        size = struct.unpack_from("<I", data, position)[0]
+        position = _expect(data, position + 4, _SEPARATOR)
+        if position + size > len(data):
+            raise PolicyFileError(f"Truncated data for {key}\\{value}")
+        payload = data[position:position + size]
+        position = _expect(data, position + size, _CLOSE)
+        entries.append(PolicyEntry(key, value, reg_type, payload))
+    return entries
+
+
+def build_pol(entries: List[PolicyEntry]) -> bytes:
+    """Serialize entries as a Registry.pol file"""
+    return POL_SIGNATURE + struct.pack("<I", POL_VERSION) + b"".join(entry.to_bytes() for entry in entries)
+
+
+class PolicyFile:
+    """
+    The entries of one Registry.pol file
+
+    Entries keep their order, because Windows applies them in sequence
+    (a "**del." entry only removes values set before it).
+    """
+
+    def __init__(self, entries: List[PolicyEntry] = None):
+        self.entries = list(entries or [])
+
+    @classmethod
+    def load(cls, path: str) -> "PolicyFile":
+        """Load a Registry.pol file; a missing file is an empty policy"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "rb") as f:
+            return cls(parse_pol(f.read()))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = path + ".better10.tmp"
+        with open(temporary, "wb") as f:
+            f.write(build_pol(self.entries))
+        os.replace(temporary, path)
+
+    def get(self, key: str, value: str) -> Optional[PolicyEntry]:
+        return next((entry for entry in self.entries if entry.matches(key, value)), None)
+
+    def set(self, key: str, value: str, data, reg_type: int = None) -> bool:
+        """
+        Set a value, replacing an earlier entry for it in place
+
+        A pending "**del." entry for the value is dropped. Returns True if
+        the file changed.
+        """
+        reg_type = value_type_for(data) if reg_type is None else reg_type
+        entry = PolicyEntry(key, value, reg_type, encode_value(data, reg_type))
+        deletes = [existing for existing in self.entries if existing.matches(key, DELETE_PREFIX + value)]
+        for existing in deletes:
+            self.entries.remove(existing)
+        current = self.get(key, value)
+        if current is None:
+            self.entries.append(entry)
+            return True
+        if (current.reg_type, current.data) == (entry.reg_type, entry.data) and not deletes:
+            return False
+        self.entries[self.entries.index(current)] = entry
+        return True
+
+    def delete(self, key: str, value: str) -> bool:
+        """Remove a value's entry and record a "**del." entry so clients remove it too"""
+        current = self.get(key, value)
+        if current is not None:
+            self.entries.remove(current)
+        if self.get(key, DELETE_PREFIX + value) is not None:
+            return current is not None
+        self.entries.append(PolicyEntry(key, DELETE_PREFIX + value, REG_SZ, encode_value(" ", REG_SZ)))
+        return True
+
+
+def is_policy_operation(operation: Dict) -> bool:
+    """True for registry operations on a HKLM or HKCU Policies key"""
+    if operation.get('type') != 'registry':
+        return False
+    try:
+        hive = parse_hive(operation.get('hive', HKEY_LOCAL_MACHINE))
+    except ValueError:
+        return False
+    path = "\\" + operation.get('key_path', '').strip("\\").lower() + "\\"
+    return hive in (HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER) and "\\policies\\" in path
+
+
+def policy_section(operation: Dict) -> str:
+    """Return MACHINE_SECTION or USER_SECTION for a policy operation"""
+    if parse_hive(operation.get('hive', HKEY_LOCAL_MACHINE)) == HKEY_CURRENT_USER:
+        return USER_SECTION
+    return MACHINE_SECTION
+
+
+def _section_path(gpo_dir: str, section: str) -> str:
+    """Path of a section's Registry.pol, reusing existing directories whatever their case"""
+    directory = find_case_insensitive(gpo_dir, section) or os.path.join(gpo_dir, section)
+    return find_case_insensitive(directory, POL_FILE_NAME) or os.path.join(directory, POL_FILE_NAME)
+
+
+def update_gpt_ini(path: str, sections: List[str]):
+    """
+    Bump the GPO version for the changed sections and register the registry extension
+
+    The version keeps the user revision in the high word and the machine
+    revision in the low word.
+    """
+    lines = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            lines = f.read().splitlines()
+    if not any(line.strip().lower() == "[general]" for line in lines):
+        lines.insert(0, "[General]")
+
+    settings = {}
+    for line in lines:
+        name, separator, value = line.partition("=")
+        if separator:
+            settings[name.strip().lower()] = value.strip()
+
+    version = int(settings.get("version", "0") or 0)
+    machine, user = version & 0xFFFF, version >> 16
+    if MACHINE_SECTION in sections:
+        machine = (machine + 1) & 0xFFFF
+    if USER_SECTION in sections:
+        user = (user + 1) & 0xFFFF
+    updates = {"version": str((user << 16) | machine)}
+    for section in sections:
+        key = EXTENSION_KEYS[section]
+        pairs = re.findall(r"\[[^\]]*\]", settings.get(key.lower(), ""))
+        if not any(REGISTRY_EXTENSION.lower() in pair.lower() for pair in pairs):
+            pairs.append(f"[{REGISTRY_EXTENSION}{SECTION_TOOLS[section]}]")
+        updates[key.lower()] = "".join(sorted(pairs, key=str.upper))
+    if "gpcfunctionalityversion" not in settings:
+        updates["gpcfunctionalityversion"] = "2"
+
+    names = {"version": "Version", "gpcfunctionalityversion": "gPCFunctionalityVersion",
+             **{key.lower(): key for key in EXTENSION_KEYS.values()}}
+    general = next(i for i, line in enumerate(lines) if line.strip().lower() == "[general]")
+    for i, line in enumerate(lines):
+        name = line.partition("=")[0].strip().lower()
+        if "=" in line and name in updates:
+            lines[i] = f"{line.partition('=')[0].strip()}={updates.pop(name)}"
+    for name, value in updates.items():
+        general += 1
+        lines.insert(general, f"{names[name]}={value}")
+
+    with open(path, "w", encoding="utf-8", newline="\r\n") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def export_policy(gpo_dir: str, operations: List[Dict]) -> Dict[str, int]:
+    """
+    Merge the policy operations of a plan into a GPO directory
+
+    For local policy the directory is %SystemRoot%\\System32\\GroupPolicy
+    (run gpupdate afterwards). A domain GPO's SYSVOL folder can be written
+    too, but the GPO's version in Active Directory is not updated, so its
+    clients do not pick the change up until it is bumped there. Operations
+    that are not policy settings are ignored.
+
+    Returns:
+        Dictionary of section -> number of policy operations written to it
+    """
+    grouped: Dict[str, List[Dict]] = {}
+    for operation in operations:
+        if is_policy_operation(operation):
+            grouped.setdefault(policy_section(operation), []).append(operation)
+
+    counts = {}
+    changed = []
+    for section, section_operations in grouped.items():
+        path = _section_path(gpo_dir, section)
+        policy = PolicyFile.load(path)
+        modified = False
+        for operation in section_operations:
+            modified |= policy.set(operation['key_path'].strip("\\"), operation.get('value_name', ''),
+                                   operation.get('value'))
+        if modified:
+            policy.save(path)
+            changed.append(section)
+        counts[section] = len(section_operations)
+
+    if changed:
+        update_gpt_ini(find_case_insensitive(gpo_dir, "gpt.ini") or os.path.join(gpo_dir, "gpt.ini"), changed)
+    return counts
@@ -0,0 +1,176 @@
+"""
+Registry snapshots and rollback for Better10
+
+Before a run changes the registry, the previous state of every value it
+will touch is captured in one bulk read. That state is the old value and
+type, or the fact that the value (or its key) did not exist. Snapshots
+are stored as one small gzipped JSON file per run, and rolling back a run
+restores them with a single grouped call to apply_registry_changes(),
+which is also the path forward writes go through.
+
+File layout (format 1):
+    {"format": 1, "run_id": ..., "backend": ..., "created": ...,
+     "keys":   [[hive name, key path, existed, shallowest missing key or null], ...],
+     "values": [[key index, value name, existed, type, value], ...]}
+"""
+
+import os
+import gzip
+import json
+import time
+from typing import List, Dict, Tuple, Optional
+
+from backends import SystemBackend, HKEY_LOCAL_MACHINE, data_dir, parse_hive, hive_name
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_SUFFIX = ".json.gz"
+
+
+def snapshot_dir(backend_name: str) -> str:
+    """Return the directory holding a backend's snapshots"""
+    path = os.path.join(data_dir(), f"snapshots_{backend_name}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _encode_value(value):
+    """Make a registry value JSON-safe (REG_BINARY data becomes {"hex": ...})"""
+    return {"hex": value.hex()} if isinstance(value, (bytes, bytearray)) else value
+
+
+def _decode_value(value):
+    return bytes.fromhex(value["hex"]) if isinstance(value, dict) and "hex" in value else value
+
+
+class RegistrySnapshot:
+    """
+    Previous registry state for the values one run writes
+
+    Each entry is a dict with "hive", "key_path", "value_name",
+    "key_exists", "missing_from", "value_exists", "value" and "type", as
+    returned by SystemBackend.read_registry_state().
+    """
+
+    def __init__(self, run_id: str, backend_name: str, entries: List[Dict], created: float = None):
+        self.run_id = run_id
+        self.backend_name = backend_name
+        self.entries = entries
+        self.created = created if created is not None else time.time()
+
+    @classmethod
+    def capture(cls, backend: SystemBackend, operations: List[Dict], run_id: str) -> "RegistrySnapshot":
+        """Read the current state of every registry value the operations write, in one pass"""
+        seen = set()
+        queries = []
+        for operation in operations:
+            if operation.get('type') != 'registry':
+                continue
+            query = (operation.get('hive', HKEY_LOCAL_MACHINE), operation['key_path'], operation['value_name'])
+            identity = (query[0], query[1].strip("\\").lower(), query[2].lower())
+            if identity not in seen:
+                seen.add(identity)
+                queries.append(query)
+
+        states = backend.read_registry_state(queries) if queries else []
+        entries = [dict(state, hive=hive, key_path=key_path, value_name=value_name)
+                   for (hive, key_path, value_name), state in zip(queries, states)]
+        return cls(run_id, backend.name, entries)
+
+    @staticmethod
+    def path_for(backend_name: str, run_id: str) -> str:
+        return os.path.join(snapshot_dir(backend_name), run_id + SNAPSHOT_SUFFIX)
+
+    @staticmethod
+    def list_runs(backend_name: str) -> List[str]:
+        """Return the run ids that have snapshots, oldest first"""
+        return sorted(name[:-len(SNAPSHOT_SUFFIX)] for name in os.listdir(snapshot_dir(backend_name))
+                      if name.endswith(SNAPSHOT_SUFFIX))
+
+    def save(self, path: str = None) -> str:
+        """Write the snapshot (to the backend's snapshot directory by default) and return its path"""
+        path = path or self.path_for(self.backend_name, self.run_id)
+        key_index: Dict[Tuple[int, str], int] = {}
+        keys, values = [], []
+        for entry in self.entries:
+            identity = (entry["hive"], entry["key_path"].lower())
+            if identity not in key_index:
+                key_index[identity] = len(keys)
+                keys.append([hive_name(entry["hive"]), entry["key_path"], entry["key_exists"], entry["missing_from"]])
+            values.append([key_index[identity], entry["value_name"], entry["value_exists"],
+                           entry["type"], _encode_value(entry["value"])])
+
+        document = {"format": SNAPSHOT_FORMAT, "run_id": self.run_id, "backend": self.backend_name,
+                    "created": round(self.created, 3), "keys": keys, "values": values}
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(document, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "RegistrySnapshot":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            document = json.load(f)
+        if document.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+
+        keys = document["keys"]
+        entries = []
+        for key_number, value_name, value_exists, reg_type, value in document["values"]:
+            hive, key_path, key_exists, missing_from = keys[key_number]
+            entries.append({
+                "hive": parse_hive(hive), "key_path": key_path, "value_name": value_name,
+                "key_exists": key_exists, "missing_from": missing_from,
+                "value_exists": value_exists, "value": _decode_value(value), "type": reg_type,
+            })
+        return cls(document["run_id"], document["backend"], entries, document.get("created"))
+
+    def rollback_changes(self) -> List[Dict]:
+        """
+        Build the changes that put every captured value back
+
+        Values that existed get their old data and type back. Values that
+        did not exist are deleted, and keys the run created are removed
+        (deepest first) if nothing else has been stored in them since.
+        """
+        changes = []
+        created_keys = {}
+        for entry in self.entries:
+            change = {"hive": entry["hive"], "key_path": entry["key_path"], "value_name": entry["value_name"]}
+            if entry["value_exists"]:
+                change.update(action="set", value=entry["value"], type=entry["type"])
+            else:
+                change.update(action="delete_value")
+            changes.append(change)
+
+            if not entry["key_exists"] and entry["missing_from"]:
+                # Every key from the value's key up to the shallowest missing one was created
+                path = entry["key_path"].strip("\\")
+                while True:
+                    created_keys.setdefault((entry["hive"], path.lower()), path)
+                    if path.lower() == entry["missing_from"].lower() or "\\" not in path:
+                        break
+                    path = path.rsplit("\\", 1)[0]
+
+        changes.extend({"action": "delete_key", "hive": hive, "key_path": path}
+                       for (hive, _), path in created_keys.items())
+        return changes
+
+    def restore(self, backend: SystemBackend) -> List[Tuple[Dict, bool, str]]:
+        """
+        Roll the registry back to this snapshot in one grouped pass
+
+        Returns:
+            (change, success, error_message) for every change applied
+        """
+        changes = self.rollback_changes()
+        results = backend.apply_registry_changes(changes)
+        return [(change, success, error) for change, (success, error) in zip(changes, results)]
+
+
+def resolve_run_id(backend_name: str, run_id: str) -> Optional[str]:
+    """Return the run id to roll back, resolving "latest" to the newest snapshot"""
+    if run_id == "latest":
+        runs = RegistrySnapshot.list_runs(backend_name)
+        return runs[-1] if runs else None
+    return run_id
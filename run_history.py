@@ -0,0 +1,389 @@
+"""
+Run history for Better10
+
+Every run's plan and the outcome of each operation (attempts, exit code,
+duration, error, verification) are stored in a local SQLite database, one
+per backend, next to the duration history. Outcomes are collected in
+memory while the run executes and written in a single transaction when it
+ends, so recording costs one commit per run.
+
+Operations are identified across runs by a fingerprint: a hash of the
+operation's canonical JSON form. Indexed queries answer questions such as
+"slowest installers over the last 30 runs" or "which bloatware removals
+fail most often".
+
+Runs measured with --measure-impact also get an impact row: the machine
+measurements taken before the run, those taken after the next boot, and
+the deltas between them (see impact.py).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional
+
+from backends import data_dir, appx_packages_in_command
+from durations import operation_kind
+from profiles import serialize_operation
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL NOT NULL,
+    operation_count INTEGER NOT NULL,
+    success_count INTEGER NOT NULL,
+    failure_count INTEGER NOT NULL,
+    cancelled INTEGER NOT NULL,
+    plan TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS operations (
+    run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    exit_code INTEGER,
+    duration REAL,
+    error TEXT,
+    verification TEXT,
+    started REAL,
+    PRIMARY KEY (run_id, position)
+);
+CREATE TABLE IF NOT EXISTS impact (
+    run_id TEXT PRIMARY KEY REFERENCES runs(run_id) ON DELETE CASCADE,
+    profile TEXT,
+    measured_before REAL NOT NULL,
+    before TEXT NOT NULL,
+    measured_after REAL,
+    after TEXT,
+    deltas TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS idx_operations_fingerprint ON operations(fingerprint);
+CREATE INDEX IF NOT EXISTS idx_operations_type ON operations(type, started);
+CREATE INDEX IF NOT EXISTS idx_operations_category ON operations(category, started);
+CREATE INDEX IF NOT EXISTS idx_operations_started ON operations(started);
+"""
+
+
+class OperationOutcome:
+    """Final state of an operation in a run"""
+    SUCCESS = "success"
+    SUCCESS_REBOOT = "success_reboot"
+    FAILURE = "failure"
+    NOT_RUN = "not_run"  # The run was cancelled before the operation started
+
+
+# Category -> description, for filtering queries by what an operation is for
+OPERATION_CATEGORIES = {
+    "installer": "Installers (local and winget)",
+    "bloatware": "Bloatware removals",
+    "registry": "Registry changes",
+    "tool": "Tools and executables",
+    "script": "Other PowerShell commands",
+}
+
+
+def operation_category(operation: Dict) -> str:
+    """Group an operation by purpose; bloatware removals are PowerShell Appx commands or winget uninstalls"""
+    op_type = operation.get('type')
+    if op_type in ('local_installer', 'winget_install'):
+        return "installer"
+    if op_type == 'winget_uninstall' or (op_type == 'powershell'
+                                         and appx_packages_in_command(operation.get('command'))):
+        return "bloatware"
+    if op_type in ('tool', 'executable'):
+        return "tool"
+    if op_type == 'registry':
+        return "registry"
+    return "script"
+
+
+def operation_fingerprint(operation: Dict) -> str:
+    """Identify an operation across runs by what it does; its display name is ignored"""
+    canonical = {key: value for key, value in serialize_operation(operation).items() if key != 'name'}
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=True)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def history_path(backend_name: str) -> str:
+    """Return the run history database of a backend"""
+    return os.path.join(data_dir(), f"history_{backend_name}.sqlite")
+
+
+class RunRecorder:
+    """
+    Collects the outcomes of one run in memory
+
+    WorkerThread reports each attempt and final outcome; RunHistory.save()
+    writes everything in one transaction when the run ends.
+    """
+
+    def __init__(self, run_id: str, operations: List[Dict]):
+        self.run_id = run_id
+        self.operations = operations
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.cancelled = False
+        self._positions = {id(operation): index for index, operation in reversed(list(enumerate(operations)))}
+        self.records = [{
+            "outcome": OperationOutcome.NOT_RUN, "attempts": 0, "exit_code": None,
+            "duration": None, "error": None, "verification": None, "started": None,
+        } for _ in operations]
+
+    def attempt(self, index: int, seconds: float, exit_code: Optional[int] = None, error: str = None):
+        """Record one attempt of an operation (a retry follows if it was not final)"""
+        record = self.records[index]
+        if record["started"] is None:
+            record["started"] = time.time() - seconds
+        record["attempts"] += 1
+        record["duration"] = (record["duration"] or 0.0) + seconds
+        record["exit_code"] = exit_code
+        record["error"] = error
+
+    def finish(self, index: int, outcome: str, seconds: float, exit_code: Optional[int] = None, error: str = None):
+        """Record the final attempt and outcome of an operation"""
+        self.attempt(index, seconds, exit_code, error)
+        self.records[index]["outcome"] = outcome
+
+    def verified(self, operation: Dict, status: str):
+        """Record the post-run verification status of an operation"""
+        index = self._positions.get(id(operation))
+        if index is not None:
+            self.records[index]["verification"] = status
+
+    def end(self, cancelled: bool = False):
+        self.finished = time.time()
+        self.cancelled = cancelled
+
+
+class RunHistory:
+    """
+    The run history database of one backend
+
+    The class attribute is the default main() configures from the
+    command line.
+    """
+
+    enabled: bool = True
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def configure(cls, enabled: bool = None):
+        """Turn recording of new runs on or off"""
+        if enabled is not None:
+            cls.enabled = enabled
+
+    @classmethod
+    def for_backend(cls, backend_name: str) -> "RunHistory":
+        return cls(history_path(backend_name))
+
+    def connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA foreign_keys = ON")
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            connection.executescript(_SCHEMA)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return connection
+
+    def save(self, recorder: RunRecorder):
+        """Write a run and all its operations in one transaction"""
+        finished = recorder.finished or time.time()
+        outcomes = [record["outcome"] for record in recorder.records]
+        rows = [
+            (recorder.run_id, position, operation_fingerprint(operation), operation.get('type', 'unknown'),
+             operation_category(operation), operation_kind(operation), operation.get('name', ''), record["outcome"], record["attempts"],
+             record["exit_code"], record["duration"], record["error"], record["verification"],
+             record["started"] or recorder.started)
+            for position, (operation, record) in enumerate(zip(recorder.operations, recorder.records))
+        ]
+        plan = json.dumps([serialize_operation(operation) for operation in recorder.operations])
+
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (recorder.run_id, recorder.started, finished, len(rows),
+                     sum(o in (OperationOutcome.SUCCESS, OperationOutcome.SUCCESS_REBOOT) for o in outcomes),
+                     outcomes.count(OperationOutcome.FAILURE), int(recorder.cancelled), plan)
+                )
+                connection.execute("DELETE FROM operations WHERE run_id = ?", (recorder.run_id,))
+                connection.executemany(
+                    "INSERT INTO operations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+        finally:
+            connection.close()
+
+    def _query(self, sql: str, parameters=()) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        connection = self.connect()
+        try:
+            return [dict(row) for row in connection.execute(sql, parameters)]
+        finally:
+            connection.close()
+
+    def _since_run(self, runs: int) -> float:
+        """Start time of the oldest of the last N runs (0 for all runs)"""
+        rows = self._query("SELECT started FROM runs ORDER BY started DESC LIMIT 1 OFFSET ?", (max(0, runs - 1),))
+        return rows[0]["started"] if rows else 0.0
+
+    def recent_runs(self, limit: int = 30) -> List[Dict]:
+        """The latest runs, newest first"""
+        return self._query(
+            "SELECT run_id, started, finished, finished - started AS seconds, operation_count, "
+            "success_count, failure_count, cancelled FROM runs ORDER BY started DESC LIMIT ?", (limit,)
+        )
+
+    def slowest(self, group: str = None, runs: int = 30, limit: int = 10) -> List[Dict]:
+        """
+        Operations with the highest average duration over the last N runs
+
+        group is an operation type or category (None for all). Only
+        successful attempts count, so a step that timed out once does not
+        dominate the ranking.
+        """
+        return self._query(
+            "SELECT fingerprint, type, category, MAX(name) AS name, COUNT(*) AS runs, AVG(duration) AS average, "
+            "MAX(duration) AS slowest FROM operations "
+            "WHERE started >= ? AND (? IS NULL OR type = ? OR category = ?) AND outcome IN ('success', 'success_reboot') "
+            "AND duration IS NOT NULL GROUP BY fingerprint ORDER BY average DESC LIMIT ?",
+            (self._since_run(runs), group, group, group, limit)
+        )
+
+    def failures(self, group: str = None, runs: int = 30, limit: int = 10) -> List[Dict]:
+        """
+        Operations that fail most often over the last N runs
+
+        group is an operation type or category (None for all). A reported
+        success whose effect verification found missing counts as a failure.
+        """
+        return self._query(
+            "SELECT fingerprint, type, category, MAX(name) AS name, COUNT(*) AS runs, "
+            "SUM(outcome = 'failure' OR verification = 'mismatch') AS failed, "
+            "1.0 * SUM(outcome = 'failure' OR verification = 'mismatch') / COUNT(*) AS failure_rate, "
+            "(SELECT error FROM operations AS latest WHERE latest.fingerprint = operations.fingerprint "
+            " AND latest.error IS NOT NULL ORDER BY latest.started DESC LIMIT 1) AS last_error "
+            "FROM operations WHERE started >= ? AND (? IS NULL OR type = ? OR category = ?) AND outcome != 'not_run' "
+            "GROUP BY fingerprint HAVING failed > 0 ORDER BY failure_rate DESC, failed DESC LIMIT ?",
+            (self._since_run(runs), group, group, group, limit)
+        )
+
+    def save_impact_baseline(self, run_id: str, profile: Optional[str], measured: float, before: Dict):
+        """Store the measurements taken before a run (the run itself must be saved first)"""
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO impact (run_id, profile, measured_before, before) VALUES (?, ?, ?, ?)",
+                    (run_id, profile, measured, json.dumps(before))
+                )
+        finally:
+            connection.close()
+
+    def save_impact_result(self, run_id: str, measured: float, after: Dict, deltas: Dict):
+        """Store the measurements taken after the next boot and their comparison with the baseline"""
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(
+                    "UPDATE impact SET measured_after = ?, after = ?, deltas = ? WHERE run_id = ?",
+                    (measured, json.dumps(after), json.dumps(deltas), run_id)
+                )
+        finally:
+            connection.close()
+
+    def impact_reports(self, pending: bool = False, limit: int = 30) -> List[Dict]:
+        """
+        Impact measurements, newest first
+
+        Args:
+            pending: Only runs still waiting for their after-boot measurement
+            limit: Maximum number of runs returned
+        """
+        rows = self._query(
+            "SELECT impact.*, runs.success_count, runs.operation_count FROM impact JOIN runs USING (run_id) "
+            f"WHERE {'measured_after IS NULL' if pending else '1'} ORDER BY measured_before DESC LIMIT ?", (limit,)
+        )
+        for row in rows:
+            for column in ("before", "after", "deltas"):
+                row[column] = json.loads(row[column]) if row[column] else None
+        return rows
+
+    def operation_trend(self, fingerprint: str, runs: int = 30) -> List[Dict]:
+        """Duration and outcome of one operation in each of its last N runs, oldest first"""
+        rows = self._query(
+            "SELECT run_id, started, outcome, attempts, duration, exit_code FROM operations "
+            "WHERE fingerprint = ? ORDER BY started DESC LIMIT ?", (fingerprint, runs)
+        )
+        return rows[::-1]
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return ""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    return f"{int(seconds // 60)}m {int(seconds % 60):02d}s"
+
+
+# Query key -> title, shown in the History tab and accepted by --history
+HISTORY_QUERIES = {
+    "runs": "Recent runs",
+    "slowest": "Slowest operations",
+    "failures": "Most frequent failures",
+    "impact": "Measured impact",
+}
+
+
+def history_table(history: RunHistory, query: str, group: str = None, runs: int = 30) -> Tuple[List[str], List[List[str]]]:
+    """
+    Run a history query and format it for display
+
+    Returns:
+        Tuple of (column headers, rows of cell text)
+    """
+    if query == "runs":
+        headers = ["Run", "Started", "Duration", "Operations", "Succeeded", "Failed", "Cancelled"]
+        rows = [[run["run_id"], datetime.fromtimestamp(run["started"]).strftime("%Y-%m-%d %H:%M"),
+                 _format_seconds(run["seconds"]), str(run["operation_count"]), str(run["success_count"]),
+                 str(run["failure_count"]), "yes" if run["cancelled"] else ""]
+                for run in history.recent_runs(runs)]
+    elif query == "slowest":
+        headers = ["Operation", "Category", "Runs", "Average", "Slowest"]
+        rows = [[row["name"], row["category"], str(row["runs"]), _format_seconds(row["average"]),
+                 _format_seconds(row["slowest"])]
+                for row in history.slowest(group, runs)]
+    elif query == "failures":
+        headers = ["Operation", "Category", "Runs", "Failed", "Failure rate", "Last error"]
+        rows = [[row["name"], row["category"], str(row["runs"]), str(row["failed"]),
+                 f"{row['failure_rate']:.0%}", (row["last_error"] or "")[:200]]
+                for row in history.failures(group, runs)]
+    elif query == "impact":
+        # Imported here: impact.py depends on this module
+        from impact import IMPACT_METRICS, format_delta
+        headers = ["Run", "Profile", "Measured"] + [label for label, _, _ in IMPACT_METRICS.values()]
+        rows = [[report["run_id"], report["profile"] or "",
+                 datetime.fromtimestamp(report["measured_after"]).strftime("%Y-%m-%d %H:%M")
+                 if report["measured_after"] else "after next boot"]
+                + [format_delta(name, (report["deltas"] or {}).get(name)) for name in IMPACT_METRICS]
+                for report in history.impact_reports(limit=runs)]
+    else:
+        raise ValueError(f"Unknown history query: {query}")
+    return headers, rows
@@ -0,0 +1,373 @@
+"""
+Persisted run logs for Better10
+
+Every run writes its log to data_dir()/logs_<backend>/<run id>.log: the
+messages shown in the Logs tab plus every line of child process output,
+one tab-separated line each:
+
+    2026-10-19 14:03:12<TAB>LEVEL<TAB>operation name<TAB>message
+
+The operation field is empty for messages outside an operation. Multi-line
+messages are split so every line carries the full prefix.
+
+Output-heavy runs (ChrisTitus.ps1 and similar) produce logs of hundreds of
+MB, far too large for a QTextEdit. LogIndex memory-maps a log and builds
+its line offsets in a background thread, together with the lines of each
+level and each operation. Those are stored as runs of consecutive line
+numbers (LineSet), which stay tiny because output arrives in long blocks
+per operation. A view renders any window of lines straight from the map,
+and filtering by level or operation combines LineSets without touching
+the file. Text search scans the map in chunks, so the file is never
+decoded into Python strings.
+"""
+
+import os
+import re
+import mmap
+import bisect
+import heapq
+import threading
+from array import array
+from datetime import datetime
+from typing import List, Dict, Optional, Iterable
+
+from backends import data_dir
+
+LOG_SUFFIX = ".log"
+# Older logs are deleted when a new run starts
+MAX_LOGS = 50
+# Level written for child process output (the GUI log only shows messages)
+OUTPUT_LEVEL = "OUTPUT"
+# Bytes indexed per step; the index is published after each step
+INDEX_CHUNK = 8 * 1024 * 1024
+
+# Consumes one line; the groups are None for lines without the prefix
+_LINE = re.compile(rb"(?:[^\t\n]*\t([A-Z]*)\t([^\t\n]*)\t)?[^\n]*\n?")
+# Candidate lines below which text search checks each line instead of scanning the file
+SEARCH_LINES_DIRECTLY = 10000
+
+
+def log_dir(backend_name: str) -> str:
+    """Return the directory holding a backend's run logs"""
+    path = os.path.join(data_dir(), f"logs_{backend_name}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def list_logs(backend_name: str) -> List[str]:
+    """Return the paths of a backend's run logs, newest first"""
+    directory = log_dir(backend_name)
+    return sorted((os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(LOG_SUFFIX)),
+                  reverse=True)
+
+
+class RunLog:
+    """
+    Appends one run's log messages and process output to its log file
+
+    Safe to call from the worker and from process output reader threads.
+    Writes are buffered; the buffer is flushed after every message so a
+    crash loses at most some process output.
+    """
+
+    def __init__(self, backend_name: str, run_id: str):
+        self.path = os.path.join(log_dir(backend_name), run_id + LOG_SUFFIX)
+        self._lock = threading.Lock()
+        self._file = None
+        self._prune(backend_name)
+
+    @staticmethod
+    def _prune(backend_name: str):
+        for path in list_logs(backend_name)[MAX_LOGS - 1:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def write(self, level: str, operation: str, message: str, when: float = None):
+        """Append a message; each of its lines gets the timestamp (when, or now), level and operation"""
+        timestamp = (datetime.fromtimestamp(when) if when is not None else datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+        prefix = f"{timestamp}\t{level}\t{(operation or '').replace(chr(9), ' ')}\t"
+        text = "".join(prefix + line + "\n" for line in (message.splitlines() or [""]))
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8", errors="replace", newline="\n")
+            self._file.write(text)
+            if level != OUTPUT_LEVEL:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class LineSet:
+    """
+    Sorted set of line numbers, stored as runs [start, end)
+
+    Runs must be added in ascending order. len() and indexing count lines,
+    so a filtered view maps its row N to lines[N] with one bisect.
+    """
+
+    def __init__(self):
+        self.starts = array("Q")
+        self.ends = array("Q")
+        self.before = array("Q")  # Lines in all earlier runs
+        self.total = 0
+
+    def add_run(self, start: int, end: int):
+        if end <= start:
+            return
+        if self.ends and self.ends[-1] == start:
+            self.ends[-1] = end
+        else:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.before.append(self.total)
+        self.total += end - start
+
+    def add(self, line: int):
+        self.add_run(line, line + 1)
+
+    def extend(self, other: "LineSet"):
+        for start, end in other.runs():
+            self.add_run(start, end)
+
+    def runs(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, row: int) -> int:
+        if not 0 <= row < self.total:
+            raise IndexError(row)
+        run = bisect.bisect_right(self.before, row) - 1
+        return self.starts[run] + row - self.before[run]
+
+    def __iter__(self):
+        for start, end in self.runs():
+            yield from range(start, end)
+
+    def clip(self, first: int, last: int) -> "LineSet":
+        """Return the lines in [first, last)"""
+        clipped = LineSet()
+        # Snapshot the lengths: the indexer may be appending runs concurrently
+        count = min(len(self.starts), len(self.ends))
+        for run in range(max(0, bisect.bisect_right(self.starts, first, 0, count) - 1), count):
+            start = self.starts[run]
+            if start >= last:
+                break
+            clipped.add_run(max(start, first), min(self.ends[run], last))
+        return clipped
+
+    def intersection(self, other: "LineSet") -> "LineSet":
+        result = LineSet()
+        mine, theirs = list(self.runs()), list(other.runs())
+        i = j = 0
+        while i < len(mine) and j < len(theirs):
+            start, end = max(mine[i][0], theirs[j][0]), min(mine[i][1], theirs[j][1])
+            result.add_run(start, end)
+            if mine[i][1] < theirs[j][1]:
+                i += 1
+            else:
+                j += 1
+        return result
+
+    @staticmethod
+    def union(sets: List["LineSet"]) -> "LineSet":
+        result = LineSet()
+        current_start = current_end = None
+        for start, end in heapq.merge(*(list(line_set.runs()) for line_set in sets)):
+            if current_end is not None and start <= current_end:
+                current_end = max(current_end, end)
+                continue
+            if current_end is not None:
+                result.add_run(current_start, current_end)
+            current_start, current_end = start, end
+        if current_end is not None:
+            result.add_run(current_start, current_end)
+        return result
+
+
+class LogLine:
+    """One line of a run log, split into its fields"""
+
+    def __init__(self, number: int, timestamp: str, level: str, operation: str, message: str):
+        self.number = number
+        self.timestamp = timestamp
+        self.level = level
+        self.operation = operation
+        self.message = message
+
+
+class LogIndex:
+    """
+    Line index over a memory-mapped run log
+
+    Call start() to index in a background thread; line_count grows as
+    chunks are indexed, and every method works on the lines indexed so
+    far. The file is mapped once, so lines appended after the index is
+    created are not seen until the log is opened again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, "rb")
+        # An empty file cannot be mapped
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.offsets = array("Q")  # Start offset of each line
+        self.levels: Dict[bytes, LineSet] = {}
+        self.operations: Dict[bytes, LineSet] = {}
+        self.line_count = 0
+        self.indexed_bytes = 0
+        self.done = self.size == 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Build the index in a background thread"""
+        if not self.done and self._thread is None:
+            self._thread = threading.Thread(target=self.build, name="log-index", daemon=True)
+            self._thread.start()
+
+    def build(self):
+        """Index the whole file (in the calling thread), publishing after each chunk"""
+        data, size = self._map, self.size
+        position = self.indexed_bytes
+        while position < size and not self._stop.is_set():
+            end = min(size, position + INDEX_CHUNK)
+            if end < size:
+                # Stop at a line boundary; a line longer than a chunk is taken whole
+                boundary = data.rfind(b"\n", position, end)
+                if boundary < 0:
+                    boundary = data.find(b"\n", end)
+                end = size if boundary < 0 else boundary + 1
+            self._index_chunk(position, end)
+            self.indexed_bytes = position = end
+        self.done = position >= size
+
+    def _index_chunk(self, start: int, end: int):
+        line = run_start = self.line_count
+        offsets = self.offsets
+        append = offsets.append
+        current = None
+        for match in _LINE.finditer(self._map, start, end):
+            if match.start() >= end:
+                break
+            append(match.start())
+            fields = match.group(1, 2)
+            if fields != current:
+                self._add_run(current, run_start, line)
+                current, run_start = fields, line
+            line += 1
+        self._add_run(current, run_start, line)
+        # Published last, so readers never see a line whose level and operation are missing
+        self.line_count = line
+
+    def _add_run(self, fields, start: int, end: int):
+        if fields is None or fields[0] is None:
+            return
+        level, operation = fields
+        self.levels.setdefault(level, LineSet()).add_run(start, end)
+        if operation:
+            self.operations.setdefault(operation, LineSet()).add_run(start, end)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        if self.size:
+            self._map.close()
+        self._file.close()
+
+    def progress(self) -> float:
+        """Fraction of the file indexed (0.0-1.0)"""
+        return 1.0 if self.done or not self.size else self.indexed_bytes / self.size
+
+    def _line_end(self, number: int) -> int:
+        """Offset just past a line's newline (lines are delimited by newlines, so no lookup is needed)"""
+        end = self._map.find(b"\n", self.offsets[number])
+        return self.size if end < 0 else end + 1
+
+    def _line_bytes(self, number: int) -> bytes:
+        return self._map[self.offsets[number]:self._line_end(number)].rstrip(b"\r\n")
+
+    def line(self, number: int) -> LogLine:
+        """Decode one indexed line"""
+        text = self._line_bytes(number).decode("utf-8", errors="replace")
+        fields = text.split("\t", 3)
+        if len(fields) == 4:
+            return LogLine(number, *fields)
+        return LogLine(number, "", "", "", text)
+
+    def level_names(self) -> List[str]:
+        return sorted(level.decode("ascii") for level in list(self.levels))
+
+    def operation_names(self) -> List[str]:
+        """Operations seen so far, in order of their first line"""
+        names = [(lines.starts[0], name) for name, lines in list(self.operations.items()) if lines.starts]
+        return [name.decode("utf-8", errors="replace") for _, name in sorted(names)]
+
+    def filter(self, levels: Iterable[str] = None, operation: str = None, text: str = None,
+               first: int = 0, last: int = None) -> Optional[LineSet]:
+        """
+        Return the lines in [first, last) matching every given criterion
+
+        levels and operation are answered from the index; text is a
+        substring, case-insensitive for ASCII, searched in the mapped file.
+        Returns None when there are no criteria (every line matches).
+        """
+        last = self.line_count if last is None else min(last, self.line_count)
+        lines: Optional[LineSet] = None
+
+        if operation is not None:
+            lines = self.operations.get(operation.encode("utf-8"), LineSet()).clip(first, last)
+        if levels is not None:
+            by_level = LineSet.union([self.levels[level.encode("ascii")].clip(first, last)
+                                      for level in levels if level.encode("ascii") in self.levels])
+            lines = by_level if lines is None else lines.intersection(by_level)
+        if text:
+            needle = text.encode("utf-8").lower()
+            if lines is not None and len(lines) < SEARCH_LINES_DIRECTLY:
+                found = LineSet()
+                for line in lines:
+                    if needle in self._line_bytes(line).lower():
+                        found.add(line)
+                lines = found
+            else:
+                found = self._search(needle, first, last)
+                lines = found if lines is None else lines.intersection(found)
+        return lines
+
+    def _search(self, needle: bytes, first: int, last: int) -> LineSet:
+        """Lines in [first, last) containing a lower-case needle, scanning the map in chunks"""
+        found = LineSet()
+        if first >= last:
+            return found
+        position, end = self.offsets[first], self._line_end(last - 1)
+        while position < end:
+            chunk_end = min(end, position + INDEX_CHUNK)
+            if chunk_end < end:
+                boundary = self._map.rfind(b"\n", position, chunk_end)
+                chunk_end = self._line_end(bisect.bisect_right(self.offsets, position, 0, last) - 1) \
+                    if boundary < 0 else boundary + 1
+            chunk = self._map[position:chunk_end].lower()
+            index = chunk.find(needle)
+            while index >= 0:
+                line = bisect.bisect_right(self.offsets, position + index, 0, last) - 1
+                found.add(line)
+                # Continue at the next line, so each line is reported once
+                next_line = chunk.find(b"\n", index)
+                if next_line < 0:
+                    break
+                index = chunk.find(needle, next_line + 1)
+            position = chunk_end
+        return found
@@ -0,0 +1,540 @@
+"""
+Resource sampling for Better10
+
+While a WorkerThread runs, a ResourceSampler thread records how busy the
+machine is at a fixed interval (one second by default):
+
+- system-wide: CPU use, committed memory, disk queue length and disk read
+  and write throughput
+- the child processes Better10 launched (every descendant of this
+  process, which includes the broker and what it starts): how many there
+  are, their CPU use and their I/O throughput
+
+Samples go into a TimeSeries, one array('d') per metric, so an hour-long
+run costs a few hundred KB. The start and end of every operation are
+recorded too, and each operation is matched to the samples taken while it
+ran. The run summary then shows whether the slowest steps were CPU-bound,
+I/O-bound or just waiting (on the network, a prompt, a service), and the
+whole series is saved as data_dir()/samples_<backend>/<run id>.json.
+
+Counters come from GetSystemTimes, GetPerformanceInfo and the PhysicalDisk
+performance counters on Windows, and from /proc elsewhere. A metric that
+cannot be read is recorded as NaN and left out of the averages.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import bisect
+import ctypes
+import threading
+from array import array
+from typing import List, Dict, Tuple, Optional, Sequence
+
+from backends import data_dir
+from process_monitor import process_tree, process_cpu_time
+
+SAMPLE_SUFFIX = ".json"
+# Older sample files are deleted when a new run starts
+MAX_SAMPLE_FILES = 50
+# Slowest operations listed in the run summary
+SUMMARY_OPERATIONS = 10
+
+# System metrics, then metrics of the launched children
+METRICS = ("cpu_percent", "commit_bytes", "disk_queue", "disk_read_bps", "disk_write_bps",
+           "child_count", "child_cpu_percent", "child_io_bps")
+
+# Thresholds for calling an operation CPU- or I/O-bound
+CPU_BUSY_PERCENT = 60.0         # System CPU use
+CHILD_CPU_BUSY_PERCENT = 80.0   # Child CPU use, as a share of one core
+DISK_BUSY_QUEUE = 1.0           # Average requests waiting or in flight
+DISK_BUSY_BPS = 20 * 1024 ** 2  # Read plus write throughput
+
+NAN = float("nan")
+
+
+class Bound:
+    """What limited an operation while it ran"""
+    CPU = "CPU-bound"
+    IO = "I/O-bound"
+    CPU_AND_IO = "CPU- and I/O-bound"
+    WAITING = "waiting"  # Neither: network, a prompt, a service
+    UNSAMPLED = "unsampled"  # Too short for a sample to be taken while it ran
+
+
+if sys.platform == "win32":
+    from ctypes import wintypes
+
+    class PERFORMANCE_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("CommitTotal", ctypes.c_size_t),
+            ("CommitLimit", ctypes.c_size_t),
+            ("CommitPeak", ctypes.c_size_t),
+            ("PhysicalTotal", ctypes.c_size_t),
+            ("PhysicalAvailable", ctypes.c_size_t),
+            ("SystemCache", ctypes.c_size_t),
+            ("KernelTotal", ctypes.c_size_t),
+            ("KernelPaged", ctypes.c_size_t),
+            ("KernelNonpaged", ctypes.c_size_t),
+            ("PageSize", ctypes.c_size_t),
+            ("HandleCount", wintypes.DWORD),
+            ("ProcessCount", wintypes.DWORD),
+            ("ThreadCount", wintypes.DWORD),
+        ]
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            "ReadOperationCount", "WriteOperationCount", "OtherOperationCount",
+            "ReadTransferCount", "WriteTransferCount", "OtherTransferCount")]
+
+    class PDH_FMT_COUNTERVALUE(ctypes.Structure):
+        _fields_ = [("CStatus", wintypes.DWORD), ("doubleValue", ctypes.c_double)]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _psapi = ctypes.WinDLL("psapi")
+    _pdh = ctypes.WinDLL("pdh")
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    PDH_FMT_DOUBLE = 0x00000200
+    DISK_COUNTERS = (
+        r"\PhysicalDisk(_Total)\Current Disk Queue Length",
+        r"\PhysicalDisk(_Total)\Disk Read Bytes/sec",
+        r"\PhysicalDisk(_Total)\Disk Write Bytes/sec",
+    )
+
+
+def performance_information() -> Optional[Dict[str, int]]:
+    """
+    Return system-wide memory and object counts
+
+    Returns:
+        Dict with commit_bytes, commit_limit_bytes, process_count and
+        thread_count (Windows), or commit figures only (Linux); None if
+        unavailable
+    """
+    if sys.platform == "win32":
+        info = PERFORMANCE_INFORMATION()
+        info.cb = ctypes.sizeof(info)
+        if not _psapi.GetPerformanceInfo(ctypes.byref(info), info.cb):
+            return None
+        return {"commit_bytes": info.CommitTotal * info.PageSize,
+                "commit_limit_bytes": info.CommitLimit * info.PageSize,
+                "process_count": info.ProcessCount, "thread_count": info.ThreadCount}
+    try:
+        with open("/proc/meminfo") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        # Values are in kB
+        return {"commit_bytes": int(fields["Committed_AS"].split()[0]) * 1024,
+                "commit_limit_bytes": int(fields["CommitLimit"].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError, IndexError):
+        return None
+
+
+def process_io_bytes(pid: int) -> Optional[int]:
+    """Return the bytes a process has read and written so far (None if unavailable)"""
+    if sys.platform == "win32":
+        handle = _kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            counters = IO_COUNTERS()
+            if not _kernel32.GetProcessIoCounters(handle, ctypes.byref(counters)):
+                return None
+            return counters.ReadTransferCount + counters.WriteTransferCount
+        finally:
+            _kernel32.CloseHandle(handle)
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["read_bytes"]) + int(fields["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class TimeSeries:
+    """
+    Samples of a fixed set of metrics, one array('d') per metric
+
+    Rows are appended in time order; times are time.monotonic() values.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = tuple(columns)
+        self.times = array("d")
+        self._values = {name: array("d") for name in self.columns}
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        self.times.append(timestamp)
+        for name, value in zip(self.columns, values):
+            self._values[name].append(NAN if value is None else value)
+
+    def column(self, name: str) -> array:
+        return self._values[name]
+
+    def rows_between(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        Return the (first, stop) row range of the samples covering start..end
+
+        A sample covers the interval since the previous one, so the first
+        sample after end still belongs to the span. A span with no sample
+        taken inside it gets an empty range: the sample covering it mostly
+        measured whatever ran before, so it says nothing about the span.
+        """
+        first = bisect.bisect_right(self.times, start)
+        if first == len(self.times) or self.times[first] > end:
+            return first, first
+        stop = min(len(self.times), bisect.bisect_left(self.times, end) + 1)
+        return first, stop
+
+    def mean(self, name: str, first: int, stop: int) -> float:
+        values = [value for value in self._values[name][first:stop] if not math.isnan(value)]
+        return sum(values) / len(values) if values else NAN
+
+    def peak(self, name: str, first: int, stop: int) -> float:
+        values = [value for value in self._values[name][first:stop] if not math.isnan(value)]
+        return max(values) if values else NAN
+
+    def to_dict(self, origin: float = 0.0) -> Dict:
+        """Columns as lists, times relative to origin; NaN becomes None for JSON"""
+        return {
+            "times": [round(t - origin, 3) for t in self.times],
+            "values": {name: [None if math.isnan(value) else round(value, 2) for value in column]
+                       for name, column in self._values.items()},
+        }
+
+
+class SystemProbe:
+    """Reads system-wide counters and turns them into per-interval rates"""
+
+    def __init__(self):
+        self._previous_cpu: Optional[Tuple[float, float]] = None
+        self._previous_disk: Optional[Tuple[float, int, int]] = None
+        self._query = None
+        self._counters = []
+        if sys.platform == "win32":
+            self._open_disk_counters()
+
+    def _open_disk_counters(self):
+        query = wintypes.HANDLE()
+        if _pdh.PdhOpenQueryW(None, 0, ctypes.byref(query)) != 0:
+            return
+        for path in DISK_COUNTERS:
+            counter = wintypes.HANDLE()
+            if _pdh.PdhAddEnglishCounterW(query, path, 0, ctypes.byref(counter)) != 0:
+                _pdh.PdhCloseQuery(query)
+                return
+            self._counters.append(counter)
+        self._query = query
+        # Rate counters need two collections; the first one is the baseline
+        _pdh.PdhCollectQueryData(query)
+
+    def close(self):
+        if self._query is not None:
+            _pdh.PdhCloseQuery(self._query)
+            self._query = None
+
+    def _cpu_times(self) -> Optional[Tuple[float, float]]:
+        """Return cumulative (busy, total) CPU time in arbitrary units"""
+        if sys.platform == "win32":
+            idle, kernel, user = (ctypes.c_ulonglong() for _ in range(3))
+            if not _kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            # Kernel time includes idle time
+            total = kernel.value + user.value
+            return total - idle.value, total
+        try:
+            with open("/proc/stat") as f:
+                fields = [int(value) for value in f.readline().split()[1:9]]
+        except (OSError, ValueError):
+            return None
+        total = sum(fields)
+        # idle and iowait
+        return total - fields[3] - fields[4], total
+
+    def _disk(self) -> Tuple[float, float, float]:
+        """Return (queue length, read bytes/s, write bytes/s)"""
+        if sys.platform == "win32":
+            if self._query is None or _pdh.PdhCollectQueryData(self._query) != 0:
+                return NAN, NAN, NAN
+            values = []
+            for counter in self._counters:
+                value = PDH_FMT_COUNTERVALUE()
+                status = _pdh.PdhGetFormattedCounterValue(counter, PDH_FMT_DOUBLE, None, ctypes.byref(value))
+                values.append(value.doubleValue if status == 0 else NAN)
+            return tuple(values)
+
+        now = time.monotonic()
+        queue, read_sectors, write_sectors = 0, 0, 0
+        try:
+            with open("/proc/diskstats") as f:
+                for line in f:
+                    fields = line.split()
+                    # Whole disks only: partitions would count the same I/O twice
+                    if len(fields) < 12 or not os.path.exists(f"/sys/block/{fields[2]}/device"):
+                        continue
+                    read_sectors += int(fields[5])
+                    write_sectors += int(fields[9])
+                    queue += int(fields[11])
+        except (OSError, ValueError):
+            return NAN, NAN, NAN
+        previous, self._previous_disk = self._previous_disk, (now, read_sectors, write_sectors)
+        if previous is None or now <= previous[0]:
+            return float(queue), NAN, NAN
+        elapsed = now - previous[0]
+        # /proc/diskstats counts 512-byte sectors whatever the device's sector size
+        return (float(queue), (read_sectors - previous[1]) * 512 / elapsed,
+                (write_sectors - previous[2]) * 512 / elapsed)
+
+    def sample(self) -> Tuple[float, float, float, float, float]:
+        """Return (CPU %, committed bytes, disk queue, read bytes/s, write bytes/s) since the last call"""
+        cpu = NAN
+        times = self._cpu_times()
+        if times is not None:
+            if self._previous_cpu is not None and times[1] > self._previous_cpu[1]:
+                cpu = 100.0 * (times[0] - self._previous_cpu[0]) / (times[1] - self._previous_cpu[1])
+            self._previous_cpu = times
+        info = performance_information()
+        commit = float(info["commit_bytes"]) if info else NAN
+        return (cpu, commit) + self._disk()
+
+
+class ChildProbe:
+    """Measures the processes descending from this one"""
+
+    def __init__(self, root: int = None):
+        self.root = root or os.getpid()
+        self.cpu_count = os.cpu_count() or 1
+        self._previous: Dict[int, Tuple[float, int]] = {}
+        self._previous_time = time.monotonic()
+
+    def sample(self) -> Tuple[float, float, float]:
+        """Return (child count, CPU % of the machine, I/O bytes/s) since the last call"""
+        now = time.monotonic()
+        elapsed = max(now - self._previous_time, 1e-6)
+        current = {}
+        cpu_delta, io_delta = 0.0, 0
+        for pid in process_tree(self.root)[1:]:
+            cpu = process_cpu_time(pid) or 0.0
+            io = process_io_bytes(pid) or 0
+            current[pid] = (cpu, io)
+            # A child that started since the last sample used all of its time in this interval
+            previous_cpu, previous_io = self._previous.get(pid, (0.0, 0))
+            cpu_delta += max(0.0, cpu - previous_cpu)
+            io_delta += max(0, io - previous_io)
+        self._previous, self._previous_time = current, now
+        return float(len(current)), 100.0 * cpu_delta / (elapsed * self.cpu_count), io_delta / elapsed
+
+
+class OperationUsage:
+    """Resource use over one execution of an operation"""
+
+    def __init__(self, index: int, name: str, start: float, end: float, samples: int,
+                 cpu_percent: float = NAN, child_cpu_percent: float = NAN, disk_bps: float = NAN,
+                 disk_queue: float = NAN, child_io_bps: float = NAN, peak_commit_bytes: float = NAN,
+                 cpu_count: int = 1):
+        self.index = index
+        self.name = name
+        self.start = start
+        self.end = end
+        self.samples = samples
+        self.cpu_percent = cpu_percent
+        self.child_cpu_percent = child_cpu_percent
+        self.disk_bps = disk_bps
+        self.disk_queue = disk_queue
+        self.child_io_bps = child_io_bps
+        self.peak_commit_bytes = peak_commit_bytes
+        self.cpu_count = cpu_count
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    @property
+    def bound(self) -> str:
+        if not self.samples:
+            return Bound.UNSAMPLED
+        # Child CPU is a share of the machine; compare it to one core
+        cpu_busy = (self.cpu_percent >= CPU_BUSY_PERCENT
+                    or self.child_cpu_percent * self.cpu_count >= CHILD_CPU_BUSY_PERCENT)
+        disk_busy = self.disk_queue >= DISK_BUSY_QUEUE or self.disk_bps >= DISK_BUSY_BPS
+        if cpu_busy and disk_busy:
+            return Bound.CPU_AND_IO
+        if cpu_busy:
+            return Bound.CPU
+        if disk_busy:
+            return Bound.IO
+        return Bound.WAITING
+
+    def describe(self) -> str:
+        """One-line summary for the run log"""
+        def figure(value: float, text: str) -> Optional[str]:
+            return None if math.isnan(value) else text
+
+        parts = [
+            figure(self.cpu_percent, f"CPU {self.cpu_percent:.0f}%"),
+            figure(self.child_cpu_percent, f"children {self.child_cpu_percent:.0f}%"),
+            figure(self.disk_bps, f"disk {self.disk_bps / 1024 ** 2:.1f} MB/s"),
+            figure(self.disk_queue, f"queue {self.disk_queue:.1f}"),
+            figure(self.peak_commit_bytes, f"commit peak {self.peak_commit_bytes / 1024 ** 3:.1f} GB"),
+        ]
+        details = ", ".join(part for part in parts if part)
+        return f"{self.name} ({self.duration:.1f}s): {self.bound}" + (f" - {details}" if details else "")
+
+    def to_dict(self, origin: float = 0.0) -> Dict:
+        def clean(value: float) -> Optional[float]:
+            return None if math.isnan(value) else round(value, 2)
+
+        return {"index": self.index, "name": self.name, "start": round(self.start - origin, 3),
+                "end": round(self.end - origin, 3), "samples": self.samples, "bound": self.bound,
+                "cpu_percent": clean(self.cpu_percent), "child_cpu_percent": clean(self.child_cpu_percent),
+                "disk_bps": clean(self.disk_bps), "disk_queue": clean(self.disk_queue),
+                "child_io_bps": clean(self.child_io_bps), "peak_commit_bytes": clean(self.peak_commit_bytes)}
+
+
+def samples_dir(backend_name: str) -> str:
+    """Return the directory holding a backend's sample files"""
+    path = os.path.join(data_dir(), f"samples_{backend_name}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class ResourceSampler:
+    """
+    Samples system and child resource use on a background thread
+
+    The class attributes are the defaults main() configures from the
+    command line.
+    """
+
+    enabled: bool = True
+    interval: float = 1.0
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or type(self).interval
+        self.series = TimeSeries(METRICS)
+        # (operation index, name, start, end); an operation retried later has several spans
+        self.spans: List[Tuple[int, str, float, Optional[float]]] = []
+        self.started = time.monotonic()
+        self._open: Dict[int, int] = {}  # Operation index -> its span in self.spans
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._system: Optional[SystemProbe] = None
+        self._children: Optional[ChildProbe] = None
+
+    @classmethod
+    def configure(cls, enabled: bool = None, interval: float = None):
+        """Change the defaults used by new samplers"""
+        if enabled is not None:
+            cls.enabled = enabled
+        if interval is not None:
+            cls.interval = max(0.1, interval)
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling, taking a last sample so the final operation is covered"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def operation_started(self, index: int, name: str, at: float = None):
+        """Open an operation's span at a time.monotonic() time (default: now)"""
+        with self._lock:
+            self._open[index] = len(self.spans)
+            self.spans.append((index, name, time.monotonic() if at is None else at, None))
+
+    def operation_finished(self, index: int, at: float = None):
+        with self._lock:
+            position = self._open.pop(index, None)
+            if position is not None:
+                operation_index, name, start, _ = self.spans[position]
+                self.spans[position] = (operation_index, name, start, time.monotonic() if at is None else at)
+
+    def _sample(self):
+        row = self._system.sample() + self._children.sample()
+        with self._lock:
+            self.series.append(time.monotonic(), row)
+
+    def _run(self):
+        # Probes are created here so their first readings (the baselines) cost the worker nothing
+        self._system = SystemProbe()
+        self._children = ChildProbe()
+        try:
+            self._system.sample()
+            self._children.sample()
+            while not self._stop.wait(self.interval):
+                self._sample()
+            self._sample()
+        finally:
+            self._system.close()
+
+    def usage(self) -> List[OperationUsage]:
+        """Return the resource use of every finished operation span, in execution order"""
+        cpu_count = os.cpu_count() or 1
+        with self._lock:
+            spans = [span for span in self.spans if span[3] is not None]
+            result = []
+            for index, name, start, end in spans:
+                first, stop = self.series.rows_between(start, end)
+                series = self.series
+                disk = [read + write for read, write in zip(series.column("disk_read_bps")[first:stop],
+                                                            series.column("disk_write_bps")[first:stop])
+                        if not math.isnan(read + write)]
+                result.append(OperationUsage(
+                    index, name, start, end, stop - first,
+                    cpu_percent=series.mean("cpu_percent", first, stop),
+                    child_cpu_percent=series.mean("child_cpu_percent", first, stop),
+                    disk_bps=sum(disk) / len(disk) if disk else NAN,
+                    disk_queue=series.mean("disk_queue", first, stop),
+                    child_io_bps=series.mean("child_io_bps", first, stop),
+                    peak_commit_bytes=series.peak("commit_bytes", first, stop),
+                    cpu_count=cpu_count
+                ))
+        return result
+
+    def summary_lines(self, limit: int = SUMMARY_OPERATIONS) -> List[str]:
+        """Lines for the run summary: the slowest operations and a count per Bound"""
+        usage = self.usage()
+        if not usage:
+            return []
+        counts: Dict[str, int] = {}
+        for item in usage:
+            counts[item.bound] = counts.get(item.bound, 0) + 1
+        lines = [f"Resource use ({len(self.series)} samples every {self.interval:g}s): " +
+                 ", ".join(f"{count} {bound}" for bound, count in sorted(counts.items(), key=lambda kv: -kv[1]))]
+        slowest = sorted(usage, key=lambda item: item.duration, reverse=True)[:limit]
+        lines.extend(f"  {item.describe()}" for item in slowest)
+        return lines
+
+    def save(self, backend_name: str, run_id: str) -> str:
+        """
+        Write the series and the per-operation usage to the backend's samples directory
+
+        Returns:
+            Path of the file written
+        """
+        directory = samples_dir(backend_name)
+        existing = sorted(name for name in os.listdir(directory) if name.endswith(SAMPLE_SUFFIX))
+        for name in existing[:max(0, len(existing) - MAX_SAMPLE_FILES + 1)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        with self._lock:
+            data = {"run_id": run_id, "interval": self.interval, "cpu_count": os.cpu_count() or 1,
+                    "metrics": list(METRICS), "series": self.series.to_dict(self.started)}
+        data["operations"] = [item.to_dict(self.started) for item in self.usage()]
+        path = os.path.join(directory, run_id + SAMPLE_SUFFIX)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        return path
@@ -0,0 +1,287 @@
+"""
+PowerShell script export for Better10
+
+Turns a plan into one self-contained PowerShell script, for machines that
+cannot have Python and PyQt5 installed. The script must run elevated. It
+performs every step in a single powershell.exe session: Appx removals,
+registry writes, winget, installers with their silent flags, and tools.
+Each step's result is returned as an object, and -ResultsPath also writes
+the results to a JSON file.
+
+Export is deterministic. The same plan always produces the same bytes
+(no timestamps, fixed encoding and line endings), so the script's SHA-256
+can be used as a cache key and the file can be Authenticode-signed.
+"""
+
+import os
+import json
+import hashlib
+from typing import List, Dict, Tuple
+
+from backends import HKEY_LOCAL_MACHINE, hive_name, detect_installer_type, detect_tool_type
+from exit_codes import EXIT_CODE_TABLES, operation_technology
+from profiles import serialize_operation
+from tool_profiles import TOOL_PROFILES, CONFIG_PLACEHOLDER
+
+SCRIPT_FORMAT = 1
+
+# Registry drives PowerShell provides out of the box
+_REGISTRY_DRIVES = {"HKLM": "HKLM:", "HKCU": "HKCU:"}
+
+_PRELUDE = r"""[CmdletBinding()]
+param(
+    # Write the per-step results to this file as JSON
+    [string]$ResultsPath
+)
+
+$ErrorActionPreference = 'Stop'
+# Relative Apps\ and Tools\ paths resolve against the folder holding this script
+$Better10Root = $PSScriptRoot
+
+function ConvertTo-Better10Argument([string]$Value) {
+    if ($Value -match '[\s"]') { return '"' + ($Value -replace '"', '\"') + '"' }
+    return $Value
+}
+
+function Invoke-Better10Process([string]$FilePath, [string[]]$ArgumentList = @()) {
+    $arguments = @($ArgumentList | ForEach-Object { ConvertTo-Better10Argument $_ })
+    if ($arguments.Count -gt 0) {
+        $proc = Start-Process -FilePath $FilePath -ArgumentList $arguments -PassThru
+    } else {
+        $proc = Start-Process -FilePath $FilePath -PassThru
+    }
+    $proc.WaitForExit()
+    return $proc.ExitCode
+}
+
+function Set-Better10RegistryValue([string]$Path, [string]$Name, $Value, [string]$Kind) {
+    if (-not (Test-Path -LiteralPath $Path)) { New-Item -Path $Path -Force | Out-Null }
+    New-ItemProperty -LiteralPath $Path -Name $Name -Value $Value -PropertyType $Kind -Force | Out-Null
+    return 0
+}
+
+function Resolve-Better10Path([string]$Path) {
+    if ([System.IO.Path]::IsPathRooted($Path)) { return $Path }
+    return Join-Path $Better10Root $Path
+}
+
+$Better10Results = New-Object System.Collections.Generic.List[object]
+
+function Invoke-Better10Step([int]$Index, [string]$Name, [string]$Type, [string]$Technology, [scriptblock]$Action) {
+    $started = [System.Diagnostics.Stopwatch]::StartNew()
+    $exitCode = $null
+    $message = ''
+    try {
+        $exitCode = @(& $Action)[-1]
+        $code = [string]([int64]$exitCode -band 4294967295)
+        $table = $Better10ExitCodes[$Technology]
+        if ($table -and $table.ContainsKey($code)) {
+            $status, $message = $table[$code]
+        } elseif ($code -eq '0') {
+            $status = 'success'
+        } else {
+            $status = 'failure'
+            $message = "Exit code $code"
+        }
+    } catch {
+        $status = 'failure'
+        $message = $_.Exception.Message
+    }
+    $started.Stop()
+
+    $result = [pscustomobject][ordered]@{
+        index     = $Index
+        name      = $Name
+        type      = $Type
+        status    = $status
+        exit_code = $exitCode
+        message   = $message
+        seconds   = [math]::Round($started.Elapsed.TotalSeconds, 3)
+    }
+    $Better10Results.Add($result)
+    $color = @{ success = 'Green'; success_reboot = 'Yellow'; transient = 'Yellow'; failure = 'Red' }[$status]
+    Write-Host ("[{0}/{1}] {2}: {3} {4}" -f $Index, $Better10StepCount, $Name, $status, $message) -ForegroundColor $color
+}
+"""
+
+_EPILOGUE = r"""
+if ($ResultsPath) {
+    ConvertTo-Json -InputObject @($Better10Results) -Depth 3 | Set-Content -LiteralPath $ResultsPath -Encoding UTF8
+}
+$failed = @($Better10Results | Where-Object { $_.status -in 'failure', 'transient' }).Count
+$reboot = @($Better10Results | Where-Object { $_.status -eq 'success_reboot' }).Count
+Write-Host ("Successful: {0}  Failed: {1}  Restart required: {2}" -f ($Better10Results.Count - $failed), $failed, $reboot)
+$Better10Results
+if ($failed -gt 0) { exit 1 }
+exit 0
+"""
+
+
+def ps_quote(value: str) -> str:
+    """Quote a string as a PowerShell single-quoted literal"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def ps_array(values: List[str]) -> str:
+    """Return a PowerShell array literal of quoted strings"""
+    return "@(" + ", ".join(ps_quote(v) for v in values) + ")"
+
+
+def plan_hash(operations: List[Dict]) -> str:
+    """SHA-256 of the canonical JSON form of a plan, independent of dict ordering"""
+    canonical = json.dumps([serialize_operation(op) for op in operations],
+                           sort_keys=True, separators=(",", ":"), ensure_ascii=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _exit_code_tables() -> str:
+    """Render the non-zero entries of EXIT_CODE_TABLES as a PowerShell hashtable"""
+    lines = ["$Better10ExitCodes = @{"]
+    for technology in sorted(EXIT_CODE_TABLES):
+        entries = [
+            f"        '{code}' = @({ps_quote(outcome)}, {ps_quote(description)})"
+            for code, (outcome, description) in sorted(EXIT_CODE_TABLES[technology].items())
+            if code != 0
+        ]
+        lines.append(f"    {ps_quote(technology)} = @{{")
+        lines.extend(entries)
+        lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def _tool_arguments(operation: Dict) -> List[str]:
+    """Return a tool's arguments as PowerShell expressions, resolving a profile's config file on the target"""
+    if operation.get('args') is not None:
+        return [ps_quote(arg) for arg in operation['args']]
+    profile = TOOL_PROFILES.get(operation.get('tool_profile'))
+    if profile is None:
+        return []
+    config = os.path.join(os.path.dirname(operation['path']), profile.config or "")
+    return [f"(Resolve-Better10Path {ps_quote(config)})" if arg == CONFIG_PLACEHOLDER else ps_quote(arg)
+            for arg in profile.args]
+
+
+def _step_action(operation: Dict) -> str:
+    """
+    Return the body of the script block for one operation
+
+    The block's last output is the step's exit code.
+    """
+    op_type = operation.get('type')
+
+    if op_type == 'powershell':
+        return f"& {{ {operation['command']} }} | Out-Host; 0"
+
+    if op_type in ('winget_install', 'winget_uninstall'):
+        package_id = ps_quote(operation['package_id'])
+        if op_type == 'winget_install':
+            command = f"winget install --id {package_id} --silent --accept-package-agreements --accept-source-agreements"
+        else:
+            command = f"winget uninstall --id {package_id} --silent"
+        return f"{command} | Out-Host; $LASTEXITCODE"
+
+    if op_type == 'registry':
+        hive = operation.get('hive', HKEY_LOCAL_MACHINE)
+        hive = hive_name(hive) if isinstance(hive, int) else str(hive).upper()
+        drive = _REGISTRY_DRIVES.get(hive)
+        if drive is None:
+            raise ValueError(f"Registry hive {hive} is not supported by script export")
+        value = operation['value']
+        if isinstance(value, int):
+            kind, literal = "DWord", str(value)
+        else:
+            kind, literal = "String", ps_quote(value)
+        path = ps_quote(f"{drive}\\{operation['key_path']}")
+        return f"Set-Better10RegistryValue {path} {ps_quote(operation['value_name'])} {literal} '{kind}'"
+
+    if op_type == 'local_installer':
+        path = f"(Resolve-Better10Path {ps_quote(operation['path'])})"
+        installer_type = operation.get('installer_type') or detect_installer_type(operation['path'])
+        if installer_type == 'msi':
+            return f"Invoke-Better10Process 'msiexec.exe' @('/i', {path}, '/quiet', '/norestart', '/qn')"
+        if installer_type == 'msix':
+            return f"Add-AppxPackage -Path {path} -ErrorAction Stop; 0"
+        return f"Invoke-Better10Process {path} @('/S')"
+
+    if op_type == 'tool':
+        path = f"(Resolve-Better10Path {ps_quote(operation['path'])})"
+        tool_type = operation.get('tool_type') or detect_tool_type(operation['path'])
+        args = _tool_arguments(operation)
+        if tool_type == 'ps1':
+            # A separate session, so a tool calling "exit" cannot end the whole plan
+            return f"Invoke-Better10Process 'powershell.exe' @('-NoProfile', '-ExecutionPolicy', 'Bypass', '-File', {', '.join([path] + args)})"
+        if tool_type in ('bat', 'cmd'):
+            return f"Invoke-Better10Process 'cmd.exe' @('/c', {', '.join([path] + args)})"
+        if args:
+            return f"Invoke-Better10Process {path} @({', '.join(args)})"
+        return f"Invoke-Better10Process {path}"
+
+    if op_type == 'executable':
+        path = f"(Resolve-Better10Path {ps_quote(operation['exe_path'])})"
+        return f"Invoke-Better10Process {path} {ps_array(operation.get('args', []))}"
+
+    raise ValueError(f"Operation type {op_type} is not supported by script export")
+
+
+def export_powershell(operations: List[Dict], name: str = None) -> str:
+    """
+    Generate a PowerShell script that performs a plan
+
+    Args:
+        operations: Operation dicts, as executed by WorkerThread
+        name: Plan name written in the script header
+
+    Returns:
+        Script text with LF line endings (write_script converts to CRLF)
+    """
+    lines = [
+        "#Requires -RunAsAdministrator",
+        "<#",
+        ".SYNOPSIS",
+        f"    Better10 plan: {name or 'Exported plan'}",
+        ".NOTES",
+        f"    Format: {SCRIPT_FORMAT}",
+        f"    Operations: {len(operations)}",
+        f"    Plan SHA-256: {plan_hash(operations)}",
+        "    Generated by Better10. Re-export instead of editing, or the hash will no longer match the plan.",
+        "#>",
+        _PRELUDE.rstrip("\n"),
+        "",
+        _exit_code_tables(),
+        f"$Better10StepCount = {len(operations)}",
+        "",
+    ]
+    for index, operation in enumerate(operations, start=1):
+        lines.append(
+            f"Invoke-Better10Step {index} {ps_quote(operation.get('name', operation.get('type')))} "
+            f"{ps_quote(operation.get('type'))} {ps_quote(operation_technology(operation))} {{ {_step_action(operation)} }}"
+        )
+    lines.append(_EPILOGUE.rstrip("\n"))
+    return "\n".join(lines) + "\n"
+
+
+def write_script(path: str, script: str) -> str:
+    """
+    Write a script as UTF-8 with BOM and CRLF line endings
+
+    Windows PowerShell 5.1 reads BOM-less files as ANSI, which would break
+    non-ASCII operation names, and Authenticode signing expects CRLF.
+
+    Returns:
+        SHA-256 of the written bytes
+    """
+    data = b"\xef\xbb\xbf" + script.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def export_plan(path: str, operations: List[Dict], name: str = None) -> Tuple[str, int]:
+    """
+    Export a plan to a script file
+
+    Returns:
+        Tuple of (SHA-256 of the file, number of steps)
+    """
+    return write_script(path, export_powershell(operations, name)), len(operations)
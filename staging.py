@@ -0,0 +1,358 @@
+"""
+Installer staging for Better10
+
+Installers in Apps/ usually live wherever Better10 was copied to: a USB
+stick or a network share. Launching them from there puts slow media on the
+critical path of every install. The stager copies upcoming installers to a
+local cache while the current operation is still running:
+
+- the cache is content-addressed: data_dir()/staging/<sha256>/<file name>,
+  so the same installer is stored once and found again on the next run
+  without reading the slow copy (an index maps path, size and mtime to
+  the hash)
+- every copy is hashed on the way in and read back and hashed again before
+  use. That catches a bad copy and leaves the file in the OS page cache, so
+  the installer starts from memory. A cache hit is re-hashed the same way
+- an operation can pin the expected hash with a "sha256" key; an installer
+  that does not match is not run
+- the cache is bounded: least recently used entries are evicted to stay
+  under max_bytes, and an installer that cannot fit is run from its source
+- in "auto" mode only installers on removable, optical or network drives
+  (or, off Windows, on another file system than the cache) are staged
+
+Staging runs on one background thread, a few installers ahead of the one
+that is executing. Slow media reads sequentially best anyway. Copies are
+scheduled by the resource governor like installers: the thread takes their
+priority, and each copy counts as a disk-heavy job.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Tuple, Optional
+
+from backends import data_dir, resolve_path
+from process_monitor import DISK_SLOTS, lower_current_thread
+from governor import ResourceGovernor
+
+CHUNK_SIZE = 1024 * 1024
+INDEX_FILE = "index.json"
+_TEMP_PREFIX = "incoming-"
+
+
+class StagingMode:
+    """Which installers are staged"""
+    AUTO = "auto"      # Only those on slow media
+    ALWAYS = "always"
+    OFF = "off"
+
+
+class StageStatus:
+    """Outcome of staging one installer"""
+    STAGED = "staged"      # Copied to the cache for this run
+    CACHED = "cached"      # Already in the cache from an earlier run
+    SKIPPED = "skipped"    # Run from its source (already local, missing, or too large)
+    FAILED = "failed"      # Could not be staged; run from its source
+    MISMATCH = "mismatch"  # Does not match the expected hash; must not be run
+
+
+class StagedInstaller:
+    """Where to run one installer from"""
+
+    def __init__(self, source: str, path: str, status: str, detail: str = "", sha256: str = None,
+                 seconds: float = 0.0):
+        self.source = source
+        self.path = path
+        self.status = status
+        self.detail = detail
+        self.sha256 = sha256
+        self.seconds = seconds
+
+
+def cache_dir() -> str:
+    """Return the staging cache directory"""
+    path = os.path.join(data_dir(), "staging")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def is_slow_media(path: str, local_dir: str) -> bool:
+    """
+    Guess whether a file lives on slow media compared with a local directory
+
+    On Windows: UNC paths and removable, network and optical drives. Elsewhere:
+    anything on another file system than local_dir.
+    """
+    if sys.platform == "win32":
+        import ctypes
+        drive, _ = os.path.splitdrive(os.path.abspath(path))
+        if drive.startswith("\\\\"):
+            return True
+        # DRIVE_REMOVABLE, DRIVE_REMOTE, DRIVE_CDROM
+        return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") in (2, 4, 5)
+    try:
+        return os.stat(path).st_dev != os.stat(local_dir).st_dev
+    except OSError:
+        return False
+
+
+def hash_file(path: str, stop: threading.Event = None) -> str:
+    """Return the SHA-256 of a file, reading it sequentially"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            if stop is not None and stop.is_set():
+                raise InterruptedError("Staging cancelled")
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InstallerStager:
+    """
+    Stages the local installers of a plan ahead of their execution
+
+    The class attributes are the defaults main() configures from the
+    command line.
+    """
+
+    mode: str = StagingMode.AUTO
+    lookahead: int = 2
+    max_bytes: int = 8 * 1024 ** 3
+
+    # Cache index and eviction are shared by every stager in the process
+    _cache_lock = threading.Lock()
+
+    def __init__(self, operations: List[Dict], directory: str = None):
+        """
+        Args:
+            operations: The plan; its local_installer operations are staged in order
+            directory: Cache directory (cache_dir() if None)
+        """
+        self.directory = directory or cache_dir()
+        # (source path, expected SHA-256 or None) in plan order
+        self.sources: List[Tuple[str, Optional[str]]] = []
+        for operation in operations:
+            if operation.get('type') != 'local_installer' or not operation.get('path') \
+                    or operation.get('stage') is False:
+                continue
+            item = self._item(operation['path'], operation.get('sha256'))
+            if item not in self.sources:
+                self.sources.append(item)
+        self.results: Dict[Tuple[str, Optional[str]], StagedInstaller] = {}
+        self._futures: Dict[Tuple[str, Optional[str]], Future] = {}
+        self._consumed = set()
+        self._pinned = set()
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._limits = ResourceGovernor().staging_limits()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="installer-staging",
+                                        initializer=lower_current_thread, initargs=(self._limits,))
+
+    @classmethod
+    def configure(cls, mode: str = None, lookahead: int = None, max_bytes: int = None):
+        """Change the defaults used by new stagers"""
+        if mode is not None:
+            cls.mode = mode
+        if lookahead is not None:
+            cls.lookahead = max(1, lookahead)
+        if max_bytes is not None:
+            cls.max_bytes = max(0, max_bytes)
+
+    @staticmethod
+    def _item(path: str, sha256: str = None) -> Tuple[str, Optional[str]]:
+        return os.path.normcase(os.path.abspath(resolve_path(path))), (sha256 or "").lower() or None
+
+    def start(self):
+        """Trim the cache to its limit, then begin staging the first installers of the plan"""
+        self._pool.submit(self._make_room, 0)
+        self._fill()
+
+    def _fill(self):
+        """Keep up to lookahead installers staged or staging beyond the ones already used"""
+        with self._lock:
+            while (self._next < len(self.sources)
+                   and len(self._futures) - len(self._consumed) < self.lookahead):
+                item = self.sources[self._next]
+                self._next += 1
+                if item not in self._futures:
+                    self._futures[item] = self._pool.submit(self._stage, *item)
+
+    def local_path(self, path: str, sha256: str = None) -> StagedInstaller:
+        """
+        Return where to run an installer from, waiting for it to be staged
+
+        Args:
+            path: The operation's installer path
+            sha256: The operation's expected hash, if it pins one
+
+        An installer the stager did not plan for is queued now; one that
+        was not staged is run from its source.
+        """
+        item = self._item(path, sha256)
+        with self._lock:
+            future = self._futures.get(item)
+            if future is None:
+                future = self._futures[item] = self._pool.submit(self._stage, *item)
+            self._consumed.add(item)
+        try:
+            result = future.result()
+        except Exception as e:
+            result = StagedInstaller(item[0], item[0], StageStatus.FAILED, str(e))
+        self._fill()
+        return result
+
+    def release(self, path: str):
+        """Allow a staged installer that has finished (given by its staged path) to be evicted again"""
+        for result in list(self.results.values()):
+            if result.path == path and result.path != result.source and result.sha256:
+                with self._cache_lock:
+                    self._pinned.discard(result.sha256)
+
+    def close(self):
+        """Stop staging; installers already staged stay in the cache"""
+        self._stop.set()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def summary(self) -> Dict[str, int]:
+        """Count the staged installers of this run by StageStatus"""
+        counts: Dict[str, int] = {}
+        for result in self.results.values():
+            counts[result.status] = counts.get(result.status, 0) + 1
+        return counts
+
+    def _stage(self, source: str, expected: Optional[str]) -> StagedInstaller:
+        started = time.monotonic()
+        result = self._stage_file(source, expected)
+        result.seconds = time.monotonic() - started
+        self.results[(source, expected)] = result
+        return result
+
+    def _stage_file(self, source: str, expected: Optional[str]) -> StagedInstaller:
+        try:
+            stat = os.stat(source)
+        except OSError:
+            # The backend reports the missing installer when it is launched
+            return StagedInstaller(source, source, StageStatus.SKIPPED, "Installer not found")
+        if self.mode == StagingMode.AUTO and not expected and not is_slow_media(source, self.directory):
+            return StagedInstaller(source, source, StageStatus.SKIPPED, "Already on local storage")
+
+        key = f"{source}|{stat.st_size}|{stat.st_mtime_ns}"
+        name = os.path.basename(source)
+        with self._cache_lock:
+            sha256 = self._read_index().get(key)
+        if sha256:
+            cached = os.path.join(self.directory, sha256, name)
+            try:
+                # Re-hashing checks the cached copy and pulls it into the page cache
+                if os.path.getsize(cached) == stat.st_size and hash_file(cached, self._stop) == sha256:
+                    return self._use(source, cached, sha256, StageStatus.CACHED, expected)
+            except OSError:
+                pass
+
+        if self.mode == StagingMode.AUTO and not is_slow_media(source, self.directory):
+            # A pinned hash on local storage is checked in place instead of copied
+            sha256 = hash_file(source, self._stop)
+            return self._use(source, source, sha256, StageStatus.SKIPPED, expected)
+
+        if not self._make_room(stat.st_size):
+            return StagedInstaller(source, source, StageStatus.SKIPPED,
+                                   f"Larger than the {self.max_bytes / 1024 ** 3:.1f} GB staging limit allows")
+
+        temp_path = os.path.join(self.directory, f"{_TEMP_PREFIX}{os.getpid()}-{os.urandom(4).hex()}")
+        try:
+            with DISK_SLOTS.hold(self._limits.max_disk_jobs):
+                digest = hashlib.sha256()
+                with open(source, "rb") as src, open(temp_path, "wb") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        if self._stop.is_set():
+                            raise InterruptedError("Staging cancelled")
+                        digest.update(chunk)
+                        dst.write(chunk)
+                sha256 = digest.hexdigest()
+                if expected and sha256 != expected:
+                    return StagedInstaller(source, source, StageStatus.MISMATCH,
+                                           f"Installer hash mismatch: expected {expected}, got {sha256}", sha256)
+                # Reading the copy back verifies it and leaves it in the page cache
+                if hash_file(temp_path, self._stop) != sha256:
+                    return StagedInstaller(source, source, StageStatus.FAILED, "Local copy does not match its source")
+            entry = os.path.join(self.directory, sha256)
+            os.makedirs(entry, exist_ok=True)
+            staged = os.path.join(entry, name)
+            os.replace(temp_path, staged)
+        except (OSError, InterruptedError) as e:
+            return StagedInstaller(source, source, StageStatus.FAILED, str(e))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with self._cache_lock:
+            index = self._read_index()
+            index[key] = sha256
+            self._write_index(index)
+        return self._use(source, staged, sha256, StageStatus.STAGED, expected)
+
+    def _use(self, source: str, path: str, sha256: str, status: str, expected: Optional[str]) -> StagedInstaller:
+        if expected and sha256 != expected:
+            return StagedInstaller(source, source, StageStatus.MISMATCH,
+                                   f"Installer hash mismatch: expected {expected}, got {sha256}", sha256)
+        if path != source:
+            with self._cache_lock:
+                self._pinned.add(sha256)
+            # The entry's mtime records when it was last used, for eviction
+            os.utime(os.path.dirname(path))
+        return StagedInstaller(source, path, status, sha256=sha256)
+
+    def _read_index(self) -> Dict[str, str]:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: Dict[str, str]):
+        # Entries whose cache directory was evicted are dropped on the way
+        live = {key: sha256 for key, sha256 in index.items()
+                if os.path.isdir(os.path.join(self.directory, sha256))}
+        temp_path = os.path.join(self.directory, INDEX_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(live, f)
+        os.replace(temp_path, os.path.join(self.directory, INDEX_FILE))
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """Return (last used, size, sha256) for every cache entry"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if len(name) != 64 or not os.path.isdir(path):
+                continue
+            size = 0
+            for file_name in os.listdir(path):
+                try:
+                    size += os.path.getsize(os.path.join(path, file_name))
+                except OSError:
+                    pass
+            entries.append((os.path.getmtime(path), size, name))
+        return entries
+
+    def _make_room(self, size: int) -> bool:
+        """Evict least recently used entries until size more bytes fit; False if they cannot"""
+        if size > self.max_bytes:
+            return False
+        with self._cache_lock:
+            entries = sorted(self._entries())
+            used = sum(entry_size for _, entry_size, _ in entries)
+            for _, entry_size, sha256 in entries:
+                if used + size <= self.max_bytes:
+                    break
+                if sha256 in self._pinned:
+                    continue
+                shutil.rmtree(os.path.join(self.directory, sha256), ignore_errors=True)
+                used -= entry_size
+            return used + size <= self.max_bytes
@@ -0,0 +1,139 @@
+"""
+End-to-end tests for agent
+
+Several agents run on 127.0.0.1 ephemeral ports against SimulatedBackend,
+and the plan is fanned out through the asyncio FleetController.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from agent import (
+    AgentServer, AgentService, AgentClient, AgentError, FleetController, RunState, serve_agent
+)
+from backends import SimulatedBackend, SimulatedProcessRunner, HKEY_CURRENT_USER
+
+TOKEN = "test-token"
+
+PLAN = [
+    {'type': 'powershell', 'name': "Remove Clipchamp", 'command': "Get-AppxPackage *Clipchamp* | Remove-AppxPackage"},
+    {'type': 'registry', 'name': "Hide Task View", 'hive': HKEY_CURRENT_USER,
+     'key_path': "Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced",
+     'value_name': "ShowTaskViewButton", 'value': 0},
+    {'type': 'powershell', 'name': "Remove Solitaire", 'command': "Get-AppxPackage *Solitaire* | Remove-AppxPackage"},
+]
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("BETTER10_DATA_DIR", str(tmp_path))
+
+
+def start_agents(count: int, latency: float):
+    servers = []
+    for _ in range(count):
+        backend = SimulatedBackend(runner=SimulatedProcessRunner(latency=latency, seed=1), appx_packages=[])
+        server = AgentServer(("127.0.0.1", 0), AgentService(backend), TOKEN)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+@pytest.fixture
+def agents(request):
+    count, latency = getattr(request, "param", (3, 0.02))
+    servers = start_agents(count, latency)
+    yield ["{}:{}".format(*server.server_address[:2]) for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fleet_runs_plan_on_every_agent(agents):
+    events = []
+    controller = FleetController(agents, TOKEN, on_event=lambda address, event: events.append((address, event)))
+
+    results = asyncio.run(controller.run(PLAN, "lab"))
+
+    assert set(results) == set(agents)
+    for status in results.values():
+        assert status["state"] == RunState.SUCCEEDED
+        assert status["successful"] == len(PLAN)
+        assert status["failed"] == 0
+    assert controller.overall_progress() == 100
+
+    for address in agents:
+        own = [event for agent, event in events if agent == address]
+        kinds = [event["event"] for event in own]
+        assert kinds[0] == "started"
+        assert kinds[-1] == "finished"
+        assert {"log", "progress", "op_started", "op_finished"} <= set(kinds)
+        assert [event["seq"] for event in own] == list(range(len(own)))
+        assert kinds.count("op_finished") == len(PLAN)
+        assert own[-1]["state"] == RunState.SUCCEEDED
+
+
+@pytest.mark.parametrize("agents", [(2, 0.5)], indirect=True)
+def test_fleet_cancel(agents):
+    plan = PLAN * 4
+    clients = [AgentClient(address, TOKEN) for address in agents]
+
+    async def scenario():
+        run_ids = {}
+        for client in clients:
+            run_ids[client.address] = (await client.call("submit", operations=plan, name="long"))["run_id"]
+        for client in clients:
+            since = 0
+            while True:
+                batch = await client.call("events", run_id=run_ids[client.address], since=since, wait=5)
+                since = batch["next"]
+                if any(event["event"] == "op_started" for event in batch["events"]):
+                    break
+        await FleetController(agents, TOKEN).cancel(run_ids)
+
+        statuses = {}
+        deadline = time.monotonic() + 30
+        for client in clients:
+            while True:
+                status = await client.call("status", run_id=run_ids[client.address])
+                if status["state"] != RunState.RUNNING or time.monotonic() > deadline:
+                    break
+                await asyncio.sleep(0.05)
+            statuses[client.address] = status
+        return statuses
+
+    statuses = asyncio.run(scenario())
+
+    for status in statuses.values():
+        assert status["state"] == RunState.CANCELLED
+        assert status["successful"] + status["failed"] < len(plan)
+
+
+@pytest.mark.parametrize("agents", [(1, 0.0)], indirect=True)
+def test_wrong_token_is_rejected(agents):
+    for token in ("not-the-token", None):
+        with pytest.raises(AgentError, match="Invalid or missing token"):
+            asyncio.run(AgentClient(agents[0], token).call("ping"))
+    assert asyncio.run(AgentClient(agents[0], TOKEN).call("ping"))["backend"]
+
+
+@pytest.mark.parametrize("agents", [(1, 0.0)], indirect=True)
+def test_failed_agent_is_reported_without_stopping_the_others(agents):
+    unreachable = "127.0.0.1:1"
+    controller = FleetController(agents + [unreachable], TOKEN)
+
+    results = asyncio.run(controller.run(PLAN))
+
+    assert results[agents[0]]["state"] == RunState.SUCCEEDED
+    assert results[unreachable]["state"] == "error"
+    assert controller.overall_progress() == 100
+
+
+def test_remote_bind_requires_token():
+    with pytest.raises(ValueError, match="without --agent-token"):
+        serve_agent(SimulatedBackend(), "0.0.0.0:0", None)
@@ -0,0 +1,173 @@
+"""
+Tests for broker over a local socket
+
+A BrokerServer with the simulated backend runs on a thread of the test
+process; the broker side of a few tests is scripted by hand with the
+frame helpers instead.
+"""
+
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from backends import SimulatedBackend, SimulatedProcessRunner
+from broker import (
+    BrokerServer, BrokerClient, BrokerError, send_frame, recv_frame, proof, PROTOCOL_VERSION, SECRET_BYTES
+)
+from process_monitor import LaunchOptions, HangAction
+
+SECRET = os.urandom(SECRET_BYTES)
+
+
+def start_broker(backend=None, secret: bytes = SECRET, accept_timeout: float = 10.0):
+    server = BrokerServer(backend or SimulatedBackend(), secret, accept_timeout=accept_timeout)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(served=server.serve()), daemon=True)
+    thread.start()
+    return server, thread, result
+
+
+def scripted_broker(script, broker_proof=None):
+    """
+    Listen for one client, do the broker side of the handshake, then run script(conn)
+
+    broker_proof(nonce) replaces the proof the broker sends back.
+    """
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        conn, _ = listener.accept()
+        listener.close()
+        with conn:
+            send_frame(conn, {"type": "hello", "version": PROTOCOL_VERSION, "nonce": "00" * 16})
+            auth = recv_frame(conn)
+            reply = (broker_proof or (lambda nonce: proof(SECRET, "broker", nonce)))(auth["nonce"])
+            send_frame(conn, {"type": "welcome", "proof": reply, "backend": "scripted", "pid": 0})
+            script(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def test_handshake_and_call():
+    server, thread, result = start_broker()
+    client = BrokerClient(server.port, SECRET)
+
+    assert client.backend_name == "simulated"
+    assert client.broker_pid == os.getpid()
+    assert client.call("is_admin") is True
+    assert client.call("file_sizes", paths=["C:\\nowhere.msi"]) == [None]
+
+    client.close()
+    thread.join(5)
+    assert result["served"] is True
+
+
+def test_wrong_secret_is_rejected_and_the_real_client_still_served():
+    server, thread, _ = start_broker()
+
+    with pytest.raises(BrokerError, match="rejected the secret"):
+        BrokerClient(server.port, os.urandom(SECRET_BYTES))
+
+    client = BrokerClient(server.port, SECRET)
+    assert client.call("is_admin") is True
+    client.close()
+    thread.join(5)
+
+
+def test_silent_connections_do_not_hold_up_the_client():
+    server, thread, _ = start_broker()
+    silent = [socket.create_connection(("127.0.0.1", server.port)) for _ in range(3)]
+
+    started = time.monotonic()
+    client = BrokerClient(server.port, SECRET)
+    assert time.monotonic() - started < 1.0
+
+    client.close()
+    for conn in silent:
+        conn.close()
+    thread.join(5)
+
+
+def test_no_client_times_out():
+    server, thread, result = start_broker(accept_timeout=0.3)
+    thread.join(5)
+
+    assert result["served"] is False
+    with pytest.raises(OSError):
+        socket.create_connection(("127.0.0.1", server.port), timeout=1)
+
+
+def test_client_rejects_a_broker_without_the_secret():
+    port = scripted_broker(lambda conn: None, broker_proof=lambda nonce: proof(b"guess", "broker", nonce))
+
+    with pytest.raises(BrokerError, match="could not prove it is the broker"):
+        BrokerClient(port, SECRET)
+
+
+def test_output_and_exit_code_reach_the_launch_options():
+    runner = SimulatedProcessRunner(output_lines=3, failure_rate=1.0, failure_exit_codes=[3010])
+    server, thread, _ = start_broker(SimulatedBackend(runner=runner))
+    client = BrokerClient(server.port, SECRET)
+    lines = []
+    options = LaunchOptions(timeout=30, on_output=lambda stream, line: lines.append((stream, line)))
+
+    success, stdout, stderr = client.call("run_powershell", options, command="Write-Output hi")
+
+    assert not success
+    assert "exit code 3010" in stderr
+    assert options.exit_code == 3010
+    assert [stream for stream, _ in lines] == ["stdout"] * 3
+    assert "".join(line for _, line in lines) == stdout
+    client.close()
+    thread.join(5)
+
+
+def test_hang_reports_reach_the_launch_options():
+    server, thread, _ = start_broker(SimulatedBackend(runner=SimulatedProcessRunner(hang_rate=1.0)))
+    client = BrokerClient(server.port, SECRET)
+    hangs = []
+    options = LaunchOptions(timeout=0.4, inactivity_timeout=0.2, hang_action=HangAction.WARN,
+                            on_hang=hangs.append)
+
+    success, _, stderr = client.call("run_tool", options, tool_path="Tools\\Tool.exe", tool_type="exe", args=None)
+
+    assert not success
+    assert "timed out" in stderr
+    assert hangs == [0.2]
+    client.close()
+    thread.join(5)
+
+
+def test_unknown_method_and_parameters_are_refused():
+    server, thread, _ = start_broker()
+    client = BrokerClient(server.port, SECRET)
+
+    with pytest.raises(BrokerError, match="Unknown request: remove_tree"):
+        client.call("remove_tree", path="C:\\")
+    with pytest.raises(BrokerError, match="Invalid parameters for run_powershell"):
+        client.call("run_powershell", command="x", shell=True)
+    client.close()
+    thread.join(5)
+
+
+def test_pending_calls_fail_when_the_broker_dies():
+    received = threading.Event()
+
+    def die_mid_call(conn):
+        recv_frame(conn)
+        received.set()
+        time.sleep(0.1)
+
+    client = BrokerClient(scripted_broker(die_mid_call), SECRET)
+    assert client.backend_name == "scripted"
+
+    with pytest.raises(BrokerError, match="closed the connection"):
+        client.call("run_powershell", LaunchOptions(), command="Start-Sleep 60")
+    assert received.is_set()
+    with pytest.raises(BrokerError, match="closed the connection"):
+        client.call("is_admin")
+    client.close()
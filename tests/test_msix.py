@@ -0,0 +1,107 @@
+"""
+Tests for the MSIX batch: its watchdog exemption, timing and staged copies
+"""
+
+import sys
+import time
+
+from backends import SimulatedBackend
+from durations import TimeoutPolicy
+from msix import MsixBatch
+from process_monitor import LaunchOptions, ExitStatus, run_monitored
+
+# Produces no output and uses no CPU for longer than the watchdog window below
+SILENT_CHILD = [sys.executable, "-c", "import time; time.sleep(2)"]
+WATCHDOG = 0.5
+
+
+def msix(name: str, installer_type: str = 'msix') -> dict:
+    operation = {'type': 'local_installer', 'name': name, 'path': f"Apps\\{name}.msix"}
+    if installer_type:
+        operation['installer_type'] = installer_type
+    return operation
+
+
+class RecordingBackend(SimulatedBackend):
+    """Records each deployment session and takes a fixed time per package"""
+
+    def __init__(self, seconds_per_package: float = 0.0):
+        super().__init__()
+        self.seconds_per_package = seconds_per_package
+        self.sessions = []
+
+    def install_msix_packages(self, package_paths, dependency_paths=None, options=None):
+        self.sessions.append((list(package_paths), options.timeout, options.inactivity_timeout))
+        time.sleep(self.seconds_per_package * len(package_paths))
+        return [(True, "")] * len(package_paths)
+
+
+def policy() -> TimeoutPolicy:
+    timeouts = TimeoutPolicy()
+    timeouts.inactivity_timeout = WATCHDOG
+    return timeouts
+
+
+def test_silent_msix_session_is_not_killed():
+    options = policy().launch_options(msix("Calculator"))
+    assert options.inactivity_timeout is None
+
+    returncode, _, _, status = run_monitored(SILENT_CHILD, options=options)
+
+    assert status == ExitStatus.EXITED
+    assert returncode == 0
+
+
+def test_silent_exe_installer_is_still_killed():
+    options = policy().launch_options({'type': 'local_installer', 'name': "Setup",
+                                       'path': "Apps\\setup.exe", 'installer_type': 'exe'})
+    assert options.inactivity_timeout == WATCHDOG
+
+    _, _, _, status = run_monitored(SILENT_CHILD, options=options)
+
+    assert status == ExitStatus.HUNG
+
+
+def test_batch_session_runs_without_watchdog():
+    backend = RecordingBackend()
+    # No installer_type: the kind is not exempt, but the batch still is
+    operations = [msix("Calculator", installer_type=None), msix("Photos", installer_type=None)]
+    batch = MsixBatch(backend, operations)
+    options = policy().launch_options(operations[0])
+    assert options.inactivity_timeout == WATCHDOG
+    timeout = options.timeout
+
+    assert batch.install(operations[0], options, lambda operation: (operation['path'], "")) == (True, "", "")
+
+    assert backend.sessions == [(["Apps\\Calculator.msix", "Apps\\Photos.msix"], timeout * 2, None)]
+
+
+def test_session_time_is_split_across_its_packages():
+    operations = [msix("Calculator"), msix("Photos"), msix("Terminal")]
+    batch = MsixBatch(RecordingBackend(seconds_per_package=0.1), operations)
+
+    for operation in operations:
+        batch.install(operation, LaunchOptions(timeout=60), lambda operation: (operation['path'], ""))
+
+    shares = [batch.duration(operation, 99.0) for operation in operations]
+    assert all(0.09 < share < 0.2 for share in shares)
+    assert max(shares) == min(shares)
+    # Only deployed operations have a share
+    assert batch.duration(msix("Other"), 5.0) == 5.0
+
+
+def test_staged_copies_are_released_after_the_session():
+    operations = [msix("Calculator"), msix("Photos"), msix("Broken")]
+    batch = MsixBatch(RecordingBackend(), operations)
+    released = []
+
+    def resolve(operation):
+        if operation['name'] == "Broken":
+            return None, "Checksum mismatch"
+        return f"/cache/{operation['name']}.msix", ""
+
+    assert batch.install(operations[0], LaunchOptions(), resolve, released.append)[0]
+
+    assert released == ["/cache/Calculator.msix", "/cache/Photos.msix"]
+    assert batch.install(operations[2], LaunchOptions(), resolve, released.append) == (False, "", "Checksum mismatch")
+    assert len(released) == 2
@@ -0,0 +1,182 @@
+"""
+Round-trip tests for offline_registry
+
+Every hive written here is parsed again with two independent readers,
+python-registry and regipy, so the tests check the regf format itself and
+not just that RegistryHive can read back what it wrote.
+"""
+
+import struct
+
+import pytest
+
+from backends import REG_SZ, REG_DWORD, REG_BINARY
+from offline_registry import RegistryHive, HiveError, BIG_DATA_SEGMENT, MAX_LEAF_ELEMENTS
+
+Registry = pytest.importorskip("Registry.Registry")
+regipy_registry = pytest.importorskip("regipy.registry")
+
+KEY = "Policies\\Microsoft\\Windows\\DataCollection"
+
+
+def save(hive: RegistryHive, tmp_path, name: str = "SOFTWARE") -> str:
+    path = str(tmp_path / name)
+    hive.save(path)
+    return path
+
+
+def python_registry_values(path: str, key: str):
+    """name -> (type, data) as python-registry reads them"""
+    opened = Registry.Registry(path).open(key)
+    return {value.name(): (value.value_type(), value.value()) for value in opened.values()}
+
+
+def regipy_values(path: str, key: str):
+    """name -> data as regipy reads them (it returns small binary data as hex)"""
+    opened = regipy_registry.RegistryHive(path).get_key("\\" + key)
+    return {value.name: bytes.fromhex(value.value) if value.value_type == "REG_BINARY" and isinstance(value.value, str)
+            else value.value for value in opened.iter_values()}
+
+
+def test_create_empty_hive(tmp_path):
+    path = save(RegistryHive.create("SOFTWARE"), tmp_path)
+
+    root = Registry.Registry(path).root()
+    assert root.subkeys_number() == 0
+    assert root.values_number() == 0
+    header = regipy_registry.RegistryHive(path).header
+    assert header.signature == b"regf"
+    assert header.primary_sequence_num == header.secondary_sequence_num
+    assert (header.major_version, header.minor_version) == (1, 5)
+
+
+def test_set_dword_and_sz(tmp_path):
+    hive = RegistryHive.create("SOFTWARE")
+    hive.set_value(KEY, "AllowTelemetry", 0)
+    hive.set_value(KEY, "Comment", "Set by Better10")
+    path = save(hive, tmp_path)
+
+    assert python_registry_values(path, KEY) == {
+        "AllowTelemetry": (REG_DWORD, 0),
+        "Comment": (REG_SZ, "Set by Better10"),
+    }
+    assert regipy_values(path, KEY) == {"AllowTelemetry": 0, "Comment": "Set by Better10"}
+
+
+def test_replace_values_in_a_reloaded_hive(tmp_path):
+    hive = RegistryHive.create("SOFTWARE")
+    hive.set_value(KEY, "AllowTelemetry", 3)
+    hive.set_value(KEY, "Comment", "short")
+    path = save(hive, tmp_path)
+
+    hive = RegistryHive.load(path)
+    hive.set_value(KEY, "AllowTelemetry", 0)
+    hive.set_value(KEY, "Comment", "a much longer string than the one it replaces")
+    hive.save()
+
+    assert python_registry_values(path, KEY) == {
+        "AllowTelemetry": (REG_DWORD, 0),
+        "Comment": (REG_SZ, "a much longer string than the one it replaces"),
+    }
+    assert regipy_values(path, KEY) == {
+        "AllowTelemetry": 0,
+        "Comment": "a much longer string than the one it replaces",
+    }
+
+
+def test_replace_value_with_another_type(tmp_path):
+    hive = RegistryHive.create("SOFTWARE")
+    hive.set_value(KEY, "Mode", 1)
+    hive.set_value(KEY, "Mode", "Deny")
+    path = save(hive, tmp_path)
+
+    assert python_registry_values(path, KEY) == {"Mode": (REG_SZ, "Deny")}
+    assert regipy_values(path, KEY) == {"Mode": "Deny"}
+
+
+def test_delete_values(tmp_path):
+    hive = RegistryHive.create("SOFTWARE")
+    hive.set_value(KEY, "AllowTelemetry", 0)
+    hive.set_value(KEY, "Comment", "gone soon")
+    hive.set_value(KEY, "Kept", 7)
+    path = save(hive, tmp_path)
+
+    hive = RegistryHive.load(path)
+    assert hive.delete_value(KEY, "comment")  # Names are case-insensitive
+    assert not hive.delete_value(KEY, "Missing")
+    hive.save()
+    assert python_registry_values(path, KEY) == {"AllowTelemetry": (REG_DWORD, 0), "Kept": (REG_DWORD, 7)}
+    assert regipy_values(path, KEY) == {"AllowTelemetry": 0, "Kept": 7}
+
+    hive = RegistryHive.load(path)
+    assert hive.delete_value(KEY, "AllowTelemetry")
+    assert hive.delete_value(KEY, "Kept")
+    hive.save()
+    assert python_registry_values(path, KEY) == {}
+    assert regipy_values(path, KEY) == {}
+
+
+def test_subkey_list_past_the_ri_threshold(tmp_path):
+    count = 3000
+    assert count > MAX_LEAF_ELEMENTS
+    hive = RegistryHive.create("SOFTWARE")
+    names = [f"Key{i:04d}" for i in range(count)]
+    for name in names:
+        hive.create_key(f"Many\\{name}")
+    hive.set_value("Many\\Key2999", "Last", 1)
+    path = save(hive, tmp_path)
+
+    many = Registry.Registry(path).open("Many")
+    assert many.subkeys_number() == count
+    assert sorted(key.name() for key in many.subkeys()) == names
+    assert Registry.Registry(path).open("Many\\Key2999").value("Last").value() == 1
+
+    key = regipy_registry.RegistryHive(path).get_key("\\Many")
+    assert sorted(subkey.name for subkey in key.iter_subkeys()) == names
+    assert regipy_values(path, "Many\\Key1500") == {}
+
+    # Adding to an existing ri index keeps it readable
+    hive = RegistryHive.load(path)
+    hive.create_key("Many\\Added")
+    hive.save()
+    assert Registry.Registry(path).open("Many").subkeys_number() == count + 1
+    assert Registry.Registry(path).open("Many\\Added").name() == "Added"
+
+
+def test_big_data_value(tmp_path):
+    data = bytes(range(256)) * 200  # 51200 bytes, four "db" segments
+    assert len(data) > BIG_DATA_SEGMENT
+    hive = RegistryHive.create("SOFTWARE")
+    hive.set_value(KEY, "Blob", data)
+    path = save(hive, tmp_path)
+
+    assert python_registry_values(path, KEY) == {"Blob": (REG_BINARY, data)}
+    assert regipy_values(path, KEY) == {"Blob": data}
+
+    # Replacing big data with a small value frees the segments
+    hive = RegistryHive.load(path)
+    hive.set_value(KEY, "Blob", b"small")
+    hive.save()
+    assert python_registry_values(path, KEY) == {"Blob": (REG_BINARY, b"small")}
+    assert regipy_values(path, KEY) == {"Blob": b"small"}
+
+
+def test_header_checksum(tmp_path):
+    hive = RegistryHive.create("SOFTWARE")
+    hive.set_value(KEY, "AllowTelemetry", 0)
+    path = save(hive, tmp_path)
+    with open(path, "rb") as f:
+        block = f.read(4096)
+
+    # XOR of the first 127 dwords, computed here independently of the module
+    expected = 0
+    for (dword,) in struct.iter_unpack("<I", block[:508]):
+        expected ^= dword
+    stored = struct.unpack_from("<I", block, 508)[0]
+    assert stored == expected
+    assert regipy_registry.RegistryHive(path).header.checksum == expected
+
+    corrupted = bytearray(block)
+    corrupted[0x30] ^= 0xFF
+    with pytest.raises(HiveError):
+        RegistryHive(bytes(corrupted) + open(path, "rb").read()[4096:])
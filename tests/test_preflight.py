@@ -0,0 +1,58 @@
+"""
+Tests for preflight against the simulated backend
+"""
+
+import time
+
+import pytest
+
+from backends import SimulatedBackend, SimulatedProcessRunner
+from preflight import Preflight, CheckStatus
+
+MISSING = "Apps\\Missing\\setup.msi"
+
+
+def installer(path: str) -> dict:
+    return {'type': 'local_installer', 'name': "Setup", 'path': path, 'installer_type': 'msi'}
+
+
+def files_check(report):
+    return next(check for check in report.checks if check.name == "Files")
+
+
+def test_missing_installer_fails(tmp_path):
+    present = tmp_path / "present.msi"
+    present.write_bytes(b"x" * 100)
+    backend = SimulatedBackend()
+
+    report = Preflight(backend).run([installer(str(present)), installer(MISSING)])
+
+    assert not report.passed
+    check = files_check(report)
+    assert check.status == CheckStatus.FAILED
+    assert check.detail == f"{MISSING} not found"
+    assert backend.paths_exist([MISSING]) == [False]
+
+
+def test_files_of_the_simulated_machine_pass():
+    report = Preflight(SimulatedBackend(files=[MISSING])).run([installer(MISSING)])
+
+    assert files_check(report).status == CheckStatus.PASSED
+
+
+def test_missing_installer_fails_the_run_before_anything_runs(tmp_path, monkeypatch, capsys):
+    pytest.importorskip("PyQt5")
+    monkeypatch.setenv("BETTER10_DATA_DIR", str(tmp_path))
+    from better10 import run_headless
+
+    # Operations take seconds, so finishing quickly means none of them ran
+    backend = SimulatedBackend(runner=SimulatedProcessRunner(latency=5.0))
+    plan = [{'type': 'powershell', 'name': "Slow step", 'command': "Start-Sleep 5"}, installer(MISSING)]
+
+    started = time.monotonic()
+    assert run_headless(plan, backend=backend) is False
+    assert time.monotonic() - started < 1.0
+
+    output = capsys.readouterr().out
+    assert f"[PREFLIGHT] ✗ Files: {MISSING} not found" in output
+    assert "nothing was run" in output
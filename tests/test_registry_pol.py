@@ -0,0 +1,165 @@
+"""
+Tests for registry_pol
+
+The expected files are assembled by hand from the documented layout, so
+the tests do not depend on the module's own encoder.
+"""
+
+import os
+import struct
+
+import pytest
+
+from backends import HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, REG_SZ, REG_DWORD
+from registry_pol import (
+    PolicyEntry, PolicyFile, PolicyFileError, parse_pol, build_pol, update_gpt_ini, export_policy,
+    REGISTRY_EXTENSION
+)
+
+KEY = "Software\\Policies\\Microsoft\\Windows\\DataCollection"
+
+
+def utf16(text: str) -> bytes:
+    return text.encode("utf-16-le")
+
+
+def record(key: str, value: str, reg_type: int, data: bytes) -> bytes:
+    """One [key;value;type;size;data] entry, written out by hand"""
+    return (utf16("[") + utf16(key) + b"\0\0" + utf16(";") + utf16(value) + b"\0\0" + utf16(";")
+            + struct.pack("<I", reg_type) + utf16(";") + struct.pack("<I", len(data)) + utf16(";")
+            + data + utf16("]"))
+
+
+HEADER = b"PReg\x01\x00\x00\x00"
+DWORD_RECORD = record(KEY, "AllowTelemetry", REG_DWORD, b"\x00\x00\x00\x00")
+SZ_RECORD = record(KEY, "Comment", REG_SZ, utf16("Better10\0"))
+
+
+def operation(value_name: str, value, hive=HKEY_LOCAL_MACHINE, key_path: str = KEY):
+    return {'type': 'registry', 'name': value_name, 'hive': hive, 'key_path': key_path,
+            'value_name': value_name, 'value': value}
+
+
+def read_gpt_ini(gpo_dir) -> dict:
+    with open(os.path.join(gpo_dir, "gpt.ini"), encoding="utf-8") as f:
+        return dict(line.split("=", 1) for line in f.read().splitlines() if "=" in line)
+
+
+def test_build_matches_hand_assembled_bytes():
+    entries = [PolicyEntry(KEY, "AllowTelemetry", REG_DWORD, b"\x00\x00\x00\x00"),
+               PolicyEntry(KEY, "Comment", REG_SZ, utf16("Better10\0"))]
+    assert build_pol(entries) == HEADER + DWORD_RECORD + SZ_RECORD
+    assert build_pol([]) == HEADER
+
+
+def test_parse_hand_assembled_bytes():
+    entries = parse_pol(HEADER + DWORD_RECORD + SZ_RECORD)
+    assert [(entry.key, entry.value, entry.reg_type, entry.decoded) for entry in entries] == [
+        (KEY, "AllowTelemetry", REG_DWORD, 0),
+        (KEY, "Comment", REG_SZ, "Better10"),
+    ]
+    assert parse_pol(HEADER) == []
+
+
+def test_data_may_contain_the_framing_characters():
+    data = utf16("];[\0")
+    entries = parse_pol(HEADER + record(KEY, "Tricky", REG_SZ, data) + DWORD_RECORD)
+    assert [(entry.value, entry.data) for entry in entries] == [("Tricky", data), ("AllowTelemetry", b"\0" * 4)]
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"PRe",
+    b"PReG\x01\x00\x00\x00",
+    b"regf\x01\x00\x00\x00",
+    b"PReg\x02\x00\x00\x00",
+])
+def test_rejects_bad_signature_or_version(data):
+    with pytest.raises(PolicyFileError):
+        parse_pol(data)
+
+
+def test_rejects_truncated_files():
+    data = HEADER + DWORD_RECORD + SZ_RECORD
+    boundaries = {len(HEADER), len(HEADER) + len(DWORD_RECORD), len(data)}
+    for length in range(len(HEADER), len(data)):
+        if length in boundaries:
+            continue
+        with pytest.raises(PolicyFileError):
+            parse_pol(data[:length])
+    assert len(parse_pol(data[:len(HEADER) + len(DWORD_RECORD)])) == 1
+
+
+def test_merge_into_existing_file(tmp_path):
+    other = record("Software\\Policies\\Other", "Kept", REG_DWORD, b"\x07\x00\x00\x00")
+    machine = tmp_path / "Machine"
+    machine.mkdir()
+    (machine / "Registry.pol").write_bytes(HEADER + other + DWORD_RECORD + SZ_RECORD)
+
+    counts = export_policy(str(tmp_path), [operation("AllowTelemetry", 1), operation("NewValue", "on")])
+
+    assert counts == {"Machine": 2}
+    assert (machine / "Registry.pol").read_bytes() == (
+        HEADER + other + record(KEY, "AllowTelemetry", REG_DWORD, b"\x01\x00\x00\x00") + SZ_RECORD
+        + record(KEY, "NewValue", REG_SZ, utf16("on\0"))
+    )
+
+
+def test_user_settings_go_to_the_user_section(tmp_path):
+    export_policy(str(tmp_path), [operation("NoAutoplayfornonVolume", 1, HKEY_CURRENT_USER,
+                                            "Software\\Policies\\Microsoft\\Windows\\Explorer")])
+    assert not (tmp_path / "Machine").exists()
+    entries = PolicyFile.load(str(tmp_path / "User" / "Registry.pol")).entries
+    assert [(entry.value, entry.decoded) for entry in entries] == [("NoAutoplayfornonVolume", 1)]
+
+
+def test_delete_entries():
+    existing = record(KEY, "**del.AllowTelemetry", REG_SZ, utf16(" \0"))
+    deletes_all = record(KEY, "**delvals.", REG_SZ, utf16(" \0"))
+    policy = PolicyFile(parse_pol(HEADER + deletes_all + existing))
+
+    # Setting the value drops its pending delete, and keeps other instructions
+    assert policy.set(KEY, "AllowTelemetry", 0)
+    assert build_pol(policy.entries) == HEADER + deletes_all + DWORD_RECORD
+
+    # Deleting it removes the entry and records a delete instruction once
+    assert policy.delete(KEY, "AllowTelemetry")
+    assert build_pol(policy.entries) == HEADER + deletes_all + existing
+    assert not policy.delete(KEY, "AllowTelemetry")
+    assert build_pol(policy.entries) == HEADER + deletes_all + existing
+
+
+def test_gpt_ini_version_bumps_only_on_change(tmp_path):
+    gpo = str(tmp_path)
+    export_policy(gpo, [operation("AllowTelemetry", 0)])
+    settings = read_gpt_ini(gpo)
+    assert settings["Version"] == "1"
+    assert REGISTRY_EXTENSION in settings["gPCMachineExtensionNames"]
+    assert "gPCUserExtensionNames" not in settings
+
+    # The same plan again changes nothing
+    export_policy(gpo, [operation("AllowTelemetry", 0)])
+    assert read_gpt_ini(gpo)["Version"] == "1"
+
+    # A changed machine value bumps the low word, a user value the high word
+    export_policy(gpo, [operation("AllowTelemetry", 1)])
+    assert read_gpt_ini(gpo)["Version"] == "2"
+    export_policy(gpo, [operation("NoAutorun", 1, HKEY_CURRENT_USER,
+                                  "Software\\Microsoft\\Windows\\CurrentVersion\\Policies\\Explorer")])
+    settings = read_gpt_ini(gpo)
+    assert settings["Version"] == str((1 << 16) | 2)
+    assert REGISTRY_EXTENSION in settings["gPCUserExtensionNames"]
+
+
+def test_gpt_ini_keeps_existing_settings(tmp_path):
+    path = tmp_path / "gpt.ini"
+    extensions = f"[{REGISTRY_EXTENSION}{{D02B1F72-3407-48AE-BA88-E8213C6761F1}}]"
+    path.write_bytes(b"[General]\r\ndisplayName=Lab policy\r\nVersion=65538\r\n"
+                     + f"gPCMachineExtensionNames={extensions}\r\n".encode())
+
+    update_gpt_ini(str(path), ["Machine"])
+
+    text = path.read_bytes().decode("utf-8")
+    # Missing settings are added at the top of [General]; the rest keeps its order
+    assert text == ("[General]\r\ngPCFunctionalityVersion=2\r\ndisplayName=Lab policy\r\nVersion=65539\r\n"
+                    f"gPCMachineExtensionNames={extensions}\r\n")
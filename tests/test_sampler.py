@@ -0,0 +1,71 @@
+"""
+Tests for how sampler attributes samples to operations
+
+Rows are appended to a sampler that is never started, so the tests do not
+depend on the machine's own load.
+"""
+
+from sampler import TimeSeries, ResourceSampler, Bound, METRICS
+
+IDLE = {"cpu_percent": 5.0, "commit_bytes": 2.0 * 1024 ** 3, "disk_queue": 0.0, "disk_read_bps": 0.0,
+        "disk_write_bps": 0.0, "child_count": 1.0, "child_cpu_percent": 0.0, "child_io_bps": 0.0}
+
+
+def row(**values):
+    return [dict(IDLE, **values)[name] for name in METRICS]
+
+
+def sampler_with(rows):
+    sampler = ResourceSampler(interval=1.0)
+    for timestamp, values in rows:
+        sampler.series.append(timestamp, values)
+    return sampler
+
+
+def run(sampler, index: int, name: str, start: float, end: float):
+    sampler.operation_started(index, name, at=start)
+    sampler.operation_finished(index, at=end)
+
+
+def test_rows_between_includes_the_sample_after_the_span():
+    series = TimeSeries(["value"])
+    for timestamp in (1.0, 2.0, 3.0, 4.0):
+        series.append(timestamp, [timestamp])
+
+    assert series.rows_between(0.5, 2.5) == (0, 3)
+    assert series.rows_between(1.0, 3.0) == (1, 3)
+    assert series.rows_between(1.5, 2.0) == (1, 2)
+
+
+def test_rows_between_is_empty_without_a_sample_inside_the_span():
+    series = TimeSeries(["value"])
+    for timestamp in (1.0, 2.0):
+        series.append(timestamp, [timestamp])
+
+    assert series.rows_between(1.2, 1.2) == (1, 1)
+    assert series.rows_between(1.2, 1.9) == (1, 1)
+    assert series.rows_between(2.5, 3.0) == (2, 2)
+
+
+def test_short_operation_does_not_inherit_a_busy_sample():
+    sampler = sampler_with([(1.0, row()), (2.0, row(cpu_percent=100.0)), (3.0, row(cpu_percent=100.0))])
+    run(sampler, 0, "Compile", 1.2, 2.0)
+    run(sampler, 1, "Set value", 2.1, 2.1)
+
+    compile_usage, set_usage = sampler.usage()
+
+    assert compile_usage.bound == Bound.CPU
+    assert compile_usage.samples == 1
+    assert set_usage.bound == Bound.UNSAMPLED
+    assert set_usage.samples == 0
+    assert set_usage.describe() == "Set value (0.0s): unsampled"
+    assert set_usage.to_dict()["cpu_percent"] is None
+
+
+def test_summary_counts_unsampled_operations():
+    sampler = sampler_with([(1.0, row()), (2.0, row(disk_queue=4.0))])
+    run(sampler, 0, "Install", 0.5, 1.5)
+    run(sampler, 1, "Tweak", 1.6, 1.6)
+    run(sampler, 2, "Tweak again", 1.7, 1.7)
+
+    assert sampler.summary_lines()[0] == "Resource use (2 samples every 1s): 2 unsampled, 1 I/O-bound"
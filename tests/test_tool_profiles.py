@@ -0,0 +1,89 @@
+"""
+Tests for tool_profiles
+
+No bundled tool has a profile yet, so the tests register a test-only one.
+"""
+
+import os
+
+import pytest
+
+import tool_profiles
+from exit_codes import ExitOutcome
+from tool_profiles import ToolProfile, profile_for_tool, tool_operation, tool_launch_arguments
+
+PROFILE = ToolProfile("cleaner", "Cleaner.exe", ["/config", "{config}", "/silent"], config="Cleaner.ini",
+                      exit_codes={0: (ExitOutcome.SUCCESS, "Success"), 3010: (ExitOutcome.SUCCESS_REBOOT, "Restart required")},
+                      timeout=120)
+
+
+@pytest.fixture(autouse=True)
+def profiles(monkeypatch):
+    monkeypatch.setattr(tool_profiles, "TOOL_PROFILES", {PROFILE.key: PROFILE})
+
+
+@pytest.fixture
+def tool(tmp_path):
+    path = tmp_path / "Cleaner.exe"
+    path.write_bytes(b"MZ")
+    return str(path)
+
+
+def test_profile_matches_file_name_case_insensitively(tool):
+    assert profile_for_tool(tool) is PROFILE
+    assert profile_for_tool(tool.replace("Cleaner.exe", "CLEANER.EXE")) is PROFILE
+    assert profile_for_tool(tool.replace("Cleaner.exe", "Other.exe")) is None
+
+
+def test_config_placeholder_is_replaced(tool):
+    open(os.path.join(os.path.dirname(tool), "Cleaner.ini"), "w").close()
+    operation = tool_operation("Cleaner", tool, "exe")
+
+    assert operation['tool_profile'] == "cleaner"
+    assert operation['timeout'] == 120
+    args, error = tool_launch_arguments(operation)
+    assert error == ""
+    assert args == ["/config", os.path.join(os.path.dirname(tool), "Cleaner.ini"), "/silent"]
+    assert PROFILE.describe() == "Cleaner.exe /config Cleaner.ini /silent"
+
+
+def test_missing_config_falls_back_to_interactive(tool):
+    operation = tool_operation("Cleaner", tool, "exe")
+
+    assert 'tool_profile' not in operation
+    assert 'timeout' not in operation
+    assert tool_launch_arguments(operation) == (None, "")
+
+
+def test_interactive_request_ignores_profile(tool):
+    open(os.path.join(os.path.dirname(tool), "Cleaner.ini"), "w").close()
+
+    assert 'tool_profile' not in tool_operation("Cleaner", tool, "exe", unattended=False)
+
+
+def test_config_removed_after_planning_is_an_error(tool):
+    config = os.path.join(os.path.dirname(tool), "Cleaner.ini")
+    open(config, "w").close()
+    operation = tool_operation("Cleaner", tool, "exe")
+    os.remove(config)
+
+    args, error = tool_launch_arguments(operation)
+    assert args is None
+    assert error == f"Config file for unattended mode not found: {config}"
+
+
+def test_unknown_profile_is_an_error(tool):
+    operation = {'type': 'tool', 'name': "Cleaner", 'path': tool, 'tool_type': 'exe', 'tool_profile': "gone"}
+
+    assert tool_launch_arguments(operation) == (None, "Unknown tool profile: gone")
+
+
+def test_explicit_arguments_win(tool):
+    operation = {'type': 'tool', 'name': "Cleaner", 'path': tool, 'tool_type': 'exe',
+                 'tool_profile': "cleaner", 'args': ["/help"]}
+
+    assert tool_launch_arguments(operation) == (["/help"], "")
+
+
+def test_technology_names_the_exit_code_table():
+    assert PROFILE.technology == "tool:cleaner"
@@ -0,0 +1,131 @@
+"""
+Unattended launch profiles for bundled tools
+
+Third-party tools in the Tools folder open an interactive GUI when started
+without arguments, which stalls an unattended run until someone closes the
+window or the timeout expires. A profile declares how to run a known tool
+silently: its command-line arguments, the config file it applies (shipped
+next to the tool), its exit codes and its timeout.
+
+Only tools with a documented silent mode get a profile: a guessed command
+line may exit 0 without doing anything, and the run would report success.
+Tools without a profile are launched as before.
+"""
+
+import os
+from typing import List, Dict, Tuple, Optional
+
+from backends import resolve_path
+from exit_codes import ExitOutcome, EXIT_CODE_TABLES
+
+# Placeholder in a profile's arguments for the full path of its config file
+CONFIG_PLACEHOLDER = "{config}"
+
+
+class ToolProfile:
+    """How to run one known tool without user interaction"""
+
+    def __init__(self, key: str, filename: str, args: List[str], config: str = None,
+                 exit_codes: Dict[int, Tuple[str, str]] = None, timeout: float = None):
+        """
+        Args:
+            key: Short identifier, stored in operations as "tool_profile"
+            filename: Tool file name the profile applies to (case-insensitive)
+            args: Unattended arguments; CONFIG_PLACEHOLDER is replaced by the config path
+            config: Config file name, looked up next to the tool
+            exit_codes: Exit code -> (ExitOutcome value, description); 0 is success if absent
+            timeout: Seconds before the tool is stopped (the tool default if None)
+        """
+        self.key = key
+        self.filename = filename
+        self.args = args
+        self.config = config
+        self.exit_codes = exit_codes or {0: (ExitOutcome.SUCCESS, "Success")}
+        self.timeout = timeout
+
+    @property
+    def technology(self) -> str:
+        """Exit-code table key for operations using this profile"""
+        return f"tool:{self.key}"
+
+    def config_path(self, tool_path: str) -> Optional[str]:
+        """Return the full path of a tool's config file, or None if the profile takes no config"""
+        if not self.config:
+            return None
+        return os.path.join(os.path.dirname(resolve_path(tool_path)), self.config)
+
+    def describe(self) -> str:
+        """Return the unattended command line for display ("Tool.exe Tool.cfg /quiet")"""
+        return " ".join([self.filename] + [arg.replace(CONFIG_PLACEHOLDER, self.config or "") for arg in self.args])
+
+    def arguments(self, tool_path: str) -> List[str]:
+        """Return the command-line arguments for a tool, with the config path filled in"""
+        config_path = self.config_path(tool_path) or ""
+        return [arg.replace(CONFIG_PLACEHOLDER, config_path) for arg in self.args]
+
+
+# O&O AppBuster (Tools/OOAPB.exe) is deliberately not listed: it has no
+# documented unattended mode, and OOAPB.cfg only holds its window state and
+# view settings, not a selection of apps to remove. It runs interactively.
+TOOL_PROFILES: Dict[str, ToolProfile] = {}
+
+# Profiles' exit codes are classified like any other technology's
+for _profile in TOOL_PROFILES.values():
+    EXIT_CODE_TABLES[_profile.technology] = _profile.exit_codes
+
+
+def profile_for_tool(tool_path: str) -> Optional[ToolProfile]:
+    """Return the profile for a tool file, or None if the tool is not known"""
+    filename = os.path.basename(tool_path).lower()
+    for profile in TOOL_PROFILES.values():
+        if profile.filename.lower() == filename:
+            return profile
+    return None
+
+
+def tool_operation(name: str, path: str, tool_type: str, unattended: bool = True) -> Dict:
+    """
+    Build the operation that runs a tool
+
+    Known tools are marked with their profile ("tool_profile"); the
+    arguments are filled in when the tool is launched, so saved profiles
+    stay portable between machines. If the profile's config file is
+    missing the tool is launched interactively as before, since its
+    silent mode would have nothing to apply.
+    """
+    operation = {'type': 'tool', 'name': name, 'path': path, 'tool_type': tool_type}
+    profile = profile_for_tool(path) if unattended else None
+    if profile is None:
+        return operation
+
+    config_path = profile.config_path(path)
+    if config_path and not os.path.exists(config_path):
+        return operation
+
+    operation['tool_profile'] = profile.key
+    if profile.timeout:
+        operation['timeout'] = profile.timeout
+    return operation
+
+
+def tool_launch_arguments(operation: Dict) -> Tuple[Optional[List[str]], str]:
+    """
+    Return the arguments for a tool operation
+
+    Explicit "args" win; otherwise the operation's profile supplies them.
+
+    Returns:
+        Tuple of (arguments or None for an interactive launch, error message)
+    """
+    if operation.get('args') is not None:
+        return list(operation['args']), ""
+    key = operation.get('tool_profile')
+    if not key:
+        return None, ""
+    profile = TOOL_PROFILES.get(key)
+    if profile is None:
+        return None, f"Unknown tool profile: {key}"
+    config_path = profile.config_path(operation.get('path', ''))
+    if config_path and not os.path.exists(config_path):
+        return None, f"Config file for unattended mode not found: {config_path}"
+    return profile.arguments(operation.get('path', '')), ""
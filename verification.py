@@ -0,0 +1,217 @@
+"""
+Post-run verification for Better10
+
+An operation that exits 0 has not necessarily taken effect.
+Remove-AppxPackage succeeds while the package stays provisioned for new
+users, and Group Policy can override an HKCU write. After a run, the
+intended effect of every successful operation is checked on the machine.
+
+Checks are batched. All registry values are read back in one pass, and
+installed programs and Appx packages come from a single inventory query.
+Files listed in an operation's optional "expect_files" are checked in one
+call. The three batches run concurrently.
+"""
+
+import os
+import re
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
+
+from backends import SystemBackend, HKEY_LOCAL_MACHINE, appx_packages_in_command, detect_installer_type
+
+
+class VerificationStatus:
+    """Result of checking one operation's effect"""
+    VERIFIED = "verified"
+    MISMATCH = "mismatch"    # The operation reported success but its effect is missing
+    UNCHECKED = "unchecked"  # No check exists for this operation, or the query failed
+
+
+class VerificationResult:
+    """Outcome of verifying one operation"""
+
+    def __init__(self, operation: Dict, status: str, detail: str = ""):
+        self.operation = operation
+        self.status = status
+        self.detail = detail
+
+    @property
+    def name(self) -> str:
+        return self.operation.get('name', 'Unknown operation')
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "status": self.status, "detail": self.detail}
+
+
+# Words in installer file names that say nothing about the product
+_INSTALLER_NOISE = {
+    "setup", "installer", "install", "x64", "x86", "win64", "win32", "amd64", "arm64",
+    "en", "us", "full", "offline", "online", "latest", "release", "stable", "msi", "exe",
+}
+
+
+def installer_product_tokens(installer_path: str) -> List[str]:
+    """
+    Guess the product name words from an installer file name
+
+    "Firefox Setup 128.0.exe" -> ["firefox"], "vlc-3.0.21-win64.exe" -> ["vlc"]
+    """
+    stem = os.path.splitext(os.path.basename(installer_path))[0].lower()
+    return [token for token in re.split(r"[^a-z0-9+]+", stem)
+            if token and token not in _INSTALLER_NOISE and not re.fullmatch(r"v?\d+[a-z]?", token)]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9+]+", "", text.lower())
+
+
+class RunVerifier:
+    """
+    Checks the effects of the operations in a finished run
+
+    The class attribute is the default main() configures from the
+    command line.
+    """
+
+    enabled: bool = True
+
+    def __init__(self, backend: SystemBackend):
+        self.backend = backend
+
+    @classmethod
+    def configure(cls, enabled: bool = None):
+        """Change the default used by new verifiers"""
+        if enabled is not None:
+            cls.enabled = enabled
+
+    @staticmethod
+    def _needs_inventory(operation: Dict) -> bool:
+        op_type = operation.get('type')
+        if op_type == 'powershell':
+            return bool(appx_packages_in_command(operation.get('command')))
+        return op_type in ('winget_install', 'winget_uninstall', 'local_installer')
+
+    def verify(self, operations: List[Dict]) -> List[VerificationResult]:
+        """
+        Verify operations that reported success
+
+        Returns:
+            One VerificationResult per operation, in the same order
+        """
+        registry_ops = [op for op in operations if op.get('type') == 'registry']
+        registry_queries = [(op.get('hive', HKEY_LOCAL_MACHINE), op.get('key_path', ''), op.get('value_name', ''))
+                            for op in registry_ops]
+        file_paths = [path for op in operations for path in op.get('expect_files', [])]
+        inventory_needed = any(self._needs_inventory(op) for op in operations)
+        winget_needed = any(op.get('type', '').startswith('winget_') for op in operations)
+
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="verify") as pool:
+            registry_future = pool.submit(self.backend.read_registry_values, registry_queries) if registry_queries else None
+            inventory_future = pool.submit(self.backend.inventory, winget_needed) if inventory_needed else None
+            files_future = pool.submit(self.backend.paths_exist, file_paths) if file_paths else None
+
+            registry_values, registry_error = self._collect(registry_future, [])
+            inventory, inventory_error = self._collect(inventory_future, {})
+            path_results, files_error = self._collect(files_future, [])
+
+        read_back = {id(op): value for op, value in zip(registry_ops, registry_values)}
+        existing = dict(zip(file_paths, path_results))
+
+        results = []
+        for operation in operations:
+            checks = []
+            if operation.get('type') == 'registry':
+                checks.append(self._check_registry(operation, read_back, registry_error))
+            elif self._needs_inventory(operation):
+                checks.append(self._check_inventory(operation, inventory, inventory_error))
+            for path in operation.get('expect_files', []):
+                if files_error:
+                    checks.append((VerificationStatus.UNCHECKED, f"File check failed: {files_error}"))
+                elif existing.get(path):
+                    checks.append((VerificationStatus.VERIFIED, ""))
+                else:
+                    checks.append((VerificationStatus.MISMATCH, f"Expected file is missing: {path}"))
+            results.append(self._combine(operation, checks))
+        return results
+
+    @staticmethod
+    def _collect(future, default) -> Tuple[object, str]:
+        """Return (result, error message) for an optional batch"""
+        if future is None:
+            return default, ""
+        try:
+            return future.result(), ""
+        except Exception as e:
+            return default, str(e) or type(e).__name__
+
+    @staticmethod
+    def _combine(operation: Dict, checks: List[Tuple[str, str]]) -> VerificationResult:
+        """Fold the individual checks of an operation into one result"""
+        mismatches = [detail for status, detail in checks if status == VerificationStatus.MISMATCH]
+        if mismatches:
+            return VerificationResult(operation, VerificationStatus.MISMATCH, "; ".join(mismatches))
+        if any(status == VerificationStatus.VERIFIED for status, _ in checks):
+            return VerificationResult(operation, VerificationStatus.VERIFIED)
+        details = [detail for _, detail in checks if detail]
+        return VerificationResult(operation, VerificationStatus.UNCHECKED,
+                                  "; ".join(details) or "No verifiable effect")
+
+    @staticmethod
+    def _check_registry(operation: Dict, read_back: Dict[int, object], error: str) -> Tuple[str, str]:
+        if error:
+            return VerificationStatus.UNCHECKED, f"Registry read-back failed: {error}"
+        expected = operation.get('value')
+        actual = read_back.get(id(operation))
+        if actual is None:
+            return VerificationStatus.MISMATCH, f"{operation.get('value_name')} is not set"
+        if actual != expected:
+            return VerificationStatus.MISMATCH, (
+                f"{operation.get('value_name')} is {actual!r}, expected {expected!r} "
+                "(possibly overridden by policy)"
+            )
+        return VerificationStatus.VERIFIED, ""
+
+    @staticmethod
+    def _check_inventory(operation: Dict, inventory: Dict[str, List[str]], error: str) -> Tuple[str, str]:
+        if error:
+            return VerificationStatus.UNCHECKED, f"Inventory query failed: {error}"
+        op_type = operation.get('type')
+
+        if op_type == 'powershell':
+            problems = []
+            for pattern in appx_packages_in_command(operation.get('command')):
+                if fnmatch.filter([p.lower() for p in inventory.get('appx_packages', [])], pattern.lower()):
+                    problems.append(f"{pattern} is still installed")
+                elif fnmatch.filter([p.lower() for p in inventory.get('provisioned_packages', [])], pattern.lower()):
+                    problems.append(f"{pattern} is still provisioned and will return for new users")
+            if problems:
+                return VerificationStatus.MISMATCH, "; ".join(problems)
+            return VerificationStatus.VERIFIED, ""
+
+        if op_type in ('winget_install', 'winget_uninstall'):
+            if 'winget_packages' not in inventory:
+                return VerificationStatus.UNCHECKED, "winget package list unavailable"
+            package_id = operation.get('package_id', '')
+            installed = package_id.lower() in (p.lower() for p in inventory['winget_packages'])
+            if op_type == 'winget_install' and not installed:
+                return VerificationStatus.MISMATCH, f"{package_id} is not listed by winget"
+            if op_type == 'winget_uninstall' and installed:
+                return VerificationStatus.MISMATCH, f"{package_id} is still installed"
+            return VerificationStatus.VERIFIED, ""
+
+        # Local installer
+        path = operation.get('path', '')
+        if (operation.get('installer_type') or detect_installer_type(path)) == 'msix':
+            package = os.path.splitext(os.path.basename(path))[0].split("_")[0].lower()
+            if package in (p.lower() for p in inventory.get('appx_packages', [])):
+                return VerificationStatus.VERIFIED, ""
+            return VerificationStatus.MISMATCH, f"Appx package {package} is not installed"
+
+        tokens = installer_product_tokens(path)
+        if not tokens:
+            return VerificationStatus.UNCHECKED, "Cannot tell the product name from the installer file name"
+        programs = [_normalize(program) for program in inventory.get('programs', [])]
+        if any(tokens[0] in program for program in programs):
+            return VerificationStatus.VERIFIED, ""
+        return VerificationStatus.MISMATCH, f"No installed program matches '{tokens[0]}'"